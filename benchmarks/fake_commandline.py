@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+A stand-in for Cinema 4D's Commandline executable, built on the c4d stand-in in benchmarks/fakec4d.
+
+Started by the Cinema4D plugin it loads the scene given with -render and replays a recorded log for the -frame range, or
+exports the frames given with -arnoldAssExport.
+Started by the Cinema4DBatch plugin it loads the .pyp plugins on g_additionalModulePath (or C4D_PLUGINS_DIR), which
+includes the real DeadlineConnect.pyp, and hands them the command line the way Cinema 4D does once it has started.
+
+FAKE_C4D_BOOT_SECONDS adds a startup delay and FAKE_C4D_EXIT_SECONDS a delay before the process exits once
+DeadlineConnect.pyp has ended, during which SIGTERM is ignored if FAKE_C4D_IGNORE_SIGTERM is set. The replay is tuned
+with the variables described in c4d/documents.py.
+-threads sets the number of render threads, like it does for Cinema 4D.
+"""
+import glob
+import os
+import signal
+import sys
+import time
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "fakec4d" ) )
+
+import c4d  # noqa: E402
+from c4d import documents  # noqa: E402
+
+
+def LoadPlugins():
+    try:
+        from importlib.machinery import SourceFileLoader
+    except ImportError:
+        import imp
+        loadSource = imp.load_source
+    else:
+        def loadSource( name, path ):
+            return SourceFileLoader( name, path ).load_module()
+
+    pluginDirs = os.environ.get( "g_additionalModulePath" ) or os.environ.get( "C4D_PLUGINS_DIR", "" )
+    modules = []
+    for pluginDir in pluginDirs.split( ";" ):
+        for pluginFile in sorted( glob.glob( os.path.join( pluginDir, "*.pyp" ) ) ):
+            modules.append( loadSource( os.path.splitext( os.path.basename( pluginFile ) )[0], pluginFile ) )
+    return modules
+
+
+def ParseRenderArguments( argv ):
+    options = { "frames": None, "image": "", "scene": None }
+    index = 0
+    while index < len( argv ):
+        arg = argv[ index ]
+        if arg == "-render":
+            options[ "scene" ] = argv[ index + 1 ]
+            index += 1
+        elif arg == "-frame":
+            values = []
+            while index + 1 < len( argv ) and argv[ index + 1 ].lstrip( "-" ).isdigit() and len( values ) < 3:
+                values.append( int( argv[ index + 1 ] ) )
+                index += 1
+            options[ "frames" ] = values
+        elif arg == "-oimage":
+            options[ "image" ] = argv[ index + 1 ]
+            index += 1
+        index += 1
+    return options
+
+
+def ExportFromCommandline( argv ):
+    options = dict( option.split( "=", 1 ) for option in argv[ argv.index( "-arnoldAssExport" ) + 1 ].split( ";" ) )
+    print( "Loading Project: %s" % options[ "scene" ] )
+    if not documents.LoadFile( options[ "scene" ] ):
+        print( "Error loading project: %s" % options[ "scene" ] )
+        return 1
+    documents.ExportFrames( options[ "filename" ], int( options[ "startFrame" ] ), int( options[ "endFrame" ] ) )
+    return 0
+
+
+def RenderFromCommandline( argv ):
+    options = ParseRenderArguments( argv )
+    if not options[ "scene" ]:
+        print( "Warning: no -render argument, exiting" )
+        return 0
+
+    print( "Loading Project: %s" % options[ "scene" ] )
+    if not documents.LoadFile( options[ "scene" ] ):
+        print( "Error loading project: %s" % options[ "scene" ] )
+        return 1
+
+    doc = documents.GetActiveDocument()
+    renderData = doc.GetActiveRenderData()
+    fps = int( renderData[ c4d.RDATA_FRAMERATE ] )
+    frames = options[ "frames" ] or [ 0 ]
+    renderData[ c4d.RDATA_FRAMEFROM ] = c4d.BaseTime( frames[0], fps )
+    renderData[ c4d.RDATA_FRAMETO ] = c4d.BaseTime( frames[1] if len( frames ) > 1 else frames[0], fps )
+    renderData[ c4d.RDATA_FRAMESTEP ] = frames[2] if len( frames ) > 2 else 1
+    renderData[ c4d.RDATA_PATH ] = options[ "image" ]
+
+    result = documents.RenderDocument( doc, renderData.GetData(), None, c4d.RENDERFLAGS_EXTERNAL )
+    if result != c4d.RENDERRESULT_OK:
+        print( "Rendering failed: %s" % result )
+        return 1
+    return 0
+
+
+def main():
+    time.sleep( float( os.environ.get( "FAKE_C4D_BOOT_SECONDS", "0" ) ) )
+    argv = sys.argv[ 1: ]
+    if "-threads" in argv[ :-1 ]:
+        os.environ[ "FAKE_C4D_THREADS" ] = argv[ argv.index( "-threads" ) + 1 ]
+
+    if any( arg.startswith( "-Deadline" ) for arg in argv ):
+        sys.argv = [ sys.argv[0] ] + argv
+        for module in LoadPlugins():
+            if hasattr( module, "PluginMessage" ):
+                module.PluginMessage( c4d.C4DPL_COMMANDLINEARGS, None )
+        if os.environ.get( "FAKE_C4D_IGNORE_SIGTERM" ):
+            signal.signal( signal.SIGTERM, signal.SIG_IGN )
+        time.sleep( float( os.environ.get( "FAKE_C4D_EXIT_SECONDS", "0" ) ) )
+        return 0
+
+    if "-arnoldAssExport" in argv[ :-1 ]:
+        return ExportFromCommandline( argv )
+    return RenderFromCommandline( argv )
+
+
+if __name__ == "__main__":
+    sys.exit( main() )
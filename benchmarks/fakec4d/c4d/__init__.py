@@ -0,0 +1,348 @@
+"""
+A minimal stand-in for Cinema 4D's c4d module: enough of the scene graph, description and render API for
+DeadlineConnect.pyp and the scripts generated by the Cinema4DBatch plugin to run outside of Cinema 4D.
+Constants the stand-in does not define are given stable made-up values on first use.
+"""
+import os
+import zlib
+
+# Plugin messages
+C4DPL_COMMANDLINEARGS = 1001
+
+# Commands and plugins of the Arnold and Redshift exporters
+ARNOLD_ASS_EXPORT = 1029993
+REDSHIFT_EXPORT_PLUGIN_ID = 1038650
+DOCUMENTSETTINGS_DOCUMENT = 1
+
+# Base types
+Obase = 5155
+Mbase = 5702
+Tbase = 5612
+Xbase = 5707
+
+# Concrete types used by the generated scenes
+Onull = 5140
+Ocube = 5159
+Opolygon = 5100
+Oparticle = 5109
+Oalembicgenerator = 1028083
+Mmaterial = 5703
+Ttexture = 5616
+Xbitmap = 5833
+Xnoise = 1011116
+Xlayer = 1011123
+VPglobalillumination = 1021096
+
+# Descriptions
+DESCFLAGS_DESC_0 = 0
+DESC_NAME = 1
+DTYPE_LONG = 15
+DTYPE_REAL = 19
+DTYPE_FILENAME = 131
+DTYPE_BASELISTLINK = 133
+
+# Shader parameters
+BITMAPSHADER_FILENAME = 1000
+
+# Render data
+RDATA_XRES = 1000
+RDATA_YRES = 1001
+RDATA_FRAMERATE = 1002
+RDATA_FRAMEFROM = 1003
+RDATA_FRAMETO = 1004
+RDATA_FRAMESTEP = 1005
+RDATA_FRAMESEQUENCE = 1006
+RDATA_FRAMESEQUENCE_MANUAL = 0
+RDATA_PATH = 1007
+RDATA_MULTIPASS_FILENAME = 1008
+RDATA_RENDERREGION = 1009
+RDATA_RENDERREGION_LEFT = 1010
+RDATA_RENDERREGION_TOP = 1011
+RDATA_RENDERREGION_RIGHT = 1012
+RDATA_RENDERREGION_BOTTOM = 1013
+
+RENDERFLAGS_EXTERNAL = 2
+RENDERFLAGS_SHOWERRORS = 4
+
+RENDERRESULT_OK = 0
+RENDERRESULT_OUTOFMEMORY = 1
+RENDERRESULT_ASSETMISSING = 2
+RENDERRESULT_SAVINGFAILED = 5
+RENDERRESULT_USERBREAK = 6
+RENDERRESULT_GICACHEMISSING = 7
+RENDERRESULT_NOMACHINE = 9
+RENDERRESULT_PROJECTNOTFOUND = 1000
+RENDERRESULT_ERRORLOADINGPROJECT = 1001
+RENDERRESULT_NOOUTPUTSPECIFIED = 1002
+
+COLORMODE_RGB = 7
+
+_globalTexturePaths = []
+
+
+def __getattr__( name ):
+    if name.isupper():
+        return 100000 + zlib.crc32( name.encode( "utf-8" ) ) % 100000
+    raise AttributeError( name )
+
+
+def GetC4DVersion():
+    return int( os.environ.get( "FAKE_C4D_VERSION", "26000" ) )
+
+
+def CallCommand( commandId ):
+    if commandId == ARNOLD_ASS_EXPORT:
+        # The export options are stored in the document settings: the file name at 0 and the frame range at 6 and 7.
+        doc = documents.GetActiveDocument()
+        options = doc.GetSettingsInstance( DOCUMENTSETTINGS_DOCUMENT ).GetContainer( ARNOLD_ASS_EXPORT )
+        documents.ExportFrames( options.GetData( 0 ), options.GetData( 6, 0 ), options.GetData( 7, 0 ) )
+
+
+def SetGlobalTexturePaths( paths ):
+    del _globalTexturePaths[:]
+    for path, enabled in paths:
+        if enabled:
+            _globalTexturePaths.append( path.decode( "utf-8" ) if isinstance( path, bytes ) else path )
+
+
+def SetGlobalTexturePath( index, path ):
+    while len( _globalTexturePaths ) <= index:
+        _globalTexturePaths.append( "" )
+    _globalTexturePaths[ index ] = path
+
+
+def GenerateTexturePath( docPath, path, suggestedFolder ):
+    """
+    Resolves a relative path against the document's folder, its tex folder and the global texture paths.
+    """
+    for folder in [ docPath, os.path.join( docPath, "tex" ) ] + _globalTexturePaths:
+        if folder:
+            candidate = os.path.join( folder, path )
+            if os.path.isfile( candidate ):
+                return candidate
+    return ""
+
+
+class BaseTime( object ):
+    def __init__( self, frame=0, fps=1 ):
+        self.frame = frame
+        self.fps = fps
+
+    def GetFrame( self, fps ):
+        return int( round( self.frame * fps / float( self.fps ) ) )
+
+    def Get( self ):
+        return self.frame / float( self.fps )
+
+
+class DescLevel( object ):
+    def __init__( self, levelId, dtype=0, creator=0 ):
+        self.id = levelId
+        self.dtype = dtype
+        self.creator = creator
+
+
+class DescID( object ):
+    def __init__( self, *levels ):
+        self.levels = levels
+
+    def GetDepth( self ):
+        return len( self.levels )
+
+    def __getitem__( self, index ):
+        return self.levels[ index ]
+
+    def __hash__( self ):
+        return hash( tuple( level.id for level in self.levels ) )
+
+    def __eq__( self, other ):
+        return isinstance( other, DescID ) and [ level.id for level in self.levels ] == [ level.id for level in other.levels ]
+
+
+class BaseContainer( dict ):
+    def GetData( self, key, default=None ):
+        return self.get( key, default )
+
+    def SetData( self, key, value ):
+        self[ key ] = value
+
+    SetInt32 = SetData
+    SetFilename = SetData
+    SetString = SetData
+
+    def SetContainer( self, key, value ):
+        self[ key ] = value
+
+    def GetContainer( self, key ):
+        return self.setdefault( key, BaseContainer() )
+
+
+class BaseList2D( object ):
+    """
+    A node in the scene graph. Parameters are stored by their top level id and described by ( name, id, dtype ) tuples.
+    """
+    baseType = 0
+
+    def __init__( self, nodeType, name="" ):
+        self.nodeType = nodeType
+        self.name = name
+        self.parent = None
+        self.children = []
+        self.nextNode = None
+        self.params = {}
+        self.description = []
+        self.shaders = []
+
+    def AddParameter( self, paramId, name, dtype, value ):
+        self.description.append( ( BaseContainer( { DESC_NAME: name } ), DescID( DescLevel( paramId, dtype ) ), DescID() ) )
+        self.params[ paramId ] = value
+
+    def InsertUnder( self, parent ):
+        if parent.children:
+            parent.children[-1].nextNode = self
+        parent.children.append( self )
+        self.parent = parent
+
+    def InsertShader( self, shader ):
+        if self.shaders:
+            self.shaders[-1].nextNode = shader
+        self.shaders.append( shader )
+
+    def GetFirstShader( self ):
+        return self.shaders[0] if self.shaders else None
+
+    def GetDown( self ):
+        return self.children[0] if self.children else None
+
+    def GetNext( self ):
+        return self.nextNode
+
+    def GetUp( self ):
+        return self.parent
+
+    def GetType( self ):
+        return self.nodeType
+
+    def CheckType( self, checkType ):
+        return checkType in ( self.nodeType, self.baseType )
+
+    def GetName( self ):
+        return self.name
+
+    def SetName( self, name ):
+        self.name = name
+
+    def GetTypeName( self ):
+        return type( self ).__name__
+
+    def GetDescription( self, flags ):
+        return list( self.description )
+
+    def GetDataInstance( self ):
+        return self.params
+
+    def GetCTracks( self ):
+        return []
+
+    def __getitem__( self, key ):
+        if isinstance( key, DescID ):
+            key = key[0].id
+        return self.params.get( key )
+
+    def __setitem__( self, key, value ):
+        if isinstance( key, DescID ):
+            key = key[0].id
+        self.params[ key ] = value
+
+
+class BaseObject( BaseList2D ):
+    baseType = Obase
+
+    def __init__( self, nodeType, name="" ):
+        BaseList2D.__init__( self, nodeType, name )
+        self.tags = []
+        self.matrix = ( 0.0, 0.0, 0.0 )
+        self.cache = None
+        self.deformCache = None
+
+    def InsertTag( self, tag ):
+        if self.tags:
+            self.tags[-1].nextNode = tag
+        self.tags.append( tag )
+
+    def GetFirstTag( self ):
+        return self.tags[0] if self.tags else None
+
+    def GetMg( self ):
+        return self.matrix
+
+    def GetCache( self ):
+        return self.cache
+
+    def GetDeformCache( self ):
+        return self.deformCache
+
+
+class PointObject( BaseObject ):
+    """
+    A polygon object whose points lie on a line along x, shifted along y by pointOffset and scaled by radius.
+    """
+    def __init__( self, nodeType, name="", pointCount=0 ):
+        BaseObject.__init__( self, nodeType, name )
+        self.pointCount = pointCount
+        self.radius = ( 0.0, 0.0, 0.0 )
+        self.pointOffset = 0.0
+
+    def GetPointCount( self ):
+        return self.pointCount
+
+    def GetAllPoints( self ):
+        # The first and last points stay put, so shifting the others keeps the bounding box.
+        scale = self.radius[0] / max( self.pointCount - 1, 1 )
+        return [ ( index * scale, 0.0 if index in ( 0, self.pointCount - 1 ) else self.pointOffset, 0.0 ) for index in range( self.pointCount ) ]
+
+    def GetMp( self ):
+        return ( 0.0, 0.0, 0.0 )
+
+    def GetRad( self ):
+        return self.radius
+
+
+class BaseTag( BaseList2D ):
+    baseType = Tbase
+
+
+class BaseMaterial( BaseList2D ):
+    baseType = Mbase
+
+
+class BaseShader( BaseList2D ):
+    baseType = Xbase
+
+
+class RenderData( BaseList2D ):
+    def __init__( self ):
+        BaseList2D.__init__( self, 110304, "Render Settings" )
+        self.params.update( {
+            RDATA_XRES: 1920,
+            RDATA_YRES: 1080,
+            RDATA_FRAMERATE: 25,
+            RDATA_FRAMEFROM: BaseTime( 0, 25 ),
+            RDATA_FRAMETO: BaseTime( 0, 25 ),
+            RDATA_PATH: "",
+        } )
+        self.videoPosts = []
+
+    def InsertVideoPost( self, videoPost ):
+        if self.videoPosts:
+            self.videoPosts[-1].nextNode = videoPost
+        self.videoPosts.append( videoPost )
+
+    def GetFirstVideoPost( self ):
+        return self.videoPosts[0] if self.videoPosts else None
+
+    def GetData( self ):
+        return self
+
+
+from c4d import bitmaps, documents, plugins, threading  # noqa: E402
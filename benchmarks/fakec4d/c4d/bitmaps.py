@@ -0,0 +1,15 @@
+class BaseBitmap( object ):
+    def __init__( self, width=0, height=0, mode=0 ):
+        self.width = width
+        self.height = height
+        self.mode = mode
+
+    def GetBw( self ):
+        return self.width
+
+    def GetBh( self ):
+        return self.height
+
+
+class MultipassBitmap( BaseBitmap ):
+    pass
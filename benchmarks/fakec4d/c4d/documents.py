@@ -0,0 +1,407 @@
+"""
+Documents for the c4d stand-in. A "scene file" is a small JSON file describing the shape of a synthetic scene (see
+benchmarks/harness.py WriteScene), and rendering replays a recorded Commandline log instead of rendering anything.
+
+The replay is tuned with environment variables so the Worker side can set them per process:
+    FAKE_C4D_STDOUT_LOG         the log template to replay (default: benchmarks/data/render_frame.log)
+    FAKE_C4D_LINES_PER_SECOND   the rate at which log lines are printed, 0 for as fast as possible
+    FAKE_C4D_FRAME_SECONDS      the minimum time each frame takes
+    FAKE_C4D_BLOCKS             the number of Redshift blocks reported per frame
+    FAKE_C4D_OUTPUT_BYTES       the size of the image written for each frame, 0 to write no output
+    FAKE_C4D_FRAME_WORK         the CPU work per frame in units of 100000 loop iterations, split across the render threads
+    FAKE_C4D_THREADS            the number of render threads, set from -threads (default: every core of the machine)
+    FAKE_C4D_CRASH_FRAME        a comma separated list of frames at which the process crashes, once each: every crash
+                                adds its frame to FAKE_C4D_CRASH_FILE, and the process does not crash again at a frame
+                                listed in that file
+    FAKE_C4D_EXPORT_SECONDS     the time the Arnold and Redshift exporters take per frame
+"""
+import copy
+import io
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+import c4d
+
+_activeDocument = None
+
+DEFAULT_LOG = os.path.join( os.path.dirname( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) ), "data", "render_frame.log" )
+
+# A PNG signature followed by an IHDR chunk, so the output passes the plugins' frame validation.
+PNG_HEADER = b"\x89PNG\r\n\x1a\n" + struct.pack( ">I4sIIBBBBB", 13, b"IHDR", 1920, 1080, 8, 2, 0, 0, 0 )
+
+
+class BaseDocument( c4d.BaseList2D ):
+    def __init__( self, path ):
+        c4d.BaseList2D.__init__( self, 110059, os.path.basename( path ) )
+        self.path = path
+        self.objects = c4d.BaseList2D( c4d.Onull, "Objects" )
+        self.materials = c4d.BaseList2D( c4d.Onull, "Materials" )
+        self.renderData = c4d.RenderData()
+        self.settings = c4d.BaseContainer()
+        self.description = {}
+        self.filenameParams = []
+        self.generators = []
+        self.time = c4d.BaseTime()
+
+    def GetClone( self, flags=0 ):
+        # The scene is rebuilt from its description rather than deep copied, since the chain of sibling nodes is deeper
+        # than Python's recursion limit for large scenes.
+        clone = BuildScene( self.path, dict( self.description, filenames=[ node[ paramId ] for node, paramId in self.filenameParams ] ) )
+        clone.renderData = copy.deepcopy( self.renderData )
+        clone.settings = copy.deepcopy( self.settings )
+        return clone
+
+    def GetFirstObject( self ):
+        return self.objects.GetDown()
+
+    def GetFirstMaterial( self ):
+        return self.materials.GetDown()
+
+    def InsertObject( self, obj, parent=None ):
+        obj.InsertUnder( parent or self.objects )
+
+    def InsertMaterial( self, material ):
+        material.InsertUnder( self.materials )
+
+    def GetActiveRenderData( self ):
+        return self.renderData
+
+    def GetDocumentPath( self ):
+        return os.path.dirname( self.path )
+
+    def GetDocumentName( self ):
+        return os.path.basename( self.path )
+
+    def GetTakeData( self ):
+        return None
+
+    def GetSettingsInstance( self, kind ):
+        return self.settings
+
+    def SetTime( self, time ):
+        self.time = time
+
+    def GetTime( self ):
+        return self.time
+
+    def ExecutePasses( self, thread, animation, expressions, caches, flags ):
+        """
+        Animates the first object, which moves along x by a unit per frame, except within the "holds" frame ranges of the
+        scene description, which keep the position of their first frame. With "animatedCaches", the caches of the Alembic
+        generators grow by a unit per frame in the same way, except within the "cacheHolds" frame ranges. With "deformedCaches",
+        the inner points of the caches move by a unit per frame within their bounding box, except within the "pointHolds"
+        frame ranges.
+        """
+        frame = self.time.GetFrame( int( self.renderData[ c4d.RDATA_FRAMERATE ] ) )
+        firstObject = self.GetFirstObject()
+        if firstObject is not None:
+            firstObject.matrix = ( float( HeldFrame( frame, self.description.get( "holds", [] ) ) ), 0.0, 0.0 )
+        if self.description.get( "animatedCaches" ):
+            cacheFrame = HeldFrame( frame, self.description.get( "cacheHolds", [] ) )
+            for generator in self.generators:
+                generator.cache.radius = ( 100.0 + cacheFrame, 100.0, 100.0 )
+        if self.description.get( "deformedCaches" ):
+            pointFrame = HeldFrame( frame, self.description.get( "pointHolds", [] ) )
+            for generator in self.generators:
+                generator.cache.pointOffset = float( pointFrame )
+        return True
+
+    def GetRenderBaseDraw( self ):
+        return None
+
+
+def HeldFrame( frame, holds ):
+    for holdFrom, holdTo in holds:
+        if holdFrom <= frame <= holdTo:
+            return holdFrom
+    return frame
+
+
+def BuildScene( path, description ):
+    """
+    Builds a scene with nested objects carrying tags, and materials whose shaders (some in layer shaders) reference textures.
+    :param path: the scene file
+    :param description: a dictionary with the "objects", "depth", "tagsPerObject", "materials", "shadersPerMaterial",
+        "textureDirectory", "textureExtension", "cacheEvery", "holds", "animatedCaches", "cacheHolds", "deformedCaches",
+        "pointHolds", "emitters", "animatedNoise" and "globalIllumination" counts and settings. A scene saved by SaveDocument adds the values of its file
+        parameters as "filenames".
+    :return: the document
+    """
+    doc = BaseDocument( path )
+    doc.description = description
+    objectCount = description.get( "objects", 100 )
+    depth = max( description.get( "depth", 3 ), 1 )
+    tagsPerObject = description.get( "tagsPerObject", 2 )
+    materialCount = description.get( "materials", 20 )
+    shadersPerMaterial = description.get( "shadersPerMaterial", 3 )
+    textureDirectory = description.get( "textureDirectory", "/mnt/projects/assets/tex" )
+    cacheEvery = description.get( "cacheEvery", 10 )
+    textureCount = description.get( "textures", materialCount * shadersPerMaterial )
+    textureExtension = description.get( "textureExtension", ".png" )
+
+    def texture( index ):
+        return "%s/texture_%04d%s" % ( textureDirectory, index % max( textureCount, 1 ), textureExtension )
+
+    materials = []
+    for materialIndex in range( materialCount ):
+        material = c4d.BaseMaterial( c4d.Mmaterial, "Material %d" % materialIndex )
+        material.AddParameter( 2000, "Brightness", c4d.DTYPE_REAL, 1.0 )
+        for shaderIndex in range( shadersPerMaterial ):
+            textureIndex = materialIndex * shadersPerMaterial + shaderIndex
+            shader = c4d.BaseShader( c4d.Xbitmap, "Bitmap" )
+            shader.AddParameter( 1000, "File", c4d.DTYPE_FILENAME, texture( textureIndex ) )
+            doc.filenameParams.append( ( shader, 1000 ) )
+            if shaderIndex == shadersPerMaterial - 1 and shaderIndex > 0:
+                # The last shader of each material is nested in a layer shader, which does not link it in its description.
+                layer = c4d.BaseShader( c4d.Xlayer, "Layer" )
+                shader.InsertUnder( layer )
+                shader = layer
+            material.AddParameter( 3000 + shaderIndex, "Channel %d" % shaderIndex, c4d.DTYPE_BASELISTLINK, shader )
+            material.InsertShader( shader )
+        if description.get( "animatedNoise" ) and materialIndex == 0:
+            noise = c4d.BaseShader( c4d.Xnoise, "Noise" )
+            noise.AddParameter( c4d.SLA_NOISE_ANI_SPEED, "Animation Speed", c4d.DTYPE_REAL, 1.0 )
+            material.InsertShader( noise )
+        doc.InsertMaterial( material )
+        materials.append( material )
+
+    parents = [ None ]
+    for objectIndex in range( objectCount ):
+        if cacheEvery and objectIndex % cacheEvery == cacheEvery - 1:
+            obj = c4d.BaseObject( c4d.Oalembicgenerator, "Alembic %d" % objectIndex )
+            obj.AddParameter( 1000, "Cache File", c4d.DTYPE_FILENAME, "%s/../caches/cache_%04d.abc" % ( textureDirectory, objectIndex ) )
+            doc.filenameParams.append( ( obj, 1000 ) )
+            obj.cache = c4d.PointObject( c4d.Opolygon, "Alembic Cache", 1000 )
+            doc.generators.append( obj )
+        else:
+            obj = c4d.BaseObject( c4d.Ocube, "Cube %d" % objectIndex )
+        obj.AddParameter( 1100, "Size", c4d.DTYPE_REAL, 200.0 )
+        for tagIndex in range( tagsPerObject ):
+            tag = c4d.BaseTag( c4d.Ttexture, "Texture" )
+            tag.AddParameter( 1010, "Material", c4d.DTYPE_BASELISTLINK, materials[ ( objectIndex + tagIndex ) % len( materials ) ] if materials else None )
+            obj.InsertTag( tag )
+
+        # Fill the hierarchy breadth first up to the requested depth.
+        parent = parents[ objectIndex % len( parents ) ]
+        doc.InsertObject( obj, parent )
+        if len( parents ) < depth:
+            parents.append( obj )
+
+    for emitterIndex in range( description.get( "emitters", 0 ) ):
+        doc.InsertObject( c4d.BaseObject( c4d.Oparticle, "Emitter %d" % emitterIndex ) )
+
+    for ( node, paramId ), filename in zip( doc.filenameParams, description.get( "filenames", [] ) ):
+        node[ paramId ] = filename
+
+    fps = description.get( "frameRate", 25 )
+    doc.renderData[ c4d.RDATA_FRAMERATE ] = fps
+    if description.get( "globalIllumination" ):
+        doc.renderData.InsertVideoPost( c4d.BaseList2D( c4d.VPglobalillumination, "Global Illumination" ) )
+    return doc
+
+
+def LoadFile( name ):
+    global _activeDocument
+    if not os.path.isfile( name ):
+        return False
+    with io.open( name, mode="r", encoding="utf-8" ) as sceneHandle:
+        description = json.load( sceneHandle )
+    time.sleep( description.get( "loadSeconds", 0.0 ) )
+    _activeDocument = BuildScene( name, description )
+    return True
+
+
+def GetActiveDocument():
+    return _activeDocument
+
+
+def SaveDocument( doc, name, flags, format ):
+    if format == c4d.REDSHIFT_EXPORT_PLUGIN_ID:
+        settings = c4d.plugins.FindPlugin( format ).settings
+        ExportFrames( name, settings.GetData( c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_START, 0 ), settings.GetData( c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_END, 0 ) )
+        return True
+    description = dict( doc.description, filenames=[ node[ paramId ] for node, paramId in doc.filenameParams ] )
+    with io.open( name, mode="w", encoding="utf-8" ) as sceneHandle:
+        sceneHandle.write( u"%s" % json.dumps( description ) )
+    return True
+
+
+def ExportFrames( filename, startFrame, endFrame ):
+    """
+    Writes an export file for every frame, named like the Arnold and Redshift exporters name them: scene.0001.ass for scene.ass.
+    """
+    exportSeconds = float( os.environ.get( "FAKE_C4D_EXPORT_SECONDS", "0" ) )
+    base, extension = os.path.splitext( filename )
+    for frame in range( startFrame, endFrame + 1 ):
+        time.sleep( exportSeconds )
+        with open( "%s.%04d%s" % ( base, frame, extension ), "wb" ) as exportHandle:
+            exportHandle.write( b"export" )
+        print( "Exported frame %d" % frame )
+    sys.stdout.flush()
+
+
+def LoadLogTemplate( path ):
+    """
+    Reads a log template. Lines before the "@end" line are printed for every frame and the lines after it once the
+    render has finished. Lines starting with "@blocks " are repeated for every Redshift block, and lines starting
+    with "@progress " for every 10%.
+    """
+    frameLines = []
+    endLines = []
+    lines = frameLines
+    with io.open( path, mode="r", encoding="utf-8" ) as logHandle:
+        for line in logHandle:
+            line = line.rstrip( "\r\n" )
+            if line == "@end":
+                lines = endLines
+            elif line:
+                lines.append( line )
+    return frameLines, endLines
+
+
+def ExpandFrameLines( frameLines, fields, blocks ):
+    for line in frameLines:
+        if line.startswith( "@blocks " ):
+            for block in range( 1, blocks + 1 ):
+                yield line[ 8: ].format( block=block, blocks=blocks, **fields )
+        elif line.startswith( "@progress " ):
+            for percent in range( 10, 101, 10 ):
+                yield line[ 10: ].format( percent=percent, **fields )
+        else:
+            yield line.format( **fields )
+
+
+def WriteFrame( outputPath, frame, outputBytes ):
+    if not outputPath or outputBytes <= 0:
+        return
+    filename = "%s%04d.png" % ( outputPath, frame )
+    directory = os.path.dirname( filename )
+    if directory and not os.path.isdir( directory ):
+        os.makedirs( directory )
+    with open( filename, "wb" ) as frameHandle:
+        frameHandle.write( PNG_HEADER )
+        frameHandle.write( b"\0" * max( outputBytes - len( PNG_HEADER ), 0 ) )
+
+
+def BurnCpu( units ):
+    total = 0
+    for value in range( units * 100000 ):
+        total += value
+    return total
+
+
+def CrashAtFrame( frame ):
+    crashFrames = os.environ.get( "FAKE_C4D_CRASH_FRAME" )
+    crashFile = os.environ.get( "FAKE_C4D_CRASH_FILE" )
+    if not crashFrames or not crashFile or frame not in [ int( crashFrame ) for crashFrame in crashFrames.split( "," ) ]:
+        return
+    crashed = []
+    if os.path.exists( crashFile ):
+        with open( crashFile ) as crashHandle:
+            crashed = [ int( line ) for line in crashHandle if line.strip() ]
+    if frame not in crashed:
+        with open( crashFile, "a" ) as crashHandle:
+            crashHandle.write( "%d\n" % frame )
+        sys.stdout.flush()
+        os._exit( 139 )
+
+
+def RenderFrameWork( pool, frameWork, renderThreads ):
+    """
+    Spreads a frame's CPU work across the render threads. They are processes, since Python threads would share one core.
+    """
+    shares = [ frameWork // renderThreads + ( 1 if index < frameWork % renderThreads else 0 ) for index in range( renderThreads ) ]
+    pool.map( BurnCpu, [ share for share in shares if share ] )
+
+
+def RenderDocument( doc, renderData, bmp, renderFlags, thread=None ):
+    frameLines, endLines = LoadLogTemplate( os.environ.get( "FAKE_C4D_STDOUT_LOG", DEFAULT_LOG ) )
+    linesPerSecond = float( os.environ.get( "FAKE_C4D_LINES_PER_SECOND", "0" ) )
+    frameSeconds = float( os.environ.get( "FAKE_C4D_FRAME_SECONDS", "0" ) )
+    blocks = int( os.environ.get( "FAKE_C4D_BLOCKS", "16" ) )
+    outputBytes = int( os.environ.get( "FAKE_C4D_OUTPUT_BYTES", "65536" ) )
+    frameWork = int( os.environ.get( "FAKE_C4D_FRAME_WORK", "0" ) )
+    renderThreads = int( os.environ.get( "FAKE_C4D_THREADS", "0" ) ) or multiprocessing.cpu_count()
+
+    fps = int( renderData[ c4d.RDATA_FRAMERATE ] )
+    startFrame = renderData[ c4d.RDATA_FRAMEFROM ].GetFrame( fps )
+    endFrame = renderData[ c4d.RDATA_FRAMETO ].GetFrame( fps )
+    step = max( int( renderData[ c4d.RDATA_FRAMESTEP ] or 1 ), 1 )
+    frames = list( range( startFrame, endFrame + 1, step ) )
+
+    giResult = RenderGICache( renderData, frames )
+    if giResult is not None:
+        return giResult
+
+    renderStart = time.time()
+    lineInterval = 1.0 / linesPerSecond if linesPerSecond > 0 else 0.0
+    pool = multiprocessing.get_context( "fork" ).Pool( renderThreads ) if frameWork > 0 else None
+    try:
+        result = RenderFrames( frames, frameLines, renderData, blocks, lineInterval, frameSeconds, outputBytes, pool, frameWork, renderThreads, thread )
+    finally:
+        if pool is not None:
+            pool.terminate()
+    if result != c4d.RENDERRESULT_OK:
+        return result
+
+    for line in endLines:
+        sys.stdout.write( line.format( seconds="%.3f" % ( time.time() - renderStart ) ) + "\n" )
+    sys.stdout.flush()
+    return c4d.RENDERRESULT_OK
+
+
+def RenderGICache( renderData, frames ):
+    """
+    Handles the GI cache settings of the Global Illumination video post: a prepass writes the cache file of the frames to
+    the custom cache path instead of rendering, and a render that skips the prepass fails if the cache file is missing.
+    :return: the render result of a prepass or of a missing cache, or None to render the frames
+    """
+    giSettings = renderData.GetFirstVideoPost()
+    while giSettings is not None and giSettings.GetType() != c4d.VPglobalillumination:
+        giSettings = giSettings.GetNext()
+    if giSettings is None or not giSettings[ c4d.GI_SETUP_DATA_EXTRA_CACHE_CUSTOMPATH_USE ]:
+        return None
+
+    cacheFile = os.path.join( giSettings[ c4d.GI_SETUP_DATA_EXTRA_CACHE_CUSTOMPATH ], "illum.gi" )
+    if giSettings[ c4d.GI_SETUP_DATA_EXTRA_CACHE_PREPASSONLY ]:
+        with open( cacheFile, "w" ) as cacheHandle:
+            cacheHandle.write( json.dumps( frames ) )
+        print( "Computed the GI prepass of %d frame(s)" % len( frames ) )
+        sys.stdout.flush()
+        return c4d.RENDERRESULT_OK
+    if giSettings[ c4d.GI_SETUP_DATA_EXTRA_CACHE_SKIPPREPASS ] and not os.path.isfile( cacheFile ):
+        return c4d.RENDERRESULT_GICACHEMISSING
+    return None
+
+
+def RenderFrames( frames, frameLines, renderData, blocks, lineInterval, frameSeconds, outputBytes, pool, frameWork, renderThreads, thread ):
+    for index, frame in enumerate( frames ):
+        frameStart = time.time()
+        fields = {
+            "frame": frame,
+            "frameIndex": index + 1,
+            "frameCount": len( frames ),
+            "time": time.strftime( "%a %b %d %H:%M:%S %Y" ),
+            "output": renderData[ c4d.RDATA_PATH ] or "",
+        }
+        for line in ExpandFrameLines( frameLines, fields, blocks ):
+            if thread is not None and thread.TestDBreak():
+                return c4d.RENDERRESULT_USERBREAK
+            sys.stdout.write( line + "\n" )
+            if lineInterval:
+                sys.stdout.flush()
+                time.sleep( lineInterval )
+        sys.stdout.flush()
+
+        CrashAtFrame( frame )
+        if pool is not None:
+            RenderFrameWork( pool, frameWork, renderThreads )
+        remaining = frameSeconds - ( time.time() - frameStart )
+        if remaining > 0:
+            time.sleep( remaining )
+        WriteFrame( renderData[ c4d.RDATA_PATH ], frame, outputBytes )
+    return c4d.RENDERRESULT_OK
@@ -0,0 +1,25 @@
+"""
+The Redshift proxy exporter of the c4d stand-in. Its settings are returned by the MSG_RETRIEVEPRIVATEDATA message and used
+by documents.SaveDocument.
+"""
+import c4d
+
+
+class ScenePlugin( object ):
+    def __init__( self, pluginId ):
+        self.pluginId = pluginId
+        self.settings = c4d.BaseContainer()
+
+    def Message( self, messageId, data ):
+        if messageId == c4d.MSG_RETRIEVEPRIVATEDATA:
+            data[ "imexporter" ] = self.settings
+        return True
+
+
+_plugins = {}
+
+
+def FindPlugin( pluginId, pluginType=0 ):
+    if pluginId != c4d.REDSHIFT_EXPORT_PLUGIN_ID:
+        return None
+    return _plugins.setdefault( pluginId, ScenePlugin( pluginId ) )
@@ -0,0 +1,36 @@
+import threading as _threading
+
+
+class C4DThread( object ):
+    """
+    Runs Main on a Python thread. TestDBreak is overridden by the Cinema4DBatch script to check its cancel file.
+    """
+    _thread = None
+
+    def Start( self, mode=0, priority=0 ):
+        self._thread = _threading.Thread( target=self.Main )
+        self._thread.start()
+        return True
+
+    def Wait( self, checkBreak=True ):
+        if self._thread is not None:
+            self._thread.join()
+
+    def End( self, wait=True ):
+        if wait:
+            self.Wait()
+
+    def IsRunning( self ):
+        return self._thread is not None and self._thread.is_alive()
+
+    def Get( self ):
+        return self
+
+    def TestBreak( self ):
+        return self.TestDBreak()
+
+    def TestDBreak( self ):
+        return False
+
+    def Main( self ):
+        pass
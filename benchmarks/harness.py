@@ -0,0 +1,240 @@
+"""
+Runs the Cinema4D and Cinema4DBatch plugins outside of Deadline. The stand-ins in benchmarks/stubs replace the
+Deadline, FranticX and .NET System modules, benchmarks/fake_commandline.py replaces Cinema 4D's Commandline, and the
+Worker class below plays the part of the Worker: it holds the job's plugin info, the plugin configuration and the task,
+and drives a plugin through its callbacks the way the Worker does.
+"""
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+BENCHMARK_DIR = os.path.dirname( os.path.abspath( __file__ ) )
+REPOSITORY_DIR = os.path.dirname( BENCHMARK_DIR )
+PLUGINS_DIR = os.path.join( REPOSITORY_DIR, "plugins" )
+FAKE_COMMANDLINE = os.path.join( BENCHMARK_DIR, "fake_commandline.py" )
+FAKE_BIN_DIR = os.path.join( BENCHMARK_DIR, "fake_bin" )
+DATA_DIR = os.path.join( BENCHMARK_DIR, "data" )
+
+for path in ( os.path.join( BENCHMARK_DIR, "fakec4d" ), os.path.join( BENCHMARK_DIR, "stubs" ) ):
+    if path not in sys.path:
+        sys.path.insert( 0, path )
+
+from Deadline.Plugins import PluginType, RenderFailedError  # noqa: E402
+from Deadline.Scripting import SetPathMappings  # noqa: E402
+from FranticX.Processes import RunningProcess  # noqa: E402
+
+C4D_VERSION = 26
+
+_loadedModules = {}
+
+
+def LoadPluginModule( name ):
+    """
+    Imports plugins/<name>/<name>.py the way the Worker does, without a package.
+    """
+    if name not in _loadedModules:
+        path = os.path.join( PLUGINS_DIR, name, name + ".py" )
+        spec = importlib.util.spec_from_file_location( name, path )
+        module = importlib.util.module_from_spec( spec )
+        spec.loader.exec_module( module )
+        _loadedModules[ name ] = module
+    return _loadedModules[ name ]
+
+
+def LoadEventModule( name ):
+    """
+    Imports events/<name>/<name>.py the way the event plugin is loaded, without a package.
+    """
+    if name not in _loadedModules:
+        path = os.path.join( REPOSITORY_DIR, "events", name, name + ".py" )
+        spec = importlib.util.spec_from_file_location( name, path )
+        module = importlib.util.module_from_spec( spec )
+        spec.loader.exec_module( module )
+        _loadedModules[ name ] = module
+    return _loadedModules[ name ]
+
+
+def LoadDeadlineConnect():
+    """
+    Imports DeadlineConnect.pyp against the c4d stand-in, in this process.
+    """
+    if "DeadlineConnect" not in _loadedModules:
+        from importlib.machinery import SourceFileLoader
+        path = os.path.join( PLUGINS_DIR, "Cinema4DBatch", "DeadlineConnect.pyp" )
+        _loadedModules[ "DeadlineConnect" ] = SourceFileLoader( "DeadlineConnect", path ).load_module()
+    return _loadedModules[ "DeadlineConnect" ]
+
+
+def WriteScene( path, **description ):
+    """
+    Writes a scene file for the c4d stand-in. See BuildScene in fakec4d/c4d/documents.py for the supported keys.
+    """
+    with io.open( path, mode="w", encoding="utf-8" ) as sceneHandle:
+        sceneHandle.write( json.dumps( description ) )
+    return path
+
+
+@contextlib.contextmanager
+def Quiet():
+    """
+    Discards anything printed, e.g. DeadlineConnect.pyp's per-path log lines, while timing code in this process.
+    """
+    with open( os.devnull, "w" ) as devnull:
+        with contextlib.redirect_stdout( devnull ):
+            yield
+
+
+class Job( object ):
+    def __init__( self, jobId, name ):
+        self.JobId = jobId
+        self.JobName = name
+        self.JobConcurrentTasks = 1
+        self.JobFramesList = []
+        self.EnvironmentKeyValues = {}
+
+    def GetJobEnvironmentKeys( self ):
+        return list( self.EnvironmentKeyValues )
+
+    def GetJobEnvironmentKeyValue( self, key ):
+        return self.EnvironmentKeyValues.get( key, "" )
+
+
+class Worker( object ):
+    """
+    The Worker side of a plugin: the job and task it renders, the plugin configuration and the directories it uses.
+    Everything is created in a temporary directory that is removed by Close.
+    """
+    def __init__( self, pluginName, pluginInfo=None, config=None, environment=None, threadNumber=0, echo=False ):
+        self.Root = tempfile.mkdtemp( prefix="c4dbench_" )
+        self.Name = "bench-worker"
+        self.PluginName = pluginName
+        self.PluginDirectory = os.path.join( PLUGINS_DIR, pluginName )
+        self.SlaveDirectory = self.makeDir( "slave" )
+        self.JobsDataDirectory = self.makeDir( "jobsData" )
+        self.TempDirectory = self.makeDir( "temp" )
+        self.DataFilename = ""
+        self.Job = Job( uuid.uuid4().hex[:24], "Benchmark" )
+        self.Job.AuxiliaryPath = self.makeDir( "auxiliary" )
+        self.ThreadNumber = threadNumber
+        self.TaskId = 0
+        self.StartFrame = 0
+        self.EndFrame = 0
+        self.CpuAffinity = None
+        self.GpuAffinity = None
+        self.Canceled = False
+        self.Progress = 0
+        self.StatusMessage = ""
+        self.Messages = []
+        self.Echo = echo
+        self.ManagedProcesses = {}
+
+        self.Config = {
+            "C4D_%s_RenderExecutable" % C4D_VERSION: FAKE_COMMANDLINE,
+            "LoadC4DTimeout": 60,
+            "ProgressUpdateTimeout": 60,
+        }
+        self.Config.update( config or {} )
+        self.PluginInfo = {
+            "Version": C4D_VERSION,
+            "Renderer": "redshift",
+        }
+        self.PluginInfo.update( pluginInfo or {} )
+
+        # The environment of the process a simple plugin renders with, and of the managed processes of advanced plugins.
+        baseEnvironment = {
+            "DEADLINE_PATH": FAKE_BIN_DIR,
+            "FAKE_C4D_STDOUT_LOG": os.path.join( DATA_DIR, "render_frame.log" ),
+        }
+        baseEnvironment.update( environment or {} )
+        self.Environment = dict( baseEnvironment )
+        self.ProcessEnvironment = dict( baseEnvironment )
+
+        self.Plugin = None
+        self.Module = LoadPluginModule( pluginName )
+
+    def makeDir( self, name ):
+        path = os.path.join( self.Root, name )
+        os.makedirs( path )
+        return path
+
+    def Log( self, level, message ):
+        self.Messages.append( ( time.time(), level, message ) )
+        if self.Echo:
+            sys.stderr.write( "%s: %s\n" % ( level, message ) )
+
+    def SetPathMappings( self, mappings ):
+        SetPathMappings( mappings )
+        value = json.dumps( [ list( mapping ) for mapping in mappings ] )
+        self.Environment[ "FAKE_DEADLINE_PATH_MAPPINGS" ] = value
+        self.ProcessEnvironment[ "FAKE_DEADLINE_PATH_MAPPINGS" ] = value
+
+    def SetTask( self, taskId, startFrame, endFrame ):
+        self.TaskId = taskId
+        self.StartFrame = startFrame
+        self.EndFrame = endFrame
+
+    def StartJob( self ):
+        """
+        Creates the plugin and calls its InitializeProcess and StartJob callbacks.
+        """
+        self.Plugin = self.Module.GetDeadlinePlugin()
+        self.Plugin.Worker = self
+        self.Plugin.InitializeProcessCallback()
+        if self.Plugin.StartJobCallback:
+            self.Plugin.StartJobCallback()
+        return self.Plugin
+
+    def RenderTask( self ):
+        """
+        Renders the current task: an advanced plugin's RenderTasks callback, or a simple plugin's render process.
+        """
+        if self.Plugin.PluginType == PluginType.Advanced:
+            self.Plugin.RenderTasksCallback()
+            return
+
+        plugin = self.Plugin
+        if plugin.PreRenderTasksCallback:
+            plugin.PreRenderTasksCallback()
+        executable = plugin.RenderExecutableCallback()
+        arguments = plugin.RenderArgumentCallback()
+        process = RunningProcess( plugin, executable, arguments, "", self.Environment )
+        exitCode = process.Wait()
+        if plugin.CheckExitCodeCallback:
+            plugin.CheckExitCodeCallback( exitCode )
+        elif exitCode != 0:
+            plugin.FailRender( "Renderer returned non-zero error code, %s. Check the log for more information." % exitCode )
+        if plugin.PostRenderTasksCallback:
+            plugin.PostRenderTasksCallback()
+
+    def EndJob( self ):
+        if self.Plugin is None:
+            return
+        try:
+            if self.Plugin.EndJobCallback:
+                self.Plugin.EndJobCallback()
+        finally:
+            for name in list( self.ManagedProcesses ):
+                self.Plugin.ShutdownMonitoredManagedProcess( name )
+            self.Module.CleanupDeadlinePlugin( self.Plugin )
+            self.Plugin = None
+
+    def Close( self ):
+        try:
+            self.EndJob()
+        finally:
+            SetPathMappings( [] )
+            shutil.rmtree( self.Root, ignore_errors=True )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.Close()
+
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the Cinema4D and Cinema4DBatch plugins and DeadlineConnect.pyp. Everything runs against the
+stand-ins in this directory, so no Deadline Worker, Cinema 4D installation or license is needed.
+
+    python benchmarks/run_benchmarks.py                  # run every benchmark
+    python benchmarks/run_benchmarks.py stdout pathmap   # run some of them
+    python benchmarks/run_benchmarks.py --quick --json results.json
+
+The plugins import six, which must be installed in the Python running the benchmarks.
+
+Benchmarks:
+    startup     Cinema4DBatch session startup and teardown, and a one frame Cinema4D task, against the fake Commandline
+    roundtrip   the round trip of a DeadlineConnect command through the socket and PollUntilComplete
+    stdout      the rate at which each plugin's stdout handlers process a recorded render log, and the size of the task log
+                with and without log capture
+    pathmap     the scene walk and the whole Pathmap command of DeadlineConnect.pyp for scenes of increasing size
+    move        the rate at which local rendering moves output to its final location
+    task        the time per task of both plugins for a multi-frame chunk
+    partition   the throughput of concurrent CPU bound tasks with and without CPU partitioning (Linux only)
+    export      the time of an Arnold and a Redshift export task with and without export shards
+    mappedscene a Cinema4DBatch session with path mapping and a one frame task, without the mapped scene cache, for the
+                session that saves the mapped scene, and for a later session that loads it
+    crash       the time of a Cinema4DBatch task in which Cinema 4D crashes and is restarted, against the same task
+                without a crash
+    transport   the latency and throughput of a loopback echo over a TCP port and a Unix domain socket, and the command
+                round trip through the plugin with each of them
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert( 0, os.path.dirname( os.path.abspath( __file__ ) ) )
+
+import harness  # noqa: E402
+from c4d import documents  # noqa: E402
+
+
+def Median( values ):
+    values = sorted( values )
+    middle = len( values ) // 2
+    if len( values ) % 2:
+        return values[ middle ]
+    return ( values[ middle - 1 ] + values[ middle ] ) / 2.0
+
+
+def Percentile( values, percent ):
+    values = sorted( values )
+    index = min( int( round( percent / 100.0 * ( len( values ) - 1 ) ) ), len( values ) - 1 )
+    return values[ index ]
+
+
+def RenderEnvironment( options ):
+    return {
+        "FAKE_C4D_BOOT_SECONDS": str( options.boot_seconds ),
+        "FAKE_C4D_LINES_PER_SECOND": str( options.lines_per_second ),
+        "FAKE_C4D_FRAME_SECONDS": str( options.frame_seconds ),
+    }
+
+
+def CreateWorker( pluginName, options, pluginInfo=None, config=None, sceneSize=( 200, 50 ), environment=None, threadNumber=0 ):
+    renderEnvironment = RenderEnvironment( options )
+    renderEnvironment.update( environment or {} )
+    worker = harness.Worker( pluginName, pluginInfo=pluginInfo, config=config, environment=renderEnvironment, threadNumber=threadNumber, echo=options.verbose )
+    scene = harness.WriteScene( os.path.join( worker.Root, "scene.c4d" ), objects=sceneSize[0], materials=sceneSize[1] )
+    outputDir = os.path.join( worker.Root, "output" )
+    os.makedirs( outputDir )
+    worker.PluginInfo.setdefault( "SceneFile", scene )
+    worker.PluginInfo.setdefault( "FilePath", outputDir )
+    worker.PluginInfo.setdefault( "FilePrefix", "beauty_" )
+    return worker
+
+
+def BenchmarkStartup( options ):
+    startups = []
+    teardowns = []
+    commandlineTasks = []
+    for _ in range( options.repeat ):
+        with CreateWorker( "Cinema4DBatch", options ) as worker:
+            startTime = time.time()
+            worker.StartJob()
+            startups.append( time.time() - startTime )
+
+            startTime = time.time()
+            worker.EndJob()
+            teardowns.append( time.time() - startTime )
+
+        with CreateWorker( "Cinema4D", options ) as worker:
+            worker.StartJob()
+            worker.SetTask( 0, 1, 1 )
+            startTime = time.time()
+            worker.RenderTask()
+            commandlineTasks.append( time.time() - startTime )
+
+    return [
+        ( "batch session startup", Median( startups ) * 1000, "ms" ),
+        ( "batch session teardown", Median( teardowns ) * 1000, "ms" ),
+        ( "commandline 1 frame task", Median( commandlineTasks ) * 1000, "ms" ),
+    ]
+
+
+def BenchmarkRoundTrip( options ):
+    timings = []
+    with CreateWorker( "Cinema4DBatch", options ) as worker:
+        worker.StartJob()
+        controller = worker.Plugin.MyCinema4DController
+        for _ in range( options.round_trips ):
+            startTime = time.time()
+            controller.Cinema4DSocket.Send( "Verbose:False" )
+            controller.PollUntilComplete( False )
+            timings.append( time.time() - startTime )
+
+    return [
+        ( "command round trip (median)", Median( timings ) * 1000, "ms" ),
+        ( "command round trip (p95)", Percentile( timings, 95 ) * 1000, "ms" ),
+    ]
+
+
+def RecordedLog( frameCount ):
+    frameLines, endLines = documents.LoadLogTemplate( os.path.join( harness.DATA_DIR, "render_frame.log" ) )
+    lines = []
+    for index in range( frameCount ):
+        fields = { "frame": index + 1, "frameIndex": index + 1, "frameCount": frameCount, "time": "Mon Oct 19 12:00:00 2026", "output": "/tmp/beauty_" }
+        lines.extend( documents.ExpandFrameLines( frameLines, fields, 16 ) )
+    lines.extend( line.format( seconds="1.000" ) for line in endLines )
+    return lines
+
+
+def TimeStdoutHandling( owner, lines ):
+    startTime = time.time()
+    for line in lines:
+        owner.HandleStdoutLine( line )
+    return len( lines ) / ( time.time() - startTime )
+
+
+def BenchmarkStdout( options ):
+    lines = RecordedLog( options.frames_per_log )
+    results = []
+
+    with CreateWorker( "Cinema4DBatch", options ) as worker:
+        worker.SetTask( 0, 1, options.frames_per_log )
+        module = worker.Module
+        plugin = module.GetDeadlinePlugin()
+        plugin.Worker = worker
+        plugin.InitializeProcessCallback()
+        process = module.Cinema4DProcess( module.Cinema4DController( plugin ) )
+        process.Plugin = plugin
+        process.InitializeProcessCallback()
+        results.append( ( "Cinema4DBatch stdout handlers", TimeStdoutHandling( process, lines ), "lines/s" ) )
+
+    for label, config in ( ( "", {} ), ( " with log capture", { "EnableLogCapture": True } ) ):
+        with CreateWorker( "Cinema4D", options, config=config ) as worker:
+            worker.SetTask( 0, 1, options.frames_per_log )
+            plugin = worker.Module.GetDeadlinePlugin()
+            plugin.Worker = worker
+            plugin.InitializeProcessCallback()
+            plugin.PreRenderTasksCallback()
+            results.append( ( "Cinema4D stdout handlers%s" % label, TimeStdoutHandling( plugin, lines ), "lines/s" ) )
+            loggedLines = [ message for message in worker.Messages if message[1] == "STDOUT" ]
+            results.append( ( "Cinema4D task log%s" % label, sum( len( message[2] ) + 1 for message in loggedLines ) / 1024.0, "KB" ) )
+            plugin.Cleanup()
+
+    return results
+
+
+def BenchmarkPathMapping( options ):
+    deadlineConnect = harness.LoadDeadlineConnect()
+    results = []
+    previousEnvironment = dict( os.environ )
+    with CreateWorker( "Cinema4DBatch", options ) as worker:
+        os.environ[ "DEADLINE_PATH" ] = harness.FAKE_BIN_DIR
+        os.environ[ "FAKE_DEADLINE_PATH_MAPPINGS" ] = json.dumps( [ [ "/mnt/projects", "/tmp/projects" ] ] )
+        try:
+            for objectCount, materialCount in options.scene_sizes:
+                scene = harness.WriteScene( os.path.join( worker.Root, "pathmap.c4d" ), objects=objectCount, materials=materialCount )
+                label = "%d objects, %d materials" % ( objectCount, materialCount )
+
+                walks = []
+                totals = []
+                pathCount = 0
+                for _ in range( options.repeat ):
+                    documents.LoadFile( scene )
+                    doc = documents.GetActiveDocument()
+                    with harness.Quiet():
+                        startTime = time.time()
+                        objectsWithPaths = []
+                        deadlineConnect.GrabAllObjectsWithPaths( doc, objectsWithPaths )
+                        walks.append( time.time() - startTime )
+                        pathCount = len( objectsWithPaths )
+
+                        startTime = time.time()
+                        deadlineConnect.runPathMapping( worker.TempDirectory, None )
+                        totals.append( time.time() - startTime )
+
+                results.append( ( "walk (%s, %d paths)" % ( label, pathCount ), Median( walks ) * 1000, "ms" ) )
+                results.append( ( "Pathmap command (%s)" % label, Median( totals ) * 1000, "ms" ) )
+        finally:
+            os.environ.clear()
+            os.environ.update( previousEnvironment )
+    return results
+
+
+def BenchmarkMove( options ):
+    rates = []
+    for _ in range( options.repeat ):
+        with CreateWorker( "Cinema4D", options ) as worker:
+            plugin = worker.StartJob()
+            plugin.PreRenderTasksCallback()
+
+            localDir = plugin.CreateTempDirectory( "c4dOutput" )
+            block = b"\0" * ( 1024 * 1024 )
+            for index in range( options.move_files ):
+                with open( os.path.join( localDir, "beauty_%04d.exr" % index ), "wb" ) as frameHandle:
+                    for _ in range( options.move_megabytes ):
+                        frameHandle.write( block )
+
+            plugin.LocalRendering = True
+            plugin.LocalFilePath = localDir
+            plugin.NetworkFilePath = worker.PluginInfo[ "FilePath" ]
+            startTime = time.time()
+            plugin.PostRenderTasksCallback()
+            rates.append( options.move_files * options.move_megabytes / ( time.time() - startTime ) )
+
+    return [ ( "output move (%d x %d MB)" % ( options.move_files, options.move_megabytes ), Median( rates ), "MB/s" ) ]
+
+
+def BenchmarkTask( options ):
+    results = []
+    frames = options.frames_per_task
+
+    with CreateWorker( "Cinema4DBatch", options ) as worker:
+        worker.StartJob()
+        timings = []
+        for taskId in range( options.tasks ):
+            worker.SetTask( taskId, taskId * frames + 1, ( taskId + 1 ) * frames )
+            startTime = time.time()
+            worker.RenderTask()
+            timings.append( time.time() - startTime )
+        results.append( ( "Cinema4DBatch task (%d frames)" % frames, Median( timings ) * 1000, "ms" ) )
+
+    with CreateWorker( "Cinema4D", options ) as worker:
+        worker.StartJob()
+        timings = []
+        for taskId in range( options.tasks ):
+            worker.SetTask( taskId, taskId * frames + 1, ( taskId + 1 ) * frames )
+            startTime = time.time()
+            worker.RenderTask()
+            timings.append( time.time() - startTime )
+        results.append( ( "Cinema4D task (%d frames)" % frames, Median( timings ) * 1000, "ms" ) )
+
+    return results
+
+
+def BenchmarkCrash( options ):
+    frames = options.frames_per_task
+    crashFrames = ",".join( str( frame ) for frame in range( 2, frames + 1, max( frames // options.crashes, 1 ) )[ :options.crashes ] )
+    results = []
+    for label, crashFrame in ( ( "without a crash", "" ), ( "with %d crash(es)" % options.crashes, crashFrames ) ):
+        timings = []
+        restartTimings = []
+        for _ in range( options.repeat ):
+            with CreateWorker( "Cinema4DBatch", options, config={ "CrashRestartLimit": options.crashes }, environment={ "FAKE_C4D_CRASH_FRAME": crashFrame } ) as worker:
+                crashFile = os.path.join( worker.Root, "crashed.txt" )
+                worker.Environment[ "FAKE_C4D_CRASH_FILE" ] = crashFile
+                worker.ProcessEnvironment[ "FAKE_C4D_CRASH_FILE" ] = crashFile
+                worker.StartJob()
+                worker.SetTask( 0, 1, frames )
+                startTime = time.time()
+                worker.RenderTask()
+                timings.append( time.time() - startTime )
+                restartTimings.append( worker.Plugin.MyCinema4DController.TaskStats.Timings.get( "crashRestart", 0.0 ) )
+        results.append( ( "Cinema4DBatch task (%d frames) %s" % ( frames, label ), Median( timings ) * 1000, "ms" ) )
+        if crashFrame:
+            results.append( ( "crash restart time per task", Median( restartTimings ) * 1000, "ms" ) )
+    return results
+
+
+def RenderConcurrently( pluginName, options, partition ):
+    """
+    Renders options.tasks tasks on each of options.concurrent_tasks render threads at the same time, the way a Worker with
+    concurrent tasks does, and returns the number of frames rendered per second.
+    """
+    frames = options.frames_per_task
+    config = { "EnableCpuPartitioning": partition }
+    environment = { "FAKE_C4D_FRAME_WORK": str( options.frame_work ), "FAKE_C4D_OUTPUT_BYTES": "0" }
+    workers = [ CreateWorker( pluginName, options, config=config, environment=environment, threadNumber=threadNumber ) for threadNumber in range( options.concurrent_tasks ) ]
+    errors = []
+
+    def renderTasks( worker ):
+        try:
+            worker.StartJob()
+            for taskId in range( options.tasks ):
+                worker.SetTask( taskId, taskId * frames + 1, ( taskId + 1 ) * frames )
+                worker.RenderTask()
+        except Exception as e:
+            errors.append( e )
+
+    try:
+        for worker in workers:
+            worker.Job.JobConcurrentTasks = options.concurrent_tasks
+        threads = [ threading.Thread( target=renderTasks, args=( worker, ) ) for worker in workers ]
+        startTime = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - startTime
+    finally:
+        for worker in workers:
+            worker.Close()
+
+    if errors:
+        raise errors[0]
+    return options.concurrent_tasks * options.tasks * frames / elapsed
+
+
+def BenchmarkPartition( options ):
+    if not hasattr( os, "sched_setaffinity" ):
+        print( "    skipped: CPU partitioning needs Linux" )
+        return []
+
+    results = []
+    for pluginName in ( "Cinema4D", "Cinema4DBatch" ):
+        for partition in ( False, True ):
+            rates = [ RenderConcurrently( pluginName, options, partition ) for _ in range( options.partition_repeat ) ]
+            label = "%s, %d concurrent tasks, %s" % ( pluginName, options.concurrent_tasks, "partitioned" if partition else "unpinned" )
+            results.append( ( label, Median( rates ), "frames/s" ) )
+    return results
+
+
+def BenchmarkExport( options ):
+    results = []
+    frames = options.export_frames
+    environment = { "FAKE_C4D_EXPORT_SECONDS": str( options.export_frame_seconds ) }
+    for pluginName, renderer, extension in ( ( "Cinema4D", "ArnoldExport", ".ass" ), ( "Cinema4DBatch", "ArnoldExport", ".ass" ), ( "Cinema4DBatch", "RedshiftExport", ".rs" ) ):
+        for shards in ( 1, options.export_shards ):
+            # The shards are started with the Worker's environment, not the one the harness gives the plugin's process.
+            os.environ.update( environment )
+            with CreateWorker( pluginName, options, config={ "ExportShards": shards }, environment=environment ) as worker:
+                worker.PluginInfo.update( { "Renderer": renderer, "ExportFile": os.path.join( worker.Root, "output", "scene" + extension ) } )
+                worker.StartJob()
+                worker.SetTask( 0, 1, frames )
+                startTime = time.time()
+                worker.RenderTask()
+                elapsed = time.time() - startTime
+            results.append( ( "%s %s (%d frames, %d session(s))" % ( pluginName, renderer, frames, shards ), elapsed * 1000, "ms" ) )
+    return results
+
+
+def BenchmarkMappedScene( options ):
+    results = []
+    mappings = [ [ "/mnt/projects", "/tmp/projects" ] ]
+    for objectCount, materialCount in options.scene_sizes[ :2 ]:
+        label = "%d objects, %d materials" % ( objectCount, materialCount )
+        timings = { "mapped every session": [], "saving the mapped scene": [], "loading the mapped scene": [] }
+        for _ in range( options.repeat ):
+            with CreateWorker( "Cinema4DBatch", options, sceneSize=( objectCount, materialCount ) ) as worker:
+                worker.SetPathMappings( mappings )
+                startTime = time.time()
+                worker.StartJob()
+                worker.SetTask( 0, 1, 1 )
+                worker.RenderTask()
+                timings[ "mapped every session" ].append( time.time() - startTime )
+
+            with CreateWorker( "Cinema4DBatch", options, config={ "EnableMappedSceneCache": True }, sceneSize=( objectCount, materialCount ) ) as worker:
+                worker.SetPathMappings( mappings )
+                for name in ( "saving the mapped scene", "loading the mapped scene" ):
+                    # A later session of the job, e.g. on another Worker, sees the same auxiliary folder and scene.
+                    with harness.Worker( "Cinema4DBatch", pluginInfo=worker.PluginInfo, config=worker.Config, environment=RenderEnvironment( options ) ) as session:
+                        session.Job.AuxiliaryPath = worker.Job.AuxiliaryPath
+                        session.SetPathMappings( mappings )
+                        startTime = time.time()
+                        session.StartJob()
+                        session.SetTask( 0, 1, 1 )
+                        session.RenderTask()
+                        timings[ name ].append( time.time() - startTime )
+        for name in ( "mapped every session", "saving the mapped scene", "loading the mapped scene" ):
+            results.append( ( "session and task, %s (%s)" % ( name, label ), Median( timings[ name ] ) * 1000, "ms" ) )
+    return results
+
+
+def EchoClient( address ):
+    """
+    Connects to address the way DeadlineConnect.pyp does and sends every message back until the server disconnects.
+    """
+    import socket
+    deadlineConnect = harness.LoadDeadlineConnect()
+    if address.startswith( "unix:" ):
+        client = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        client.connect( address[ len( "unix:" ): ] )
+    else:
+        client = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        client.connect( ( "localhost", int( address ) ) )
+    try:
+        while True:
+            message = deadlineConnect.recv_msg( client )
+            if message is None:
+                break
+            deadlineConnect.send_msg( client, message )
+    finally:
+        client.close()
+
+
+def TimeEcho( server, address, message, count ):
+    client = threading.Thread( target=EchoClient, args=( address, ) )
+    client.start()
+    server.WaitForConnection( 5000, True )
+    timings = []
+    for _ in range( count ):
+        startTime = time.time()
+        server.Send( message )
+        server.Receive( 5000 )
+        timings.append( time.time() - startTime )
+    server.Disconnect( True )
+    client.join()
+    return timings
+
+
+def BenchmarkTransport( options ):
+    from FranticX.Net import ListeningSocket
+    UnixListeningSocket = harness.LoadPluginModule( "Cinema4DBatch" ).UnixListeningSocket
+
+    def CreateServer( transport, directory ):
+        if transport == "tcp":
+            server = ListeningSocket()
+            server.StartListening( 0, True, True, 10 )
+            return server, str( server.Port )
+        server = UnixListeningSocket( os.path.join( directory, "c4d.sock" ) )
+        server.StartListening( 10 )
+        return server, server.Address
+
+    transports = [ "tcp", "unix" ] if hasattr( socket, "AF_UNIX" ) else [ "tcp" ]
+    largeMessage = "x" * ( options.transport_kilobytes * 1024 )
+    results = []
+    directory = tempfile.mkdtemp( prefix="c4dtransport" )
+    try:
+        for transport in transports:
+            server, address = CreateServer( transport, directory )
+            timings = TimeEcho( server, address, "Verbose:False", options.round_trips * 10 )
+            results.append( ( "%s echo of a command (median)" % transport, Median( timings ) * 1000000, "us" ) )
+            results.append( ( "%s echo of a command (p95)" % transport, Percentile( timings, 95 ) * 1000000, "us" ) )
+
+            server, address = CreateServer( transport, directory )
+            timings = TimeEcho( server, address, largeMessage, options.round_trips )
+            results.append( ( "%s echo of %d KB" % ( transport, options.transport_kilobytes ), 2 * len( largeMessage ) / sum( timings ) * len( timings ) / 1048576.0, "MB/s" ) )
+
+        # The command round trip through the plugin and DeadlineConnect.pyp, with each transport.
+        for transport in transports:
+            timings = []
+            with CreateWorker( "Cinema4DBatch", options, config={ "UseUnixSocket": transport == "unix" } ) as worker:
+                worker.StartJob()
+                controller = worker.Plugin.MyCinema4DController
+                for _ in range( options.round_trips ):
+                    startTime = time.time()
+                    controller.Cinema4DSocket.Send( "Verbose:False" )
+                    controller.PollUntilComplete( False )
+                    timings.append( time.time() - startTime )
+            results.append( ( "%s command round trip (median)" % transport, Median( timings ) * 1000, "ms" ) )
+    finally:
+        shutil.rmtree( directory, ignore_errors=True )
+    return results
+
+
+BENCHMARKS = [
+    ( "startup", BenchmarkStartup ),
+    ( "roundtrip", BenchmarkRoundTrip ),
+    ( "stdout", BenchmarkStdout ),
+    ( "pathmap", BenchmarkPathMapping ),
+    ( "move", BenchmarkMove ),
+    ( "task", BenchmarkTask ),
+    ( "partition", BenchmarkPartition ),
+    ( "export", BenchmarkExport ),
+    ( "mappedscene", BenchmarkMappedScene ),
+    ( "crash", BenchmarkCrash ),
+    ( "transport", BenchmarkTransport ),
+]
+
+
+def ParseArguments( argv ):
+    parser = argparse.ArgumentParser( description="Runs the offline Cinema 4D plugin benchmarks." )
+    parser.add_argument( "benchmarks", nargs="*", metavar="benchmark", help="the benchmarks to run (default: all)" )
+    parser.add_argument( "--quick", action="store_true", help="use fewer repetitions and smaller inputs" )
+    parser.add_argument( "--repeat", type=int, help="the number of times each measurement is repeated" )
+    parser.add_argument( "--json", help="also write the results to this file" )
+    parser.add_argument( "--boot-seconds", type=float, default=0.0, help="the simulated Cinema 4D startup time" )
+    parser.add_argument( "--lines-per-second", type=float, default=0.0, help="the rate the fake Commandline prints its log at, 0 for unthrottled" )
+    parser.add_argument( "--frame-seconds", type=float, default=0.0, help="the minimum simulated render time per frame" )
+    parser.add_argument( "--concurrent-tasks", type=int, help="the number of concurrent tasks of the partition benchmark (default: 4, at most the number of cores)" )
+    parser.add_argument( "--frame-work", type=int, help="the simulated CPU work per frame of the partition benchmark, in units of 100000 loop iterations" )
+    parser.add_argument( "--verbose", action="store_true", help="echo the plugin log to stderr" )
+    options = parser.parse_args( argv )
+    unknown = set( options.benchmarks ) - set( name for name, _ in BENCHMARKS )
+    if unknown:
+        parser.error( "unknown benchmark(s): %s" % ", ".join( sorted( unknown ) ) )
+
+    quick = options.quick
+    if options.repeat is None:
+        options.repeat = 2 if quick else 5
+    options.round_trips = 50 if quick else 200
+    options.frames_per_log = 50 if quick else 500
+    options.scene_sizes = [ ( 200, 50 ), ( 2000, 300 ) ] if quick else [ ( 200, 50 ), ( 2000, 300 ), ( 10000, 1000 ) ]
+    options.move_files = 20 if quick else 100
+    options.move_megabytes = 1 if quick else 4
+    options.tasks = 3 if quick else 5
+    options.frames_per_task = 5 if quick else 10
+    if options.concurrent_tasks is None:
+        options.concurrent_tasks = max( min( 4, os.cpu_count() or 1 ), 2 )
+    if options.frame_work is None:
+        options.frame_work = 20 if quick else 100
+    options.partition_repeat = 1 if quick else 3
+    options.export_frames = 20 if quick else 100
+    options.export_frame_seconds = 0.02
+    options.export_shards = 4
+    options.transport_kilobytes = 1024
+    options.crashes = 2
+    return options
+
+
+def main( argv ):
+    options = ParseArguments( argv )
+    selected = options.benchmarks or [ name for name, _ in BENCHMARKS ]
+
+    results = {}
+    for name, benchmark in BENCHMARKS:
+        if name not in selected:
+            continue
+        print( "%s" % name )
+        results[ name ] = []
+        for metric, value, unit in benchmark( options ):
+            print( "    %-52s %12.2f %s" % ( metric, value, unit ) )
+            results[ name ].append( { "metric": metric, "value": value, "unit": unit } )
+        sys.stdout.flush()
+
+    if options.json:
+        with open( options.json, "w" ) as resultsHandle:
+            json.dump( results, resultsHandle, indent=2 )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[ 1: ] ) )
@@ -0,0 +1,24 @@
+"""
+A stand-in for Deadline's DeadlineEventListener. The configuration is read from the Config dictionary, which is empty
+until a test fills it, and the log is kept in Log.
+"""
+from FranticX.Processes import CallbackOwner
+
+
+class DeadlineEventListener( CallbackOwner ):
+    @property
+    def Config( self ):
+        return self.__dict__.setdefault( "_config", {} )
+
+    @property
+    def Log( self ):
+        return self.__dict__.setdefault( "_log", [] )
+
+    def GetConfigEntryWithDefault( self, key, default ):
+        return str( self.Config.get( key, default ) )
+
+    def LogInfo( self, message ):
+        self.Log.append( ( "INFO", message ) )
+
+    def LogWarning( self, message ):
+        self.Log.append( ( "WARNING", message ) )
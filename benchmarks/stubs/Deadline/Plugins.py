@@ -0,0 +1,209 @@
+"""
+A stand-in for Deadline's DeadlinePlugin. Everything a plugin asks the Worker for is read from the Worker object the
+harness attaches to the plugin (see benchmarks/harness.py).
+"""
+import os
+import shutil
+import tempfile
+
+from FranticX.Processes import RunningProcess, StdoutHandling
+
+
+class PluginType( object ):
+    Simple = 0
+    Advanced = 1
+
+
+class RenderFailedError( Exception ):
+    """
+    Raised by FailRender, which never returns on a real Worker either.
+    """
+    pass
+
+
+def _toBool( value ):
+    return str( value ).strip().lower() in ( "true", "1", "yes", "on" )
+
+
+class DeadlinePlugin( StdoutHandling ):
+    Worker = None
+    PluginType = PluginType.Simple
+
+    # Logging
+
+    def LogInfo( self, message ):
+        self.Worker.Log( "INFO", message )
+
+    def LogWarning( self, message ):
+        self.Worker.Log( "WARNING", message )
+
+    def LogStdout( self, message ):
+        self.Worker.Log( "STDOUT", message )
+
+    def FailRender( self, message ):
+        self.Worker.Log( "ERROR", message )
+        raise RenderFailedError( message )
+
+    def SetProgress( self, progress ):
+        self.Worker.Progress = progress
+
+    def SetStatusMessage( self, message ):
+        self.Worker.StatusMessage = message
+
+    def IsCanceled( self ):
+        return self.Worker.Canceled
+
+    # Plugin configuration and plugin info
+
+    def GetConfigEntry( self, key ):
+        return self.Worker.Config[ key ]
+
+    def GetConfigEntryWithDefault( self, key, default ):
+        return str( self.Worker.Config.get( key, default ) )
+
+    def GetBooleanConfigEntryWithDefault( self, key, default ):
+        return _toBool( self.Worker.Config[ key ] ) if key in self.Worker.Config else default
+
+    def GetIntegerConfigEntryWithDefault( self, key, default ):
+        return int( self.Worker.Config.get( key, default ) )
+
+    def GetFloatConfigEntryWithDefault( self, key, default ):
+        return float( self.Worker.Config.get( key, default ) )
+
+    def GetPluginInfoEntry( self, key ):
+        return self.Worker.PluginInfo[ key ]
+
+    def GetPluginInfoEntryWithDefault( self, key, default ):
+        return str( self.Worker.PluginInfo.get( key, default ) )
+
+    def GetBooleanPluginInfoEntryWithDefault( self, key, default ):
+        return _toBool( self.Worker.PluginInfo[ key ] ) if key in self.Worker.PluginInfo else default
+
+    def GetIntegerPluginInfoEntryWithDefault( self, key, default ):
+        return int( self.Worker.PluginInfo.get( key, default ) )
+
+    def GetFloatPluginInfoEntryWithDefault( self, key, default ):
+        return float( self.Worker.PluginInfo.get( key, default ) )
+
+    def GetRenderExecutable( self, configKey, name ):
+        for executable in self.GetConfigEntryWithDefault( configKey, "" ).split( ";" ):
+            executable = executable.strip()
+            if executable and os.path.isfile( executable ):
+                return executable
+        self.FailRender( "%s render executable was not found in the semicolon separated list \"%s\"." % ( name, self.GetConfigEntryWithDefault( configKey, "" ) ) )
+
+    # Job, task and Worker
+
+    def GetJob( self ):
+        return self.Worker.Job
+
+    def GetStartFrame( self ):
+        return self.Worker.StartFrame
+
+    def GetEndFrame( self ):
+        return self.Worker.EndFrame
+
+    def GetCurrentTaskId( self ):
+        return str( self.Worker.TaskId )
+
+    def IsTileJob( self ):
+        return False
+
+    def GetThreadNumber( self ):
+        return self.Worker.ThreadNumber
+
+    def GetSlaveName( self ):
+        return self.Worker.Name
+
+    def GetSlaveDirectory( self ):
+        return self.Worker.SlaveDirectory
+
+    def GetPluginDirectory( self ):
+        return self.Worker.PluginDirectory
+
+    def GetJobsDataDirectory( self ):
+        return self.Worker.JobsDataDirectory
+
+    def GetDataFilename( self ):
+        return self.Worker.DataFilename
+
+    def CreateTempDirectory( self, name ):
+        return tempfile.mkdtemp( prefix=name + "_", dir=self.Worker.TempDirectory )
+
+    def OverrideCpuAffinity( self ):
+        return self.Worker.CpuAffinity is not None
+
+    def CpuAffinity( self ):
+        return list( self.Worker.CpuAffinity or [] )
+
+    def OverrideGpuAffinity( self ):
+        return self.Worker.GpuAffinity is not None
+
+    def GpuAffinity( self ):
+        return list( self.Worker.GpuAffinity or [] )
+
+    # Environment of the rendering process
+
+    def SetEnvironmentVariable( self, key, value ):
+        self.Worker.Environment[ key ] = value
+
+    def GetEnvironmentVariable( self, key ):
+        return self.Worker.Environment.get( key, "" )
+
+    def SetProcessEnvironmentVariable( self, key, value ):
+        self.Worker.ProcessEnvironment[ key ] = value
+
+    def GetProcessEnvironmentVariable( self, key ):
+        return self.Worker.ProcessEnvironment.get( key, "" )
+
+    # Output
+
+    def VerifyAndMoveDirectory( self, source, destination, deleteSource, retries ):
+        """
+        Copies every file to the destination, checks the copy's size and then removes the source file, like the Worker.
+        """
+        for root, _, files in os.walk( source ):
+            targetDir = os.path.join( destination, os.path.relpath( root, source ) )
+            if not os.path.isdir( targetDir ):
+                os.makedirs( targetDir )
+            for name in files:
+                sourceFile = os.path.join( root, name )
+                targetFile = os.path.join( targetDir, name )
+                shutil.copyfile( sourceFile, targetFile )
+                if os.path.getsize( sourceFile ) != os.path.getsize( targetFile ):
+                    self.FailRender( "Failed to verify the copy of %s" % sourceFile )
+                os.remove( sourceFile )
+        if deleteSource:
+            shutil.rmtree( source, ignore_errors=True )
+
+    # Managed processes of advanced plugins
+
+    def StartMonitoredManagedProcess( self, name, process ):
+        process.Plugin = self
+        process.InitializeProcessCallback()
+        self.Worker.ManagedProcesses[ name ] = RunningProcess(
+            process,
+            process.RenderExecutableCallback(),
+            process.RenderArgumentCallback(),
+            process.StartupDirectoryCallback() if process.StartupDirectoryCallback else "",
+            self.Worker.ProcessEnvironment )
+
+    def VerifyMonitoredManagedProcess( self, name ):
+        if not self.Worker.ManagedProcesses[ name ].IsRunning():
+            self.FlushMonitoredManagedProcessStdout( name )
+            self.FailRender( "Monitored managed process \"%s\" has exited or been terminated." % name )
+
+    def MonitoredManagedProcessIsRunning( self, name ):
+        process = self.Worker.ManagedProcesses.get( name )
+        return process is not None and process.IsRunning()
+
+    def FlushMonitoredManagedProcessStdout( self, name ):
+        self.Worker.ManagedProcesses[ name ].Flush()
+
+    def CheckForMonitoredManagedProcessPopups( self, name ):
+        return ""
+
+    def ShutdownMonitoredManagedProcess( self, name ):
+        process = self.Worker.ManagedProcesses.pop( name, None )
+        if process is not None:
+            process.Shutdown()
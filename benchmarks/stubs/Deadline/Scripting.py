@@ -0,0 +1,63 @@
+"""
+Stand-ins for the Deadline.Scripting utilities used by the plugins. Path mappings are set by the harness with
+SetPathMappings and are applied by simple prefix replacement, like the Repository's path mapping rules.
+"""
+import os
+import sys
+
+_pathMappings = []
+
+
+def SetPathMappings( mappings ):
+    """
+    :param mappings: a list of ( fromPath, toPath ) tuples
+    """
+    del _pathMappings[:]
+    _pathMappings.extend( mappings )
+
+
+class RepositoryUtils( object ):
+    @staticmethod
+    def GetJobAuxiliaryPath( job ):
+        return job.AuxiliaryPath
+
+    @staticmethod
+    def GetPathMappings():
+        return [ [ fromPath, toPath ] for fromPath, toPath in _pathMappings ]
+
+    @staticmethod
+    def CheckPathMapping( path ):
+        for fromPath, toPath in _pathMappings:
+            if path.lower().startswith( fromPath.lower() ):
+                mapped = toPath + path[ len( fromPath ): ]
+                return mapped.replace( "\\", "/" ) if not SystemUtils.IsRunningOnWindows() else mapped
+        return path
+
+
+class SystemUtils( object ):
+    @staticmethod
+    def IsRunningOnWindows():
+        return sys.platform.startswith( "win" )
+
+    @staticmethod
+    def IsRunningOnMac():
+        return sys.platform == "darwin"
+
+    @staticmethod
+    def IsRunningOnLinux():
+        return sys.platform.startswith( "linux" )
+
+    @staticmethod
+    def GetCpuCount():
+        return os.cpu_count() or 1
+
+
+class FileUtils( object ):
+    @staticmethod
+    def FileExists( path ):
+        return os.path.isfile( path )
+
+    @staticmethod
+    def DirectoryExists( path ):
+        return os.path.isdir( path )
+
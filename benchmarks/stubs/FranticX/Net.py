@@ -0,0 +1,111 @@
+"""
+A stand-in for FranticX's ListeningSocket. Messages are framed the same way DeadlineConnect.pyp frames them: a 4-byte
+big-endian length followed by the UTF-8 encoded message.
+"""
+import socket
+import struct
+import time
+
+
+class SimpleSocketException( Exception ):
+    def __init__( self, message ):
+        Exception.__init__( self, message )
+        self.Message = message
+
+
+class SimpleSocketTimeoutException( SimpleSocketException ):
+    pass
+
+
+class ListeningSocket( object ):
+    def __init__( self ):
+        self.listener = None
+        self.connection = None
+        self.buffer = b""
+        self.Port = 0
+
+    @property
+    def IsListening( self ):
+        return self.listener is not None
+
+    @property
+    def IsConnected( self ):
+        return self.connection is not None
+
+    def StartListening( self, port, localOnly, reuseAddress, backlog ):
+        self.listener = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        if reuseAddress:
+            self.listener.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR, 1 )
+        self.listener.bind( ( "localhost" if localOnly else "", port ) )
+        self.listener.listen( backlog )
+        self.Port = self.listener.getsockname()[1]
+
+    def StopListening( self ):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+
+    def WaitForConnection( self, timeoutMilliseconds, disconnectExisting ):
+        if self.connection is not None:
+            if not disconnectExisting:
+                return
+            self.Disconnect( False )
+
+        self.listener.settimeout( timeoutMilliseconds / 1000.0 )
+        try:
+            connection, _ = self.listener.accept()
+        except socket.timeout:
+            raise SimpleSocketTimeoutException( "Timed out waiting for a connection" )
+        connection.setsockopt( socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 )
+        self.connection = connection
+        self.buffer = b""
+
+    def Disconnect( self, stopListening ):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            finally:
+                self.connection = None
+        if stopListening:
+            self.StopListening()
+
+    def Send( self, message ):
+        if self.connection is None:
+            raise SimpleSocketException( "The socket is not connected" )
+        data = message.encode( "utf-8" )
+        try:
+            self.connection.sendall( struct.pack( ">I", len( data ) ) + data )
+        except socket.error as e:
+            self.Disconnect( False )
+            raise SimpleSocketException( str( e ) )
+
+    def Receive( self, timeoutMilliseconds ):
+        if self.connection is None:
+            raise SimpleSocketException( "The socket is not connected" )
+
+        self.fill( 4, time.time() + timeoutMilliseconds / 1000.0 )
+        length = struct.unpack( ">I", self.buffer[:4] )[0]
+        # Once a message has started arriving, wait for the rest of it regardless of the timeout.
+        self.fill( 4 + length, None )
+
+        message = self.buffer[ 4:4 + length ]
+        self.buffer = self.buffer[ 4 + length: ]
+        return message.decode( "utf-8" )
+
+    def fill( self, size, deadline ):
+        while len( self.buffer ) < size:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise SimpleSocketTimeoutException( "Timed out waiting for a message" )
+            self.connection.settimeout( remaining )
+            try:
+                packet = self.connection.recv( 65536 )
+            except socket.timeout:
+                raise SimpleSocketTimeoutException( "Timed out waiting for a message" )
+            except socket.error as e:
+                self.Disconnect( False )
+                raise SimpleSocketException( str( e ) )
+            if not packet:
+                self.Disconnect( False )
+                raise SimpleSocketException( "The connection was closed by the remote host" )
+            self.buffer += packet
@@ -0,0 +1,189 @@
+"""
+A stand-in for FranticX's ManagedProcess, and the process plumbing shared with the Deadline plugin stand-in.
+"""
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class Event( object ):
+    """
+    Mimics a .NET event: handlers are added with += and all of them are called when the event is raised.
+    """
+    def __init__( self ):
+        self.handlers = []
+
+    def __iadd__( self, handler ):
+        self.handlers.append( handler )
+        return self
+
+    def __call__( self, *args ):
+        result = None
+        for handler in self.handlers:
+            result = handler( *args )
+        return result
+
+    def __bool__( self ):
+        return bool( self.handlers )
+
+    __nonzero__ = __bool__
+
+
+class StdoutHandler( object ):
+    def __init__( self, pattern ):
+        self.Pattern = pattern
+        self.regex = re.compile( pattern )
+        self.HandleCallback = Event()
+
+
+class CallbackOwner( object ):
+    """
+    The plugins add handlers to their callbacks in __init__ without calling the base class constructor, so the events are
+    created the first time they are used.
+    """
+    def __getattr__( self, name ):
+        if name.endswith( "Callback" ):
+            event = Event()
+            object.__setattr__( self, name, event )
+            return event
+        raise AttributeError( name )
+
+
+class StdoutHandling( CallbackOwner ):
+    """
+    The stdout and popup handler registration shared by simple plugins and managed processes.
+    """
+    @property
+    def StdoutHandlers( self ):
+        return self.__dict__.setdefault( "_stdoutHandlers", [] )
+
+    @property
+    def PopupHandlers( self ):
+        return self.__dict__.setdefault( "_popupHandlers", [] )
+
+    def AddStdoutHandlerCallback( self, pattern ):
+        handler = StdoutHandler( pattern )
+        self.StdoutHandlers.append( handler )
+        return handler
+
+    def AddPopupHandler( self, title, button ):
+        self.PopupHandlers.append( ( title, button ) )
+
+    def AddPopupIgnorer( self, title ):
+        self.PopupHandlers.append( ( title, None ) )
+
+    def GetRegexMatch( self, index ):
+        return self.__dict__[ "_regexMatch" ].group( index )
+
+    def SuppressThisLine( self ):
+        self.__dict__[ "_suppressLine" ] = True
+
+    def HandleStdoutLine( self, line ):
+        """
+        Runs every stdout handler whose pattern matches the line, the way the Worker does, and then logs the line unless a
+        handler suppressed it.
+        :return: the number of handlers that matched
+        """
+        matched = 0
+        self.__dict__[ "_suppressLine" ] = False
+        try:
+            for handler in self.StdoutHandlers:
+                match = handler.regex.search( line )
+                if match is not None:
+                    self.__dict__[ "_regexMatch" ] = match
+                    handler.HandleCallback()
+                    matched += 1
+        finally:
+            if not self.__dict__[ "_suppressLine" ]:
+                self.LogStdout( line )
+        return matched
+
+
+class RunningProcess( object ):
+    """
+    A child process whose stdout is read on a background thread and handed to a StdoutHandling owner when flushed.
+    """
+    def __init__( self, owner, executable, arguments, startupDirectory, environment ):
+        self.owner = owner
+        self.lines = queue.Queue()
+
+        command = [ executable ] + shlex.split( arguments )
+        if executable.endswith( ".py" ):
+            # The fake Commandline is a Python script, so run it with this interpreter on every platform.
+            command.insert( 0, sys.executable )
+
+        env = dict( os.environ )
+        env.update( environment )
+        env[ "PYTHONUNBUFFERED" ] = "1"
+        self.process = subprocess.Popen( command, cwd=startupDirectory or None, env=env, stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+        self.reader = threading.Thread( target=self.readStdout )
+        self.reader.daemon = True
+        self.reader.start()
+
+    def readStdout( self ):
+        for line in iter( self.process.stdout.readline, b"" ):
+            self.lines.put( line.decode( "utf-8", "replace" ).rstrip( "\r\n" ) )
+        self.process.stdout.close()
+
+    def IsRunning( self ):
+        return self.process.poll() is None
+
+    def Flush( self ):
+        while True:
+            try:
+                line = self.lines.get_nowait()
+            except queue.Empty:
+                return
+            self.owner.HandleStdoutLine( line )
+
+    def Wait( self ):
+        """
+        Handles stdout as it arrives until the process exits.
+        :return: the exit code
+        """
+        while self.reader.is_alive() or not self.lines.empty():
+            try:
+                line = self.lines.get( timeout=0.1 )
+            except queue.Empty:
+                continue
+            self.owner.HandleStdoutLine( line )
+        return self.process.wait()
+
+    def Shutdown( self ):
+        if self.IsRunning():
+            self.process.terminate()
+            try:
+                self.process.wait( 5 )
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.reader.join( 5 )
+
+
+class ManagedProcess( StdoutHandling ):
+    # Set by the plugin that starts the process; stdout log lines go to its log.
+    Plugin = None
+
+    def SetProgress( self, progress ):
+        if self.Plugin is not None:
+            self.Plugin.SetProgress( progress )
+
+    def SetStatusMessage( self, message ):
+        if self.Plugin is not None:
+            self.Plugin.SetStatusMessage( message )
+
+    def LogStdout( self, line ):
+        if self.Plugin is not None:
+            self.Plugin.LogStdout( line )
+
+    def FailRender( self, message ):
+        self.Plugin.FailRender( message )
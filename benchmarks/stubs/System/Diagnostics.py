@@ -0,0 +1,7 @@
+class ProcessPriorityClass( object ):
+    Idle = 64
+    BelowNormal = 16384
+    Normal = 32
+    AboveNormal = 32768
+    High = 128
+    RealTime = 256
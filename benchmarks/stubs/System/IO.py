@@ -0,0 +1,27 @@
+import io
+import os
+import tempfile
+
+
+class File( object ):
+    @staticmethod
+    def Exists( path ):
+        return os.path.isfile( path )
+
+    @staticmethod
+    def WriteAllText( path, contents, encoding="utf-8" ):
+        with io.open( path, mode="w", encoding=encoding, newline="" ) as fileHandle:
+            fileHandle.write( contents )
+
+    @staticmethod
+    def ReadAllText( path ):
+        with io.open( path, mode="r", encoding="utf-8" ) as fileHandle:
+            return fileHandle.read()
+
+
+class Path( object ):
+    @staticmethod
+    def GetTempFileName():
+        handle, path = tempfile.mkstemp( suffix=".tmp" )
+        os.close( handle )
+        return path
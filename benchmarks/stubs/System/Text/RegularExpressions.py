@@ -0,0 +1,28 @@
+import re
+
+
+class Group( object ):
+    def __init__( self, value ):
+        self.Value = value if value is not None else ""
+        self.Success = value is not None
+
+
+class Match( object ):
+    def __init__( self, match ):
+        self.Success = match is not None
+        self.Groups = []
+        if match is not None:
+            self.Groups = [ Group( match.group( 0 ) ) ] + [ Group( value ) for value in match.groups() ]
+        self.Value = self.Groups[0].Value if self.Groups else ""
+
+
+class Regex( object ):
+    # Like .NET, a match may start anywhere in the input.
+    def __init__( self, pattern ):
+        self.pattern = re.compile( pattern )
+
+    def Match( self, value ):
+        return Match( self.pattern.search( value ) )
+
+    def IsMatch( self, value ):
+        return self.pattern.search( value ) is not None
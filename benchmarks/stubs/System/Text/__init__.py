@@ -0,0 +1,3 @@
+class Encoding( object ):
+    UTF8 = "utf-8"
+    ASCII = "ascii"
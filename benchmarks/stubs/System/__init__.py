@@ -0,0 +1,47 @@
+"""
+Stand-ins for the parts of the .NET System namespace used by the plugins.
+"""
+import time
+
+# .NET ticks are 100 nanosecond intervals.
+TICKS_PER_SECOND = 10000000
+
+
+class TimeSpan( object ):
+    def __init__( self, ticks ):
+        self.Ticks = int( ticks )
+
+    @staticmethod
+    def FromTicks( ticks ):
+        return TimeSpan( ticks )
+
+    @property
+    def TotalSeconds( self ):
+        return self.Ticks / float( TICKS_PER_SECOND )
+
+    @property
+    def TotalMilliseconds( self ):
+        return self.Ticks / float( TICKS_PER_SECOND // 1000 )
+
+    @property
+    def Milliseconds( self ):
+        # Like .NET, this is the millisecond component of the time span, not its total length.
+        return int( self.TotalMilliseconds ) % 1000
+
+
+class _DateTimeType( type ):
+    @property
+    def Now( cls ):
+        return cls( int( time.time() * TICKS_PER_SECOND ) )
+
+
+class DateTime( metaclass=_DateTimeType ):
+    def __init__( self, ticks ):
+        self.Ticks = ticks
+
+    @property
+    def TimeOfDay( self ):
+        return TimeSpan( self.Ticks % ( 86400 * TICKS_PER_SECOND ) )
+
+    def Subtract( self, other ):
+        return TimeSpan( self.Ticks - other.Ticks )
@@ -0,0 +1,181 @@
+from __future__ import absolute_import, division
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+
+from Deadline.Events import DeadlineEventListener
+from Deadline.Scripting import RepositoryUtils
+
+# The render history is read with the helpers the Cinema4D and Cinema4DBatch plugins write it with.
+_commonDir = os.path.join( os.path.dirname( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) ), "plugins", "Cinema4D" )
+if _commonDir not in sys.path:
+    sys.path.insert( 0, _commonDir )
+
+from Cinema4DCommon import GetRenderHistoryDirectory, LoadRenderHistory
+
+# The plugins whose render history is aggregated.
+CINEMA4D_PLUGINS = ( "Cinema4D", "Cinema4DBatch" )
+
+# The figures aggregated per job: a name, the unit of the job extra info entries, and how to read the values of a task record.
+STATISTICS = [
+    ( "Frame", "s", lambda record: record.get( "frames" ) or [] ),
+    ( "Startup", "s", lambda record: [ record[ "startup" ] ] if record.get( "startup" ) is not None else [] ),
+    ( "Boot", "s", lambda record: GetTiming( record, "boot" ) ),
+    ( "Load", "s", lambda record: GetTiming( record, "load" ) ),
+    ( "PathMapping", "s", lambda record: GetTiming( record, "pathMapping" ) ),
+    ( "Upload", "s", lambda record: GetTiming( record, "upload" ) ),
+    ( "Overhead", "s", lambda record: [ record[ "overhead" ] ] if record.get( "overhead" ) is not None else [] ),
+    ( "PeakMemory", "MB", lambda record: [ record[ "peakMemory" ] / 1048576.0 ] if record.get( "peakMemory" ) else [] ),
+]
+
+PERCENTILES = ( 50, 90, 99 )
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS tasks (
+        job TEXT, task INTEGER, worker TEXT, time REAL, plugin TEXT, scene TEXT, renderer TEXT, take TEXT,
+        startup REAL, overhead REAL, upload REAL, peakMemory INTEGER, frameCount INTEGER, frameSeconds REAL, timings TEXT,
+        PRIMARY KEY ( job, task, worker, time ) )""",
+    """CREATE TABLE IF NOT EXISTS frames (
+        job TEXT, task INTEGER, worker TEXT, time REAL, frameIndex INTEGER, seconds REAL,
+        PRIMARY KEY ( job, task, worker, time, frameIndex ) )""",
+    """CREATE TABLE IF NOT EXISTS jobs (
+        job TEXT PRIMARY KEY, name TEXT, user TEXT, plugin TEXT, scene TEXT, renderer TEXT, framesPerTask INTEGER,
+        status TEXT, time REAL, statistics TEXT )""",
+]
+
+def GetDeadlineEventListener():
+    return Cinema4DRenderStatsListener()
+
+def CleanupDeadlineEventListener( eventListener ):
+    eventListener.Cleanup()
+
+def GetTiming( record, name ):
+    value = ( record.get( "timings" ) or {} ).get( name )
+    return [ value ] if value is not None else []
+
+def Percentile( values, percent ):
+    """
+    :return: the nearest-rank percentile of values
+    """
+    values = sorted( values )
+    index = int( math.ceil( percent / 100.0 * len( values ) ) ) - 1
+    return values[ min( max( index, 0 ), len( values ) - 1 ) ]
+
+def AggregateRecords( records ):
+    """
+    Computes the percentiles of each figure over the task records of a job. A task that was requeued and rendered again
+    is counted each time it was rendered, since every render took the time it did.
+    :return: a dictionary of figure name to a dictionary with the "count", "mean", "max" and "p<N>" values
+    """
+    statistics = {}
+    for name, unit, getValues in STATISTICS:
+        values = [ value for record in records for value in getValues( record ) ]
+        if not values:
+            continue
+        figure = { "unit": unit, "count": len( values ), "mean": sum( values ) / len( values ), "max": max( values ) }
+        for percent in PERCENTILES:
+            figure[ "p%d" % percent ] = Percentile( values, percent )
+        statistics[ name ] = figure
+    return statistics
+
+def StoreJobStatistics( databaseFile, job, status, records, statistics ):
+    """
+    Adds the task records and the job's statistics to the SQLite database. Records that are already in it, from an
+    earlier time the job finished, are replaced.
+    """
+    connection = sqlite3.connect( databaseFile, timeout=30 )
+    try:
+        with connection:
+            for statement in SCHEMA:
+                connection.execute( statement )
+            for record in records:
+                frames = record.get( "frames" ) or []
+                key = ( job.JobId, record.get( "task" ), record.get( "worker", "" ), record.get( "time" ) )
+                connection.execute( "INSERT OR REPLACE INTO tasks VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )", key + (
+                    record.get( "plugin" ), record.get( "scene" ), record.get( "renderer" ), record.get( "take" ),
+                    record.get( "startup" ), record.get( "overhead" ), ( record.get( "timings" ) or {} ).get( "upload" ),
+                    record.get( "peakMemory" ), len( frames ), sum( frames ), json.dumps( record.get( "timings" ) or {}, sort_keys=True ) ) )
+                connection.executemany( "INSERT OR REPLACE INTO frames VALUES ( ?, ?, ?, ?, ?, ? )", [ key + ( index, seconds ) for index, seconds in enumerate( frames ) ] )
+            connection.execute( "INSERT OR REPLACE INTO jobs VALUES ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ? )", (
+                job.JobId, job.JobName, job.JobUserName, job.JobPlugin, job.GetJobPluginInfoKeyValue( "SceneFile" ),
+                job.GetJobPluginInfoKeyValue( "Renderer" ), job.JobFramesPerTask, status, time.time(), json.dumps( statistics, sort_keys=True ) ) )
+    finally:
+        connection.close()
+
+class Cinema4DRenderStatsListener( DeadlineEventListener ):
+    """
+    Aggregates the render history that the Cinema4D and Cinema4DBatch plugins record for every task when a job finishes
+    or fails: the per-frame render times, the startup, boot, scene load and path mapping times, the upload time and the
+    peak memory. The percentiles are written to the job's extra info, and the task records and job statistics are added
+    to an SQLite database for capacity planning and chunk size tuning.
+    """
+    def __init__( self ):
+        self.OnJobFinishedCallback += self.OnJobFinished
+        self.OnJobFailedCallback += self.OnJobFailed
+
+    def Cleanup( self ):
+        del self.OnJobFinishedCallback
+        del self.OnJobFailedCallback
+
+    def OnJobFinished( self, job ):
+        self.AggregateJob( job, "Completed" )
+
+    def OnJobFailed( self, job ):
+        self.AggregateJob( job, "Failed" )
+
+    def GetHistoryDirectory( self, job ):
+        """
+        :return: the render history directory from this event plugin's configuration, or else from the job's plugin
+        """
+        historyDir = self.GetConfigEntryWithDefault( "RenderHistoryDirectory", "" ).strip()
+        if not historyDir:
+            historyDir = RepositoryUtils.GetPluginConfig( job.JobPlugin ).GetConfigEntryWithDefault( "RenderHistoryDirectory", "" ).strip()
+        return RepositoryUtils.CheckPathMapping( historyDir ) if historyDir else ""
+
+    def AggregateJob( self, job, status ):
+        if job.JobPlugin not in CINEMA4D_PLUGINS:
+            return
+
+        historyDir = self.GetHistoryDirectory( job )
+        if not historyDir:
+            self.LogInfo( "No render history directory is configured, so the render statistics of job %s are not aggregated" % job.JobId )
+            return
+        sceneFile = job.GetJobPluginInfoKeyValue( "SceneFile" )
+        if not sceneFile:
+            # The plugins key the history by the scene file submitted with the job, as each Worker saw it.
+            self.LogInfo( "Job %s was submitted with its scene file, whose render history can not be found" % job.JobId )
+            return
+
+        sceneHistoryDir = GetRenderHistoryDirectory( historyDir, sceneFile, job.GetJobPluginInfoKeyValue( "Renderer" ) )
+        records = LoadRenderHistory( sceneHistoryDir, lambda record: record.get( "job" ) == job.JobId )
+        if not records:
+            self.LogInfo( "No render history was recorded for job %s" % job.JobId )
+            return
+
+        statistics = AggregateRecords( records )
+        self.WriteJobExtraInfo( job, records, statistics )
+
+        databaseFile = self.GetConfigEntryWithDefault( "StatisticsDatabase", "" ).strip()
+        if databaseFile:
+            databaseFile = RepositoryUtils.CheckPathMapping( databaseFile )
+            try:
+                StoreJobStatistics( databaseFile, job, status, records, statistics )
+            except ( sqlite3.Error, IOError, OSError ) as e:
+                self.LogWarning( "Failed to store the render statistics of job %s in %s: %s" % ( job.JobId, databaseFile, e ) )
+
+        self.LogInfo( "Aggregated the render statistics of %d task(s) of job %s" % ( len( records ), job.JobId ) )
+
+    def WriteJobExtraInfo( self, job, records, statistics ):
+        """
+        Writes the task and frame counts, and the median, 90th percentile and maximum of each figure, to the job's extra info.
+        """
+        prefix = self.GetConfigEntryWithDefault( "ExtraInfoPrefix", "RenderStats" ).strip()
+        job.SetJobExtraInfoKeyValue( "%s.Tasks" % prefix, str( len( records ) ) )
+        job.SetJobExtraInfoKeyValue( "%s.Frames" % prefix, str( sum( len( record.get( "frames" ) or [] ) for record in records ) ) )
+        for name, figure in statistics.items():
+            for key in ( "p50", "p90", "max" ):
+                job.SetJobExtraInfoKeyValue( "%s.%s.%s" % ( prefix, name, key.upper() ), "%.2f %s" % ( figure[ key ], figure[ "unit" ] ) )
+        RepositoryUtils.SaveJob( job )
@@ -2,12 +2,30 @@
 
 from __future__ import absolute_import
 import os
+import signal
+import sys
 import tempfile
+import threading
+import time
+import uuid
 
 from Deadline.Plugins import DeadlinePlugin, PluginType
 from Deadline.Scripting import FileUtils, RepositoryUtils, SystemUtils
 from six.moves import range
 
+# The helpers shared with the Cinema4DBatch plugin live in Cinema4DCommon.py, next to this plugin.
+_commonDir = os.path.dirname( os.path.abspath( __file__ ) )
+if _commonDir not in sys.path:
+    sys.path.insert( 0, _commonDir )
+
+from Cinema4DCommon import (
+    CheckExportCache, CheckExportShards, CollectHangDiagnostics, CreateCgroup, CreateLiveMetrics, CreateRedshiftCache,
+    CreateResourceSampler, CreateStdoutCapture, ExportShardProcesses, FilterPluginDirectories, FindNewChildProcess,
+    GetChildProcessIds, GetCinema4DInstall, GetCpuPartition, GetDirectorySize, GetFramesToRender, GetLinuxEnvironment,
+    GetProcessStartTime, HangWatchdog, JobManifest, LogCgroupUsage, LogResourceSamplerMessages, PlaceExportShard,
+    RemoveVerifiedPaths, RunAssetPreflight, SaveCapturedLog, SetProcessTreeAffinity, SetRenderPhase, SignalProcessTree,
+    SplitExportFrames, StartExportShards, StoreExportCache, TaskStatistics, VerifyExportFiles, WriteRenderHistory )
+
 
 def GetDeadlinePlugin():
     return Cinema4DPlugin()
@@ -27,12 +45,36 @@ class Cinema4DPlugin( DeadlinePlugin ):
         self.CheckProgress = False
         self.CurrentRenderPhase = ""
         self.UsingRedshift = False
+        self.TaskStats = TaskStatistics()
+        self.ProcessStartTime = None
+        self.CpuPartition = None
+        self.Cgroup = None
+        self.PlacementThread = None
+        self.ResourceSampler = None
+        self.TaskPeakMemory = None
+        self.LiveMetrics = None
+        self.RedshiftCache = None
+        self.HangWatchdog = None
+        self.HangWatchdogThread = None
+        self.StdoutCapture = None
+        self.C4DInstall = None
+        self.PluginFiltering = False
+        self.KnownChildren = None
+        self.SessionMarker = ""
+        self.ExportShards = None
+        self.ExportFile = ""
+        self.ExportFrames = []
+        self.ExportCache = None
+        self.ExportCacheKeys = None
+        self.JobManifest = JobManifest( self, self.MapPath )
 
         self.InitializeProcessCallback += self.InitializeProcess
         self.PreRenderTasksCallback += self.PreRenderTasks
         self.RenderExecutableCallback += self.RenderExecutable
         self.RenderArgumentCallback += self.RenderArgument
+        self.CheckExitCodeCallback += self.CheckExitCode
         self.PostRenderTasksCallback += self.PostRenderTasks
+        self.EndJobCallback += self.EndJob
 
     def Cleanup( self ):
         for stdoutHandler in self.StdoutHandlers:
@@ -42,7 +84,15 @@ class Cinema4DPlugin( DeadlinePlugin ):
         del self.PreRenderTasksCallback
         del self.RenderExecutableCallback
         del self.RenderArgumentCallback
+        del self.CheckExitCodeCallback
         del self.PostRenderTasksCallback
+        del self.EndJobCallback
+
+        if self.StdoutCapture:
+            self.StdoutCapture.Close()
+        if self.LiveMetrics:
+            self.LiveMetrics.Stop()
+        self.StopExportShards()
 
     def InitializeProcess( self ):
         self.StdoutHandling = True
@@ -53,6 +103,10 @@ class Cinema4DPlugin( DeadlinePlugin ):
         self.prevFrame = self.GetStartFrame()
         self.C4DExe = ""
 
+        # The output is captured before any other handler sees it, so that a line that fails the render is in the saved log.
+        if self.GetBooleanConfigEntryWithDefault( "EnableLogCapture", False ):
+            self.AddStdoutHandlerCallback( ".*" ).HandleCallback += self.HandleCapturedStdout
+
         self.AddStdoutHandlerCallback( ".*Document not found.*" ).HandleCallback += self.HandleStdoutError
         self.AddStdoutHandlerCallback( ".*Project not found.*" ).HandleCallback += self.HandleStdoutError
         self.AddStdoutHandlerCallback( ".*Error rendering project.*" ).HandleCallback += self.HandleStdoutError
@@ -89,6 +143,11 @@ class Cinema4DPlugin( DeadlinePlugin ):
         self.AddStdoutHandlerCallback( ".*ImportError: No module named site.*" ).HandleCallback += self.HandleNoSite
         self.AddStdoutHandlerCallback( ".*code for hash .* was not found." ).HandleCallback += self.HandleHashNotFound
 
+        # Memory warnings from the resource sampler are logged as soon as Commandline prints anything, and anything it prints
+        # shows the hang watchdog that it is making progress.
+        if self.GetBooleanConfigEntryWithDefault( "EnableResourceSampling", False ) or self.GetBooleanConfigEntryWithDefault( "EnableHangDetection", False ):
+            self.AddStdoutHandlerCallback( ".*" ).HandleCallback += self.HandleAnyStdout
+
         # Handle QuickTime popup dialog
         # "QuickTime does not support the current Display Setting.  Please change it and restart this application."
         self.AddPopupHandler( "Unsupported Display", "OK" )
@@ -99,10 +158,68 @@ class Cinema4DPlugin( DeadlinePlugin ):
     def PreRenderTasks( self ):
         self.LogInfo("Starting Cinema 4D Task")
         self.FinishedFrameCount = 0
+        self.TaskStats = TaskStatistics()
+        self.TaskPeakMemory = None
+        self.ProcessStartTime = None
+
+        # A task that failed did not get to PostRenderTasks, so its placement and sampling threads may still be running.
+        if self.PlacementThread:
+            self.PlacementStopEvent.set()
+            self.PlacementThread.join()
+            self.PlacementThread = None
+        if self.ResourceSampler:
+            self.ResourceSampler.Stop()
+        self.StopHangWatchdog()
+        self.StopExportShards()
+        self.ExportFrames = []
+        self.ExportCache = None
+
+        knownChildren = set( GetChildProcessIds( os.getpid() ) )
+        self.KnownChildren = knownChildren
+        # Every render thread starts Commandline as a child of the Worker process, so each task marks its own through its environment.
+        sessionToken = uuid.uuid4().hex
+        self.SetEnvironmentVariable( "DEADLINE_C4D_SESSION", sessionToken )
+        self.SessionMarker = "DEADLINE_C4D_SESSION=%s" % sessionToken
+        self.CpuPartition = GetCpuPartition( self )
+        self.Cgroup = CreateCgroup( self, "c4d-%s-%s" % ( self.GetSlaveName(), self.GetThreadNumber() ) )
+        if self.Cgroup:
+            self.CgroupPressure = self.Cgroup.ReadPressure()
+            self.CgroupEvents = self.Cgroup.ReadMemoryEvents()
+        if self.Cgroup or self.CpuPartition:
+            self.PlacementError = None
+            self.PlacementStopEvent = threading.Event()
+            self.PlacementThread = threading.Thread( target=self.PlaceRenderer, args=( knownChildren, ) )
+            self.PlacementThread.daemon = True
+            self.PlacementThread.start()
+        self.ResourceSampler = CreateResourceSampler( self, lambda: FindNewChildProcess( knownChildren, self.C4DExe, self.SessionMarker ), self.Cgroup is not None )
+        self.StartHangWatchdog( knownChildren )
+        if not self.LiveMetrics:
+            self.LiveMetrics = CreateLiveMetrics( self, self.MapPath, "Cinema4D" )
+        if self.LiveMetrics:
+            self.LiveMetrics.StartTask( str( self.GetCurrentTaskId() ), self.TaskStats, lambda: FindNewChildProcess( knownChildren, self.C4DExe, self.SessionMarker ), "Startup" )
+
+        if self.GetBooleanConfigEntryWithDefault( "EnableLogCapture", False ):
+            if not self.StdoutCapture:
+                self.StdoutCapture = CreateStdoutCapture( self )
+            self.StdoutCapture.StartTask()
+
+        if not self.RedshiftCache:
+            self.RedshiftCache = CreateRedshiftCache( self, self.MapPath, self.JobManifest.GetRenderer() )
+        if self.RedshiftCache:
+            self.SetEnvironmentVariable( "REDSHIFT_CACHEPATH", self.RedshiftCache.Directory )
+            self.RedshiftCache.StartTask()
+
+        if self.GetBooleanConfigEntryWithDefault( "EnableAssetPreflight", False ):
+            assetPaths = self.JobManifest.GetAssetPaths()
+            if assetPaths is None:
+                self.LogInfo( "Skipping the asset pre-flight check because the job does not have an asset manifest" )
+            else:
+                RunAssetPreflight( self, assetPaths )
 
     def RenderExecutable( self ):
         self.version = self.GetIntegerPluginInfoEntryWithDefault( "Version", 18 ) 
-        self.C4DExe = self.GetRenderExecutable( "C4D_" + str(self.version) + "_RenderExecutable" , "Cinema 4D %s" %self.version )
+        self.C4DInstall = GetCinema4DInstall( self )
+        self.C4DExe = self.C4DInstall[ "executable" ]
 
         return self.C4DExe
 
@@ -114,15 +231,9 @@ class Cinema4DPlugin( DeadlinePlugin ):
         for additional info about the bug and other workarounds.
         """
         
-        parent_dir = os.path.dirname(self.C4DExe)
-        if SystemUtils.IsRunningOnMac():
-            # On MacOS executable will be at '/Applications/MAXON CINEMA 4D R24/Commandline.app/Contents/MacOS/Commandline'.
-            # The 'plugins' folder is located 3 levels higher, together with 'Commandline.app'
-            parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(parent_dir)))
-
-        defaultPluginsDir = os.path.join(parent_dir, 'plugins')
+        defaultPluginsDir = self.C4DInstall[ "pluginsDir" ]
 
-        if not os.path.exists(defaultPluginsDir):
+        if not self.C4DInstall[ "hasPluginsDir" ]:
             self.LogWarning('Failed to find Default plugins directory (%s).  If Cinema 4D is not able to access the default plugins directory it may render incorrectly.' % defaultPluginsDir)
             return
         
@@ -138,16 +249,23 @@ class Cinema4DPlugin( DeadlinePlugin ):
 
         self.SetEnvironmentVariable('g_additionalModulePath', finalPluginsDirs)
 
+    def setFilteredPluginSearchpath( self ):
+        envVariable = "g_additionalModulePath"
+        if self.version < 20:
+            envVariable = "C4D_PLUGINS_DIR"
+        existingPluginsDirs = self.GetEnvironmentVariable( envVariable )
+        if not existingPluginsDirs:
+            existingPluginsDirs = os.environ.get( envVariable, "" )
+
+        pluginDirs = existingPluginsDirs.split( ";" )
+        filteredPluginDirs, self.PluginFiltering = FilterPluginDirectories( self, pluginDirs, self.JobManifest.GetRenderer() )
+        if filteredPluginDirs != pluginDirs:
+            self.SetEnvironmentVariable( envVariable, ";".join( filteredPluginDirs ) )
+            self.LogInfo( "[%s] set to: %s" % ( envVariable, ";".join( filteredPluginDirs ) ) )
+
     def RenderArgument( self ):
         if SystemUtils.IsRunningOnLinux() and self.GetBooleanConfigEntryWithDefault( "SetLinuxEnvironment", True ):
-            c4dDir = os.path.dirname( self.C4DExe )
-            ldPath = os.environ.get( "LD_LIBRARY_PATH", "" )
-            pyPath = os.environ.get( "PYTHONPATH", "" )
-            path = os.environ.get( "PATH", "" )
-            
-            modLdPath = "%s/../lib64:%s/resource/modules/python/Python.linux64.framework/lib64:%s/resource/modules/embree.module/libs/linux64:%s" % ( c4dDir, c4dDir, c4dDir, ldPath )
-            modPyPath = "%s/resource/modules/python/Python.linux64.framework/lib/python2.7:%s/resource/modules/python/Python.linux64.framework/lib64/python2.7/lib-dynload:%s" % ( c4dDir, c4dDir, pyPath )
-            modPath = "%s:%s" % ( path, c4dDir )
+            modLdPath, modPyPath, modPath = GetLinuxEnvironment( self.C4DInstall )
             
             self.LogInfo( "[LD_LIBRARY_PATH] set to %s" % modLdPath )
             self.LogInfo( "[PYTHONPATH] set to %s" % modPyPath )
@@ -159,6 +277,8 @@ class Cinema4DPlugin( DeadlinePlugin ):
             
         if self.version in [23, 24]:
             self.setDefaultPluginSearchpath()
+        self.PluginFiltering = False
+        self.setFilteredPluginSearchpath()
         
         sceneFile = self.GetPluginInfoEntryWithDefault( "SceneFile", self.GetDataFilename() )
         sceneFile = RepositoryUtils.CheckPathMapping( sceneFile )
@@ -166,6 +286,8 @@ class Cinema4DPlugin( DeadlinePlugin ):
         
         activeTake = self.GetPluginInfoEntryWithDefault( "Take", "" )
         argument = [ "-nogui" ]
+        # The directories Commandline writes its output to, which the hang watchdog checks for new files.
+        outputDirectories = []
         
         # NOTE: Negate the "No OpenGL" plugin info option from the monitor submitter to make the logic below
         # easier to read
@@ -173,7 +295,7 @@ class Cinema4DPlugin( DeadlinePlugin ):
 
         # If the integrated submitter has specified a renderer other than Hardware OpenGL
         # we can skip loading OpenGL
-        renderer = self.GetPluginInfoEntryWithDefault( "Renderer", "" )
+        renderer = self.JobManifest.GetRenderer()
         if self.loadOpenGL and renderer not in ( "", "ogl_hardware" ):
             self.loadOpenGL = False
 
@@ -195,10 +317,29 @@ class Cinema4DPlugin( DeadlinePlugin ):
             argument.append("-arnoldAbortOnLicenseFail %s" % str(self.GetBooleanConfigEntryWithDefault("AbortOnArnoldLicenseFail", True)).lower())
 
         if not exportJob:
-            argument.append( '-render "%s"' % sceneFile )
-            argument.append( '-frame %s %s' % ( self.GetStartFrame(), self.GetEndFrame() ) )
-            if self.GetBooleanPluginInfoEntryWithDefault( "EnableFrameStep", False ):
-                argument.append( self.GetPluginInfoEntryWithDefault( "FrameStep", "2" ) )
+            startFrame = self.GetStartFrame()
+            endFrame = self.GetEndFrame()
+            renderScene = True
+            if self.GetBooleanPluginInfoEntryWithDefault( "SkipExistingFrames", False ):
+                frameStep = 1
+                if self.GetBooleanPluginInfoEntryWithDefault( "EnableFrameStep", False ):
+                    frameStep = self.GetIntegerPluginInfoEntryWithDefault( "FrameStep", 2 )
+
+                framesToRender = GetFramesToRender( self, self.MapPath, sceneFile, list( range( startFrame, endFrame + 1, frameStep ) ) )
+                if framesToRender:
+                    # Commandline renders a single range, so valid frames between the first and last invalid frame are rendered again.
+                    startFrame = framesToRender[0]
+                    endFrame = framesToRender[-1]
+                else:
+                    renderScene = False
+
+            if renderScene:
+                argument.append( '-render "%s"' % sceneFile )
+                argument.append( '-frame %s %s' % ( startFrame, endFrame ) )
+                if self.GetBooleanPluginInfoEntryWithDefault( "EnableFrameStep", False ):
+                    argument.append( self.GetPluginInfoEntryWithDefault( "FrameStep", "2" ) )
+            else:
+                self.LogInfo( "All frames of this task already have valid output, so Cinema 4D will exit without rendering" )
          
             if activeTake and self.GetIntegerPluginInfoEntryWithDefault( "Version", 17 ) >= 17:
                 argument.append( '-take "%s"' % activeTake )
@@ -246,6 +387,7 @@ class Cinema4DPlugin( DeadlinePlugin ):
 
                 fileprefix = self.GetPluginInfoEntryWithDefault( "FilePrefix", "" ).strip()
                 argument.append( '-oimage "%s"' % os.path.join( filepath, fileprefix ) )
+                outputDirectories.append( os.path.dirname( os.path.join( filepath, fileprefix ) ) )
             
             # Build the multipass output filename from the path and prefix
             multifilepath = self.GetPluginInfoEntryWithDefault( "MultiFilePath", "" ).strip()
@@ -275,6 +417,7 @@ class Cinema4DPlugin( DeadlinePlugin ):
             
                 multifileprefix = self.GetPluginInfoEntryWithDefault( "MultiFilePrefix", "" ).strip()
                 argument.append( '-omultipass "%s"' % os.path.join( multifilepath, multifileprefix ) )
+                outputDirectories.append( os.path.dirname( os.path.join( multifilepath, multifileprefix ) ) )
 
             redshiftLogVerbosity = self.GetConfigEntryWithDefault( "RedshiftLogging", "Debug" )
             if redshiftLogVerbosity != "None":
@@ -293,11 +436,25 @@ class Cinema4DPlugin( DeadlinePlugin ):
             if exportFile:
                 self.ValidateFilepath( os.path.dirname( exportFile ) )
                 arnoldExportArgs.append( "filename=%s" % exportFile )
+                outputDirectories.append( os.path.dirname( exportFile ) )
 
-            arnoldExportArgs.append( 'startFrame=%s' % self.GetStartFrame() )
-            arnoldExportArgs.append( 'endFrame=%s' % self.GetEndFrame() )
-
-            argument.append( '"%s"' % ";".join( arnoldExportArgs ) )
+            frames = list( range( self.GetStartFrame(), self.GetEndFrame() + 1 ) )
+            if exportFile:
+                frames = self.CheckExportCache( exportFile, sceneFile, renderer, frames )
+            if frames:
+                # Commandline exports a single frame range, so the export cache can only leave out frames at either end of the task.
+                frames = list( range( frames[ 0 ], frames[ -1 ] + 1 ) )
+                frameRange = ( frames[ 0 ], frames[ -1 ] )
+                if exportFile:
+                    self.ExportFrames = frames
+                    frameRange = self.StartExportShards( argument, arnoldExportArgs, exportFile, frames )
+                arnoldExportArgs.append( 'startFrame=%s' % frameRange[ 0 ] )
+                arnoldExportArgs.append( 'endFrame=%s' % frameRange[ 1 ] )
+
+                argument.append( '"%s"' % ";".join( arnoldExportArgs ) )
+            else:
+                argument.remove( '-arnoldAssExport' )
+                self.LogInfo( "All frames of this task have a valid export in the export cache, skipping the export" )
         elif renderer == "OctaneExport":
             octaneExportArgs = []
 
@@ -305,16 +462,92 @@ class Cinema4DPlugin( DeadlinePlugin ):
             exportFile = RepositoryUtils.CheckPathMapping(exportFile)
             if exportFile:
                 self.ValidateFilepath( os.path.dirname( exportFile ) )
-                octaneExportArgs.append( '"%s"' % sceneFile )
-                octaneExportArgs.append( '-exportORBX' )
-                octaneExportArgs.append( '"%s"' % exportFile )
+                outputDirectories.append( os.path.dirname( exportFile ) )
+                # Octane exports the animation to a single file, which the export cache records under its name.
+                if self.CheckExportCache( exportFile, sceneFile, renderer, [ os.path.basename( exportFile ) ] ):
+                    self.ExportFrames = [ os.path.basename( exportFile ) ]
+                    octaneExportArgs.append( '"%s"' % sceneFile )
+                    octaneExportArgs.append( '-exportORBX' )
+                    octaneExportArgs.append( '"%s"' % exportFile )
+                else:
+                    self.LogInfo( "The export file has a valid export in the export cache, skipping the export" )
             else:
                 self.FailRender( "Cannot complete an 'Export Job' when an 'Export File' has not been specified" )
             
             argument.extend( octaneExportArgs ) 
 
+        if self.HangWatchdog:
+            self.HangWatchdog.SetOutputDirectories( outputDirectories )
+
+        # Cinema 4D is launched as soon as the arguments are returned.
+        self.ProcessStartTime = time.time()
+
         return " ".join( argument )
     
+    def CheckExportCache( self, exportFile, sceneFile, renderer, items ):
+        """
+        Leaves out the items of the task whose export is still valid, if the export cache is enabled.
+        :param items: the frames of the task, or the name of the export file of a single file export
+        :return: the items to export
+        """
+        self.ExportFile = exportFile
+        self.ExportCache, self.ExportCacheKeys, items = CheckExportCache( self, self.TaskStats, exportFile, sceneFile, renderer, items )
+        return items
+
+    def StartExportShards( self, argument, arnoldExportArgs, exportFile, frames ):
+        """
+        Starts Commandline sessions that export all but the first slice of the frames next to the one the Worker starts, if
+        export sharding is enabled.
+        :param argument: the arguments of Commandline, up to the export arguments
+        :param arnoldExportArgs: the export arguments, without the frames
+        :param exportFile: the export file, without the frame numbers that the exporter adds
+        :param frames: the consecutive frames to export
+        :return: the ( startFrame, endFrame ) slice that is left to the Commandline the Worker starts
+        """
+        slices = [ frames ]
+        shardCount = self.GetIntegerConfigEntryWithDefault( "ExportShards", 1 )
+        if shardCount > 1:
+            slices = SplitExportFrames( frames, shardCount )
+        if len( slices ) < 2:
+            return ( frames[ 0 ], frames[ -1 ] )
+
+        shards = ExportShardProcesses( self.CreateTempDirectory( "exportShards" ) )
+        getArguments = lambda frameSlice: " ".join( argument + [ '"%s"' % ";".join( arnoldExportArgs + [ 'startFrame=%s' % frameSlice[ 0 ], 'endFrame=%s' % frameSlice[ -1 ] ] ) ] )
+        StartExportShards( self, shards, slices[ 1: ], self.C4DExe, getArguments, self.GetEnvironmentVariable, "", self.PlaceExportShard )
+
+        self.ExportShards = shards
+        self.LogInfo( "Exporting frames %s-%s in Commandline and the other %s slice(s) in export shards" % ( slices[ 0 ][ 0 ], slices[ 0 ][ -1 ], len( slices ) - 1 ) )
+        return ( slices[ 0 ][ 0 ], slices[ 0 ][ -1 ] )
+
+    def PlaceExportShard( self, pid, index ):
+        """
+        Moves an export shard that was just started into the task's cgroup and CPU partition, like PlaceRenderer does for Commandline.
+        """
+        # The Commandline the Worker starts is found among the Worker's new child processes, so the shards are left out.
+        if self.KnownChildren is not None:
+            self.KnownChildren.add( pid )
+        PlaceExportShard( self, pid, self.Cgroup, self.CpuPartition )
+
+    def FinishExportShards( self ):
+        """
+        Waits for the export shards to finish, and fails the task if one of them failed or if an exported frame does not have
+        an export file.
+        """
+        shards = self.ExportShards
+        waitStartTime = time.time()
+        results = shards.Wait( self.IsCanceled )
+        self.TaskStats.AddTiming( "exportShardWait", time.time() - waitStartTime )
+        CheckExportShards( self, shards, results, lambda frameRange, exitCode: None if exitCode == 0 else "Commandline returned non-zero error code, %s" % exitCode )
+        VerifyExportFiles( self, self.ExportFile, self.ExportFrames, self.TaskStats.StartTime )
+
+    def StopExportShards( self ):
+        """
+        Kills the export shards of a task that failed.
+        """
+        if self.ExportShards:
+            self.ExportShards.Stop()
+            self.ExportShards = None
+
     def GetNumThreads( self ):
         """
         Returns the number of threads we want to use based off the number of threads specified in the job and the Worker's CPU Affinity
@@ -322,6 +555,10 @@ class Cinema4DPlugin( DeadlinePlugin ):
         """
         threads = self.GetIntegerPluginInfoEntryWithDefault( "Threads", 0 )
 
+        # The CPU partition is already limited to the Worker's CPU affinity.
+        if self.CpuPartition:
+            return len( self.CpuPartition ) if threads == 0 else min( len( self.CpuPartition ), threads )
+
         #OverrideCpuAffinity - Returns whether the Worker has its CPU affinity override enabled
         if self.OverrideCpuAffinity():
             #CPUAffinity - returns a list containing the indices of all CPUs the Worker has in its affinity
@@ -332,18 +569,219 @@ class Cinema4DPlugin( DeadlinePlugin ):
                 threads = min( affinity, threads )
                 
         return threads
+
+    def PlaceRenderer( self, knownChildren ):
+        """
+        Runs on a background thread while Commandline renders. Once Commandline has been started, it is moved into the task's
+        cgroup and its process tree is restricted to the task's CPU partition. The partition is applied again every second,
+        for the threads that a thread of Commandline started while the tree was being restricted. Nothing is logged from this
+        thread, errors are reported by PostRenderTasks.
+        """
+        pid = None
+        pinnedThreads = set()
+        while not self.PlacementStopEvent.wait( 0.05 if pid is None else 1.0 ):
+            try:
+                if pid is None:
+                    pid = FindNewChildProcess( knownChildren, self.C4DExe, self.SessionMarker )
+                    if pid is None:
+                        continue
+                    startTime = GetProcessStartTime( pid )
+                    if self.Cgroup:
+                        self.Cgroup.AddProcessTree( pid )
+                # Commandline's pid is reused once it exits, so an unrelated process is never restricted.
+                if not self.CpuPartition or GetProcessStartTime( pid ) != startTime:
+                    return
+                SetProcessTreeAffinity( pid, self.CpuPartition, pinnedThreads )
+            except Exception as e:
+                self.PlacementError = e
+                return
+
+    def StopRendererPlacement( self ):
+        if not self.PlacementThread:
+            return
+        self.PlacementStopEvent.set()
+        self.PlacementThread.join()
+        self.PlacementThread = None
+        if self.PlacementError:
+            self.LogWarning( "Failed to move Cinema 4D into its cgroup or CPU partition: %s" % self.PlacementError )
+
+    def StopCgroup( self ):
+        if not self.Cgroup:
+            return
+        LogCgroupUsage( self, self.Cgroup, self.CgroupPressure, self.CgroupEvents )
+        self.Cgroup.Remove()
+        self.Cgroup = None
+
+    def StopResourceSampler( self ):
+        if not self.ResourceSampler:
+            return
+        self.ResourceSampler.Stop()
+        LogResourceSamplerMessages( self, self.ResourceSampler )
+        for line in self.ResourceSampler.FormatSummary():
+            self.LogInfo( line )
+        self.TaskPeakMemory = self.ResourceSampler.PeakRss or None
+        self.ResourceSampler = None
     
+    def SetRenderPhase( self, phase, frame=None ):
+        SetRenderPhase( self.ResourceSampler, self.LiveMetrics, phase, frame )
+
+    def StartHangWatchdog( self, knownChildren ):
+        """
+        Starts watching Commandline for hangs on a background thread, if hang detection is enabled.
+        :param knownChildren: the child processes of the Worker from before Commandline was started
+        """
+        if not self.GetBooleanConfigEntryWithDefault( "EnableHangDetection", False ):
+            return
+        if not SystemUtils.IsRunningOnLinux():
+            self.LogWarning( "Hang detection is only supported on Linux" )
+            return
+
+        self.HangWatchdog = HangWatchdog( self.GetIntegerConfigEntryWithDefault( "HangTimeout", 10 ) * 60, self.GetIntegerConfigEntryWithDefault( "HangCpuPercent", 150 ) / 100.0 )
+        self.HangReport = None
+        self.HangDiagnosticsEnabled = self.GetBooleanConfigEntryWithDefault( "CollectHangDiagnostics", True )
+        self.HangWatchdogStopEvent = threading.Event()
+        self.HangWatchdogThread = threading.Thread( target=self.WatchForHang, args=( knownChildren, ) )
+        self.HangWatchdogThread.daemon = True
+        self.HangWatchdogThread.start()
+
+    def WatchForHang( self, knownChildren ):
+        """
+        Runs on a background thread while Commandline renders. The plugin thread only runs when Commandline prints something,
+        so a hung Commandline is killed from this thread, which ends the task. Nothing is logged from this thread, the hang
+        and its diagnostic snapshot are reported by CheckExitCode.
+        """
+        watchdog = self.HangWatchdog
+        try:
+            while not self.HangWatchdogStopEvent.wait( 1.0 ):
+                if watchdog.RootPid is None:
+                    pid = FindNewChildProcess( knownChildren, self.C4DExe, self.SessionMarker )
+                    if pid is None:
+                        continue
+                    watchdog.SetProcess( pid )
+                    watchdog.Restart()
+
+                hang = watchdog.Check()
+                if hang:
+                    diagnostics = CollectHangDiagnostics( watchdog.RootPid ) if self.HangDiagnosticsEnabled else []
+                    self.HangReport = ( hang, diagnostics )
+                    SignalProcessTree( watchdog.RootPid, watchdog.RootStartTime, signal.SIGKILL )
+                    return
+        except Exception as e:
+            self.HangReport = ( None, [ "Hang detection stopped: %s" % e ] )
+
+    def StopHangWatchdog( self ):
+        """
+        Stops the hang watchdog's thread.
+        :return: the description of the hang and the diagnostic lines, or None if Commandline did not hang
+        """
+        if not self.HangWatchdogThread:
+            return None
+        self.HangWatchdogStopEvent.set()
+        self.HangWatchdogThread.join()
+        self.HangWatchdogThread = None
+        self.HangWatchdog = None
+        return self.HangReport
+
+    def SaveCapturedLog( self ):
+        if self.StdoutCapture:
+            SaveCapturedLog( self, self.StdoutCapture, RepositoryUtils.GetJobAuxiliaryPath( self.GetJob() ) )
+
+    def HandleCapturedStdout( self ):
+        if self.StdoutCapture and not self.StdoutCapture.Write( self.GetRegexMatch( 0 ) ):
+            self.SuppressThisLine()
+
+    def HandleAnyStdout( self ):
+        LogResourceSamplerMessages( self, self.ResourceSampler )
+        if self.HangWatchdog:
+            self.HangWatchdog.NoteActivity()
+
+    def CheckExitCode( self, exitCode ):
+        hangReport = self.StopHangWatchdog()
+        if hangReport:
+            hang, diagnostics = hangReport
+            for line in diagnostics:
+                self.LogWarning( line )
+            if hang:
+                self.StopExportShards()
+                self.SaveCapturedLog()
+                self.FailRender( "%s Cinema 4D was stopped, the HangTimeout setting can be modified in the Cinema4D plugin configuration." % hang )
+
+        if exitCode != 0:
+            self.StopExportShards()
+            self.SaveCapturedLog()
+            self.FailRender( "Renderer returned non-zero error code, %d. Check the log for more information." % exitCode )
+
     def PostRenderTasks( self ):
+        self.TaskStats.EndFrame()
+
+        self.StopRendererPlacement()
+        self.StopResourceSampler()
+        if self.StdoutCapture:
+            self.LogInfo( self.StdoutCapture.FormatSummary() )
+        # The export shards run in the task's cgroup, which can only be removed once they have exited.
+        try:
+            if self.ExportShards:
+                self.FinishExportShards()
+        finally:
+            self.StopExportShards()
+            self.StopCgroup()
+        if self.ExportCache:
+            StoreExportCache( self, self.ExportCache, self.ExportCacheKeys, self.ExportFile, self.ExportFrames, self.TaskStats.StartTime )
+            self.ExportCache = None
+        if self.ProcessStartTime is not None and self.TaskStats.FirstFrameTime is not None:
+            self.LogInfo( "Commandline started rendering %.2f seconds after it was launched %s" % ( self.TaskStats.FirstFrameTime - self.ProcessStartTime, "with plugin filtering" if self.PluginFiltering else "with every plugin" ) )
+
         if( self.LocalRendering ):
+            uploadStartTime = time.time()
+            if self.LiveMetrics:
+                self.LiveMetrics.SetPhase( "Upload" )
+                self.LiveMetrics.AddUploadedBytes( sum( GetDirectorySize( localPath ) for localPath, networkPath in (
+                    ( self.LocalFilePath, self.NetworkFilePath ), ( self.LocalMPFilePath, self.NetworkMPFilePath ) ) if networkPath != "" ) )
             if( self.NetworkFilePath != "" ):
                 self.LogInfo( "Moving main output files and folders from " + self.LocalFilePath + " to " + self.NetworkFilePath )
                 self.VerifyAndMoveDirectory( self.LocalFilePath, self.NetworkFilePath, False, -1 )
             if( self.NetworkMPFilePath != "" ):
                 self.LogInfo( "Moving multipass output files and folders from " + self.LocalMPFilePath + " to " + self.NetworkMPFilePath )
                 self.VerifyAndMoveDirectory( self.LocalMPFilePath, self.NetworkMPFilePath, False, -1 )
+            self.TaskStats.AddTiming( "upload", time.time() - uploadStartTime )
+
+        if self.LiveMetrics:
+            self.LiveMetrics.SetPhase( "Idle" )
+            if self.LiveMetrics.Error:
+                self.LogWarning( "Failed to write the live metrics: %s" % self.LiveMetrics.Error )
+                self.LiveMetrics.Error = None
+
+        if self.RedshiftCache:
+            for line in self.RedshiftCache.EndTask():
+                self.LogInfo( line )
+
+        self.WriteRenderHistory()
         
         self.LogInfo( "Finished Cinema 4D Task" )
 
+    def EndJob( self ):
+        RemoveVerifiedPaths( os.path.join( self.GetSlaveDirectory(), "preflight" ), self.GetJob().JobId )
+
+    def WriteRenderHistory( self ):
+        """
+        Appends the timings of this task to the render history, if a render history directory is configured. Commandline is
+        started for every task, so the startup time (boot and scene load) is part of every task.
+        :return: None
+        """
+        startup = None
+        if self.ProcessStartTime is not None and self.TaskStats.FirstFrameTime is not None:
+            startup = self.TaskStats.FirstFrameTime - self.ProcessStartTime
+        WriteRenderHistory( self, self.MapPath, self.TaskStats, {
+            "plugin": "Cinema4D",
+            "startup": startup,
+            "timings": self.TaskStats.Timings,
+            "peakMemory": self.TaskPeakMemory,
+            "pluginFiltering": self.PluginFiltering,
+        }, taskStartup=startup or 0.0 )
+
+    def MapPath( self, filepath ):
+        return self.ProcessPath( RepositoryUtils.CheckPathMapping( filepath ) )
+
     def ProcessPath( self, filepath ):
         if SystemUtils.IsRunningOnWindows():
             filepath = filepath.replace( "/", "\\" )
@@ -437,6 +875,8 @@ class Cinema4DPlugin( DeadlinePlugin ):
             self.FailRender( "Failed to create test file in directory: '%s'" % directory )
 
     def HandleSetupProgress( self ):
+        self.SetRenderPhase( "Setup" )
+
         # If frame number is given update the Render status with the current frame
         if self.currFrame != None:
             self.CurrentRenderPhase = "Frame: " + str(self.currFrame) + ",  Rendering Phase: Setup"
@@ -445,6 +885,7 @@ class Cinema4DPlugin( DeadlinePlugin ):
 
     def HandleProgressCheck( self ):
         self.CheckProgress = True
+        self.SetRenderPhase( "Main Render" )
         
         # If frame number is given update the Render status with the current frame
         if self.currFrame != None:
@@ -476,16 +917,20 @@ class Cinema4DPlugin( DeadlinePlugin ):
         self.SetStatusMessage( str( self.CurrentRenderPhase ) + " - Progress: " + str( self.GetRegexMatch( 1 ) ) + "%" )
 
     def HandleStdoutProgress( self ):
+        self.TaskStats.StartFrame()
         self.currFrame = int(self.GetRegexMatch(1))
         self.SetStatusMessage(self.GetRegexMatch(0))
+        self.SetRenderPhase( "Render", self.currFrame )
 
     def HandleProgress2( self ):
+        self.TaskStats.EndFrame()
         self.SetProgress( 100 )
         self.SetStatusMessage( self.GetRegexMatch( 0 ) )
 
     def HandleFrameProgress( self ):
         self.FinishedFrameCount = self.FinishedFrameCount + 1
         self.CheckProgress = self.UsingRedshift
+        self.SetRenderPhase( "Finalize" )
 
         # If frame number is given update the Render status with the current frame
         if self.currFrame is not None:
@@ -502,6 +947,7 @@ class Cinema4DPlugin( DeadlinePlugin ):
         self.LogInfo( "Task Overall Progress: " + str( progress ) + "%" )
 
     def HandleNoSite( self ):
+        self.SaveCapturedLog()
         self.FailRender( "Failed to import the following modules: site\nPlease ensure that your environment is set correctly or that you are allowing Deadline to set the render environment.\nPlease go to the C4D FAQ in the Deadline documentation for more information." )
 
     def HandleHashNotFound( self ):
@@ -511,9 +957,11 @@ class Cinema4DPlugin( DeadlinePlugin ):
         errorMsg = self.GetRegexMatch( 0 )
         if not self.loadOpenGL:
             errorMsg = "This job was configured to not load OpenGL. If you are using the Hardware OpenGL renderer, resubmit without the \"Don't Load OpenGL\" option checked."
+        self.SaveCapturedLog()
         self.FailRender( errorMsg )
 
     def HandleStdoutError( self ):
+        self.SaveCapturedLog()
         self.FailRender( self.GetRegexMatch( 0 ) )
 
     def HandleUsingRedshift( self ):
@@ -526,9 +974,11 @@ class Cinema4DPlugin( DeadlinePlugin ):
         frameCount = abs( endFrame - startFrame ) + 1
 
         progress = 100 * self.FinishedFrameCount / frameCount
-        self.deadlinePlugin.SetProgress( progress )
+        self.SetProgress( progress )
 
     def HandleRedshiftBlockRendered( self ):
+        if self.LiveMetrics:
+            self.LiveMetrics.AddRedshiftBlock()
         startFrame = self.GetStartFrame()
         endFrame = self.GetEndFrame()
         frameCount = abs( endFrame - startFrame ) + 1
@@ -0,0 +1,2356 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the Cinema4D and Cinema4DBatch plugins: frame validation, render history, CPU and memory
+accounting, process tree handling, install probing and export sharding. Nothing in here depends on Deadline, so
+the helpers can be imported by the submission scripts and the event plugins, and tested on their own. The helpers that
+set up a render take the plugin and only use its configuration, plugin info, job and logging methods.
+"""
+
+from __future__ import absolute_import
+import collections
+import errno
+import fnmatch
+import glob
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where files are locked with msvcrt instead.
+    fcntl = None
+    import msvcrt
+
+try:
+    import zstandard
+except ImportError:
+    # The captured output is compressed with gzip instead.
+    zstandard = None
+
+# Characters that mark an asset path as a pattern (UDIMs, sequences, tokens) rather than a single file.
+ASSET_PATTERN_CHARACTERS = ( "<", ">", "#", "$", "%", "*", "?" )
+
+def FindMissingFiles( paths, threadCount ):
+    """
+    Checks that every path exists, using a pool of threads so that the round trips to the file server overlap.
+    :param paths: the list of paths to check
+    :param threadCount: the maximum number of paths to check at once
+    :return: the sorted list of paths that do not exist
+    """
+    if not paths:
+        return []
+
+    pool = ThreadPool( max( 1, min( threadCount, len( paths ) ) ) )
+    try:
+        found = pool.map( os.path.exists, paths )
+    finally:
+        pool.close()
+
+    return sorted( path for path, exists in zip( paths, found ) if not exists )
+
+# The verified paths of a job are removed when the job ends on the Worker, or after this many seconds without a task if
+# the Worker stopped without ending it.
+PREFLIGHT_RETENTION_SECONDS = 7 * 24 * 3600
+
+def LoadVerifiedPaths( verifiedFile ):
+    """
+    Reads the asset paths that the pre-flight of earlier tasks of a job found.
+    :return: the set of paths, empty if none have been verified yet
+    """
+    if not os.path.isfile( verifiedFile ):
+        return set()
+    with io.open( verifiedFile, mode="r", encoding="utf-8" ) as verifiedHandle:
+        return set( line.rstrip( "\n" ) for line in verifiedHandle if line.endswith( "\n" ) )
+
+def AppendVerifiedPaths( verifiedFile, paths ):
+    """
+    Adds asset paths that the pre-flight found to a job's verified paths. The lines are appended with a single write to a
+    file opened for appending, so that concurrent tasks on this Worker do not interleave them.
+    :return: None
+    """
+    if not os.path.isdir( os.path.dirname( verifiedFile ) ):
+        try:
+            os.makedirs( os.path.dirname( verifiedFile ) )
+        except OSError:
+            pass
+    handle = os.open( verifiedFile, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644 )
+    try:
+        os.write( handle, u"".join( path + u"\n" for path in paths ).encode( "utf-8" ) )
+    finally:
+        os.close( handle )
+
+def RemoveVerifiedPaths( preflightDir, jobId ):
+    """
+    Removes the verified paths of a job once it ends on this Worker, and those of other jobs that have not had a task on
+    this Worker for PREFLIGHT_RETENTION_SECONDS. A concurrent task of the same job that is still running only checks its
+    paths again.
+    :return: None
+    """
+    if not os.path.isdir( preflightDir ):
+        return
+    staleTime = time.time() - PREFLIGHT_RETENTION_SECONDS
+    for name in os.listdir( preflightDir ):
+        path = os.path.join( preflightDir, name )
+        try:
+            if name == "%s.txt" % jobId or os.path.getmtime( path ) < staleTime:
+                os.remove( path )
+        except OSError:
+            pass
+
+def RunAssetPreflight( plugin, assetPaths ):
+    """
+    Fails the task with a report of every missing asset. Paths that have been found once are remembered for the rest of
+    the job on this Worker, so later tasks only check the paths that have not been verified yet.
+    :param plugin: the DeadlinePlugin of the task
+    :param assetPaths: the list of asset paths to check
+    :return: None
+    """
+    verifiedFile = os.path.join( plugin.GetSlaveDirectory(), "preflight", "%s.txt" % plugin.GetJob().JobId )
+    pathsToCheck = sorted( set( assetPaths ) - LoadVerifiedPaths( verifiedFile ) )
+
+    startTime = time.time()
+    missingPaths = FindMissingFiles( pathsToCheck, plugin.GetIntegerConfigEntryWithDefault( "AssetPreflightThreads", 16 ) )
+    plugin.LogInfo( "Asset pre-flight checked %s path(s) in %.2f seconds (%s already verified for this job)" % ( len( pathsToCheck ), time.time() - startTime, len( assetPaths ) - len( pathsToCheck ) ) )
+
+    foundPaths = sorted( set( pathsToCheck ) - set( missingPaths ) )
+    if foundPaths:
+        AppendVerifiedPaths( verifiedFile, foundPaths )
+
+    if missingPaths:
+        plugin.FailRender( "Asset pre-flight found %s missing asset(s):\n%s" % ( len( missingPaths ), "\n".join( missingPaths ) ) )
+
+def ReadAssetManifest( manifestFile ):
+    """
+    Reads the asset paths from an asset manifest, a JSON file with an "assets" list whose entries are either paths or
+    objects with a "path" key. Patterns such as UDIMs or image sequences are skipped since they can not be checked directly.
+    :return: the list of asset paths, as they were recorded
+    """
+    with io.open( manifestFile, mode="r", encoding="utf-8" ) as manifestHandle:
+        manifest = json.load( manifestHandle )
+
+    assetPaths = []
+    for asset in manifest.get( "assets", [] ):
+        path = asset.get( "path", "" ) if isinstance( asset, dict ) else asset
+        if path and not any( char in path for char in ASSET_PATTERN_CHARACTERS ):
+            assetPaths.append( path )
+
+    return assetPaths
+
+class JobManifest( object ):
+    """
+    The job's asset manifest, which submission/Cinema4D/Main/C4DJobManifest.py writes at submission with the scene's
+    assets and entries such as the "renderer" and the "memoryEstimate". The manifest is read once and kept for the job.
+    """
+
+    def __init__( self, plugin, mapPath ):
+        """
+        :param plugin: the DeadlinePlugin of the job
+        :param mapPath: returns a path of the job with path mapping applied
+        """
+        self.Plugin = plugin
+        self.mapPath = mapPath
+        self.manifest = None
+
+    def GetFile( self ):
+        """
+        :return: the job's asset manifest file, or None if the job does not have an asset manifest
+        """
+        manifestFile = self.Plugin.GetPluginInfoEntryWithDefault( "AssetManifest", "" ).strip()
+        if not manifestFile:
+            return None
+
+        if not os.path.isabs( manifestFile ):
+            return os.path.join( self.Plugin.GetJobsDataDirectory(), manifestFile )
+        return self.mapPath( manifestFile )
+
+    def GetEntry( self, key, default=None ):
+        """
+        :return: the value of an entry, or default if the job does not have a readable manifest with the entry
+        """
+        manifestFile = self.GetFile()
+        if manifestFile is None:
+            return default
+        if self.manifest is None or self.manifest[ 0 ] != manifestFile:
+            try:
+                with io.open( manifestFile, mode="r", encoding="utf-8" ) as manifestHandle:
+                    self.manifest = ( manifestFile, json.load( manifestHandle ) )
+            except ( IOError, OSError, ValueError ) as e:
+                self.Plugin.LogWarning( "Failed to read the job's manifest: %s" % e )
+                self.manifest = ( manifestFile, {} )
+        return self.manifest[ 1 ].get( key, default )
+
+    def GetRenderer( self ):
+        """
+        :return: the job's Renderer, or the renderer that the manifest recorded for jobs submitted without one
+        """
+        return self.Plugin.GetPluginInfoEntryWithDefault( "Renderer", "" ) or self.GetEntry( "renderer", "" )
+
+    def GetAssetPaths( self ):
+        """
+        Reads the asset paths from the manifest. Relative paths are skipped since they can not be checked directly.
+        :return: the list of path mapped asset paths, or None if the job does not have an asset manifest
+        """
+        manifestFile = self.GetFile()
+        if manifestFile is None:
+            return None
+
+        if not os.path.isfile( manifestFile ):
+            self.Plugin.FailRender( "Asset manifest is missing: %s" % manifestFile )
+
+        assetPaths = [ self.mapPath( path ) for path in ReadAssetManifest( manifestFile ) ]
+        return [ path for path in assetPaths if os.path.isabs( path ) ]
+
+# The maximum number of existing output files to validate at once when skipping existing frames.
+FRAME_VALIDATION_THREADS = 8
+
+# Leading bytes of the image formats Cinema 4D writes, used to reject truncated or corrupt frames when resuming a task.
+# Formats without a signature (such as TGA) are only checked for being non-empty.
+IMAGE_FILE_HEADERS = {
+    ".bmp": ( b"BM", ),
+    ".dpx": ( b"SDPX", b"XPDS" ),
+    ".exr": ( b"\x76\x2f\x31\x01", ),
+    ".hdr": ( b"#?RADIANCE", b"#?RGBE" ),
+    ".iff": ( b"FORM", ),
+    ".jpeg": ( b"\xff\xd8\xff", ),
+    ".jpg": ( b"\xff\xd8\xff", ),
+    ".png": ( b"\x89PNG", ),
+    ".psb": ( b"8BPS", ),
+    ".psd": ( b"8BPS", ),
+    ".tif": ( b"II*\x00", b"MM\x00*" ),
+    ".tiff": ( b"II*\x00", b"MM\x00*" ),
+}
+
+def IndexFrameFiles( directory, prefix, anyInfix ):
+    """
+    Finds the files that have been written for an output prefix, such as 'Name0001.exr', 'Name.0001.exr' or 'Name_001'.
+    :param directory: the directory the frames are written to
+    :param prefix: the output filename prefix
+    :param anyInfix: whether to allow any text between the prefix and the frame number, such as multipass pass names
+    :return: a dictionary of frame number to the list of files written for that frame
+    """
+    pattern = "^" + re.escape( prefix ) + ( ".*?" if anyInfix else "" ) + r"[._]?(\d+)(\.[A-Za-z0-9]+)?$"
+    regex = re.compile( pattern, re.IGNORECASE if os.name == "nt" else 0 )
+
+    frameFiles = {}
+    try:
+        filenames = os.listdir( directory )
+    except OSError:
+        return frameFiles
+
+    for filename in filenames:
+        match = regex.match( filename )
+        if match:
+            frameFiles.setdefault( int( match.group( 1 ) ), [] ).append( os.path.join( directory, filename ) )
+
+    return frameFiles
+
+def IsValidFrameFile( path, minModifiedTime ):
+    """
+    Checks that a frame file is not empty, is newer than minModifiedTime and starts with the signature of its image format.
+    """
+    try:
+        stat = os.stat( path )
+    except OSError:
+        return False
+
+    if stat.st_size == 0 or stat.st_mtime < minModifiedTime:
+        return False
+
+    headers = IMAGE_FILE_HEADERS.get( os.path.splitext( path )[1].lower() )
+    if not headers:
+        return True
+
+    try:
+        with open( path, "rb" ) as frameFile:
+            header = frameFile.read( 16 )
+    except ( IOError, OSError ):
+        return False
+
+    return any( header.startswith( signature ) for signature in headers )
+
+def FindFramesToRender( frames, outputs, minModifiedTime, threadCount ):
+    """
+    Works out which frames still need to be rendered by validating the files that already exist for each output in parallel.
+    A frame of the main output is complete if one of its files is valid. Multipass outputs write a file per pass, so those
+    frames are only complete if they have as many files as the most complete frame and all of them are valid.
+    :param frames: the list of frames the task renders
+    :param outputs: a list of ( directory, prefix, isMultipass ) tuples
+    :param minModifiedTime: files older than this time (usually the scene's modification time) are considered out of date
+    :param threadCount: the maximum number of files to validate at once
+    :return: the sorted list of frames that are missing or invalid
+    """
+    framesToRender = set()
+    groupsToValidate = []
+    for directory, prefix, isMultipass in outputs:
+        frameFiles = IndexFrameFiles( directory, prefix, isMultipass )
+        expectedCount = 1
+        if isMultipass and frameFiles:
+            expectedCount = max( len( files ) for files in frameFiles.values() )
+
+        for frame in frames:
+            files = frameFiles.get( frame, [] )
+            if len( files ) < expectedCount:
+                framesToRender.add( frame )
+            else:
+                groupsToValidate.append( ( frame, files, isMultipass ) )
+
+    paths = [ path for _frame, files, _isMultipass in groupsToValidate for path in files ]
+    validPaths = set()
+    if paths:
+        pool = ThreadPool( max( 1, min( threadCount, len( paths ) ) ) )
+        try:
+            results = pool.map( lambda path: IsValidFrameFile( path, minModifiedTime ), paths )
+        finally:
+            pool.close()
+        validPaths = set( path for path, valid in zip( paths, results ) if valid )
+
+    for frame, files, isMultipass in groupsToValidate:
+        check = all if isMultipass else any
+        if not check( path in validPaths for path in files ):
+            framesToRender.add( frame )
+
+    return sorted( framesToRender )
+
+def GetResumeOutputs( plugin, mapPath ):
+    """
+    Predicts the network location of the main and multipass output frames.
+    :param plugin: the DeadlinePlugin of the task
+    :param mapPath: returns a path of the job with path mapping applied
+    :return: a list of ( directory, prefix, isMultipass ) tuples, or None if the output file names can not be predicted
+    """
+    outputs = []
+    for pathKey, prefixKey, isMultipass in ( ( "FilePath", "FilePrefix", False ), ( "MultiFilePath", "MultiFilePrefix", True ) ):
+        filepath = plugin.GetPluginInfoEntryWithDefault( pathKey, "" ).strip()
+        if not filepath:
+            continue
+
+        prefix = plugin.GetPluginInfoEntryWithDefault( prefixKey, "" ).strip()
+        outputPath = mapPath( os.path.join( filepath, prefix ) )
+        # Tokens such as $take are only resolved by Cinema 4D.
+        if not prefix or "$" in outputPath:
+            return None
+
+        outputs.append( ( os.path.dirname( outputPath ), os.path.basename( outputPath ), isMultipass ) )
+
+    return outputs or None
+
+def GetFramesToRender( plugin, mapPath, sceneFile, frames ):
+    """
+    Finds the frames of a task that do not have valid output on the network yet, so a requeued task only renders what is missing.
+    :param sceneFile: the scene being rendered, output older than the scene is rendered again
+    :param frames: the list of frames the task renders
+    :return: the sorted list of frames to render
+    """
+    outputs = GetResumeOutputs( plugin, mapPath )
+    if outputs is None:
+        plugin.LogWarning( "Rendering all frames because the output file names can not be predicted. Skipping existing frames requires an output path and prefix without tokens." )
+        return frames
+
+    minModifiedTime = 0
+    if os.path.isfile( sceneFile ):
+        minModifiedTime = os.path.getmtime( sceneFile )
+
+    startTime = time.time()
+    framesToRender = FindFramesToRender( frames, outputs, minModifiedTime, FRAME_VALIDATION_THREADS )
+    plugin.LogInfo( "Skipping %s of %s frame(s) that already have valid output (checked in %.2f seconds)" % ( len( frames ) - len( framesToRender ), len( frames ), time.time() - startTime ) )
+
+    return framesToRender
+
+def CompactFrameRanges( frames ):
+    """
+    Groups a list of frames into contiguous ( start, end ) ranges, e.g. [ 1, 2, 3, 7 ] becomes [ ( 1, 3 ), ( 7, 7 ) ].
+    """
+    ranges = []
+    for frame in sorted( frames ):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1] = ( ranges[-1][0], frame )
+        else:
+            ranges.append( ( frame, frame ) )
+    return ranges
+
+class TaskStatistics( object ):
+    """
+    Collects the timings of a task for the render history.
+    """
+    def __init__( self ):
+        self.StartTime = time.time()
+        self.Timings = {}
+        self.FrameTimes = []
+        self.FirstFrameTime = None
+        self.frameStartTime = None
+
+    def StartFrame( self ):
+        now = time.time()
+        if self.FirstFrameTime is None:
+            self.FirstFrameTime = now
+        if self.frameStartTime is not None:
+            self.FrameTimes.append( now - self.frameStartTime )
+        self.frameStartTime = now
+
+    def EndFrame( self ):
+        if self.frameStartTime is not None:
+            self.FrameTimes.append( time.time() - self.frameStartTime )
+            self.frameStartTime = None
+
+    def AddTiming( self, name, seconds ):
+        self.Timings[ name ] = self.Timings.get( name, 0.0 ) + seconds
+
+def GetRenderHistoryDirectory( historyDir, sceneFile, renderer ):
+    """
+    Returns the directory that holds the render history of a scene and renderer. The scene path is used as it was submitted,
+    with its separators made consistent, so tasks rendered on every OS, and the submitter, share the same key. Its case is
+    kept, since paths that only differ in case are different scenes on Linux and macOS file servers.
+    :param historyDir: the render history directory from the plugin configuration
+    :param sceneFile: the scene file as submitted
+    :param renderer: the job's Renderer plugin info entry
+    :return: the path to the scene's history directory
+    """
+    key = u"%s|%s" % ( sceneFile.replace( "\\", "/" ), renderer )
+    return os.path.join( historyDir, hashlib.sha1( key.encode( "utf-8" ) ).hexdigest() )
+
+def AppendRenderHistory( sceneHistoryDir, writer, record ):
+    """
+    Appends a task record to the render history of a scene. Appends to one file from several machines can interleave or
+    overwrite each other on NFS and SMB shares, so every render thread of every Worker appends to a file of its own.
+    :param sceneHistoryDir: the directory returned by GetRenderHistoryDirectory
+    :param writer: the name of the render thread, e.g. the Worker name and thread number
+    :param record: the task record
+    :return: None
+    """
+    try:
+        os.makedirs( sceneHistoryDir )
+    except OSError:
+        if not os.path.isdir( sceneHistoryDir ):
+            raise
+
+    historyFile = os.path.join( sceneHistoryDir, re.sub( r"[^\w.-]", "_", writer ) + ".jsonl" )
+    with io.open( historyFile, mode="a", encoding="utf-8" ) as historyHandle:
+        historyHandle.write( u"%s\n" % json.dumps( record, sort_keys=True ) )
+
+def LoadRenderHistory( sceneHistoryDir, accept=None ):
+    """
+    Reads the task records of every render thread from the render history of a scene, skipping records that cannot be parsed.
+    :param sceneHistoryDir: the directory returned by GetRenderHistoryDirectory
+    :param accept: a function that returns whether to keep a record, or None to keep every record
+    :return: the list of records, in the order the tasks finished
+    """
+    records = []
+    try:
+        filenames = os.listdir( sceneHistoryDir )
+    except OSError:
+        return records
+
+    for filename in filenames:
+        if not filename.endswith( ".jsonl" ):
+            continue
+        try:
+            with io.open( os.path.join( sceneHistoryDir, filename ), mode="r", encoding="utf-8" ) as historyHandle:
+                for line in historyHandle:
+                    try:
+                        record = json.loads( line )
+                    except ValueError:
+                        # A partially written line from a Worker that was stopped mid-write.
+                        continue
+                    if accept is None or accept( record ):
+                        records.append( record )
+        except ( IOError, OSError ):
+            continue
+
+    records.sort( key=lambda record: record.get( "time" ) or 0.0 )
+    return records
+
+def WriteRenderHistory( plugin, mapPath, stats, record, taskStartup=0.0 ):
+    """
+    Appends the timings of a task to the render history, if a render history directory is configured.
+    :param plugin: the DeadlinePlugin of the task
+    :param mapPath: returns a path of the job with path mapping applied
+    :param stats: the TaskStatistics of the task
+    :param record: the entries of the task record that depend on the plugin: its "plugin" name, the "startup" time, the
+        "timings", the "peakMemory" and whether "pluginFiltering" was used
+    :param taskStartup: the part of the startup time that was spent in the task, which is not counted as overhead
+    :return: None
+    """
+    historyDir = plugin.GetConfigEntryWithDefault( "RenderHistoryDirectory", "" ).strip()
+    if not historyDir:
+        return
+    historyDir = mapPath( historyDir )
+
+    sceneFile = plugin.GetPluginInfoEntryWithDefault( "SceneFile", plugin.GetDataFilename() )
+    renderer = plugin.GetPluginInfoEntryWithDefault( "Renderer", "" )
+    record = dict( record )
+    record.update( {
+        "job": plugin.GetJob().JobId,
+        "task": plugin.GetCurrentTaskId(),
+        "worker": plugin.GetSlaveName(),
+        "scene": sceneFile,
+        "renderer": renderer,
+        "take": plugin.GetPluginInfoEntryWithDefault( "Take", "" ),
+        "time": time.time(),
+        "overhead": max( time.time() - stats.StartTime - taskStartup - sum( stats.FrameTimes ) - stats.Timings.get( "upload", 0.0 ), 0.0 ),
+        "frames": stats.FrameTimes,
+    } )
+
+    try:
+        AppendRenderHistory( GetRenderHistoryDirectory( historyDir, sceneFile, renderer ), "%s_%d" % ( plugin.GetSlaveName(), plugin.GetThreadNumber() ), record )
+    except ( IOError, OSError ) as e:
+        plugin.LogWarning( "Failed to write the render history: %s" % e )
+
+NUMA_NODE_DIRECTORY = "/sys/devices/system/node"
+CPU_DIRECTORY = "/sys/devices/system/cpu"
+
+def ParseCpuList( cpuList ):
+    """
+    Parses a CPU list in the kernel's format, e.g. "0-31,64-95".
+    :param cpuList: the CPU list
+    :return: the list of CPU indices
+    """
+    cpus = []
+    for part in cpuList.strip().split( "," ):
+        if "-" in part:
+            first, last = part.split( "-" )
+            cpus.extend( range( int( first ), int( last ) + 1 ) )
+        elif part:
+            cpus.append( int( part ) )
+    return cpus
+
+def FormatCpuList( cpus ):
+    ranges = []
+    for cpu in sorted( cpus ):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append( [ cpu, cpu ] )
+    return ",".join( "%d" % first if first == last else "%d-%d" % ( first, last ) for first, last in ranges )
+
+def ReadCpuListFile( path ):
+    try:
+        with io.open( path, mode="r", encoding="utf-8" ) as cpuListHandle:
+            return ParseCpuList( cpuListHandle.read() )
+    except ( IOError, OSError, ValueError ):
+        return None
+
+def GetNumaTopology( availableCpus ):
+    """
+    Groups CPUs by NUMA node, and the CPUs of each node by physical core so that hyperthreads of a core stay together.
+    Machines without NUMA information are treated as a single node.
+    :param availableCpus: the CPUs that may be used
+    :return: a list of ( node, cores ) tuples, where cores is a list of lists of CPU indices
+    """
+    available = set( availableCpus )
+    nodeCpus = {}
+    if os.path.isdir( NUMA_NODE_DIRECTORY ):
+        for name in os.listdir( NUMA_NODE_DIRECTORY ):
+            match = re.match( r"node(\d+)$", name )
+            if match:
+                cpus = available.intersection( ReadCpuListFile( os.path.join( NUMA_NODE_DIRECTORY, name, "cpulist" ) ) or [] )
+                if cpus:
+                    nodeCpus[ int( match.group( 1 ) ) ] = cpus
+    if not nodeCpus:
+        nodeCpus[ 0 ] = available
+
+    topology = []
+    for node in sorted( nodeCpus ):
+        cores = []
+        assigned = set()
+        for cpu in sorted( nodeCpus[ node ] ):
+            if cpu in assigned:
+                continue
+            siblings = ReadCpuListFile( os.path.join( CPU_DIRECTORY, "cpu%d" % cpu, "topology", "thread_siblings_list" ) ) or []
+            core = sorted( ( nodeCpus[ node ] - assigned ).intersection( siblings ) ) if cpu in siblings else [ cpu ]
+            assigned.update( core )
+            cores.append( core )
+        topology.append( ( node, cores ) )
+    return topology
+
+def PartitionCpus( topology, slotCount, slot ):
+    """
+    Splits the CPUs into disjoint sets, one per concurrent task, without splitting a core or (unless there are more tasks
+    than NUMA nodes) spanning NUMA nodes. When there are more tasks than nodes, each node is shared by the tasks assigned to it.
+    :param topology: the result of GetNumaTopology
+    :param slotCount: the number of concurrent tasks
+    :param slot: the render thread to return the CPUs for
+    :return: a tuple of the NUMA nodes used and the sorted list of CPUs
+    """
+    nodeCount = len( topology )
+    if slotCount <= nodeCount:
+        selected = topology[ slot * nodeCount // slotCount : ( slot + 1 ) * nodeCount // slotCount ]
+        return [ node for node, cores in selected ], sorted( cpu for node, cores in selected for core in cores for cpu in core )
+
+    nodeIndex = slot * nodeCount // slotCount
+    nodeSlots = [ other for other in range( slotCount ) if other * nodeCount // slotCount == nodeIndex ]
+    position = nodeSlots.index( slot )
+    node, cores = topology[ nodeIndex ]
+    if len( nodeSlots ) > len( cores ):
+        # More tasks than cores on this node, so some tasks share a core.
+        selectedCores = [ cores[ position % len( cores ) ] ]
+    else:
+        selectedCores = cores[ position * len( cores ) // len( nodeSlots ) : ( position + 1 ) * len( cores ) // len( nodeSlots ) ]
+    return [ node ], sorted( cpu for core in selectedCores for cpu in core )
+
+def GetCpuPartition( plugin, originalAffinity=None ):
+    """
+    Picks the CPUs for a render thread when CPU partitioning is enabled, so that the Cinema 4D processes of concurrent tasks
+    on the Worker render on disjoint sets of cores, each within a single NUMA node when there are at least as many nodes as tasks.
+    :param plugin: the DeadlinePlugin of the render thread
+    :param originalAffinity: the CPUs the Worker may use, for a render thread that changes its own affinity, or None to read them
+    :return: the sorted list of CPUs, or None if CPU partitioning is disabled or not supported on this Worker
+    """
+    if not plugin.GetBooleanConfigEntryWithDefault( "EnableCpuPartitioning", False ):
+        return None
+    if not hasattr( os, "sched_setaffinity" ):
+        plugin.LogWarning( "CPU partitioning is only supported on Linux, so Cinema 4D will use every core" )
+        return None
+
+    availableCpus = set( os.sched_getaffinity( 0 ) if originalAffinity is None else originalAffinity )
+    if plugin.OverrideCpuAffinity():
+        availableCpus &= set( plugin.CpuAffinity() )
+    if not availableCpus:
+        return None
+
+    threadNumber = plugin.GetThreadNumber()
+    slotCount = max( plugin.GetJob().JobConcurrentTasks, threadNumber + 1 )
+    topology = GetNumaTopology( availableCpus )
+    nodes, cpus = PartitionCpus( topology, slotCount, threadNumber )
+    plugin.LogInfo( "CPU partitioning: %s NUMA node(s) (%s), %s concurrent task(s)" % ( len( topology ), "; ".join( "node %s: %s" % ( node, FormatCpuList( cpu for core in cores for cpu in core ) ) for node, cores in topology ), slotCount ) )
+    plugin.LogInfo( "CPU partitioning: render thread %s uses NUMA node(s) %s, CPUs %s (%s threads)" % ( threadNumber, ",".join( str( node ) for node in nodes ), FormatCpuList( cpus ), len( cpus ) ) )
+    return cpus
+
+def ReadProcFile( path ):
+    """
+    Reads a file under /proc or /sys, which may disappear at any time along with the process or cgroup it describes.
+    :return: the contents, or None if the file could not be read
+    """
+    try:
+        with io.open( path, mode="rb" ) as procHandle:
+            return procHandle.read().decode( "utf-8", "replace" )
+    except ( IOError, OSError ):
+        return None
+
+def GetChildProcessIds( pid ):
+    """
+    Returns the ids of the direct children of a process, from the children lists of its threads. Kernels built without
+    these lists are handled by scanning /proc for processes whose parent is the process.
+    """
+    taskDir = "/proc/%d/task" % pid
+    try:
+        threadIds = os.listdir( taskDir )
+    except OSError:
+        return []
+
+    children = []
+    for threadId in threadIds:
+        childList = ReadProcFile( os.path.join( taskDir, threadId, "children" ) )
+        if childList is None:
+            if os.path.isdir( os.path.join( taskDir, threadId ) ):
+                return ScanChildProcessIds( pid )
+            continue
+        children.extend( int( child ) for child in childList.split() )
+    return children
+
+def ScanChildProcessIds( pid ):
+    children = []
+    for name in os.listdir( "/proc" ):
+        if name.isdigit():
+            stat = ReadProcFile( "/proc/%s/stat" % name )
+            # The command name can contain spaces and parentheses, so the fields are read after the last ")".
+            if stat and int( stat.rsplit( ")", 1 )[1].split()[1] ) == pid:
+                children.append( int( name ) )
+    return children
+
+def GetProcessStartTime( pid ):
+    """
+    Returns the time a process started, in clock ticks since boot. Together with the pid it identifies the process, since
+    a pid can be reused by an unrelated process as soon as the process exits and is reaped.
+    :return: the start time, or None if the process does not exist
+    """
+    stat = ReadProcFile( "/proc/%d/stat" % pid )
+    try:
+        # The command name can contain spaces and parentheses, so the fields are read after the last ")".
+        return int( stat.rsplit( ")", 1 )[1].split()[19] )
+    except ( AttributeError, IndexError, ValueError ):
+        return None
+
+def GetProcessTree( pid ):
+    tree = [ pid ]
+    for processId in tree:
+        tree.extend( GetChildProcessIds( processId ) )
+    return tree
+
+def FindNewChildProcess( knownChildren, executable, sessionMarker ):
+    """
+    Finds the process started for the renderer: a child of this process that was not in knownChildren, whose command line
+    includes the executable's file name, and whose command line or environment includes the session marker. The render
+    threads of a Worker all start their renderers as children of the Worker process, so without the marker a thread could
+    pick up the renderer that another thread started at the same time.
+    :param sessionMarker: text that only the command line or environment of this session's renderer contains
+    :return: the process id, or None if the process has not been started yet
+    """
+    executableName = os.path.basename( executable )
+    for pid in GetChildProcessIds( os.getpid() ):
+        if pid not in knownChildren:
+            commandLine = ReadProcFile( "/proc/%d/cmdline" % pid )
+            if not commandLine or executableName not in commandLine:
+                continue
+            if sessionMarker in commandLine or sessionMarker in ( ReadProcFile( "/proc/%d/environ" % pid ) or "" ):
+                return pid
+    return None
+
+def SetProcessTreeAffinity( pid, cpus, pinnedThreads ):
+    """
+    Restricts every thread of a process and of its descendants to a set of CPUs. The threads and processes they start
+    afterwards inherit the affinity of the thread that starts them.
+    :param pinnedThreads: the set of thread ids that were already restricted, which are skipped and added to
+    :return: None
+    """
+    for processId in GetProcessTree( pid ):
+        try:
+            threadIds = os.listdir( "/proc/%d/task" % processId )
+        except OSError:
+            continue
+        for threadId in threadIds:
+            threadId = int( threadId )
+            if threadId in pinnedThreads:
+                continue
+            try:
+                os.sched_setaffinity( threadId, cpus )
+            except OSError as e:
+                # The thread exited in the meantime.
+                if e.errno != errno.ESRCH:
+                    raise
+            pinnedThreads.add( threadId )
+
+class CgroupSlice( object ):
+    """
+    A cgroup v2 group that a render process tree is moved into, to cap its memory and to weight its CPU and I/O against
+    the other tasks on the Worker. The parent group must be delegated to the user the Worker runs as, and must not contain
+    any processes itself since the controllers have to be enabled for its children.
+    """
+    PRESSURE_RESOURCES = ( "cpu", "memory", "io" )
+
+    def __init__( self, parentDirectory, name ):
+        self.ParentDirectory = parentDirectory
+        self.Path = os.path.join( parentDirectory, name )
+
+    def WriteFile( self, directory, name, value ):
+        with io.open( os.path.join( directory, name ), mode="w", encoding="utf-8" ) as cgroupHandle:
+            cgroupHandle.write( u"%s" % value )
+
+    def Create( self, limits ):
+        """
+        Creates the group, or reuses it if a previous task left it behind, and applies the limits.
+        :param limits: a dictionary of interface files, e.g. "memory.max", and the values to write to them
+        """
+        enabled = ( ReadProcFile( os.path.join( self.ParentDirectory, "cgroup.subtree_control" ) ) or "" ).split()
+        for controller in sorted( set( name.split( "." )[0] for name in limits ) ):
+            if controller not in enabled:
+                self.WriteFile( self.ParentDirectory, "cgroup.subtree_control", "+%s" % controller )
+
+        if not os.path.isdir( self.Path ):
+            os.mkdir( self.Path )
+        for name, value in sorted( limits.items() ):
+            self.WriteFile( self.Path, name, value )
+
+    def AddProcessTree( self, pid ):
+        """
+        Moves a process and all of its descendants into the group. Processes they start later are created in the group.
+        """
+        for processId in GetProcessTree( pid ):
+            try:
+                self.WriteFile( self.Path, "cgroup.procs", processId )
+            except ( IOError, OSError ) as e:
+                # The process exited in the meantime.
+                if e.errno != errno.ESRCH:
+                    raise
+
+    def ReadPressure( self ):
+        """
+        Reads the pressure stall information of the group.
+        :return: a dictionary of the total stall time in seconds, keyed by resource and kind, e.g. "memory full"
+        """
+        pressure = {}
+        for resource in self.PRESSURE_RESOURCES:
+            for line in ( ReadProcFile( os.path.join( self.Path, "%s.pressure" % resource ) ) or "" ).splitlines():
+                fields = line.split()
+                totals = [ field for field in fields[ 1: ] if field.startswith( "total=" ) ]
+                if totals:
+                    pressure[ "%s %s" % ( resource, fields[0] ) ] = int( totals[0][ 6: ] ) / 1000000.0
+        return pressure
+
+    def ReadMemoryEvents( self ):
+        events = {}
+        for line in ( ReadProcFile( os.path.join( self.Path, "memory.events" ) ) or "" ).splitlines():
+            fields = line.split()
+            if len( fields ) == 2:
+                events[ fields[0] ] = int( fields[1] )
+        return events
+
+    def ReadMemoryPeak( self ):
+        # memory.peak was added in Linux 5.19.
+        peak = ReadProcFile( os.path.join( self.Path, "memory.peak" ) )
+        return int( peak ) if peak and peak.strip().isdigit() else None
+
+    def Remove( self ):
+        try:
+            os.rmdir( self.Path )
+            return True
+        except OSError:
+            return False
+
+def GetCgroupLimits( plugin ):
+    """
+    Returns the cgroup v2 interface files to write for the job's resource limits. Every file is written, so that a group
+    reused from a previous task does not keep that task's limits.
+    :param plugin: the DeadlinePlugin of the job
+    :return: a dictionary of interface files and values
+    """
+    memoryHigh = plugin.GetIntegerPluginInfoEntryWithDefault( "MemoryHighMB", 0 )
+    memoryMax = plugin.GetIntegerPluginInfoEntryWithDefault( "MemoryMaxMB", 0 )
+    return {
+        "memory.high": memoryHigh * 1024 * 1024 if memoryHigh > 0 else "max",
+        "memory.max": memoryMax * 1024 * 1024 if memoryMax > 0 else "max",
+        "cpu.weight": min( max( plugin.GetIntegerPluginInfoEntryWithDefault( "CpuWeight", 100 ), 1 ), 10000 ),
+        "io.weight": "default %s" % min( max( plugin.GetIntegerPluginInfoEntryWithDefault( "IoWeight", 100 ), 1 ), 10000 ),
+    }
+
+def CreateCgroup( plugin, name ):
+    """
+    Creates the cgroup that Cinema 4D runs in, if a cgroup parent directory is configured.
+    :param plugin: the DeadlinePlugin of the job
+    :param name: the name of the group, unique to the render thread or session
+    :return: the CgroupSlice, or None if cgroup isolation is disabled or the group could not be created
+    """
+    parentDir = plugin.GetConfigEntryWithDefault( "CgroupParentDirectory", "" ).strip()
+    if not parentDir:
+        return None
+    if not sys.platform.startswith( "linux" ):
+        plugin.LogWarning( "Cgroup isolation is only supported on Linux, so Cinema 4D will run without resource limits" )
+        return None
+
+    cgroup = CgroupSlice( parentDir, re.sub( r"[^\w.-]", "_", name ) )
+    limits = GetCgroupLimits( plugin )
+    try:
+        cgroup.Create( limits )
+    except ( IOError, OSError ) as e:
+        plugin.LogWarning( "Failed to set up the cgroup %s, so Cinema 4D will run without resource limits: %s" % ( cgroup.Path, e ) )
+        return None
+
+    plugin.LogInfo( "Cinema 4D will run in the cgroup %s (%s)" % ( cgroup.Path, ", ".join( "%s=%s" % item for item in sorted( limits.items() ) ) ) )
+    return cgroup
+
+def LogCgroupUsage( plugin, cgroup, startPressure, startEvents, peakLabel="peak" ):
+    """
+    Logs the pressure stall time of the cgroup since startPressure was read, and how often memory.high and memory.max were hit.
+    :param peakLabel: what the cgroup's peak memory is the peak of, e.g. "session peak" for a group that outlives the task
+    """
+    pressure = cgroup.ReadPressure()
+    if pressure:
+        plugin.LogInfo( "Pressure stall time: %s" % ", ".join( "%s %.2fs" % ( key, pressure[ key ] - startPressure.get( key, 0.0 ) ) for key in sorted( pressure ) ) )
+
+    events = cgroup.ReadMemoryEvents()
+    throttled = events.get( "high", 0 ) - startEvents.get( "high", 0 )
+    limited = events.get( "max", 0 ) - startEvents.get( "max", 0 )
+    oomKills = events.get( "oom_kill", 0 ) - startEvents.get( "oom_kill", 0 )
+    peak = cgroup.ReadMemoryPeak()
+    plugin.LogInfo( "Memory: %s %s, throttled at memory.high %s time(s), reached memory.max %s time(s)" % ( peakLabel, "%.0f MB" % ( peak / 1048576.0 ) if peak is not None else "unknown", throttled, limited ) )
+    if oomKills:
+        plugin.LogWarning( "The OOM killer killed %s process(es) in the cgroup, the job's memory limit may be too low" % oomKills )
+
+# The unit of the CPU times in /proc/<pid>/stat.
+CLOCK_TICKS = os.sysconf( "SC_CLK_TCK" ) if hasattr( os, "sysconf" ) else 100
+
+def ReadProcessCounters( pid ):
+    """
+    Reads the resource counters of a single process from /proc.
+    :return: a tuple of the resident memory in bytes and the list of cumulative counters (CPU seconds, I/O wait seconds,
+        bytes read from disk, bytes written to disk, other bytes read and written), or None if the process has exited
+    """
+    stat = ReadProcFile( "/proc/%d/stat" % pid )
+    status = ReadProcFile( "/proc/%d/status" % pid )
+    if not stat or not status:
+        return None
+
+    # The command name can contain spaces and parentheses, so the fields are read after the last ")". Field n of the
+    # man page is at index n - 3: utime (14), stime (15) and delayacct_blkio_ticks (42).
+    fields = stat.rsplit( ")", 1 )[1].split()
+    cpuSeconds = ( int( fields[ 11 ] ) + int( fields[ 12 ] ) ) / float( CLOCK_TICKS )
+    ioWaitSeconds = int( fields[ 39 ] ) / float( CLOCK_TICKS ) if len( fields ) > 39 else 0.0
+
+    rss = 0
+    match = re.search( r"^VmRSS:\s+(\d+) kB", status, re.MULTILINE )
+    if match:
+        rss = int( match.group( 1 ) ) * 1024
+
+    # /proc/<pid>/io is only readable by the owner of the process. rchar and wchar include the disk I/O, which is
+    # subtracted so the rest is network, pipe and page cache I/O.
+    io = dict( ( key, int( value ) ) for key, value in re.findall( r"^(\w+): (\d+)$", ReadProcFile( "/proc/%d/io" % pid ) or "", re.MULTILINE ) )
+    readBytes = io.get( "read_bytes", 0 )
+    writeBytes = io.get( "write_bytes", 0 )
+    otherBytes = max( io.get( "rchar", 0 ) - readBytes, 0 ) + max( io.get( "wchar", 0 ) - writeBytes, 0 )
+    return rss, [ cpuSeconds, ioWaitSeconds, readBytes, writeBytes, otherBytes ]
+
+def ReadMemInfo():
+    memInfo = ReadProcFile( "/proc/meminfo" ) or ""
+    return dict( ( key, int( value ) * 1024 ) for key, value in re.findall( r"^(\w+):\s+(\d+) kB", memInfo, re.MULTILINE ) )
+
+def FormatMegabytes( byteCount ):
+    return "%.0f MB" % ( byteCount / 1048576.0 )
+
+class ProcessTreeSampler( object ):
+    """
+    Samples the CPU time, resident memory, I/O wait and I/O bytes of the renderer's process tree from /proc on a background
+    thread, and attributes them to the render phase and frame that the plugin reports from the renderer's output. Nothing is
+    logged from the thread: memory warnings are queued for TakeMessages, and the summary is built by FormatSummary.
+    A process that exits between two samples loses the CPU time and I/O it used since the last sample.
+    """
+    COUNTERS = ( "cpu", "ioWait", "read", "write", "other" )
+
+    def __init__( self, findRootProcess, interval, memoryWarningPercent, memoryLimit=None ):
+        """
+        :param findRootProcess: called on the sampling thread until it returns the id of the renderer process
+        :param interval: the time between two samples, in seconds
+        :param memoryWarningPercent: the percentage of the memory limit, or of the Worker's memory, at which to warn
+        :param memoryLimit: the memory limit of the renderer in bytes, or None to use the Worker's memory
+        """
+        self.findRootProcess = findRootProcess
+        self.Interval = interval
+        self.MemoryWarningPercent = memoryWarningPercent
+        self.MemoryLimit = memoryLimit
+        self.RootPid = None
+        self.CpuCount = 1
+        self.lock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.messages = []
+        self.lastCounters = {}
+        self.lastSampleTime = None
+        self.StartTask( "Startup" )
+
+    def StartTask( self, phase ):
+        with self.lock:
+            self.Phase = phase
+            self.Frame = None
+            self.Usage = collections.OrderedDict()
+            self.PeakRss = 0
+            self.warned = set()
+
+    def SetPhase( self, phase ):
+        with self.lock:
+            self.Phase = phase
+
+    def SetFrame( self, frame ):
+        with self.lock:
+            self.Frame = frame
+
+    def Start( self ):
+        self.thread = threading.Thread( target=self.run )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def Stop( self ):
+        self.stopEvent.set()
+        if self.thread:
+            self.thread.join()
+
+    def TakeMessages( self ):
+        with self.lock:
+            messages, self.messages = self.messages, []
+        return messages
+
+    def run( self ):
+        try:
+            while True:
+                if self.RootPid is None:
+                    self.RootPid = self.findRootProcess()
+                    if self.RootPid is not None:
+                        try:
+                            self.CpuCount = len( os.sched_getaffinity( self.RootPid ) )
+                        except ( AttributeError, OSError ):
+                            self.CpuCount = cpu_count()
+                        # What the process used before it was found is counted in the first interval.
+                        self.lastSampleTime = time.time()
+                else:
+                    self.Sample()
+                if self.stopEvent.wait( self.Interval if self.RootPid is not None else 0.05 ):
+                    break
+            self.Sample()
+        except Exception as e:
+            with self.lock:
+                self.messages.append( "Resource sampling stopped: %s" % e )
+
+    def Sample( self ):
+        if self.RootPid is None:
+            return
+        now = time.time()
+        rss = 0
+        totals = [ 0.0 ] * len( self.COUNTERS )
+        counters = {}
+        for pid in GetProcessTree( self.RootPid ):
+            processCounters = ReadProcessCounters( pid )
+            if processCounters is None:
+                continue
+            processRss, counters[ pid ] = processCounters
+            rss += processRss
+            previous = self.lastCounters.get( pid, [ 0 ] * len( self.COUNTERS ) )
+            for index, value in enumerate( counters[ pid ] ):
+                totals[ index ] += max( value - previous[ index ], 0 )
+        self.lastCounters = counters
+
+        with self.lock:
+            key = ( self.Phase, self.Frame )
+            usage = self.Usage.setdefault( key, self.newUsage() )
+            usage[ "wall" ] += now - self.lastSampleTime
+            usage[ "peakRss" ] = max( usage[ "peakRss" ], rss )
+            for name, value in zip( self.COUNTERS, totals ):
+                usage[ name ] += value
+            self.PeakRss = max( self.PeakRss, rss )
+            self.lastSampleTime = now
+            self.checkMemory( rss )
+
+    def checkMemory( self, rss ):
+        memInfo = ReadMemInfo()
+        memTotal = memInfo.get( "MemTotal", 0 )
+        limit = self.MemoryLimit or memTotal
+        if limit and rss >= limit * self.MemoryWarningPercent / 100.0 and "rss" not in self.warned:
+            self.warned.add( "rss" )
+            self.messages.append( "Cinema 4D is using %s, %.0f%% of the %s it may use, and may soon run out of memory" % ( FormatMegabytes( rss ), 100.0 * rss / limit, FormatMegabytes( limit ) ) )
+        if memTotal and "MemAvailable" in memInfo and memInfo[ "MemAvailable" ] <= memTotal * ( 100 - self.MemoryWarningPercent ) / 100.0 and "node" not in self.warned:
+            self.warned.add( "node" )
+            self.messages.append( "The Worker is low on memory: %s of %s available, Cinema 4D is using %s" % ( FormatMegabytes( memInfo[ "MemAvailable" ] ), FormatMegabytes( memTotal ), FormatMegabytes( rss ) ) )
+
+    def newUsage( self ):
+        return dict( [ ( "wall", 0.0 ), ( "peakRss", 0 ) ] + [ ( name, 0.0 ) for name in self.COUNTERS ] )
+
+    def describe( self, usage ):
+        efficiency = 100.0 * usage[ "cpu" ] / ( usage[ "wall" ] * self.CpuCount ) if usage[ "wall" ] > 0 else 0.0
+        return "%.1fs, CPU %.1fs (%.0f%% of %s cores), peak RSS %s, I/O wait %.1fs, disk read %s, disk write %s, other I/O %s" % (
+            usage[ "wall" ], usage[ "cpu" ], efficiency, self.CpuCount, FormatMegabytes( usage[ "peakRss" ] ), usage[ "ioWait" ],
+            FormatMegabytes( usage[ "read" ] ), FormatMegabytes( usage[ "write" ] ), FormatMegabytes( usage[ "other" ] ) )
+
+    def FormatSummary( self ):
+        """
+        Builds the resource usage summary of the task, in total, per phase and per frame.
+        :return: the list of lines to log, which is empty if the renderer was never found
+        """
+        with self.lock:
+            usages = list( self.Usage.items() )
+        if not usages:
+            return []
+
+        def combine( groups, key, usage ):
+            combined = groups.setdefault( key, self.newUsage() )
+            for name in ( "wall", ) + self.COUNTERS:
+                combined[ name ] += usage[ name ]
+            combined[ "peakRss" ] = max( combined[ "peakRss" ], usage[ "peakRss" ] )
+
+        total = {}
+        phases = collections.OrderedDict()
+        frames = collections.OrderedDict()
+        for ( phase, frame ), usage in usages:
+            combine( total, None, usage )
+            combine( phases, phase, usage )
+            if frame is not None:
+                combine( frames, frame, usage )
+
+        lines = [ "Resource usage of this task: %s" % self.describe( total[ None ] ) ]
+        lines.extend( "    Phase %s: %s" % ( phase, self.describe( usage ) ) for phase, usage in phases.items() )
+        lines.extend( "    Frame %s: %s" % ( frame, self.describe( usage ) ) for frame, usage in frames.items() )
+        return lines
+
+def CreateResourceSampler( plugin, findRootProcess, memoryLimited ):
+    """
+    Starts sampling the resource usage of Cinema 4D's process tree, if resource sampling is enabled.
+    :param plugin: the DeadlinePlugin of the job
+    :param findRootProcess: returns the id of the Cinema 4D process once it has been started
+    :param memoryLimited: whether Cinema 4D runs in a cgroup with the job's memory limit, which is warned against instead
+        of the Worker's memory
+    :return: the ProcessTreeSampler, or None if resource sampling is disabled or not supported on this Worker
+    """
+    if not plugin.GetBooleanConfigEntryWithDefault( "EnableResourceSampling", False ):
+        return None
+    if not sys.platform.startswith( "linux" ):
+        plugin.LogWarning( "Resource sampling is only supported on Linux" )
+        return None
+
+    memoryLimit = 0
+    if memoryLimited:
+        memoryLimit = plugin.GetIntegerPluginInfoEntryWithDefault( "MemoryMaxMB", 0 ) or plugin.GetIntegerPluginInfoEntryWithDefault( "MemoryHighMB", 0 )
+    interval = plugin.GetIntegerConfigEntryWithDefault( "ResourceSamplingInterval", 1000 ) / 1000.0
+    sampler = ProcessTreeSampler( findRootProcess, interval, plugin.GetIntegerConfigEntryWithDefault( "MemoryWarningPercent", 90 ), memoryLimit * 1024 * 1024 or None )
+    sampler.Start()
+    return sampler
+
+def LogResourceSamplerMessages( plugin, sampler ):
+    if sampler:
+        for message in sampler.TakeMessages():
+            plugin.LogWarning( message )
+
+def ReadProcessTreeMemory( pid, field ):
+    """
+    Sums a memory field of /proc/<pid>/status over a process tree, e.g. VmRSS for the memory it uses now or VmHWM for the
+    peak memory of each of its processes.
+    :return: the memory in bytes
+    """
+    memory = 0
+    for processId in GetProcessTree( pid ):
+        match = re.search( r"^%s:\s+(\d+) kB" % field, ReadProcFile( "/proc/%d/status" % processId ) or "", re.MULTILINE )
+        if match:
+            memory += int( match.group( 1 ) ) * 1024
+    return memory
+
+def GetDirectorySize( directory ):
+    """
+    :return: the total size in bytes of the files under directory
+    """
+    size = 0
+    for root, dirs, files in os.walk( directory ):
+        for name in files:
+            try:
+                size += os.path.getsize( os.path.join( root, name ) )
+            except OSError:
+                pass
+    return size
+
+def FormatMetricLabels( labels ):
+    # Label values escape backslashes, double quotes and line feeds, as the Prometheus text format requires.
+    return ",".join( '%s="%s"' % ( name, str( value ).replace( "\\", "\\\\" ).replace( '"', '\\"' ).replace( "\n", "\\n" ) ) for name, value in labels )
+
+class LiveMetrics( object ):
+    """
+    Publishes the live state of a Worker thread's render in the Prometheus text format, to a file that node_exporter's
+    textfile collector reads. The plugin reports the phase, frames, Redshift blocks and uploads it parses from the renderer's
+    output, and a background thread rewrites the file every interval with those and the resident memory of the renderer's
+    process tree. The file is replaced in one step, so a scrape never reads a partial file, and removed by Stop.
+    """
+    PREFIX = "deadline_cinema4d_"
+
+    def __init__( self, metricsFile, labels, interval ):
+        """
+        :param metricsFile: the file to write, which must end in .prom for the textfile collector
+        :param labels: the ( name, value ) labels of the Worker thread, e.g. the Worker and plugin
+        :param interval: the time between two writes, in seconds
+        """
+        self.MetricsFile = metricsFile
+        self.Labels = list( labels )
+        self.Interval = interval
+        self.lock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.Error = None
+        self.UploadedBytes = 0
+        self.lastWriteTime = None
+        self.lastBlocks = 0
+        self.StartTask( "", None, lambda: None, "Startup" )
+
+    def StartTask( self, taskId, taskStats, findRootProcess, phase ):
+        """
+        :param taskId: the id of the task, or "" between tasks
+        :param taskStats: the TaskStatistics of the task, whose frame times are published
+        :param findRootProcess: returns the id of the renderer process, or None if it is not running
+        :param phase: the phase the task starts in
+        """
+        with self.lock:
+            self.TaskId = taskId
+            self.TaskStats = taskStats
+            self.findRootProcess = findRootProcess
+            self.Phase = phase
+            self.Frame = None
+            self.RedshiftBlocks = 0
+            self.lastBlocks = 0
+            self.LastActivity = time.time()
+
+    def SetPhase( self, phase, frame=None ):
+        with self.lock:
+            self.Phase = phase
+            if frame is not None:
+                self.Frame = frame
+            self.LastActivity = time.time()
+
+    def AddRedshiftBlock( self ):
+        with self.lock:
+            self.RedshiftBlocks += 1
+            self.LastActivity = time.time()
+
+    def AddUploadedBytes( self, byteCount ):
+        with self.lock:
+            self.UploadedBytes += byteCount
+            self.LastActivity = time.time()
+
+    def Start( self ):
+        self.thread = threading.Thread( target=self.run )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def Stop( self ):
+        self.stopEvent.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        try:
+            os.remove( self.MetricsFile )
+        except OSError:
+            pass
+
+    def run( self ):
+        while True:
+            try:
+                self.Write()
+            except ( IOError, OSError ) as e:
+                # The error is kept for the plugin to log; the next interval tries again.
+                self.Error = e
+            if self.stopEvent.wait( self.Interval ):
+                break
+
+    def Format( self ):
+        """
+        :return: the metrics in the Prometheus text format
+        """
+        now = time.time()
+        with self.lock:
+            labels = self.Labels + [ ( "task", self.TaskId ) ]
+            phase = self.Phase
+            frame = self.Frame
+            frameTimes = list( self.TaskStats.FrameTimes ) if self.TaskStats else []
+            blocks = self.RedshiftBlocks
+            elapsed = now - self.lastWriteTime if self.lastWriteTime is not None else 0.0
+            blockRate = ( blocks - self.lastBlocks ) / elapsed if elapsed > 0 else 0.0
+            self.lastBlocks = blocks
+            self.lastWriteTime = now
+            uploadedBytes = self.UploadedBytes
+            lastActivity = self.LastActivity
+            findRootProcess = self.findRootProcess
+
+        pid = findRootProcess()
+        metrics = [
+            ( "phase", "gauge", "The render phase of the Worker thread, as a label of a series that is always 1.", [ ( "phase", phase ) ], 1 ),
+            ( "frame", "gauge", "The frame being rendered.", [], frame ),
+            ( "frames_done", "gauge", "The number of frames of the task that have been rendered.", [], len( frameTimes ) ),
+            ( "last_frame_seconds", "gauge", "The render time of the last frame of the task.", [], frameTimes[ -1 ] if frameTimes else None ),
+            ( "average_frame_seconds", "gauge", "The average render time of the frames of the task.", [], sum( frameTimes ) / len( frameTimes ) if frameTimes else None ),
+            ( "redshift_blocks_per_second", "gauge", "The rate at which Redshift reported rendered blocks since the last update.", [], blockRate ),
+            ( "uploaded_bytes_total", "counter", "The bytes of local output moved to the output folders.", [], uploadedBytes ),
+            ( "rss_bytes", "gauge", "The resident memory of the renderer's process tree.", [], ReadProcessTreeMemory( pid, "VmRSS" ) if pid else None ),
+            ( "last_activity_timestamp_seconds", "gauge", "The time the renderer last reported progress.", [], lastActivity ),
+            ( "updated_timestamp_seconds", "gauge", "The time these metrics were written.", [], now ),
+        ]
+        lines = []
+        for name, metricType, description, extraLabels, value in metrics:
+            if value is None:
+                continue
+            lines.append( "# HELP %s%s %s" % ( self.PREFIX, name, description ) )
+            lines.append( "# TYPE %s%s %s" % ( self.PREFIX, name, metricType ) )
+            lines.append( "%s%s{%s} %s" % ( self.PREFIX, name, FormatMetricLabels( labels + extraLabels ), repr( float( value ) ) ) )
+        return "\n".join( lines ) + "\n"
+
+    def Write( self ):
+        text = self.Format()
+        directory = os.path.dirname( self.MetricsFile )
+        # The temporary file does not end in .prom, so the textfile collector ignores it until it is complete.
+        handle, tempPath = tempfile.mkstemp( dir=directory, prefix=".metrics" )
+        try:
+            with io.open( handle, mode="w", encoding="utf-8" ) as metricsHandle:
+                metricsHandle.write( u"%s" % text )
+            os.chmod( tempPath, 0o644 )
+            os.replace( tempPath, self.MetricsFile )
+        except ( IOError, OSError ):
+            try:
+                os.remove( tempPath )
+            except OSError:
+                pass
+            raise
+
+def CreateLiveMetrics( plugin, mapPath, pluginName, findRootProcess=None ):
+    """
+    Starts publishing the live metrics of a Worker thread, if a metrics directory is configured.
+    :param plugin: the DeadlinePlugin of the job
+    :param mapPath: returns a path of the job with path mapping applied
+    :param pluginName: the name of the plugin, which labels the metrics
+    :param findRootProcess: returns the id of the Cinema 4D process between tasks, or None if it only runs during tasks
+    :return: the LiveMetrics, or None if live metrics are disabled or the metrics directory can not be created
+    """
+    metricsDir = plugin.GetConfigEntryWithDefault( "MetricsDirectory", "" ).strip()
+    if not metricsDir:
+        return None
+    metricsDir = mapPath( metricsDir )
+    try:
+        if not os.path.isdir( metricsDir ):
+            os.makedirs( metricsDir )
+    except OSError as e:
+        plugin.LogWarning( "Failed to create the metrics directory %s, live metrics are disabled: %s" % ( metricsDir, e ) )
+        return None
+
+    workerName = plugin.GetSlaveName()
+    threadNumber = plugin.GetThreadNumber()
+    metricsFile = os.path.join( metricsDir, re.sub( r"[^\w.-]", "_", "cinema4d_%s_%s" % ( workerName, threadNumber ) ) + ".prom" )
+    labels = [ ( "plugin", pluginName ), ( "worker", workerName ), ( "thread", threadNumber ), ( "job", plugin.GetJob().JobId ) ]
+    metrics = LiveMetrics( metricsFile, labels, plugin.GetIntegerConfigEntryWithDefault( "MetricsInterval", 5000 ) / 1000.0 )
+    if findRootProcess:
+        metrics.StartTask( "", None, findRootProcess, "Startup" )
+    metrics.Start()
+    plugin.LogInfo( "Publishing live metrics to %s" % metricsFile )
+    return metrics
+
+def SetRenderPhase( sampler, metrics, phase, frame=None ):
+    """
+    Attributes the resource usage that follows to the render phase and frame, and publishes them in the live metrics.
+    :param sampler: the ProcessTreeSampler of the task, or None
+    :param metrics: the LiveMetrics of the Worker thread, or None
+    """
+    if sampler:
+        if frame is not None:
+            sampler.SetFrame( frame )
+        sampler.SetPhase( phase )
+    if metrics:
+        metrics.SetPhase( phase, frame )
+
+def FindProgram( name ):
+    """
+    :return: the path of a program on the PATH, or None if it is not installed
+    """
+    for directory in os.environ.get( "PATH", "" ).split( os.pathsep ):
+        path = os.path.join( directory, name )
+        if directory and os.path.isfile( path ) and os.access( path, os.X_OK ):
+            return path
+    return None
+
+def SignalProcessTree( pid, startTime, signalNumber ):
+    """
+    Sends a signal to a process and every process it started: to its process group if it leads a group of its own, or else
+    to each process of its tree, since a process started without a new session shares the Worker's process group. Nothing
+    is signalled unless the process is still the one that was started at startTime, since its pid is reused once it exits.
+    :param startTime: the start time GetProcessStartTime returned for the process when it was found
+    :return: True if the process was signalled
+    """
+    if startTime is None or GetProcessStartTime( pid ) != startTime:
+        return False
+    try:
+        if os.getpgid( pid ) == pid and pid != os.getpgid( 0 ):
+            os.killpg( pid, signalNumber )
+            return True
+    except OSError:
+        pass
+    for processId in reversed( GetProcessTree( pid ) ):
+        try:
+            os.kill( processId, signalNumber )
+        except OSError:
+            pass
+    return True
+
+def CollectHangDiagnostics( pid, timeout=60 ):
+    """
+    Takes a diagnostic snapshot of a process tree that stopped making progress: the state, CPU time and wait channel of
+    every thread, and the thread stacks of the root process from py-spy and gdb if they are installed.
+    :param pid: the root of the process tree
+    :param timeout: the time each stack dump may take, in seconds
+    :return: the list of lines to log
+    """
+    lines = []
+    for processId in GetProcessTree( pid ):
+        commandLine = ( ReadProcFile( "/proc/%d/cmdline" % processId ) or "" ).replace( "\0", " " ).strip()
+        lines.append( "Process %s: %s" % ( processId, commandLine or "(exited)" ) )
+        try:
+            threadIds = sorted( os.listdir( "/proc/%d/task" % processId ), key=int )
+        except OSError:
+            continue
+        for threadId in threadIds:
+            stat = ReadProcFile( "/proc/%d/task/%s/stat" % ( processId, threadId ) )
+            if not stat:
+                continue
+            name = stat[ stat.find( "(" ) + 1 : stat.rfind( ")" ) ]
+            fields = stat.rsplit( ")", 1 )[1].split()
+            cpuSeconds = ( int( fields[ 11 ] ) + int( fields[ 12 ] ) ) / float( CLOCK_TICKS )
+            waitChannel = ( ReadProcFile( "/proc/%d/task/%s/wchan" % ( processId, threadId ) ) or "" ).strip()
+            lines.append( "    Thread %s (%s): state %s, CPU %.1fs, waiting in %s" % ( threadId, name, fields[ 0 ], cpuSeconds, waitChannel if waitChannel not in ( "", "0" ) else "-" ) )
+
+    for command in ( [ "py-spy", "dump", "--native", "--pid", str( pid ) ], [ "gdb", "--batch", "--pid", str( pid ), "-ex", "thread apply all bt" ] ):
+        program = FindProgram( command[0] )
+        if not program:
+            continue
+        lines.append( "Thread stacks from %s:" % command[0] )
+        try:
+            output = subprocess.check_output( [ program ] + command[1:], stderr=subprocess.STDOUT, timeout=timeout )
+        except subprocess.CalledProcessError as e:
+            output = e.output
+        except ( OSError, subprocess.TimeoutExpired ) as e:
+            lines.append( "    Failed: %s" % e )
+            continue
+        lines.extend( "    " + line for line in output.decode( "utf-8", "replace" ).splitlines() )
+    return lines
+
+class HangWatchdog( object ):
+    """
+    Judges whether the renderer is still making progress from three signals: its output, which the plugin reports with
+    NoteActivity, new files in its output directories, and the CPU time and I/O of its process tree. The renderer is hung
+    once none of them showed progress for the hang timeout. CPU time only counts as progress while more cores are busy than
+    the CPU threshold, so a thread spinning in a plugin does not keep a hung render alive, but a long frame that keeps the
+    render threads busy is never treated as a hang.
+    """
+    IO_PROGRESS_BYTES = 1024 * 1024
+
+    def __init__( self, hangTimeout, cpuThreshold ):
+        """
+        :param hangTimeout: the time without progress after which the renderer is hung, in seconds
+        :param cpuThreshold: the number of busy cores above which CPU time counts as progress
+        """
+        self.HangTimeout = hangTimeout
+        self.CpuThreshold = cpuThreshold
+        self.CheckInterval = min( max( hangTimeout / 10.0, 1.0 ), 30.0 )
+        self.RootPid = None
+        self.RootStartTime = None
+        self.OutputDirectories = []
+        self.CpuCores = 0.0
+        self.Restart()
+
+    def SetProcess( self, pid ):
+        """
+        Sets the renderer process. The CPU threshold is capped at one core less than the cores it may use, so that a renderer
+        limited to a few cores can still show progress through its CPU time. A single core can not tell a spinning thread from
+        a render, so there a quarter of the core counts as rendering.
+        """
+        try:
+            self.CpuThreshold = min( self.CpuThreshold, max( len( os.sched_getaffinity( pid ) ) - 1, 0.25 ) )
+        except ( AttributeError, OSError ):
+            pass
+        self.RootPid = pid
+        self.RootStartTime = GetProcessStartTime( pid )
+
+    def SetOutputDirectories( self, directories ):
+        self.OutputDirectories = [ directory for directory in directories if directory ]
+
+    def Restart( self ):
+        """
+        Starts watching a new render: the time without progress starts now and the next check only takes a baseline.
+        """
+        self.lastCheckTime = None
+        self.lastCounters = None
+        self.lastOutputState = None
+        self.NoteActivity( "the start of the render" )
+
+    def NoteActivity( self, reason="its output" ):
+        self.LastProgressTime = time.time()
+        self.LastProgress = reason
+
+    def readCounters( self ):
+        cpuSeconds = 0.0
+        ioBytes = 0
+        for pid in GetProcessTree( self.RootPid ):
+            processCounters = ReadProcessCounters( pid )
+            if processCounters is not None:
+                cpuSeconds += processCounters[1][0]
+                ioBytes += sum( processCounters[1][2:] )
+        return cpuSeconds, ioBytes
+
+    def readOutputState( self ):
+        # A new or renamed file changes the modification time of its directory, which is much cheaper to check on a file
+        # server than the files themselves.
+        state = []
+        for directory in self.OutputDirectories:
+            try:
+                state.append( ( os.stat( directory ).st_mtime, len( os.listdir( directory ) ) ) )
+            except OSError:
+                state.append( None )
+        return state
+
+    def Check( self ):
+        """
+        Samples the signals, at most once per check interval.
+        :return: a description of the hang, or None while the renderer is making progress or has not been found yet
+        """
+        now = time.time()
+        if self.RootPid is None or ( self.lastCheckTime is not None and now - self.lastCheckTime < self.CheckInterval ):
+            return None
+
+        counters = self.readCounters()
+        outputState = self.readOutputState()
+        if self.lastCheckTime is not None:
+            # Processes that exited take their counters with them, so the totals can go down.
+            self.CpuCores = max( counters[0] - self.lastCounters[0], 0.0 ) / ( now - self.lastCheckTime )
+            if self.CpuCores > self.CpuThreshold:
+                self.NoteActivity( "its CPU usage (%.1f cores)" % self.CpuCores )
+            elif counters[1] - self.lastCounters[1] >= self.IO_PROGRESS_BYTES:
+                self.NoteActivity( "its I/O" )
+            elif outputState != self.lastOutputState:
+                self.NoteActivity( "new files in its output directories" )
+        self.lastCheckTime = now
+        self.lastCounters = counters
+        self.lastOutputState = outputState
+
+        idleTime = now - self.LastProgressTime
+        if idleTime < self.HangTimeout:
+            return None
+        return "Cinema 4D made no progress for %d minute(s): it printed nothing, wrote no new files, did almost no I/O and used %.2f cores, which is not more than the %.2f cores that count as rendering. The last progress was %s." % ( idleTime // 60, self.CpuCores, self.CpuThreshold, self.LastProgress )
+
+class StdoutCapture( object ):
+    """
+    Keeps the full stdout of Cinema 4D on local disk and decides which of its lines go to the task log. The output is
+    compressed with zstd if the zstandard module is installed, or else with gzip, into a ring of segment files: once the
+    segments hold more than the size limit the oldest one is deleted. Errors, warnings and phase transitions are always
+    forwarded to the task log, and a sample of at most SampleLines of the other lines per minute.
+    """
+    SEGMENT_COUNT = 4
+    FORWARD_REGEX = re.compile( r"error|warning|fail|abort|exception|traceback|not found|missing|invalid|cannot|unable|Rendering Phase|Rendering frame|Rendering successful|Loading Project|Loading Scene", re.IGNORECASE )
+
+    def __init__( self, directory, name, maxBytes, sampleLines ):
+        """
+        :param directory: the directory of the segment files, which is created if needed
+        :param name: the prefix of the segment files, anything left over with this prefix is deleted
+        :param maxBytes: the maximum compressed size of the segments
+        :param sampleLines: the number of other lines forwarded to the task log per minute
+        """
+        self.Directory = directory
+        self.Name = name
+        self.SegmentBytes = max( maxBytes // self.SEGMENT_COUNT, 64 * 1024 )
+        self.SampleLines = sampleLines
+        self.Extension = ".log.zst" if zstandard else ".log.gz"
+        self.Segments = collections.deque()
+        self.nextSegment = 0
+        self.segmentFile = None
+        self.writer = None
+        self.sampleStart = 0.0
+        self.sampledLines = 0
+        self.StartTask()
+
+        if not os.path.isdir( directory ):
+            os.makedirs( directory )
+        for filename in os.listdir( directory ):
+            if filename.startswith( name + "." ):
+                os.remove( os.path.join( directory, filename ) )
+
+    def StartTask( self ):
+        self.TaskLines = 0
+        self.TaskBytes = 0
+        self.TaskForwarded = 0
+
+    def openSegment( self ):
+        path = os.path.join( self.Directory, "%s.%06d%s" % ( self.Name, self.nextSegment, self.Extension ) )
+        self.nextSegment += 1
+        self.Segments.append( path )
+        self.segmentFile = open( path, "wb" )
+        if zstandard:
+            self.writer = zstandard.ZstdCompressor( level=3 ).stream_writer( self.segmentFile, closefd=False )
+        else:
+            self.writer = gzip.GzipFile( fileobj=self.segmentFile, mode="wb", compresslevel=6 )
+
+        while len( self.Segments ) > self.SEGMENT_COUNT:
+            try:
+                os.remove( self.Segments.popleft() )
+            except OSError:
+                pass
+
+    def closeSegment( self ):
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.segmentFile.close()
+        self.writer = None
+        self.segmentFile = None
+
+    def Write( self, line ):
+        """
+        Captures a line of stdout.
+        :return: True if the line should also go to the task log
+        """
+        data = ( line + "\n" ).encode( "utf-8", "replace" )
+        if self.writer is None:
+            self.openSegment()
+        self.writer.write( data )
+        if self.segmentFile.tell() >= self.SegmentBytes:
+            self.closeSegment()
+        self.TaskLines += 1
+        self.TaskBytes += len( data )
+
+        forward = self.FORWARD_REGEX.search( line ) is not None
+        if not forward:
+            now = time.time()
+            if now - self.sampleStart >= 60:
+                self.sampleStart = now
+                self.sampledLines = 0
+            if self.sampledLines < self.SampleLines:
+                self.sampledLines += 1
+                forward = True
+        if forward:
+            self.TaskForwarded += 1
+        return forward
+
+    def Save( self, path ):
+        """
+        Writes the captured output to a single file. Compressed segments can be concatenated, so the file is one valid zstd
+        or gzip stream. The current segment is completed first, and the next line starts a new one.
+        """
+        self.closeSegment()
+        with open( path, "wb" ) as outputHandle:
+            for segment in self.Segments:
+                try:
+                    with open( segment, "rb" ) as segmentHandle:
+                        while True:
+                            block = segmentHandle.read( 1024 * 1024 )
+                            if not block:
+                                break
+                            outputHandle.write( block )
+                except IOError:
+                    # The oldest segment was dropped.
+                    pass
+
+    def FormatSummary( self ):
+        return "Captured %d lines (%.1f MB) of Cinema 4D output, %d of them are in this log. The full output is kept on the Worker in %s" % ( self.TaskLines, self.TaskBytes / 1048576.0, self.TaskForwarded, os.path.join( self.Directory, self.Name + ".*" + self.Extension ) )
+
+    def Close( self ):
+        self.closeSegment()
+
+def CreateStdoutCapture( plugin ):
+    """
+    Creates the capture of Cinema 4D's output, in the Worker's directory so that it outlives the job's temp folder.
+    :param plugin: the DeadlinePlugin of the job
+    """
+    directory = os.path.join( plugin.GetSlaveDirectory(), "Cinema4DLogs" )
+    maxBytes = plugin.GetIntegerConfigEntryWithDefault( "LogCaptureMaxMB", 256 ) * 1024 * 1024
+    return StdoutCapture( directory, "thread%s" % plugin.GetThreadNumber(), maxBytes, plugin.GetIntegerConfigEntryWithDefault( "LogCaptureSampleLines", 60 ) )
+
+def SaveCapturedLog( plugin, capture, auxiliaryDir ):
+    """
+    Saves the captured output of a failed task to the job's auxiliary folder, where it can be downloaded from the Monitor.
+    :param capture: the StdoutCapture, or None if the output is not captured
+    :param auxiliaryDir: the job's auxiliary folder
+    """
+    if not capture:
+        return
+    plugin.LogInfo( capture.FormatSummary() )
+    directory = os.path.join( auxiliaryDir, "Cinema4DLogs" )
+    filename = re.sub( r"[^\w.-]", "_", "task%s_%s_%s" % ( plugin.GetCurrentTaskId(), plugin.GetSlaveName(), time.strftime( "%Y%m%d-%H%M%S" ) ) ) + capture.Extension
+    try:
+        if not os.path.isdir( directory ):
+            os.makedirs( directory )
+        capture.Save( os.path.join( directory, filename ) )
+        plugin.LogInfo( "The full Cinema 4D output was saved to %s" % os.path.join( directory, filename ) )
+    except ( IOError, OSError ) as e:
+        plugin.LogWarning( "Failed to save the full Cinema 4D output to the job's auxiliary folder: %s" % e )
+
+def ProbeCinema4DInstall( executable ):
+    """
+    Finds the parts of a Cinema 4D installation that Commandline is started with: the library and Python directories of
+    its Python framework, whichever Python version it ships, and its default plugins folder.
+    :param executable: the Commandline executable
+    :return: a dictionary that can be stored in the Cinema4DInstallCache
+    """
+    c4dDir = os.path.dirname( executable )
+    framework = os.path.join( c4dDir, "resource", "modules", "python", "Python.linux64.framework" )
+    libDirs = [ os.path.normpath( os.path.join( c4dDir, "..", "lib64" ) ), os.path.join( framework, "lib64" ), os.path.join( c4dDir, "resource", "modules", "embree.module", "libs", "linux64" ) ]
+
+    pythonVersion = None
+    pythonDirs = []
+    for libDir in sorted( glob.glob( os.path.join( framework, "lib", "python[0-9]*" ) ) ):
+        name = os.path.basename( libDir )
+        pythonVersion = name[ len( "python" ): ]
+        pythonDirs.append( libDir )
+        pythonDirs.extend( [ os.path.join( framework, "lib64", name, "lib-dynload" ), os.path.join( libDir, "lib-dynload" ) ] )
+
+    pluginsParentDir = c4dDir
+    if sys.platform == "darwin":
+        # On MacOS executable will be at '/Applications/MAXON CINEMA 4D R24/Commandline.app/Contents/MacOS/Commandline'.
+        # The 'plugins' folder is located 3 levels higher, together with 'Commandline.app'
+        pluginsParentDir = os.path.dirname( os.path.dirname( os.path.dirname( c4dDir ) ) )
+    pluginsDir = os.path.join( pluginsParentDir, "plugins" )
+
+    return {
+        "executable": executable,
+        "libDirs": [ directory for directory in libDirs if os.path.isdir( directory ) ],
+        "pythonVersion": pythonVersion,
+        "pythonDirs": [ directory for directory in pythonDirs if os.path.isdir( directory ) ],
+        "pluginsDir": pluginsDir,
+        "hasPluginsDir": os.path.isdir( pluginsDir ),
+    }
+
+def GetLinuxEnvironment( install ):
+    """
+    :param install: the installation found by ProbeCinema4DInstall
+    :return: the LD_LIBRARY_PATH, PYTHONPATH and PATH that Commandline is started with on Linux
+    """
+    ldPath = ":".join( install[ "libDirs" ] + [ os.environ.get( "LD_LIBRARY_PATH", "" ) ] )
+    pyPath = ":".join( install[ "pythonDirs" ] + [ os.environ.get( "PYTHONPATH", "" ) ] )
+    path = "%s:%s" % ( os.environ.get( "PATH", "" ), os.path.dirname( install[ "executable" ] ) )
+    return ldPath, pyPath, path
+
+class Cinema4DInstallCache( object ):
+    """
+    The Cinema 4D installations found on this Worker, in a JSON file in the Worker's directory that the Cinema4D and
+    Cinema4DBatch plugins share. An installation is looked up by its version and the configured executable paths, and is
+    only used while its executable exists with the same modification time, so an update or a reinstall is probed again.
+    """
+    def __init__( self, path ):
+        self.Path = path
+
+    def read( self ):
+        try:
+            with io.open( self.Path, mode="r", encoding="utf-8" ) as cacheHandle:
+                return json.load( cacheHandle )
+        except ( IOError, OSError, ValueError ):
+            return {}
+
+    def Lookup( self, version, executables ):
+        """
+        :param executables: the configured executable paths
+        :return: the installation, or None if it has to be probed
+        """
+        install = self.read().get( "%s|%s" % ( version, executables ) )
+        if not install:
+            return None
+        try:
+            if os.stat( install[ "executable" ] ).st_mtime != install[ "mtime" ]:
+                return None
+        except OSError:
+            return None
+        return install
+
+    def Store( self, version, executables, install ):
+        install = dict( install, mtime=os.stat( install[ "executable" ] ).st_mtime )
+        installs = self.read()
+        installs[ "%s|%s" % ( version, executables ) ] = install
+        # Written to a temporary file that replaces the cache, so the other render threads never read a partial file.
+        try:
+            handle, tempPath = tempfile.mkstemp( dir=os.path.dirname( self.Path ), prefix=".c4dinstalls" )
+        except OSError:
+            return install
+        try:
+            with io.open( handle, mode="w", encoding="utf-8" ) as cacheHandle:
+                cacheHandle.write( u"%s" % json.dumps( installs, indent=1, sort_keys=True ) )
+            os.replace( tempPath, self.Path )
+        except ( IOError, OSError ):
+            try:
+                os.remove( tempPath )
+            except OSError:
+                pass
+        return install
+
+def GetCinema4DInstall( plugin ):
+    """
+    Resolves the render executable of the job's Cinema 4D version and probes its installation, or reuses what an earlier
+    task on this Worker found.
+    :param plugin: the DeadlinePlugin of the job, whose version is the job's Cinema 4D version
+    :return: the install, as described by ProbeCinema4DInstall
+    """
+    configKey = "C4D_" + str( plugin.version ) + "_RenderExecutable"
+    executables = plugin.GetConfigEntryWithDefault( configKey, "" )
+    cache = Cinema4DInstallCache( os.path.join( plugin.GetSlaveDirectory(), "Cinema4DInstalls.json" ) )
+    install = cache.Lookup( plugin.version, executables )
+    if install is None:
+        install = cache.Store( plugin.version, executables, ProbeCinema4DInstall( plugin.GetRenderExecutable( configKey, "Cinema 4D %s" % plugin.version ) ) )
+        plugin.LogInfo( "Probed the Cinema 4D installation of %s: Python %s" % ( install[ "executable" ], install[ "pythonVersion" ] or "not found" ) )
+    return install
+
+# The plugin folders each renderer needs, as case insensitive patterns of their names. The job's Renderer is matched by
+# prefix, so "vray5" and "RedshiftExport" use the patterns of "vray" and "redshift".
+RENDERER_PLUGIN_PATTERNS = collections.OrderedDict( [
+    ( "redshift", ( "redshift*", ) ),
+    ( "octane", ( "*octane*", ) ),
+    ( "arnold", ( "c4dtoa*", "arnold*" ) ),
+    ( "vray", ( "v-ray*", "vray*" ) ),
+    ( "corona", ( "corona*", ) ),
+    ( "cycles4d", ( "cycles4d*", ) ),
+] )
+
+# Cinema 4D's own renderers, which need no plugins.
+NATIVE_RENDERERS = ( "standard", "physical", "ogl_hardware", "ogl_software", "preview" )
+
+def GetRendererPluginPatterns( renderer ):
+    """
+    :return: the plugin name patterns the renderer needs, or None if the renderer is not known
+    """
+    renderer = renderer.lower()
+    if renderer in NATIVE_RENDERERS:
+        return ()
+    for name, patterns in RENDERER_PLUGIN_PATTERNS.items():
+        if renderer.startswith( name ):
+            return patterns
+    return None
+
+def BuildFilteredPluginDirectory( cacheDir, pluginDirs, patterns ):
+    """
+    Builds a plugin folder of symlinks to the plugins in the plugin folders whose names match the patterns, so that Cinema 4D
+    only scans and initializes those. A folder is built once for each set of plugins and reused by later launches.
+    :param cacheDir: the folder the filtered plugin folders are built in
+    :param pluginDirs: the plugin folders, in the order Cinema 4D searches them
+    :param patterns: the case insensitive fnmatch patterns of the plugin names to keep
+    :return: the filtered folder, the names of the plugins it links, and the number of plugins left out
+    """
+    selected = []
+    selectedNames = set()
+    total = 0
+    for pluginDir in pluginDirs:
+        try:
+            names = sorted( os.listdir( pluginDir ) )
+        except OSError:
+            continue
+        for name in names:
+            total += 1
+            # Cinema 4D loads the first of two plugins with the same name.
+            if name.lower() in selectedNames:
+                continue
+            if any( fnmatch.fnmatch( name.lower(), pattern.lower() ) for pattern in patterns ):
+                selected.append( os.path.join( pluginDir, name ) )
+                selectedNames.add( name.lower() )
+
+    key = hashlib.sha1( json.dumps( selected ).encode( "utf-8" ) ).hexdigest()[ :16 ]
+    filteredDir = os.path.join( cacheDir, key )
+    if not os.path.isdir( filteredDir ):
+        if not os.path.isdir( cacheDir ):
+            os.makedirs( cacheDir )
+        # Built in a temporary folder that is renamed once it is complete, so another render thread never sees a partial one.
+        buildDir = tempfile.mkdtemp( dir=cacheDir, prefix=".build" )
+        for source in selected:
+            os.symlink( source, os.path.join( buildDir, os.path.basename( source ) ) )
+        try:
+            os.rename( buildDir, filteredDir )
+        except OSError:
+            # Another render thread built the same folder first.
+            for name in os.listdir( buildDir ):
+                os.remove( os.path.join( buildDir, name ) )
+            os.rmdir( buildDir )
+    return filteredDir, [ os.path.basename( source ) for source in selected ], total - len( selected )
+
+def FilterPluginDirectories( plugin, pluginDirs, renderer ):
+    """
+    Replaces the plugin folders Cinema 4D loads plugins from with a folder of only the plugins that the job's renderer needs
+    and the plugins in the plugin filter allowlist, if plugin filtering is enabled.
+    :param plugin: the DeadlinePlugin of the job
+    :param pluginDirs: the plugin folders, in the order Cinema 4D searches them
+    :param renderer: the job's renderer
+    :return: the plugin folders to use, and whether they were filtered
+    """
+    if not plugin.GetBooleanConfigEntryWithDefault( "EnablePluginFiltering", False ):
+        return pluginDirs, False
+    pluginDirs = [ pluginDir for pluginDir in pluginDirs if pluginDir ]
+    if not pluginDirs:
+        return pluginDirs, False
+    if os.name == "nt":
+        plugin.LogWarning( "Plugin filtering is not supported on Windows, so every plugin is loaded" )
+        return pluginDirs, False
+
+    patterns = GetRendererPluginPatterns( renderer )
+    if patterns is None:
+        plugin.LogInfo( "Plugin filtering does not know which plugins the renderer '%s' needs, so every plugin is loaded" % renderer )
+        return pluginDirs, False
+    allowlist = [ pattern.strip() for pattern in plugin.GetConfigEntryWithDefault( "PluginFilterAllowlist", "" ).split( ";" ) if pattern.strip() ]
+
+    try:
+        filteredDir, names, skippedCount = BuildFilteredPluginDirectory( os.path.join( plugin.GetSlaveDirectory(), "Cinema4DPluginSets" ), pluginDirs, list( patterns ) + allowlist )
+    except ( IOError, OSError ) as e:
+        plugin.LogWarning( "Failed to build the filtered plugin folder, so every plugin is loaded: %s" % e )
+        return pluginDirs, False
+    plugin.LogInfo( "Plugin filtering: loading %d plugin(s) (%s) from %s and leaving out %d for the renderer '%s'" % ( len( names ), ", ".join( names ) or "none", filteredDir, skippedCount, renderer ) )
+    return [ filteredDir ], True
+
+# The file a session locks while it evicts from a Redshift cache. The lock is released by the OS if the session dies.
+REDSHIFT_CACHE_LOCK = ".deadline_evict.lock"
+
+class RedshiftCache( object ):
+    """
+    A persistent Redshift cache directory for a Worker, which its sessions use through REDSHIFT_CACHEPATH. Redshift converts
+    textures and compiles shaders into it on first use, so later sessions, and the concurrent tasks of the Worker, find them
+    ready instead of building them again. The cache is kept under a size quota by removing the least recently used files.
+    """
+    def __init__( self, directory, quotaBytes ):
+        self.Directory = directory
+        self.QuotaBytes = quotaBytes
+        self.taskStartTime = None
+
+    def scan( self ):
+        """
+        :return: a dictionary of path to ( size, last use time, modification time ) of the files in the cache
+        """
+        files = {}
+        for root, dirs, filenames in os.walk( self.Directory ):
+            for filename in filenames:
+                if filename == REDSHIFT_CACHE_LOCK:
+                    continue
+                path = os.path.join( root, filename )
+                try:
+                    stat = os.stat( path )
+                except OSError:
+                    continue
+                files[ path ] = ( stat.st_size, max( stat.st_atime, stat.st_mtime ), stat.st_mtime )
+        return files
+
+    def StartTask( self ):
+        self.taskStartTime = time.time()
+
+    def EndTask( self ):
+        """
+        Scans the cache once, to count the files that were written since the task started and to evict from it if it has
+        outgrown its quota. Files added by a concurrent task of the Worker are counted for this task as well.
+        :return: the lines describing how warm the cache was for the task and what was evicted
+        """
+        if self.taskStartTime is None:
+            return []
+        startTime = self.taskStartTime
+        self.taskStartTime = None
+        files = self.scan()
+
+        newFiles = [ path for path, ( size, lastUse, modifiedTime ) in files.items() if modifiedTime >= startTime ]
+        newBytes = sum( files[ path ][ 0 ] for path in newFiles )
+        cachedFiles = len( files ) - len( newFiles )
+        cachedBytes = sum( size for size, lastUse, modifiedTime in files.values() ) - newBytes
+        if newFiles:
+            lines = [ "The Redshift cache was cold for this task: %d file(s) (%s) were converted or compiled, in addition to the %d file(s) (%s) already cached" % (
+                len( newFiles ), FormatMegabytes( newBytes ), cachedFiles, FormatMegabytes( cachedBytes ) ) ]
+        else:
+            lines = [ "The Redshift cache was warm for this task: nothing was added to the %d file(s) (%s) already cached" % ( cachedFiles, FormatMegabytes( cachedBytes ) ) ]
+
+        evictedCount, evictedBytes = self.evict( files )
+        if evictedCount:
+            lines.append( "Evicted %d least recently used file(s) (%s) from the Redshift cache to keep it under its quota of %s" % ( evictedCount, FormatMegabytes( evictedBytes ), FormatMegabytes( self.QuotaBytes ) ) )
+        return lines
+
+    def evict( self, files ):
+        """
+        Removes the least recently used files until the cache fits its quota. Only one session evicts at a time, and a file
+        that can not be removed, e.g. because Redshift has it open on Windows, is skipped.
+        :return: a tuple of the number of files and bytes evicted
+        """
+        total = sum( size for size, lastUse, modifiedTime in files.values() )
+        if self.QuotaBytes <= 0 or total <= self.QuotaBytes:
+            return 0, 0
+        lockHandle = self.acquireLock()
+        if lockHandle is None:
+            return 0, 0
+
+        evictedCount = 0
+        evictedBytes = 0
+        try:
+            for path, ( size, lastUse, modifiedTime ) in sorted( files.items(), key=lambda item: item[ 1 ][ 1 ] ):
+                if total <= self.QuotaBytes:
+                    break
+                try:
+                    os.remove( path )
+                except OSError:
+                    continue
+                total -= size
+                evictedCount += 1
+                evictedBytes += size
+        finally:
+            self.releaseLock( lockHandle )
+        return evictedCount, evictedBytes
+
+    def acquireLock( self ):
+        """
+        Locks the eviction lock file without waiting. The file itself is never removed, since a session could then lock a
+        file that another session has already replaced.
+        :return: the open lock file, or None if another session is evicting
+        """
+        try:
+            lockHandle = os.open( os.path.join( self.Directory, REDSHIFT_CACHE_LOCK ), os.O_CREAT | os.O_RDWR )
+        except OSError:
+            return None
+        try:
+            if fcntl is not None:
+                fcntl.flock( lockHandle, fcntl.LOCK_EX | fcntl.LOCK_NB )
+            else:
+                msvcrt.locking( lockHandle, msvcrt.LK_NBLCK, 1 )
+        except ( IOError, OSError ):
+            os.close( lockHandle )
+            return None
+        return lockHandle
+
+    def releaseLock( self, lockHandle ):
+        try:
+            if fcntl is not None:
+                fcntl.flock( lockHandle, fcntl.LOCK_UN )
+            else:
+                os.lseek( lockHandle, 0, os.SEEK_SET )
+                msvcrt.locking( lockHandle, msvcrt.LK_UNLCK, 1 )
+        finally:
+            os.close( lockHandle )
+
+def CreateRedshiftCache( plugin, mapPath, renderer ):
+    """
+    Sets up this Worker's directory in the configured Redshift cache directory, for jobs that render with Redshift.
+    :param plugin: the DeadlinePlugin of the job
+    :param mapPath: returns a path of the job with path mapping applied
+    :param renderer: the job's renderer
+    :return: the RedshiftCache, or None if the job does not render with Redshift, no Redshift cache directory is configured
+        or the directory can not be created
+    """
+    cacheDir = plugin.GetConfigEntryWithDefault( "RedshiftCacheDirectory", "" ).strip()
+    if not cacheDir or renderer != "redshift":
+        return None
+    cacheDir = os.path.join( mapPath( cacheDir ), re.sub( r"[^\w.-]", "_", plugin.GetSlaveName() ) )
+    # The concurrent tasks of the Worker share the directory, so another one may create it first.
+    try:
+        os.makedirs( cacheDir )
+    except OSError as e:
+        if not os.path.isdir( cacheDir ):
+            plugin.LogWarning( "Failed to create the Redshift cache directory %s, Redshift uses its default cache: %s" % ( cacheDir, e ) )
+            return None
+
+    quota = plugin.GetIntegerConfigEntryWithDefault( "RedshiftCacheQuota", 50 )
+    plugin.LogInfo( "Using the Redshift texture and shader cache in %s, with a quota of %s GB" % ( cacheDir, quota ) )
+    return RedshiftCache( cacheDir, quota * 1024 * 1024 * 1024 )
+
+# The environment variables the plugins set for Cinema 4D, which export shards are started with as well.
+EXPORT_SHARD_ENVIRONMENT = ( "g_additionalModulePath", "C4D_PLUGINS_DIR", "LD_LIBRARY_PATH", "PYTHONPATH", "PATH" )
+
+def SplitExportFrames( frames, shardCount ):
+    """
+    Splits the frames of an export task into slices of consecutive frames whose lengths differ by at most one frame. Each
+    slice has at least two frames, so that every session exports an animation and names its files with frame numbers.
+    :param frames: the sorted list of frames to export
+    :return: the list of slices, each a list of frames, in frame order
+    """
+    frameCount = len( frames )
+    shardCount = max( min( shardCount, frameCount // 2 ), 1 )
+    slices = []
+    start = 0
+    for index in range( shardCount ):
+        end = start + frameCount // shardCount + ( 1 if index < frameCount % shardCount else 0 )
+        slices.append( frames[ start:end ] )
+        start = end
+    return slices
+
+def FindExportFiles( exportFile, minModifiedTime ):
+    """
+    Finds the files of an animation export. Arnold and Redshift add the frame number to the name of the export file, e.g.
+    scene.0001.ass for scene.ass, so the files of every frame are found with one listing of the folder.
+    :param exportFile: the export file of the job
+    :param minModifiedTime: files modified before this time are left over from an earlier export
+    :return: a dictionary of the frames and the names of their files
+    """
+    directory, filename = os.path.split( exportFile )
+    base, extension = os.path.splitext( filename.replace( "#", "" ) )
+    frameRegex = re.compile( r"^%s[._]?(-?\d+)%s$" % ( re.escape( base.rstrip( "._" ) ), re.escape( extension ) ), re.IGNORECASE )
+    try:
+        names = os.listdir( directory or "." )
+    except OSError:
+        names = []
+
+    exportFiles = {}
+    for name in names:
+        match = frameRegex.match( name )
+        if match is None:
+            continue
+        try:
+            if os.path.getmtime( os.path.join( directory, name ) ) >= minModifiedTime:
+                exportFiles[ int( match.group( 1 ) ) ] = name
+        except OSError:
+            continue
+    return exportFiles
+
+def FindMissingExportFrames( exportFile, frames, minModifiedTime ):
+    """
+    Finds the frames of an animation export that do not have a file.
+    :return: the sorted list of frames without a file
+    """
+    return sorted( set( frames ) - set( FindExportFiles( exportFile, minModifiedTime ) ) )
+
+class ExportCache( object ):
+    """
+    A manifest next to an export file that records the key each frame was exported with, so that an export can skip the
+    frames whose files are still valid. A key is a hash of the scene file's content, the take, the export settings and the
+    frame, and a file is valid while it has the size and modification time it had when it was exported. Single file exports
+    are recorded under the name of their file instead of a frame.
+    """
+    def __init__( self, exportFile ):
+        self.ExportFile = exportFile
+        self.Directory = os.path.dirname( exportFile )
+        self.Path = exportFile.replace( "#", "" ) + ".exportcache.json"
+        self.manifest = self.read()
+
+    def read( self ):
+        try:
+            with io.open( self.Path, mode="r", encoding="utf-8" ) as cacheHandle:
+                return json.load( cacheHandle )
+        except ( IOError, OSError, ValueError ):
+            return {}
+
+    def GetSceneDigest( self, sceneFile ):
+        """
+        Hashes the content of the scene file. The hash is kept in the manifest, so the file is only read again once it changes.
+        """
+        stat = os.stat( sceneFile )
+        scene = self.manifest.get( "scene", {} )
+        if scene.get( "path" ) == sceneFile and scene.get( "size" ) == stat.st_size and scene.get( "mtime" ) == stat.st_mtime:
+            return scene[ "digest" ]
+
+        sceneHash = hashlib.sha1()
+        with open( sceneFile, "rb" ) as sceneHandle:
+            for chunk in iter( lambda: sceneHandle.read( 1024 * 1024 ), b"" ):
+                sceneHash.update( chunk )
+        self.manifest[ "scene" ] = { "path": sceneFile, "size": stat.st_size, "mtime": stat.st_mtime, "digest": sceneHash.hexdigest() }
+        return sceneHash.hexdigest()
+
+    def GetKeys( self, settings, items ):
+        """
+        :param settings: a dictionary of everything besides the frame that the export depends on
+        :param items: the frames, or the name of the file of a single file export
+        :return: a dictionary of the items and their keys
+        """
+        return dict( ( item, hashlib.sha1( json.dumps( dict( settings, item=item ), sort_keys=True ).encode( "utf-8" ) ).hexdigest() ) for item in items )
+
+    def FindValidItems( self, keys ):
+        """
+        :return: the items that were exported with the same key and whose files have not changed since
+        """
+        exports = self.manifest.get( "exports", {} )
+        validItems = []
+        for item, key in keys.items():
+            entry = exports.get( str( item ) )
+            if not entry or entry[ "key" ] != key:
+                continue
+            try:
+                stat = os.stat( os.path.join( self.Directory, entry[ "file" ] ) )
+            except OSError:
+                continue
+            if stat.st_size == entry[ "size" ] and stat.st_mtime == entry[ "mtime" ]:
+                validItems.append( item )
+        return sorted( validItems )
+
+    def Store( self, keys, files ):
+        """
+        Records the files of exported items. The other tasks of the job update the manifest as well, so it is read again
+        and replaced in one step, and an item whose update is lost is only exported again.
+        :param keys: a dictionary of the items and their keys
+        :param files: a dictionary of the exported items and the names of their files in the export folder
+        """
+        manifest = self.read()
+        if "scene" in self.manifest:
+            manifest[ "scene" ] = self.manifest[ "scene" ]
+        exports = manifest.setdefault( "exports", {} )
+        for item, name in files.items():
+            try:
+                stat = os.stat( os.path.join( self.Directory, name ) )
+            except OSError:
+                continue
+            exports[ str( item ) ] = { "key": keys[ item ], "file": name, "size": stat.st_size, "mtime": stat.st_mtime }
+
+        handle, tempPath = tempfile.mkstemp( dir=self.Directory or None, prefix=".exportcache" )
+        try:
+            with io.open( handle, mode="w", encoding="utf-8" ) as cacheHandle:
+                cacheHandle.write( u"%s" % json.dumps( manifest, indent=1, sort_keys=True ) )
+            os.replace( tempPath, self.Path )
+        except ( IOError, OSError ):
+            try:
+                os.remove( tempPath )
+            except OSError:
+                pass
+            raise
+        self.manifest = manifest
+
+def CheckExportCache( plugin, taskStats, exportFile, sceneFile, renderer, items ):
+    """
+    Finds the items of a task whose export is still valid, if the export cache is enabled.
+    :param plugin: the DeadlinePlugin of the task
+    :param taskStats: the TaskStatistics of the task, which the time spent is added to
+    :param items: the frames of the task, or the name of the export file of a single file export
+    :return: the ExportCache, the keys of the items and the items to export, or ( None, None, items ) if the export cache is not used
+    """
+    if not plugin.GetBooleanConfigEntryWithDefault( "EnableExportCache", False ):
+        return None, None, items
+
+    startTime = time.time()
+    cache = ExportCache( exportFile )
+    try:
+        sceneDigest = cache.GetSceneDigest( sceneFile )
+    except ( IOError, OSError ) as e:
+        plugin.LogWarning( "Exporting every frame because the scene file could not be read for the export cache: %s" % e )
+        return None, None, items
+    settings = {
+        "scene": sceneDigest,
+        "take": plugin.GetPluginInfoEntryWithDefault( "Take", "" ),
+        "renderer": renderer,
+        "version": plugin.version,
+        "exportFile": exportFile,
+    }
+    keys = cache.GetKeys( settings, items )
+    cachedItems = cache.FindValidItems( keys )
+    taskStats.AddTiming( "exportCache", time.time() - startTime )
+    plugin.LogInfo( "Export cache: %s hit(s) and %s miss(es) for the %s item(s) of the task (%s)" % ( len( cachedItems ), len( items ) - len( cachedItems ), len( items ), cache.Path ) )
+    return cache, keys, sorted( set( items ) - set( cachedItems ) )
+
+def StoreExportCache( plugin, cache, keys, exportFile, items, taskStartTime ):
+    """
+    Records the files the task exported in the export cache.
+    :param keys: the keys CheckExportCache returned
+    :param items: the items the task exported
+    :param taskStartTime: the time the task started, older files were not exported by the task
+    """
+    # Allow for file systems that store modification times in whole seconds.
+    minModifiedTime = taskStartTime - 2
+    exportFiles = FindExportFiles( exportFile, minModifiedTime )
+    name = os.path.basename( exportFile )
+    try:
+        if name in items and os.path.getmtime( exportFile ) >= minModifiedTime:
+            exportFiles[ name ] = name
+        cache.Store( keys, dict( ( item, exportFiles[ item ] ) for item in items if item in exportFiles ) )
+    except ( IOError, OSError ) as e:
+        plugin.LogWarning( "Failed to update the export cache: %s" % e )
+
+class ExportShardProcesses( object ):
+    """
+    The Cinema 4D sessions that export slices of a task's frames next to the one the Worker started. The Worker does not
+    read their output, so each one writes it to a log file in the shards' folder. The plugins move each session into the
+    cgroup and CPU partition of the task once it has been started, and stop the sessions with the task or the job.
+    """
+    def __init__( self, directory ):
+        self.Directory = directory
+        self.Shards = []
+        self.StartTimes = {}
+
+    def GetFilename( self, frameRange, extension ):
+        return os.path.join( self.Directory, "shard_%s-%s%s" % ( frameRange[ 0 ], frameRange[ 1 ], extension ) )
+
+    def Start( self, frameRange, executable, arguments, environment, startupDirectory ):
+        """
+        :param frameRange: the ( startFrame, endFrame ) slice the session exports
+        :param arguments: the command line arguments of Cinema 4D, quoted like the arguments of a managed process
+        :param environment: the complete environment of the session
+        :return: the process id of the session
+        """
+        if os.name == "nt":
+            command = '"%s" %s' % ( executable, arguments )
+        else:
+            command = [ executable ] + shlex.split( arguments )
+
+        with open( self.GetFilename( frameRange, ".log" ), "wb" ) as logHandle:
+            process = subprocess.Popen( command, cwd=startupDirectory or None, env=environment, stdout=logHandle, stderr=subprocess.STDOUT )
+        self.Shards.append( ( frameRange, process, time.time() ) )
+        self.StartTimes[ process.pid ] = GetProcessStartTime( process.pid )
+        return process.pid
+
+    def Wait( self, isCanceled, interval=0.25 ):
+        """
+        Waits for every session to exit, or stops them if the task is canceled.
+        :param isCanceled: called while waiting, returns True if the task has been canceled
+        :return: a list of ( frameRange, exitCode, seconds, logFile ) tuples, the exit code is None if the session was stopped
+        """
+        finished = {}
+        while len( finished ) < len( self.Shards ):
+            for frameRange, process, startTime in self.Shards:
+                if frameRange not in finished and process.poll() is not None:
+                    finished[ frameRange ] = ( process.returncode, time.time() - startTime )
+            if len( finished ) < len( self.Shards ):
+                if isCanceled():
+                    self.Stop()
+                    break
+                time.sleep( interval )
+
+        results = []
+        for frameRange, _process, startTime in self.Shards:
+            exitCode, seconds = finished.get( frameRange, ( None, time.time() - startTime ) )
+            results.append( ( frameRange, exitCode, seconds, self.GetFilename( frameRange, ".log" ) ) )
+        return results
+
+    def Stop( self ):
+        """
+        Kills the sessions that are still running, along with any process they started.
+        """
+        for _frameRange, process, _startTime in self.Shards:
+            if process.poll() is None:
+                # The session is not reaped until it has been waited for, so its pid can not have been reused.
+                if os.name != "nt":
+                    SignalProcessTree( process.pid, self.StartTimes.get( process.pid ), signal.SIGKILL )
+                try:
+                    process.kill()
+                except OSError:
+                    pass
+                process.wait()
+
+    def ReadLogTail( self, logFile, lineCount=20 ):
+        try:
+            with io.open( logFile, mode="r", encoding="utf-8", errors="replace" ) as logHandle:
+                return [ line.rstrip( "\r\n" ) for line in collections.deque( logHandle, lineCount ) ]
+        except ( IOError, OSError ):
+            return []
+
+def GetExportShardEnvironment( job, getVariable ):
+    """
+    The environment of an export shard: the Worker's environment with the job's environment and the variables set for Cinema 4D.
+    :param getVariable: returns the value of a variable the plugin set for Cinema 4D
+    """
+    environment = dict( os.environ )
+    for key in job.GetJobEnvironmentKeys():
+        environment[ key ] = job.GetJobEnvironmentKeyValue( key )
+    for key in EXPORT_SHARD_ENVIRONMENT:
+        value = getVariable( key )
+        if value:
+            environment[ key ] = value
+    return environment
+
+def StartExportShards( plugin, shards, slices, executable, getArguments, getVariable, startupDir, placeShard ):
+    """
+    Starts an export shard for every slice of frames.
+    :param shards: the ExportShardProcesses to start the shards in
+    :param slices: the slices of consecutive frames
+    :param getArguments: returns the arguments of the shard that exports a slice
+    :param getVariable: returns the value of a variable the plugin set for Cinema 4D
+    :param placeShard: called with the process id and index of each shard once it has been started
+    :return: None
+    """
+    environment = GetExportShardEnvironment( plugin.GetJob(), getVariable )
+    for index, frameSlice in enumerate( slices ):
+        frameRange = ( frameSlice[ 0 ], frameSlice[ -1 ] )
+        pid = shards.Start( frameRange, executable, getArguments( frameSlice ), environment, startupDir )
+        plugin.LogInfo( "Started export shard for frames %s-%s (process %s)" % ( frameRange[ 0 ], frameRange[ 1 ], pid ) )
+        placeShard( pid, index )
+
+def PlaceExportShard( plugin, pid, cgroup, cpuPartition ):
+    """
+    Moves an export shard that was just started into Cinema 4D's cgroup and CPU partition.
+    :param cgroup: the CgroupSlice of Cinema 4D, or None
+    :param cpuPartition: the CPUs of Cinema 4D, or None
+    """
+    if cgroup:
+        try:
+            cgroup.AddProcessTree( pid )
+        except ( IOError, OSError ) as e:
+            plugin.LogWarning( "Failed to move the export shard (process %s) into the cgroup %s, so it will run without resource limits: %s" % ( pid, cgroup.Path, e ) )
+    if cpuPartition:
+        try:
+            SetProcessTreeAffinity( pid, cpuPartition, set() )
+        except OSError as e:
+            plugin.LogWarning( "Failed to restrict the export shard (process %s) to CPUs %s: %s" % ( pid, FormatCpuList( cpuPartition ), e ) )
+
+def CheckExportShards( plugin, shards, results, getError ):
+    """
+    Logs how each export shard ended, with the end of the output of the ones that failed, and fails the task if one of them failed.
+    :param shards: the ExportShardProcesses the shards ran in
+    :param results: the results of ExportShardProcesses.Wait
+    :param getError: returns the error of a shard that ran to the end from its frame range and exit code, or None if it succeeded
+    :return: None
+    """
+    failures = []
+    for frameRange, exitCode, seconds, logFile in results:
+        error = "stopped because the task was canceled" if exitCode is None else getError( frameRange, exitCode )
+        if error is None:
+            plugin.LogInfo( "Export shard for frames %s-%s finished in %.1f seconds" % ( frameRange[ 0 ], frameRange[ 1 ], seconds ) )
+            continue
+
+        plugin.LogWarning( "Export shard for frames %s-%s failed: %s. The end of its output (%s):" % ( frameRange[ 0 ], frameRange[ 1 ], error, logFile ) )
+        for line in shards.ReadLogTail( logFile ):
+            plugin.LogWarning( "    %s" % line )
+        failures.append( "%s-%s" % frameRange )
+
+    if failures:
+        plugin.FailRender( "The export shard(s) for frames %s failed. Check the log for more information." % ", ".join( failures ) )
+
+def VerifyExportFiles( plugin, exportFile, frames, taskStartTime ):
+    """
+    Fails the task if an exported frame does not have an export file that was written during the task.
+    :param exportFile: the export file, without the frame numbers that the exporter adds
+    :param frames: the frames the task exported
+    :param taskStartTime: the time the task started
+    """
+    # Allow for file systems that store modification times in whole seconds.
+    missingFrames = FindMissingExportFrames( exportFile, frames, taskStartTime - 2 )
+    if missingFrames:
+        plugin.FailRender( "The export is missing the file(s) of %s frame(s): %s" % ( len( missingFrames ), ", ".join( "%s-%s" % frameRange for frameRange in CompactFrameRanges( missingFrames ) ) ) )
+    plugin.LogInfo( "Verified the export files of all %s exported frame(s)" % len( frames ) )
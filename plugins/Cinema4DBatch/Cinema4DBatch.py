@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
 
 from __future__ import absolute_import
+import errno
+import hashlib
 import io
+import json
 import os
+import re
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
 import tempfile
+import threading
 import time
+import uuid
 
 from Deadline.Plugins import DeadlinePlugin, PluginType
 from Deadline.Scripting import FileUtils, RepositoryUtils, SystemUtils
@@ -17,6 +29,27 @@ from System.Text import Encoding
 from System.Text.RegularExpressions import Regex
 from six.moves import range
 
+try:
+    import fcntl
+except ImportError:
+    # Memory admission control is only supported on Linux.
+    fcntl = None
+
+# The helpers shared with the Cinema4D plugin live in Cinema4DCommon.py, in that plugin's folder.
+_commonDir = os.path.join( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ), "Cinema4D" )
+if _commonDir not in sys.path:
+    sys.path.insert( 0, _commonDir )
+
+from Cinema4DCommon import (
+    CheckExportCache, CheckExportShards, CollectHangDiagnostics, CompactFrameRanges, CreateCgroup, CreateLiveMetrics,
+    CreateRedshiftCache, CreateResourceSampler, CreateStdoutCapture, ExportShardProcesses, FRAME_VALIDATION_THREADS,
+    FilterPluginDirectories, FindFramesToRender, FindNewChildProcess, FormatMegabytes, GetChildProcessIds,
+    GetCinema4DInstall, GetCpuPartition, GetDirectorySize, GetFramesToRender, GetLinuxEnvironment, GetProcessStartTime,
+    GetRenderHistoryDirectory, HangWatchdog, IndexFrameFiles, JobManifest, LoadRenderHistory, LogCgroupUsage,
+    LogResourceSamplerMessages, PlaceExportShard, ReadAssetManifest, ReadMemInfo, ReadProcFile, ReadProcessTreeMemory,
+    RemoveVerifiedPaths, RunAssetPreflight, SaveCapturedLog, SetRenderPhase, SignalProcessTree, SplitExportFrames,
+    StartExportShards, StoreExportCache, TaskStatistics, VerifyExportFiles, WriteRenderHistory )
+
 
 ######################################################################
 ## This is the function that Deadline calls to get an instance of the
@@ -27,6 +60,405 @@ def GetDeadlinePlugin():
 
 def CleanupDeadlinePlugin( deadlinePlugin ):
     deadlinePlugin.Cleanup()
+
+def GetFrameFilename( path, frame ):
+    """
+    Renames a frame file for another frame, keeping the padding of its frame number, e.g. 'Name0001.exr' becomes 'Name0007.exr' for frame 7.
+    """
+    directory, filename = os.path.split( path )
+    match = re.search( r"(\d+)(\.[A-Za-z0-9]+)?$", filename )
+    if not match:
+        return path
+    return os.path.join( directory, filename[ :match.start( 1 ) ] + str( frame ).zfill( len( match.group( 1 ) ) ) + filename[ match.end( 1 ): ] )
+
+def LinkOrCopyFile( source, destination ):
+    """
+    Hard links source as destination, replacing a file left there by an earlier render, or copies it if the file system
+    does not support hard links.
+    """
+    if os.path.lexists( destination ):
+        os.remove( destination )
+    try:
+        os.link( source, destination )
+    except ( AttributeError, OSError ):
+        shutil.copy2( source, destination )
+
+# The video post of Cinema 4D's Global Illumination, which the Standard and Physical renderers use, and the file that
+# describes a GI cache computed by a prepass.
+GI_VIDEOPOST = 1021096
+GI_CACHE_STAMP = "deadline_gicache.json"
+
+def GetGICacheKey( sceneFile, take ):
+    """
+    Identifies a version of a scene and take in the GI cache directory. The key is computed from the scene's content, so
+    that every Worker computes the same key whatever path it sees the scene at, and a changed scene gets a new cache.
+    """
+    digest = hashlib.sha1()
+    with open( sceneFile, "rb" ) as sceneHandle:
+        for chunk in iter( lambda: sceneHandle.read( 1048576 ), b"" ):
+            digest.update( chunk )
+    digest.update( take.encode( "utf-8" ) )
+    return digest.hexdigest()
+
+# Stands in for the frame ranges in the render script, so that the script can be rewritten to resume a task after a crash.
+FRAME_RANGES_PLACEHOLDER = "__DEADLINE_FRAME_RANGES__"
+
+class Cinema4DCrashedError( Exception ):
+    """
+    Raised by PollUntilComplete when Cinema 4D exits or drops its connection and the caller is able to restart it.
+    """
+    pass
+
+# Node-local reservations of the Cinema 4D sessions of every Worker on this machine.
+SESSION_RESERVATION_DIRECTORY = os.path.join( tempfile.gettempdir(), "deadline_cinema4dbatch_sessions" )
+# How often a session that waits for free memory checks again.
+MEMORY_ADMISSION_POLL_SECONDS = 5
+
+def ProcessExists( pid ):
+    try:
+        os.kill( pid, 0 )
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+def ProcessIsRunning( pid ):
+    # A process that exited stays a zombie until its parent reaps it.
+    stat = ReadProcFile( "/proc/%d/stat" % pid )
+    return stat is not None and stat.rsplit( ")", 1 )[1].split()[0] not in ( "Z", "X" )
+
+def WaitForProcessExit( pid, timeout ):
+    """
+    Waits for a process to exit without reaping it, so that the Worker still gets its exit code: on a pidfd, which becomes
+    readable as soon as the process exits, or by polling /proc on kernels without pidfds.
+    :param timeout: the maximum time to wait, in seconds
+    :return: True if the process exited
+    """
+    try:
+        pidfd = os.pidfd_open( pid )
+    except AttributeError:
+        pidfd = None
+    except OSError as e:
+        if e.errno == errno.ESRCH:
+            return True
+        pidfd = None
+
+    if pidfd is not None:
+        try:
+            return bool( select.select( [ pidfd ], [], [], timeout )[0] )
+        finally:
+            os.close( pidfd )
+
+    deadline = time.time() + timeout
+    while ProcessIsRunning( pid ):
+        if time.time() >= deadline:
+            return False
+        time.sleep( 0.05 )
+    return True
+
+def StopProcessTree( pid, startTime, gracePeriod, termTimeout ):
+    """
+    Gives a process the grace period to exit on its own, then sends SIGTERM to its process tree, and SIGKILL if it is still
+    running after the term timeout. The process is only signalled while it is still the one that was started at startTime.
+    :param startTime: the start time GetProcessStartTime returned for the process when it was started
+    :param gracePeriod: the time the process may take to exit on its own, in seconds
+    :param termTimeout: the time the process may take to exit after SIGTERM, in seconds
+    :return: a tuple of how the process ended ("exited", "terminated", "killed" or "running") and the time it took in seconds
+    """
+    startedAt = time.time()
+    if WaitForProcessExit( pid, gracePeriod ):
+        return "exited", time.time() - startedAt
+
+    if not SignalProcessTree( pid, startTime, signal.SIGTERM ):
+        # The pid no longer belongs to the process, so it exited and was reaped.
+        return "exited", time.time() - startedAt
+    if WaitForProcessExit( pid, termTimeout ):
+        return "terminated", time.time() - startedAt
+
+    if not SignalProcessTree( pid, startTime, signal.SIGKILL ):
+        return "terminated", time.time() - startedAt
+    # SIGKILL can not be ignored, but a process in uninterruptible sleep only dies once the sleep ends.
+    if WaitForProcessExit( pid, termTimeout ):
+        return "killed", time.time() - startedAt
+    return "running", time.time() - startedAt
+
+class MappedSceneCache( object ):
+    """
+    The path mapped copies of a job's scene in the job's auxiliary folder. The first session that maps the scene saves
+    the mapped scene and records the paths it was mapped from. A later session maps those paths with its own Worker's
+    rules to find the copy that was mapped the same way, so Workers on different operating systems or sites each use
+    their own copy. Each copy is saved in a folder of its own under the scene's file name, so that $prj in the render
+    paths still resolves to the scene's name.
+    """
+    def __init__( self, directory, sceneFile ):
+        self.Directory = directory
+        self.SceneFile = sceneFile
+        self.Name = hashlib.sha1( sceneFile.encode( "utf-8" ) ).hexdigest()[ :16 ]
+        self.PathsFile = os.path.join( directory, self.Name + ".paths.json" )
+        self.SceneState = self.GetSceneState()
+
+    def GetSceneState( self ):
+        try:
+            stat = os.stat( self.SceneFile )
+        except OSError:
+            return None
+        return { "path": self.SceneFile, "size": stat.st_size, "mtime": stat.st_mtime }
+
+    def GetFilenames( self, originalPaths, mapPath, texturePaths ):
+        """
+        :return: the mapped scene file and its asset manifest for the paths as this Worker maps them
+        """
+        mappedPaths = [ mapPath( path ) for path in originalPaths ]
+        key = hashlib.sha1( json.dumps( [ mappedPaths, texturePaths ] ).encode( "utf-8" ) ).hexdigest()[ :16 ]
+        sceneDirectory = os.path.join( self.Directory, "%s_%s" % ( self.Name, key ) )
+        return os.path.join( sceneDirectory, os.path.basename( self.SceneFile ) ), os.path.join( sceneDirectory, "assets.json" )
+
+    def Lookup( self, mapPath, texturePaths ):
+        """
+        :param mapPath: the function that maps a path with this Worker's path mapping rules
+        :param texturePaths: the path mapped texture search paths of the job
+        :return: the mapped scene file and its asset manifest, or None if the scene has not been saved for this Worker's mapping
+        """
+        if self.SceneState is None:
+            return None
+        try:
+            with io.open( self.PathsFile, mode="r", encoding="utf-8" ) as pathsHandle:
+                record = json.load( pathsHandle )
+        except ( IOError, OSError, ValueError ):
+            return None
+        if record.get( "scene" ) != self.SceneState:
+            return None
+
+        sceneFile, assetsFile = self.GetFilenames( record[ "paths" ], mapPath, texturePaths )
+        if os.path.isfile( sceneFile ) and os.path.isfile( assetsFile ):
+            return sceneFile, assetsFile
+        return None
+
+    def Store( self, tempFiles, mapPath, texturePaths ):
+        """
+        Moves the mapped scene, the paths it was mapped from and its asset manifest saved by Cinema 4D into place. Sessions on
+        other Workers may store the same copy at the same time, so every file is replaced in one step.
+        :param tempFiles: the scene, paths and asset manifest files Cinema 4D saved
+        :return: the mapped scene file
+        """
+        tempSceneFile, tempPathsFile, tempAssetsFile = tempFiles
+        with io.open( tempPathsFile, mode="r", encoding="utf-8" ) as pathsHandle:
+            originalPaths = json.load( pathsHandle )[ "paths" ]
+        sceneFile, assetsFile = self.GetFilenames( originalPaths, mapPath, texturePaths )
+        sceneDirectory = os.path.dirname( sceneFile )
+        if not os.path.isdir( sceneDirectory ):
+            try:
+                os.makedirs( sceneDirectory )
+            except OSError:
+                if not os.path.isdir( sceneDirectory ):
+                    raise
+        os.replace( tempAssetsFile, assetsFile )
+        os.replace( tempSceneFile, sceneFile )
+
+        with io.open( tempPathsFile, mode="w", encoding="utf-8" ) as pathsHandle:
+            pathsHandle.write( u"%s" % json.dumps( { "scene": self.SceneState, "paths": originalPaths } ) )
+        os.replace( tempPathsFile, self.PathsFile )
+        return sceneFile
+
+class UnixSocketException( Exception ):
+    def __init__( self, message ):
+        Exception.__init__( self, message )
+        self.Message = message
+
+class UnixSocketTimeoutException( UnixSocketException ):
+    pass
+
+# The exceptions raised by the Cinema 4D socket, whichever transport it uses.
+SOCKET_EXCEPTIONS = ( SimpleSocketException, UnixSocketException )
+SOCKET_TIMEOUT_EXCEPTIONS = ( SimpleSocketTimeoutException, UnixSocketTimeoutException )
+
+class UnixListeningSocket( object ):
+    """
+    A listening socket on a Unix domain socket path with the interface of FranticX's ListeningSocket that the controller
+    uses. Messages are framed the same way: a 4-byte big-endian length followed by the UTF-8 encoded message. Only the
+    Worker's user can connect to it, and the socket file is removed when it stops listening.
+    """
+    def __init__( self, path, ownedDirectory=None ):
+        """
+        :param path: the path of the socket file
+        :param ownedDirectory: a directory created for the socket file, removed when the socket stops listening
+        """
+        self.Path = path
+        self.Address = "unix:" + path
+        self.OwnedDirectory = ownedDirectory
+        self.listener = None
+        self.connection = None
+        self.buffer = b""
+
+    @property
+    def IsListening( self ):
+        return self.listener is not None
+
+    @property
+    def IsConnected( self ):
+        return self.connection is not None
+
+    def StartListening( self, backlog ):
+        if os.path.exists( self.Path ):
+            os.remove( self.Path )
+        listener = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        try:
+            listener.bind( self.Path )
+            os.chmod( self.Path, 0o600 )
+            listener.listen( backlog )
+        except socket.error as e:
+            listener.close()
+            raise UnixSocketException( str( e ) )
+        self.listener = listener
+
+    def StopListening( self ):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.remove( self.Path )
+            except OSError:
+                pass
+        if self.OwnedDirectory:
+            shutil.rmtree( self.OwnedDirectory, ignore_errors=True )
+            self.OwnedDirectory = None
+
+    def WaitForConnection( self, timeoutMilliseconds, disconnectExisting ):
+        if self.connection is not None:
+            if not disconnectExisting:
+                return
+            self.Disconnect( False )
+
+        self.listener.settimeout( timeoutMilliseconds / 1000.0 )
+        try:
+            connection, _ = self.listener.accept()
+        except socket.timeout:
+            raise UnixSocketTimeoutException( "Timed out waiting for a connection" )
+        except socket.error as e:
+            raise UnixSocketException( str( e ) )
+        self.connection = connection
+        self.buffer = b""
+
+    def Disconnect( self, stopListening ):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            finally:
+                self.connection = None
+        if stopListening:
+            self.StopListening()
+
+    def Send( self, message ):
+        if self.connection is None:
+            raise UnixSocketException( "The socket is not connected" )
+        data = message.encode( "utf-8" )
+        self.connection.settimeout( None )
+        try:
+            self.connection.sendall( struct.pack( ">I", len( data ) ) + data )
+        except socket.error as e:
+            self.Disconnect( False )
+            raise UnixSocketException( str( e ) )
+
+    def Receive( self, timeoutMilliseconds ):
+        if self.connection is None:
+            raise UnixSocketException( "The socket is not connected" )
+
+        self.fill( 1, time.time() + timeoutMilliseconds / 1000.0 )
+        # Once a message has started arriving, wait for the rest of it regardless of the timeout.
+        self.fill( 4, None )
+        length = struct.unpack( ">I", self.buffer[ :4 ] )[ 0 ]
+        self.fill( 4 + length, None )
+
+        message = self.buffer[ 4:4 + length ]
+        self.buffer = self.buffer[ 4 + length: ]
+        return message.decode( "utf-8" )
+
+    def fill( self, size, deadline ):
+        while len( self.buffer ) < size:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise UnixSocketTimeoutException( "Timed out waiting for a message" )
+            self.connection.settimeout( remaining )
+            try:
+                packet = self.connection.recv( 65536 )
+            except socket.timeout:
+                raise UnixSocketTimeoutException( "Timed out waiting for a message" )
+            except socket.error as e:
+                self.Disconnect( False )
+                raise UnixSocketException( str( e ) )
+            if not packet:
+                self.Disconnect( False )
+                raise UnixSocketException( "The connection was closed by the remote host" )
+            self.buffer += packet
+
+def EstimatePeakMemory( sceneHistoryDir, take, sampleCount=5 ):
+    """
+    Estimates the peak memory of a Cinema 4D session from the render history of a scene and renderer: the largest peak
+    recorded by the most recent tasks of the take.
+    :return: the estimate in bytes, or None if no task of the scene has recorded its peak memory yet
+    """
+    records = LoadRenderHistory( sceneHistoryDir, lambda record: record.get( "take", "" ) == take and record.get( "peakMemory" ) )
+    return max( record[ "peakMemory" ] for record in records[ -sampleCount: ] ) if records else None
+
+class SessionReservations( object ):
+    """
+    The memory reserved by the Cinema 4D sessions on this machine, with one file per session so that the render threads of
+    every Worker see each other. Used as a context manager that locks the directory, so that checking the free memory and
+    reserving it can not interleave with another session doing the same.
+    """
+    def __init__( self, directory=SESSION_RESERVATION_DIRECTORY ):
+        self.Directory = directory
+        self.lockHandle = None
+
+    def __enter__( self ):
+        try:
+            os.makedirs( self.Directory )
+        except OSError:
+            if not os.path.isdir( self.Directory ):
+                raise
+        self.lockHandle = open( os.path.join( self.Directory, "reservations.lock" ), "a" )
+        fcntl.flock( self.lockHandle, fcntl.LOCK_EX )
+        return self
+
+    def __exit__( self, *exc ):
+        fcntl.flock( self.lockHandle, fcntl.LOCK_UN )
+        self.lockHandle.close()
+
+    def Outstanding( self, exclude=None ):
+        """
+        Returns the memory that the other sessions on this machine are expected to use on top of what they use now, since
+        a session that is still loading its scene has not reached its peak yet. Reservations left behind by Workers that
+        have exited are removed.
+        :param exclude: the name of a reservation to skip
+        :return: a tuple of the outstanding memory in bytes and the number of sessions
+        """
+        outstanding = 0
+        sessionCount = 0
+        for name in os.listdir( self.Directory ):
+            if not name.endswith( ".json" ) or name == "%s.json" % exclude:
+                continue
+            path = os.path.join( self.Directory, name )
+            try:
+                with io.open( path, mode="r", encoding="utf-8" ) as reservationHandle:
+                    reservation = json.load( reservationHandle )
+            except ( IOError, OSError, ValueError ):
+                continue
+            if not ProcessExists( reservation[ "owner" ] ):
+                self.Release( name[ :-5 ] )
+                continue
+            used = ReadProcessTreeMemory( reservation[ "pid" ], "VmRSS" ) if reservation.get( "pid" ) else 0
+            outstanding += max( reservation[ "expected" ] - used, 0 )
+            sessionCount += 1
+        return outstanding, sessionCount
+
+    def Reserve( self, name, expected, pid=None ):
+        with io.open( os.path.join( self.Directory, "%s.json" % name ), mode="w", encoding="utf-8" ) as reservationHandle:
+            reservationHandle.write( u"%s" % json.dumps( { "owner": os.getpid(), "pid": pid, "expected": expected } ) )
+
+    def Release( self, name ):
+        try:
+            os.remove( os.path.join( self.Directory, "%s.json" % name ) )
+        except OSError:
+            pass
     
 ######################################################################
 ## This is the main DeadlinePlugin class for the Cinema4D plugin.
@@ -60,11 +492,19 @@ class Cinema4DBatchPlugin( DeadlinePlugin ):
         self.MyCinema4DController.slaveDirectory = self.GetSlaveDirectory()
         
         # Start Cinema4D.
-        self.MyCinema4DController.StartCinema4D()
+        try:
+            self.MyCinema4DController.StartCinema4D()
+        except:
+            self.MyCinema4DController.SaveCapturedLog()
+            raise
         
     def RenderTasks( self ):
         self.LogInfo( "Render Tasks called" )
-        self.MyCinema4DController.RenderTasks()
+        try:
+            self.MyCinema4DController.RenderTasks()
+        except:
+            self.MyCinema4DController.SaveCapturedLog()
+            raise
         
     def EndJob( self ):
         self.LogInfo( "End Job called - shutting down Cinema 4D Batch plugin" )
@@ -72,6 +512,8 @@ class Cinema4DBatchPlugin( DeadlinePlugin ):
         if self.MyCinema4DController:
             # End the Cinema4D job (unloads the scene file, etc).
             self.MyCinema4DController.EndCinema4DJob()
+
+        RemoveVerifiedPaths( os.path.join( self.GetSlaveDirectory(), "preflight" ), self.GetJob().JobId )
         
 class Cinema4DController( object ):
     Plugin = None
@@ -81,14 +523,41 @@ class Cinema4DController( object ):
     Cinema4DStartupFile = ""
     slaveDirectory = ""
     Cinema4DFilename = ""
+    MappedSceneCache = None
+    JobManifest = None
     Cinema4DRenderExecutable = ""
+    Cinema4DInstall = None
+    PluginFiltering = False
     ScriptFilename = ""
     ScriptJob = False
     
     ManagedCinema4DProcessRenderArgument = ""
     ManagedCinema4DProcessStartupDirectory = ""
     ManagedCinema4DProcessRenderExecutable = ""
+    CpuPartition = None
+    OriginalCpuAffinity = None
+    Cgroup = None
+    ResourceSampler = None
+    ResourceSamplerHasTask = False
+    LiveMetrics = None
+    RedshiftCache = None
+    Cinema4DPid = None
+    Cinema4DStartTime = None
+    MemoryReservation = None
+    ExpectedPeakMemory = None
+    ExportShards = None
+    ExportShardReservations = []
+    HangWatchdog = None
+    StdoutCapture = None
+    StartupCommands = []
+    ScriptTemplate = ""
+    DuplicateFramesFile = ""
+    GICacheKey = None
+    GICachePrepass = None
+    SessionCrashes = 0
     AuthenticationToken = ""
+    SessionMarker = ""
+    SessionId = ""
     
     LoadCinema4DTimeout = 1000
     ProgressUpdateTimeout = 8000
@@ -117,6 +586,11 @@ class Cinema4DController( object ):
         self.LoadCinema4DTimeout = self.Plugin.GetIntegerConfigEntryWithDefault( "LoadC4DTimeout", 1000 )
         self.ProgressUpdateTimeout = self.Plugin.GetIntegerConfigEntryWithDefault( "ProgressUpdateTimeout", 8000 )
         
+        self.TaskStats = TaskStatistics()
+        self.JobManifest = JobManifest( self.Plugin, self.MapPath )
+        # Timings of the Cinema 4D session, recorded with the first task it renders.
+        self.SessionTimings = {}
+
         # Create the temp script file.
         self.renderTempDirectory = self.Plugin.CreateTempDirectory( "thread" + str(self.Plugin.GetThreadNumber()) )
         self.CancellationTokenPath = self.ProcessPath( os.path.join( self.renderTempDirectory, "cancellation.token" ) )
@@ -133,8 +607,9 @@ class Cinema4DController( object ):
         if self.Plugin.version < 15:
             self.Plugin.FailRender( "Cinema 4D " + str(self.Plugin.version) + " is not supported for the Batch plugin, please use the normal Cinema 4D plugin.")
 
-        self.Cinema4DRenderExecutable = self.Plugin.GetRenderExecutable( "C4D_" + str(self.Plugin.version) + "_RenderExecutable" , "Cinema 4D %s" % self.Plugin.version )
-    
+        self.Cinema4DInstall = GetCinema4DInstall( self.Plugin )
+        self.Cinema4DRenderExecutable = self.Cinema4DInstall[ "executable" ]
+
     def ProcessPath( self, filepath ):
         if SystemUtils.IsRunningOnWindows():
             filepath = filepath.replace("/","\\")
@@ -144,6 +619,9 @@ class Cinema4DController( object ):
             filepath = filepath.replace("\\","/")
         return filepath
 
+    def MapPath( self, filepath ):
+        return self.ProcessPath( RepositoryUtils.CheckPathMapping( filepath ) )
+
     def setDirectoryToLoadPlugin( self ):
         """
         Sets up the environment to tell Cinema 4D where to load DeadlineConnect.pyp.
@@ -173,20 +651,18 @@ class Cinema4DController( object ):
             for additional info about the bug and other workarounds.
             """
             
-            parent_dir = os.path.dirname(self.Cinema4DRenderExecutable)
-            if SystemUtils.IsRunningOnMac():
-                # On MacOS executable will be at '/Applications/MAXON CINEMA 4D R24/Commandline.app/Contents/MacOS/Commandline'.
-                # The 'plugins' folder is located 3 levels higher, together with 'Commandline.app'
-                parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(parent_dir)))
-
-            defaultPluginsDir = os.path.join(parent_dir, 'plugins')
+            defaultPluginsDir = self.Cinema4DInstall[ "pluginsDir" ]
 
             if defaultPluginsDir not in pluginDirs:
-                if os.path.exists(defaultPluginsDir):
+                if self.Cinema4DInstall[ "hasPluginsDir" ]:
                     pluginDirs.append(defaultPluginsDir)
                 else:
                     self.Plugin.LogWarning('Failed to find Default plugins directory (%s). If Cinema 4D is not able to access the default plugins directory it may render incorrectly.' %defaultPluginsDir)
 
+        # DeadlineConnect.pyp is always loaded, the other plugins may be filtered by the job's renderer.
+        filteredDirs, self.PluginFiltering = FilterPluginDirectories( self.Plugin, pluginDirs[ 1: ], self.JobManifest.GetRenderer() )
+        pluginDirs = pluginDirs[ :1 ] + filteredDirs
+
         # Pre-pending our plugin dir due to a bug in R18 & R19 not supporting multiple paths for C4D_PLUGINS_DIR
         c4dPluginDirs = ';'.join(pluginDirs)
 
@@ -198,20 +674,44 @@ class Cinema4DController( object ):
         sceneFile = self.Plugin.GetPluginInfoEntryWithDefault( "SceneFile", self.Plugin.GetDataFilename() )
         sceneFile = RepositoryUtils.CheckPathMapping( sceneFile )
         sceneFile = self.ProcessPath( sceneFile )
+        self.Cinema4DFilename = sceneFile
+        self.GICacheKey = None
+
+        if not self.LiveMetrics:
+            self.LiveMetrics = CreateLiveMetrics( self.Plugin, self.MapPath, "Cinema4DBatch", lambda: self.Cinema4DPid )
+
+        # A path mapped copy of the scene that an earlier session of the job saved is loaded instead of mapping the scene again.
+        self.MappedSceneCache = None
+        mappedScene = None
+        if self.Plugin.GetBooleanConfigEntryWithDefault( "EnableMappedSceneCache", False ) and len( RepositoryUtils.GetPathMappings() ) > 0:
+            self.MappedSceneCache = MappedSceneCache( os.path.join( RepositoryUtils.GetJobAuxiliaryPath( self.Plugin.GetJob() ), "MappedScenes" ), sceneFile )
+            mappedScene = self.MappedSceneCache.Lookup( RepositoryUtils.CheckPathMapping, self.GetTexturePaths() )
+
+        # Check the assets listed in the job's manifest, or in the mapped scene's manifest, before paying for Cinema 4D's
+        # startup. Without a manifest the assets are listed by Cinema 4D once the scene has been loaded and path mapped.
+        self.SessionTimings = {}
+        preflightAssets = self.Plugin.GetBooleanConfigEntryWithDefault( "EnableAssetPreflight", False )
+        if preflightAssets:
+            assetPaths = self.JobManifest.GetAssetPaths()
+            if assetPaths is None and mappedScene:
+                assetPaths = [ path for path in ReadAssetManifest( mappedScene[ 1 ] ) if os.path.isabs( path ) ]
+            if assetPaths is not None:
+                startTime = time.time()
+                RunAssetPreflight( self.Plugin, assetPaths )
+                self.SessionTimings[ "preflight" ] = time.time() - startTime
+                preflightAssets = False
         
+        # The memory reservation and the cgroup are named after the session, since in abandon mode the previous session of
+        # this render thread can still be running, and releasing its reservation and cgroup, once the next one has started.
+        self.SessionId = uuid.uuid4().hex[:8]
+        self.WaitForMemoryAdmission()
+
         self.setDirectoryToLoadPlugin()
         
         self.AuthenticationToken = str( DateTime.Now.TimeOfDay.Ticks )
         
         if SystemUtils.IsRunningOnLinux() and self.Plugin.GetBooleanConfigEntryWithDefault( "SetLinuxEnvironment", True ):
-            c4dDir = os.path.dirname( self.Cinema4DRenderExecutable )
-            ldPath = os.environ.get( "LD_LIBRARY_PATH", "" )
-            pyPath = os.environ.get( "PYTHONPATH", "" )
-            path = os.environ.get( "PATH", "" )
-            
-            modLdPath = "%s/../lib64:%s/resource/modules/python/Python.linux64.framework/lib64:%s/resource/modules/embree.module/libs/linux64:%s" % ( c4dDir, c4dDir, c4dDir, ldPath )
-            modPyPath = "%s/resource/modules/python/Python.linux64.framework/lib/python2.7:%s/resource/modules/python/Python.linux64.framework/lib64/python2.7/lib-dynload:%s" % ( c4dDir, c4dDir, pyPath )
-            modPath = "%s:%s" % ( path, c4dDir )
+            modLdPath, modPyPath, modPath = GetLinuxEnvironment( self.Cinema4DInstall )
             
             self.Plugin.LogInfo( "[LD_LIBRARY_PATH] set to %s" % modLdPath )
             self.Plugin.LogInfo( "[PYTHONPATH] set to %s" % modPyPath )
@@ -220,13 +720,12 @@ class Cinema4DController( object ):
             self.Plugin.SetProcessEnvironmentVariable( "PYTHONPATH", modPyPath )
             self.Plugin.SetProcessEnvironmentVariable( "PATH", modPath )
 
+        self.RedshiftCache = CreateRedshiftCache( self.Plugin, self.MapPath, self.JobManifest.GetRenderer() )
+        if self.RedshiftCache:
+            self.Plugin.SetProcessEnvironmentVariable( "REDSHIFT_CACHEPATH", self.RedshiftCache.Directory )
+
         # Initialize the listening socket.
-        self.Cinema4DSocket = ListeningSocket()
-        self.Cinema4DSocket.StartListening( 0, True, True, 10 )
-        if not self.Cinema4DSocket.IsListening:
-            self.Plugin.FailRender( "Failed to open a port for listening to Cinema 4D" )
-        else:
-            self.Plugin.LogInfo( "Cinema 4D socket connection port: %d" % self.Cinema4DSocket.Port )
+        connectAddress = self.CreateCinema4DSocket()
         
         parameters = [ "-nogui" ]
 
@@ -243,7 +742,7 @@ class Cinema4DController( object ):
 
         # If the integrated submitter has specified a renderer other than Hardware OpenGL
         # we can skip loading OpenGL
-        renderer = self.Plugin.GetPluginInfoEntryWithDefault( "Renderer", "" )
+        renderer = self.JobManifest.GetRenderer()
         if self.loadOpenGL and renderer not in ( "", "ogl_hardware" ):
             self.loadOpenGL = False
 
@@ -259,6 +758,11 @@ class Cinema4DController( object ):
         if os.environ.get( "REDSHIFT_LICENSE_MAXON_DISABLE", "False" ) == "True" or (renderer != "redshift" and renderer != ""):
             parameters.append("-redshift-license-maxon-disable")
 
+        # LaunchCinema4D pins this thread to the CPU partition while it starts Cinema 4D, and then restores this affinity.
+        if self.OriginalCpuAffinity is None and hasattr( os, "sched_getaffinity" ):
+            self.OriginalCpuAffinity = os.sched_getaffinity( 0 )
+        self.CpuPartition = GetCpuPartition( self.Plugin, self.OriginalCpuAffinity )
+        self.Cgroup = CreateCgroup( self.Plugin, "c4d-%s-%s-%s" % ( self.Plugin.GetSlaveName(), self.Plugin.GetThreadNumber(), self.SessionId ) )
         threads = self.GetNumThreads()
         if threads > 0:
             parameters.append( "-threads %s" % str( threads ) )
@@ -272,24 +776,51 @@ class Cinema4DController( object ):
         if redshiftLogVerbosity != "None":
             parameters.append( "-redshift-log-console %s" % redshiftLogVerbosity )
         
+        # Export shards are started with the same arguments, but run their commands without a connection to Deadline.
+        self.SessionParameters = list( parameters )
         self.importTestFile = os.path.join( self.Plugin.CreateTempDirectory( "importTest" ), "importCheck.txt")
-        parameters.append( '"-DeadlineConnect %s %s \'%s\'"' % ( self.Cinema4DSocket.Port, self.AuthenticationToken, self.importTestFile ) )
+        # The connection address is unique to this session, so it also tells this session's Cinema 4D process apart.
+        self.SessionMarker = "-DeadlineConnect %s %s " % ( connectAddress, self.AuthenticationToken )
+        parameters.append( '"%s\'%s\'"' % ( self.SessionMarker, self.importTestFile ) )
 
         parameterString = " ".join(parameters)
         self.Plugin.LogInfo( "Parameters: %s" % parameterString )
+        startTime = time.time()
         self.LaunchCinema4D( self.Cinema4DRenderExecutable, parameterString, os.path.dirname( self.Cinema4DRenderExecutable ) )
         self.WaitForConnection( "Cinema 4D startup" )
         self.Plugin.LogInfo( "Connected to Cinema 4D" )
         
         verbose = self.Plugin.GetBooleanConfigEntryWithDefault( "Verbose", False )
         
-        self.Cinema4DSocket.Send( "Verbose:" + str( verbose ) )
-        self.Plugin.LogInfo( self.PollUntilComplete( False ) )
-
-        self.Cinema4DSocket.Send( "DeadlineStartup:" + sceneFile )
-        self.Plugin.LogInfo( self.PollUntilComplete( False ) )
-
-        self.SendPathMapping()
+        self.StartupCommands = []
+        self.SendStartupCommand( "Verbose:" + str( verbose ) )
+        self.SessionTimings[ "boot" ] = time.time() - startTime
+        self.Plugin.LogInfo( "Cinema 4D started in %.2f seconds %s" % ( self.SessionTimings[ "boot" ], "with plugin filtering" if self.PluginFiltering else "with every plugin" ) )
+
+        startTime = time.time()
+        self.SendStartupCommand( "DeadlineStartup:" + ( mappedScene[ 0 ] if mappedScene else sceneFile ) )
+        self.SessionTimings[ "load" ] = time.time() - startTime
+
+        startTime = time.time()
+        if mappedScene:
+            self.Plugin.LogInfo( "Loaded the path mapped scene saved by an earlier session of the job: %s" % mappedScene[ 0 ] )
+            texPathFile = self.createTexturePathFile()
+            if texPathFile:
+                self.SendStartupCommand( "TexturePaths:" + texPathFile )
+        else:
+            self.SendPathMapping()
+            if self.MappedSceneCache:
+                self.SaveMappedScene()
+        self.SessionTimings[ "pathMapping" ] = time.time() - startTime
+
+        if preflightAssets:
+            startTime = time.time()
+            RunAssetPreflight( self.Plugin, self.ListSceneAssets() )
+            self.SessionTimings[ "preflight" ] = time.time() - startTime
+
+        startTime = time.time()
+        self.SendAssetCache()
+        self.SessionTimings[ "assetCache" ] = time.time() - startTime
     
     def GetNumThreads( self ):
         """
@@ -297,6 +828,9 @@ class Cinema4DController( object ):
         :return: The number of threads
         """
         threads = self.Plugin.GetIntegerPluginInfoEntryWithDefault( "Threads", 0 )
+        # The CPU partition is already limited to the Worker's CPU affinity.
+        if self.CpuPartition:
+            return len( self.CpuPartition ) if threads == 0 else min( len( self.CpuPartition ), threads )
         # OverrideCpuAffinity - Returns whether the Worker has its CPU affinity override enabled
         if self.Plugin.OverrideCpuAffinity():
             #CPUAffinity - returns a list containing the indices of all CPUs the Worker has in its affinity
@@ -307,6 +841,72 @@ class Cinema4DController( object ):
                 threads = min( affinity, threads )
                 
         return threads   
+
+    def WaitForMemoryAdmission( self ):
+        """
+        Waits until this machine has enough free memory for another Cinema 4D session of the scene, going by the peak memory
+        that earlier tasks of the scene, take and renderer recorded in the render history, and reserves it. The memory that
+        the other sessions on the machine are expected to use on top of what they use now is not counted as free. A session
+        is always admitted if it would be the only one on the machine, so it can not wait forever. A warning is logged every
+        MemoryAdmissionTimeout seconds that it waits.
+        :return: None
+        """
+        if not self.Plugin.GetBooleanConfigEntryWithDefault( "EnableMemoryAdmission", False ):
+            return
+        if fcntl is None or not SystemUtils.IsRunningOnLinux():
+            self.Plugin.LogWarning( "Memory admission control is only supported on Linux, so Cinema 4D is started without checking the free memory" )
+            return
+        peakMemory = None
+        historyDir = self.Plugin.GetConfigEntryWithDefault( "RenderHistoryDirectory", "" ).strip()
+        if historyDir:
+            historyDir = self.ProcessPath( RepositoryUtils.CheckPathMapping( historyDir ) )
+            sceneFile = self.Plugin.GetPluginInfoEntryWithDefault( "SceneFile", self.Plugin.GetDataFilename() )
+            renderer = self.Plugin.GetPluginInfoEntryWithDefault( "Renderer", "" )
+            peakMemory = EstimatePeakMemory( GetRenderHistoryDirectory( historyDir, sceneFile, renderer ), self.Plugin.GetPluginInfoEntryWithDefault( "Take", "" ) )
+        if peakMemory is None:
+            # Until the render history has recorded the scene's peak memory, the estimate made at submission is used.
+            peakMemory = self.JobManifest.GetEntry( "memoryEstimate" )
+            if peakMemory:
+                self.Plugin.LogInfo( "No peak memory has been recorded for this scene yet, so the estimate of %s from the job's manifest is used" % FormatMegabytes( peakMemory ) )
+        if not peakMemory:
+            self.Plugin.LogInfo( "No peak memory has been recorded for this scene yet and the job's manifest has no estimate, so Cinema 4D is started without checking the free memory" )
+            return
+
+        headroom = self.Plugin.GetIntegerConfigEntryWithDefault( "MemoryAdmissionHeadroom", 10 )
+        expected = int( peakMemory * ( 100 + headroom ) / 100.0 )
+        timeout = self.Plugin.GetIntegerConfigEntryWithDefault( "MemoryAdmissionTimeout", 600 )
+        name = re.sub( r"[^\w.-]", "_", "%s-%s-%s" % ( self.Plugin.GetSlaveName(), self.Plugin.GetThreadNumber(), self.SessionId ) )
+        startTime = time.time()
+        warningTime = startTime
+        waiting = False
+        while True:
+            with SessionReservations() as reservations:
+                outstanding, sessionCount = reservations.Outstanding( exclude=name )
+                available = ReadMemInfo().get( "MemAvailable", 0 ) - outstanding
+                if available >= expected or sessionCount == 0:
+                    reservations.Reserve( name, expected )
+                    self.MemoryReservation = name
+                    self.ExpectedPeakMemory = expected
+                    self.Plugin.LogInfo( "Starting Cinema 4D: the scene needs about %s (a peak of %s plus %s%% headroom) and %s is free after the %s other session(s) on this machine%s" % (
+                        FormatMegabytes( expected ), FormatMegabytes( peakMemory ), headroom, FormatMegabytes( max( available, 0 ) ), sessionCount,
+                        ", after waiting %.0f seconds" % ( time.time() - startTime ) if waiting else "" ) )
+                    return
+
+            # Failing the task would count as an error against the job and the Worker, and starting Cinema 4D without a
+            # reservation would oversubscribe the memory, so the session keeps waiting.
+            if not waiting:
+                self.Plugin.LogInfo( "Waiting for free memory: the scene needs about %s and %s is free after the %s other session(s) on this machine" % ( FormatMegabytes( expected ), FormatMegabytes( max( available, 0 ) ), sessionCount ) )
+                waiting = True
+            elif time.time() - warningTime >= timeout:
+                self.Plugin.LogWarning( "Still waiting for free memory after %.0f seconds: the scene needs about %s and %s is free after the %s other session(s) on this machine" % (
+                    time.time() - startTime, FormatMegabytes( expected ), FormatMegabytes( max( available, 0 ) ), sessionCount ) )
+                warningTime = time.time()
+            if self.Plugin.IsCanceled():
+                self.Plugin.FailRender( "Render was canceled" )
+            time.sleep( MEMORY_ADMISSION_POLL_SECONDS )
+
+    def SetRenderPhase( self, phase, frame=None ):
+        SetRenderPhase( self.ResourceSampler, self.LiveMetrics, phase, frame )
     
     def GetGpuOverrides( self ):
         # If the number of gpus per task is set, then need to calculate the gpus to use.
@@ -350,6 +950,15 @@ class Cinema4DController( object ):
         
         return resultGPUs
         
+    def SendStartupCommand( self, command ):
+        """
+        Sends a command of the session's startup sequence to Cinema 4D and waits for it to complete. The command is recorded,
+        so that the startup sequence can be replayed if Cinema 4D has to be restarted.
+        """
+        self.StartupCommands.append( command )
+        self.Cinema4DSocket.Send( command )
+        self.Plugin.LogInfo( self.PollUntilComplete( False ) )
+
     def SendPathMapping( self ):
         pathMappings = RepositoryUtils.GetPathMappings()
         if len( pathMappings ) > 0:
@@ -358,9 +967,114 @@ class Cinema4DController( object ):
             if texPathFile:
                 args.append( texPathFile )
             
-            self.Cinema4DSocket.Send( "Pathmap:" + ";".join(args) )
-            self.Plugin.LogInfo( self.PollUntilComplete( False ) )
+            self.SendStartupCommand( "Pathmap:" + ";".join(args) )
     
+    def CreateCinema4DSocket( self ):
+        """
+        Creates the socket Cinema 4D connects to. With UseUnixSocket it is a Unix domain socket in a temporary folder of the
+        Worker, which saves the TCP stack on every command and reply, and falls back to a TCP port on localhost if Unix
+        domain sockets are not available.
+        :return: the address DeadlineConnect.pyp connects to: the port, or "unix:" followed by the socket path
+        """
+        if self.Plugin.GetBooleanConfigEntryWithDefault( "UseUnixSocket", False ):
+            if SystemUtils.IsRunningOnWindows() or not hasattr( socket, "AF_UNIX" ):
+                self.Plugin.LogWarning( "Unix domain sockets are not supported on this Worker, using a TCP port instead" )
+            else:
+                socketPath = os.path.join( self.Plugin.CreateTempDirectory( "connect" ), "c4d.sock" )
+                ownedDirectory = None
+                # Socket paths are limited to about 100 bytes, and DeadlineConnect.pyp's arguments are split on spaces.
+                if len( socketPath.encode( "utf-8" ) ) > 100 or " " in socketPath:
+                    ownedDirectory = tempfile.mkdtemp( prefix="c4dconnect" )
+                    socketPath = os.path.join( ownedDirectory, "c4d.sock" )
+
+                unixSocket = UnixListeningSocket( socketPath, ownedDirectory )
+                try:
+                    unixSocket.StartListening( 10 )
+                except UnixSocketException as e:
+                    unixSocket.StopListening()
+                    self.Plugin.LogWarning( "Failed to listen on the Unix domain socket %s, using a TCP port instead: %s" % ( socketPath, e.Message ) )
+                else:
+                    self.Cinema4DSocket = unixSocket
+                    self.Plugin.LogInfo( "Cinema 4D socket connection path: %s" % socketPath )
+                    return unixSocket.Address
+
+        self.Cinema4DSocket = ListeningSocket()
+        self.Cinema4DSocket.StartListening( 0, True, True, 10 )
+        if not self.Cinema4DSocket.IsListening:
+            self.Plugin.FailRender( "Failed to open a port for listening to Cinema 4D" )
+        else:
+            self.Plugin.LogInfo( "Cinema 4D socket connection port: %d" % self.Cinema4DSocket.Port )
+        return str( self.Cinema4DSocket.Port )
+
+    def GetTexturePaths( self ):
+        """
+        :return: the path mapped texture search paths of the job
+        """
+        texPathFile = self.createTexturePathFile()
+        if not texPathFile:
+            return []
+        with io.open( texPathFile, mode="r", encoding="utf-8" ) as texPathHandle:
+            return [ line.strip() for line in texPathHandle ]
+
+    def SaveMappedScene( self ):
+        """
+        Has Cinema 4D save the path mapped scene to the job's auxiliary folder, so that later sessions of the job on Workers
+        that map paths the same way can load it instead of mapping the scene again.
+        """
+        cache = self.MappedSceneCache
+        # The files are saved next to their final location under names of this session, so that they can be moved into place in one step.
+        tempBase = os.path.join( cache.Directory, ".%s_%s" % ( cache.Name, self.AuthenticationToken ) )
+        tempFiles = [ tempBase + extension for extension in ( ".c4d", ".paths.json", ".assets.json" ) ]
+        try:
+            if not os.path.isdir( cache.Directory ):
+                os.makedirs( cache.Directory )
+        except OSError as e:
+            self.Plugin.LogWarning( "Failed to create the mapped scene folder: %s" % e )
+            return
+
+        self.Cinema4DSocket.Send( "SaveMappedScene:" + ";".join( tempFiles ) )
+        self.Plugin.LogInfo( self.PollUntilComplete( False ) )
+        try:
+            self.Plugin.LogInfo( "Saved the path mapped scene for the later sessions of the job: %s" % cache.Store( tempFiles, RepositoryUtils.CheckPathMapping, self.GetTexturePaths() ) )
+        except ( IOError, OSError, ValueError ) as e:
+            self.Plugin.LogWarning( "Failed to save the path mapped scene: %s" % e )
+            for tempFile in tempFiles:
+                try:
+                    os.remove( tempFile )
+                except OSError:
+                    pass
+
+    def ListSceneAssets( self ):
+        """
+        Asks Cinema 4D for the (already path mapped) file paths used by the loaded scene.
+        :return: the list of asset paths
+        """
+        manifestFile = os.path.join( self.renderTempDirectory, "sceneAssets.json" )
+        self.Cinema4DSocket.Send( "ListAssets:" + manifestFile )
+        self.Plugin.LogInfo( self.PollUntilComplete( False ) )
+
+        return [ path for path in ReadAssetManifest( manifestFile ) if os.path.isabs( path ) ]
+
+    def SendAssetCache( self ):
+        """
+        Tells Cinema 4D to copy the textures, caches and light profiles referenced by the scene to the Worker-local asset cache
+        and to remap the scene's file parameters to the local copies. This runs after path mapping so that the remapped paths are cached.
+        :return: None
+        """
+        if not self.Plugin.GetBooleanConfigEntryWithDefault( "EnableAssetCache", False ):
+            return
+
+        cacheDir = self.Plugin.GetConfigEntryWithDefault( "AssetCacheDirectory", "" ).strip()
+        if not cacheDir:
+            cacheDir = os.path.join( self.slaveDirectory, "assetcache" )
+        cacheDir = self.ProcessPath( cacheDir )
+
+        maxCacheBytes = self.Plugin.GetIntegerConfigEntryWithDefault( "AssetCacheMaxSize", 50 ) * 1024 * 1024 * 1024
+        threads = self.Plugin.GetIntegerConfigEntryWithDefault( "AssetCacheThreads", 8 )
+
+        self.Plugin.LogInfo( "Caching scene assets in: %s" % cacheDir )
+        self.SendStartupCommand( "AssetCache:%s;%s;%s" % ( cacheDir, maxCacheBytes, threads ) )
+
     def createTexturePathFile( self ):
         texPathFileName = None
         if self.Plugin.GetBooleanPluginInfoEntryWithDefault( "HasTexturePaths", False ):
@@ -408,10 +1122,341 @@ class Cinema4DController( object ):
         deadlineC4DThreadScript.append( "            if effectiveRenderData is not None:" )
         deadlineC4DThreadScript.append( "                rd = effectiveRenderData[ 0 ]" )
     
+    def writeSkipDuplicateFrames( self, globalScript, deadlineC4DThreadScript ):
+        """
+        Adds the functions that hash the evaluated scene state of each frame to the render script: the global matrix of every
+        object, the points of the evaluated geometry in their caches, the animated parameters of the objects and tags, every
+        parameter of the materials and shaders, and the render camera. The caches cover Alembic, point animation, MoGraph,
+        deformers and simulated geometry, and hashing every material parameter covers the ones XPresso or Python drive without
+        an animation track. The script renders only the first frame of each distinct state and writes the other frames, with
+        the frame they duplicate, to self.DuplicateFramesFile. Particles are not in any cache, and movie, image sequence and
+        animated noise shaders change with the time alone, so every frame of a scene with either is rendered.
+        """
+        globalScript.append( "import hashlib" )
+        globalScript.append( "import json" )
+        globalScript.append( "import os" )
+        globalScript.append( "MOVIE_EXTENSIONS = ( '.avi', '.m4v', '.mov', '.mp4', '.mpeg', '.mpg', '.wmv' )" )
+        globalScript.append( "POINT_CHUNK = 4096" )
+        globalScript.append( "BUILDFLAGS_DEFAULT = c4d.BUILDFLAGS_NONE if hasattr( c4d, 'BUILDFLAGS_NONE' ) else c4d.BUILDFLAGS_0" )
+        globalScript.append( "def HashAnimatedParameters( digest, node ):" )
+        globalScript.append( "    for track in node.GetCTracks():" )
+        globalScript.append( "        try:" )
+        globalScript.append( "            value = node[ track.GetDescriptionID() ]" )
+        globalScript.append( "        except ( AttributeError, TypeError ):" )
+        globalScript.append( "            continue" )
+        globalScript.append( "        digest.update( repr( value ).encode( 'utf-8' ) )" )
+        # XPresso and Python can drive any parameter of a material without an animation track, so all of them are hashed.
+        globalScript.append( "def HashParameters( digest, node ):" )
+        globalScript.append( "    for bc, paramId, groupId in node.GetDescription( c4d.DESCFLAGS_DESC_0 ):" )
+        globalScript.append( "        try:" )
+        globalScript.append( "            value = node[ paramId ]" )
+        globalScript.append( "        except ( AttributeError, TypeError ):" )
+        globalScript.append( "            continue" )
+        globalScript.append( "        digest.update( repr( value ).encode( 'utf-8' ) )" )
+        globalScript.append( "def HashShaders( digest, shader ):" )
+        globalScript.append( "    while shader:" )
+        globalScript.append( "        HashParameters( digest, shader )" )
+        globalScript.append( "        HashShaders( digest, shader.GetDown() )" )
+        globalScript.append( "        shader = shader.GetNext()" )
+        globalScript.append( "def HashCacheTree( digest, node ):" )
+        globalScript.append( "    while node:" )
+        globalScript.append( "        digest.update( repr( node.GetMg() ).encode( 'utf-8' ) )" )
+        globalScript.append( "        HashGeometry( digest, node )" )
+        globalScript.append( "        HashCacheTree( digest, node.GetDown() )" )
+        globalScript.append( "        node = node.GetNext()" )
+        globalScript.append( "def HashGeometry( digest, op ):" )
+        globalScript.append( "    cache = op.GetDeformCache() or op.GetCache()" )
+        globalScript.append( "    if cache is not None:" )
+        globalScript.append( "        HashCacheTree( digest, cache )" )
+        globalScript.append( "    elif isinstance( op, c4d.PointObject ):" )
+        # Every point is hashed, since deformers, point level animation and cloth move points within the bounding box.
+        globalScript.append( "        points = op.GetAllPoints()" )
+        globalScript.append( "        digest.update( repr( len( points ) ).encode( 'utf-8' ) )" )
+        globalScript.append( "        for start in range( 0, len( points ), POINT_CHUNK ):" )
+        globalScript.append( "            digest.update( repr( points[ start:start + POINT_CHUNK ] ).encode( 'utf-8' ) )" )
+        globalScript.append( "def HasParticleEmitters( op ):" )
+        globalScript.append( "    while op:" )
+        globalScript.append( "        if op.CheckType( c4d.Oparticle ) or HasParticleEmitters( op.GetDown() ):" )
+        globalScript.append( "            return True" )
+        globalScript.append( "        op = op.GetNext()" )
+        globalScript.append( "    return False" )
+        globalScript.append( "def GetShaderParameter( shader, name ):" )
+        globalScript.append( "    parameter = getattr( c4d, name, None )" )
+        globalScript.append( "    if parameter is None:" )
+        globalScript.append( "        return None" )
+        globalScript.append( "    try:" )
+        globalScript.append( "        return shader[ parameter ]" )
+        globalScript.append( "    except ( AttributeError, TypeError ):" )
+        globalScript.append( "        return None" )
+        globalScript.append( "def IsTimeDependentShader( shader ):" )
+        globalScript.append( "    if shader.CheckType( c4d.Xbitmap ):" )
+        globalScript.append( "        filename = GetShaderParameter( shader, 'BITMAPSHADER_FILENAME' ) or ''" )
+        globalScript.append( "        if os.path.splitext( str( filename ) )[1].lower() in MOVIE_EXTENSIONS:" )
+        globalScript.append( "            return True" )
+        globalScript.append( "        timingFrom = GetShaderParameter( shader, 'BITMAPSHADER_TIMING_FROM' )" )
+        globalScript.append( "        timingTo = GetShaderParameter( shader, 'BITMAPSHADER_TIMING_TO' )" )
+        globalScript.append( "        return timingFrom is not None and timingTo is not None and timingTo > timingFrom" )
+        globalScript.append( "    if shader.CheckType( getattr( c4d, 'Xnoise', -1 ) ):" )
+        globalScript.append( "        return bool( GetShaderParameter( shader, 'SLA_NOISE_ANI_SPEED' ) )" )
+        globalScript.append( "    return False" )
+        globalScript.append( "def HasTimeDependentShaders( shader ):" )
+        globalScript.append( "    while shader:" )
+        globalScript.append( "        if IsTimeDependentShader( shader ) or HasTimeDependentShaders( shader.GetDown() ):" )
+        globalScript.append( "            return True" )
+        globalScript.append( "        shader = shader.GetNext()" )
+        globalScript.append( "    return False" )
+        globalScript.append( "def GetTimeDependentState( doc ):" )
+        globalScript.append( "    if HasParticleEmitters( doc.GetFirstObject() ):" )
+        globalScript.append( "        return 'particle emitters'" )
+        globalScript.append( "    material = doc.GetFirstMaterial()" )
+        globalScript.append( "    while material:" )
+        globalScript.append( "        if HasTimeDependentShaders( material.GetFirstShader() ):" )
+        globalScript.append( "            return 'movie, image sequence or animated noise shaders'" )
+        globalScript.append( "        material = material.GetNext()" )
+        globalScript.append( "    return None" )
+        globalScript.append( "def HashObjects( digest, op ):" )
+        globalScript.append( "    while op:" )
+        globalScript.append( "        digest.update( repr( op.GetMg() ).encode( 'utf-8' ) )" )
+        globalScript.append( "        HashGeometry( digest, op )" )
+        globalScript.append( "        HashAnimatedParameters( digest, op )" )
+        globalScript.append( "        tag = op.GetFirstTag()" )
+        globalScript.append( "        while tag:" )
+        globalScript.append( "            HashAnimatedParameters( digest, tag )" )
+        globalScript.append( "            tag = tag.GetNext()" )
+        globalScript.append( "        HashObjects( digest, op.GetDown() )" )
+        globalScript.append( "        op = op.GetNext()" )
+        globalScript.append( "def HashSceneState( doc, frame, fps ):" )
+        globalScript.append( "    doc.SetTime( c4d.BaseTime( frame, fps ) )" )
+        globalScript.append( "    doc.ExecutePasses( None, True, True, True, BUILDFLAGS_DEFAULT )" )
+        globalScript.append( "    digest = hashlib.sha1()" )
+        globalScript.append( "    HashObjects( digest, doc.GetFirstObject() )" )
+        globalScript.append( "    material = doc.GetFirstMaterial()" )
+        globalScript.append( "    while material:" )
+        globalScript.append( "        HashParameters( digest, material )" )
+        globalScript.append( "        HashShaders( digest, material.GetFirstShader() )" )
+        globalScript.append( "        material = material.GetNext()" )
+        globalScript.append( "    renderBaseDraw = doc.GetRenderBaseDraw()" )
+        globalScript.append( "    camera = renderBaseDraw.GetSceneCamera( doc ) if renderBaseDraw is not None else None" )
+        globalScript.append( "    if camera is not None:" )
+        globalScript.append( "        digest.update( repr( camera.GetMg() ).encode( 'utf-8' ) )" )
+        globalScript.append( "        HashAnimatedParameters( digest, camera )" )
+        globalScript.append( "    return digest.hexdigest()" )
+        globalScript.append( "def SkipDuplicateFrames( doc, fps, frameRanges, duplicatesFile ):" )
+        globalScript.append( "    timeDependentState = GetTimeDependentState( doc )" )
+        globalScript.append( "    if timeDependentState:" )
+        globalScript.append( "        with open( duplicatesFile, 'w' ) as duplicatesHandle:" )
+        globalScript.append( "            json.dump( {}, duplicatesHandle )" )
+        globalScript.append( "        print ( 'WARNING: Rendering all frames because the scene has %s, whose state can not be compared between frames' % timeDependentState )" )
+        globalScript.append( "        return frameRanges" )
+        globalScript.append( "    originalTime = doc.GetTime()" )
+        globalScript.append( "    firstFrames = {}" )
+        globalScript.append( "    duplicates = {}" )
+        globalScript.append( "    renderRanges = []" )
+        globalScript.append( "    for frameFrom, frameTo in frameRanges:" )
+        globalScript.append( "        for frame in range( frameFrom, frameTo + 1 ):" )
+        globalScript.append( "            key = HashSceneState( doc, frame, fps )" )
+        globalScript.append( "            if key in firstFrames:" )
+        globalScript.append( "                duplicates[ str( frame ) ] = firstFrames[ key ]" )
+        globalScript.append( "            elif renderRanges and frame == renderRanges[-1][1] + 1:" )
+        globalScript.append( "                firstFrames[ key ] = frame" )
+        globalScript.append( "                renderRanges[-1] = ( renderRanges[-1][0], frame )" )
+        globalScript.append( "            else:" )
+        globalScript.append( "                firstFrames[ key ] = frame" )
+        globalScript.append( "                renderRanges.append( ( frame, frame ) )" )
+        globalScript.append( "    doc.SetTime( originalTime )" )
+        globalScript.append( "    doc.ExecutePasses( None, True, True, True, BUILDFLAGS_DEFAULT )" )
+        globalScript.append( "    with open( duplicatesFile, 'w' ) as duplicatesHandle:" )
+        globalScript.append( "        json.dump( duplicates, duplicatesHandle )" )
+        globalScript.append( "    print ( 'Skipping %d duplicate frame(s) of %d with the same scene state as an earlier frame' % ( len( duplicates ), len( duplicates ) + len( firstFrames ) ) )" )
+        globalScript.append( "    return renderRanges" )
+
+        deadlineC4DThreadScript.append( "        frameRanges = SkipDuplicateFrames( self.deadlineDoc, fps, %s, r'%s' )" % ( FRAME_RANGES_PLACEHOLDER, self.DuplicateFramesFile ) )
+
+    def writeGICacheSettings( self, globalScript, deadlineC4DThreadScript, giCacheMode, renderer ):
+        """
+        Configures the Global Illumination cache of the render settings for a GI cache job. A prepass job computes the cache
+        for the frames of its task in full animation mode, into a temporary directory next to the scene's cache that
+        PublishGICache replaces it with. A render job loads the cache read-only and skips the prepass, if a prepass has been
+        computed for the current version of the scene, and otherwise computes GI in each task as usual.
+        :param giCacheMode: "Prepass" or "Load"
+        :param renderer: the job's Renderer
+        """
+        giCacheDir = self.Plugin.GetPluginInfoEntryWithDefault( "GICacheDirectory", "" ).strip()
+        if not giCacheDir:
+            self.Plugin.LogWarning( "The GI cache is not used because the job does not have a GI cache directory" )
+            return
+        if renderer not in ( "", "standard", "physical" ):
+            self.Plugin.LogWarning( "The GI cache is not used because it is only supported by the Standard and Physical renderers, not '%s'" % renderer )
+            return
+        giCacheDir = self.ProcessPath( RepositoryUtils.CheckPathMapping( giCacheDir ) )
+
+        if self.GICacheKey is None:
+            startTime = time.time()
+            self.GICacheKey = GetGICacheKey( self.Cinema4DFilename, self.Plugin.GetPluginInfoEntryWithDefault( "Take", "" ) )
+            self.Plugin.LogInfo( "The GI cache key of the scene is %s (computed in %.2f seconds)" % ( self.GICacheKey, time.time() - startTime ) )
+        cacheDir = os.path.join( giCacheDir, self.GICacheKey )
+
+        if giCacheMode == "Prepass":
+            # The published cache replaces the scene's cache for every frame, so it has to cover all of the job's frames.
+            jobFrames = [ int( frame ) for frame in self.Plugin.GetJob().JobFramesList ]
+            if not jobFrames or ( int( self.StartFrame ), int( self.EndFrame ) ) != ( min( jobFrames ), max( jobFrames ) ):
+                self.Plugin.FailRender( "A GI prepass task has to compute the cache of the job's whole frame range, but this task renders frames %s to %s of a job with frames %s. Submit the prepass job with a single task." % ( self.StartFrame, self.EndFrame, ", ".join( "%s-%s" % frameRange for frameRange in CompactFrameRanges( jobFrames ) ) ) )
+            try:
+                os.makedirs( giCacheDir )
+            except OSError:
+                if not os.path.isdir( giCacheDir ):
+                    raise
+            prepassDir = self.ProcessPath( tempfile.mkdtemp( dir=giCacheDir, prefix=self.GICacheKey + ".prepass-" ) )
+            self.GICachePrepass = ( prepassDir, cacheDir )
+            prepassStep = max( self.Plugin.GetIntegerPluginInfoEntryWithDefault( "GICachePrepassStep", 1 ), 1 )
+            self.Plugin.LogInfo( "Computing the GI cache of frames %s to %s, every %s frame(s)" % ( self.StartFrame, self.EndFrame, prepassStep ) )
+            settings = [ ( "AUTOSAVE", True ), ( "AUTOLOAD", False ), ( "SKIPPREPASS", False ), ( "PREPASSONLY", True ) ]
+            cachePath = prepassDir
+            deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_FRAMESTEP]=%d" % prepassStep )
+        else:
+            try:
+                with io.open( os.path.join( cacheDir, GI_CACHE_STAMP ), mode="r", encoding="utf-8" ) as stampHandle:
+                    stamp = json.load( stampHandle )
+            except ( IOError, OSError, ValueError ):
+                self.Plugin.LogWarning( "No GI cache has been computed for this version of the scene in %s, so this task computes its own GI" % giCacheDir )
+                return
+            self.Plugin.LogInfo( "Loading the GI cache of frames %s to %s that job %s computed on %s" % ( stamp[ "frames" ][ 0 ], stamp[ "frames" ][ 1 ], stamp[ "job" ], time.strftime( "%Y-%m-%d %H:%M:%S", time.localtime( stamp[ "time" ] ) ) ) )
+            settings = [ ( "AUTOSAVE", False ), ( "AUTOLOAD", True ), ( "SKIPPREPASS", True ), ( "PREPASSONLY", False ) ]
+            cachePath = cacheDir
+
+        globalScript.append( "def GetGlobalIlluminationSettings( renderData ):" )
+        globalScript.append( "    videopost = renderData.GetFirstVideoPost()" )
+        globalScript.append( "    while videopost:" )
+        globalScript.append( "        if videopost.GetType() == %d:" % GI_VIDEOPOST )
+        globalScript.append( "            return videopost" )
+        globalScript.append( "        videopost = videopost.GetNext()" )
+        globalScript.append( "    return None" )
+        # The names of the cache parameters have changed between versions of Cinema 4D, so a missing one is reported instead of failing the render.
+        globalScript.append( "def SetGICacheParameter( videopost, name, value ):" )
+        globalScript.append( "    parameter = getattr( c4d, 'GI_SETUP_DATA_EXTRA_CACHE_' + name, None )" )
+        globalScript.append( "    if parameter is None:" )
+        globalScript.append( "        print ( 'WARNING: this version of Cinema 4D does not have the GI cache parameter ' + name )" )
+        globalScript.append( "    else:" )
+        globalScript.append( "        videopost[parameter] = value" )
+
+        deadlineC4DThreadScript.append( "        giSettings = GetGlobalIlluminationSettings(self.renderData)" )
+        deadlineC4DThreadScript.append( "        if giSettings is None:" )
+        deadlineC4DThreadScript.append( "            print ( 'Global Illumination is not enabled in the render settings, so the GI cache is not used' )" )
+        if giCacheMode == "Prepass":
+            # Without Global Illumination a prepass would render the frames' images instead.
+            deadlineC4DThreadScript.append( "            return" )
+        deadlineC4DThreadScript.append( "        else:" )
+        for name, value in [ ( "FULLANIM", True ), ( "CUSTOMPATH_USE", True ), ( "CUSTOMPATH", "r'%s'" % cachePath ) ] + settings:
+            deadlineC4DThreadScript.append( "            SetGICacheParameter(giSettings, '%s', %s)" % ( name, value ) )
+
+    def PublishGICache( self ):
+        """
+        Replaces the scene's GI cache with the cache the prepass computed, and records which frames it covers and which job
+        computed it.
+        """
+        prepassDir, cacheDir = self.GICachePrepass
+        self.GICachePrepass = None
+        cacheFiles = os.listdir( prepassDir )
+        if not cacheFiles:
+            shutil.rmtree( prepassDir, ignore_errors=True )
+            self.Plugin.FailRender( "The GI prepass did not write a cache. Check that Global Illumination is enabled in the scene's render settings." )
+
+        stamp = {
+            "scene": self.Cinema4DFilename,
+            "take": self.Plugin.GetPluginInfoEntryWithDefault( "Take", "" ),
+            "frames": [ int( self.StartFrame ), int( self.EndFrame ) ],
+            "step": max( self.Plugin.GetIntegerPluginInfoEntryWithDefault( "GICachePrepassStep", 1 ), 1 ),
+            "job": self.Plugin.GetJob().JobId,
+            "worker": self.Plugin.GetSlaveName(),
+            "time": time.time(),
+        }
+        with io.open( os.path.join( prepassDir, GI_CACHE_STAMP ), mode="w", encoding="utf-8" ) as stampHandle:
+            stampHandle.write( u"%s" % json.dumps( stamp, indent=1, sort_keys=True ) )
+
+        # The cache of an earlier prepass of the same scene is renamed aside before the new one is renamed into its place, so a
+        # render task finds either a complete cache or none at all. Render tasks that start from now on load the new one.
+        oldCacheDir = None
+        try:
+            if os.path.isdir( cacheDir ):
+                oldCacheDir = "%s.old-%s" % ( cacheDir, uuid.uuid4().hex[:8] )
+                os.rename( cacheDir, oldCacheDir )
+            os.rename( prepassDir, cacheDir )
+        except OSError as e:
+            if oldCacheDir and os.path.isdir( oldCacheDir ) and not os.path.exists( cacheDir ):
+                try:
+                    os.rename( oldCacheDir, cacheDir )
+                except OSError:
+                    pass
+            shutil.rmtree( prepassDir, ignore_errors=True )
+            self.Plugin.FailRender( "Failed to publish the GI cache to %s: %s" % ( cacheDir, e ) )
+        if oldCacheDir:
+            shutil.rmtree( oldCacheDir, ignore_errors=True )
+        self.Plugin.LogInfo( "Published the GI cache (%d file(s), %s) to %s" % ( len( cacheFiles ), FormatMegabytes( GetDirectorySize( cacheDir ) ), cacheDir ) )
+
+    def DuplicateFrameOutputs( self, renderOutputs ):
+        """
+        Writes the output of the frames the render script skipped as duplicates, hard linking the files of the frame each one
+        duplicates under its own frame number, or copying them where hard links are not supported.
+        :param renderOutputs: the ( directory, prefix, isMultipass ) outputs of the render
+        """
+        try:
+            with io.open( self.DuplicateFramesFile, mode="r", encoding="utf-8" ) as duplicatesHandle:
+                duplicates = json.load( duplicatesHandle )
+        except ( IOError, OSError, ValueError ) as e:
+            self.Plugin.LogWarning( "Failed to read the duplicate frames of this task, their output was not written: %s" % e )
+            return
+        if not duplicates:
+            return
+
+        sourceFrames = {}
+        for frame, sourceFrame in duplicates.items():
+            sourceFrames.setdefault( sourceFrame, [] ).append( int( frame ) )
+
+        fileCount = 0
+        for directory, prefix, isMultipass in renderOutputs:
+            frameFiles = IndexFrameFiles( directory, prefix, isMultipass )
+            for sourceFrame, frames in sourceFrames.items():
+                sourceFiles = frameFiles.get( sourceFrame, [] )
+                if not sourceFiles:
+                    self.Plugin.LogWarning( "Frame %s has no output in %s to duplicate for frame(s) %s" % ( sourceFrame, directory, ", ".join( str( frame ) for frame in sorted( frames ) ) ) )
+                for sourceFile in sourceFiles:
+                    for frame in frames:
+                        LinkOrCopyFile( sourceFile, GetFrameFilename( sourceFile, frame ) )
+                        fileCount += 1
+
+        for sourceFrame in sorted( sourceFrames ):
+            self.Plugin.LogInfo( "Frame %s was duplicated as frame(s) %s" % ( sourceFrame, ", ".join( str( frame ) for frame in sorted( sourceFrames[ sourceFrame ] ) ) ) )
+        self.Plugin.LogInfo( "Skipped rendering %s duplicate frame(s), wrote %s output file(s) for them" % ( len( duplicates ), fileCount ) )
+
     def RenderTasks( self ):
         self.Plugin.LogInfo("Pre Build Script")
+        self.TaskStats = TaskStatistics()
+        # The first task of the session includes Cinema 4D's startup.
+        if self.ResourceSampler and self.ResourceSamplerHasTask:
+            self.ResourceSampler.StartTask( "Prepare" )
+        self.ResourceSamplerHasTask = True
+        if self.LiveMetrics:
+            self.LiveMetrics.StartTask( str( self.Plugin.GetCurrentTaskId() ), self.TaskStats, lambda: self.Cinema4DPid, "Prepare" )
+        if self.StdoutCapture:
+            self.StdoutCapture.StartTask()
+        if self.RedshiftCache:
+            self.RedshiftCache.StartTask()
+        if self.Cgroup:
+            cgroupPressure = self.Cgroup.ReadPressure()
+            cgroupEvents = self.Cgroup.ReadMemoryEvents()
+        self.FrameRanges = [ ( self.Plugin.GetStartFrame(), self.Plugin.GetEndFrame() ) ]
+        # The directories Cinema 4D writes its output to, which the hang watchdog checks for new files.
+        outputDirectories = []
+        # The ( directory, prefix, isMultipass ) outputs of a render, used to resume it if Cinema 4D crashes.
+        renderOutputs = None
         renderer = self.Plugin.GetPluginInfoEntryWithDefault( "Renderer", "" )
         exportJob = "Export" in renderer
+        # The file an Arnold or Redshift export writes, with the frame numbers added by the exporter.
+        exportFile = ""
+        exportFrames = []
+        exportCache = None
+        # A task that failed before its export shards finished leaves them running.
+        self.StopExportShards()
         
         self.ScriptJob = self.Plugin.GetBooleanPluginInfoEntryWithDefault( "ScriptJob", False )
         
@@ -434,6 +1479,7 @@ class Cinema4DController( object ):
             deadlineC4DThreadScript = []
             
             if not exportJob:
+                renderOutputs = []
                 self.RegionRendering = self.Plugin.GetBooleanPluginInfoEntryWithDefault( "RegionRendering", False )
                 self.SingleFrameRegionJob = self.Plugin.IsTileJob()
                 self.SingleFrameRegionFrame = str(self.Plugin.GetStartFrame())
@@ -514,8 +1560,6 @@ class Cinema4DController( object ):
                 
                 deadlineC4DThreadScript.append( "        fps = int( self.renderData[c4d.RDATA_FRAMERATE] )" )
                 deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_FRAMESEQUENCE] = c4d.RDATA_FRAMESEQUENCE_MANUAL" )
-                deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_FRAMEFROM]=c4d.BaseTime(" + str(self.StartFrame ) + ", fps)" )
-                deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_FRAMETO]=c4d.BaseTime(" + str( self.EndFrame ) + ", fps)" )
                 deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_FRAMESTEP]=1")
 
                 # Set AbortOnLicenseFail value to Arnold settings
@@ -600,6 +1644,8 @@ class Cinema4DController( object ):
                         fileprefix = self.Plugin.GetPluginInfoEntryWithDefault( "FilePrefix", "" ).strip()
 
                     outputPath = os.path.join( filepath, fileprefix )
+                    outputDirectories.append( os.path.dirname( outputPath ) )
+                    renderOutputs.append( ( os.path.dirname( outputPath ), os.path.basename( outputPath ), False ) )
                     outputPath = outputPath.replace( "\\", "\\\\" ) # Escape the backslashes in the path
                     deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_PATH]=\"" + outputPath + "\"" )
                 
@@ -636,6 +1682,8 @@ class Cinema4DController( object ):
                         multifileprefix = self.Plugin.GetPluginInfoEntryWithDefault( "MultiFilePrefix", "" ).strip()
                     
                     outputMultiFilePath = os.path.join( multifilepath, multifileprefix )
+                    outputDirectories.append( os.path.dirname( outputMultiFilePath ) )
+                    renderOutputs.append( ( os.path.dirname( outputMultiFilePath ), os.path.basename( outputMultiFilePath ), True ) )
                     outputMultiFilePath = outputMultiFilePath.replace( "\\", "\\\\" )
                     
                     deadlineC4DThreadScript.append( "        self.renderData[c4d.RDATA_MULTIPASS_FILENAME]=\"" + outputMultiFilePath + "\"" )
@@ -673,26 +1721,64 @@ class Cinema4DController( object ):
                         fileprefix = self.Plugin.GetPluginInfoEntryWithDefault( "VRay5FilePrefix", "" ).strip()
 
                     vray5OutputPath = os.path.join( vray5_filepath, fileprefix )
+                    outputDirectories.append( os.path.dirname( vray5OutputPath ) )
                     vray5OutputPath = vray5OutputPath.replace( "\\", "\\\\" ) # Escape the backslashes in the path
                     deadlineC4DThreadScript.append( "        vray5Settings = self.GetVray5RenderSettings(self.deadlineDoc)")
                     deadlineC4DThreadScript.append( "        if vray5Settings is not None:")
                     deadlineC4DThreadScript.append( "            vray5Settings[c4d.VRAY_VP_OUTPUT_SETTINGS_FILENAME]=\"%s\"" % vray5OutputPath)
 
+                # A GI prepass writes no images, so the frames of its task are never skipped.
+                self.GICachePrepass = None
+                giCacheMode = self.Plugin.GetPluginInfoEntryWithDefault( "GICacheMode", "None" )
+                if giCacheMode in ( "Prepass", "Load" ):
+                    self.writeGICacheSettings( globalScript, deadlineC4DThreadScript, giCacheMode, renderer )
+                    if self.GICachePrepass:
+                        outputDirectories.append( self.GICachePrepass[ 0 ] )
+
+                # Skipping existing frames can leave gaps in the task's frame range, so each contiguous range is rendered separately.
+                self.FrameRanges = [ ( int( self.StartFrame ), int( self.EndFrame ) ) ]
+                if self.Plugin.GetBooleanPluginInfoEntryWithDefault( "SkipExistingFrames", False ) and not self.GICachePrepass:
+                    if self.RegionRendering:
+                        self.Plugin.LogWarning( "Rendering all frames because existing frames can not be skipped for region renders." )
+                    else:
+                        self.FrameRanges = CompactFrameRanges( GetFramesToRender( self.Plugin, self.MapPath, self.Cinema4DFilename, list( range( int( self.StartFrame ), int( self.EndFrame ) + 1 ) ) ) )
+
+                # Frames whose scene state matches an earlier frame of the task are not rendered, their output is duplicated after the render.
+                self.DuplicateFramesFile = ""
+                framesExpression = FRAME_RANGES_PLACEHOLDER
+                if self.Plugin.GetBooleanPluginInfoEntryWithDefault( "SkipDuplicateFrames", False ) and not self.GICachePrepass:
+                    if self.RegionRendering or vray5_filepath:
+                        self.Plugin.LogWarning( "Rendering all frames because duplicate frames can not be skipped for region renders or V-Ray 5 outputs." )
+                    elif not renderOutputs or any( not prefix or "$" in os.path.join( directory, prefix ) for directory, prefix, _isMultipass in renderOutputs ):
+                        self.Plugin.LogWarning( "Rendering all frames because the output file names can not be predicted. Skipping duplicate frames requires an output path and prefix without tokens." )
+                    else:
+                        self.DuplicateFramesFile = self.ProcessPath( os.path.join( self.renderTempDirectory, "duplicateFrames.json" ) )
+                        if os.path.isfile( self.DuplicateFramesFile ):
+                            os.remove( self.DuplicateFramesFile )
+                        self.writeSkipDuplicateFrames( globalScript, deadlineC4DThreadScript )
+                        framesExpression = "frameRanges"
+
                 # Start rendering the document and handle the results.
-                deadlineC4DThreadScript.append( "        bmp = bitmaps.MultipassBitmap(int(self.renderData[c4d.RDATA_XRES]), int(self.renderData[c4d.RDATA_YRES]), c4d.COLORMODE_RGB)" )
-                deadlineC4DThreadScript.append( "        results = documents.RenderDocument(self.deadlineDoc, self.renderData.GetData(), bmp, c4d.RENDERFLAGS_EXTERNAL | c4d.RENDERFLAGS_SHOWERRORS, self.Get())" )
-                deadlineC4DThreadScript.append( "        if results != c4d.RENDERRESULT_OK and results != c4d.RENDERRESULT_USERBREAK:" )
-                deadlineC4DThreadScript.append( "            resDict = {" )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_OUTOFMEMORY : 'Not enough memory.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_ASSETMISSING : 'Assets (textures etc.) are missing.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_SAVINGFAILED : 'Failed to save.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_NOMACHINE : 'No Machine.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_PROJECTNOTFOUND : 'Project not found.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_ERRORLOADINGPROJECT : 'Error loading project.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_NOOUTPUTSPECIFIED : 'No output specified.'," )
-                deadlineC4DThreadScript.append( "                c4d.RENDERRESULT_GICACHEMISSING : 'GI cache is missing.'" )
-                deadlineC4DThreadScript.append( "            }" )
-                deadlineC4DThreadScript.append( "            print ( 'RenderDocument failed with return code ' + str(results) + ' meaning: ' + ( resDict[results] if results in resDict else 'Unknown Error.') )" )              
+                deadlineC4DThreadScript.append( "        for frameFrom, frameTo in %s:" % framesExpression )
+                deadlineC4DThreadScript.append( "            self.renderData[c4d.RDATA_FRAMEFROM]=c4d.BaseTime(frameFrom, fps)" )
+                deadlineC4DThreadScript.append( "            self.renderData[c4d.RDATA_FRAMETO]=c4d.BaseTime(frameTo, fps)" )
+                deadlineC4DThreadScript.append( "            bmp = bitmaps.MultipassBitmap(int(self.renderData[c4d.RDATA_XRES]), int(self.renderData[c4d.RDATA_YRES]), c4d.COLORMODE_RGB)" )
+                deadlineC4DThreadScript.append( "            results = documents.RenderDocument(self.deadlineDoc, self.renderData.GetData(), bmp, c4d.RENDERFLAGS_EXTERNAL | c4d.RENDERFLAGS_SHOWERRORS, self.Get())" )
+                deadlineC4DThreadScript.append( "            if results == c4d.RENDERRESULT_USERBREAK:" )
+                deadlineC4DThreadScript.append( "                break" )
+                deadlineC4DThreadScript.append( "            if results != c4d.RENDERRESULT_OK:" )
+                deadlineC4DThreadScript.append( "                resDict = {" )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_OUTOFMEMORY : 'Not enough memory.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_ASSETMISSING : 'Assets (textures etc.) are missing.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_SAVINGFAILED : 'Failed to save.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_NOMACHINE : 'No Machine.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_PROJECTNOTFOUND : 'Project not found.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_ERRORLOADINGPROJECT : 'Error loading project.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_NOOUTPUTSPECIFIED : 'No output specified.'," )
+                deadlineC4DThreadScript.append( "                    c4d.RENDERRESULT_GICACHEMISSING : 'GI cache is missing.'" )
+                deadlineC4DThreadScript.append( "                }" )
+                deadlineC4DThreadScript.append( "                print ( 'RenderDocument failed with return code ' + str(results) + ' meaning: ' + ( resDict[results] if results in resDict else 'Unknown Error.') )" )
+                deadlineC4DThreadScript.append( "                break" )
                 
                 # Overriding the function on c4d.threading.C4DThread that checks if we should stop rendering.
                 deadlineC4DThreadScript.append( "    def TestDBreak(self):" )                           
@@ -731,19 +1817,24 @@ class Cinema4DController( object ):
                     self.Plugin.LogInfo( "Exporting to Arnold" )
 
                     globalScript.append( "ARNOLD_ASS_EXPORT = 1029993" )
-                    globalScript.append( "options = c4d.BaseContainer()" )
-                    globalScript.append( "options.SetInt32( 6, %s )" % self.Plugin.GetStartFrame() )
-                    globalScript.append( "options.SetInt32( 7, %s )" % self.Plugin.GetEndFrame() )
+                    # The frames are filled in when the script is written. The export cache and export shards can leave
+                    # several ranges of the task's frames to export.
+                    globalScript.append( "for exportFrom, exportTo in %s:" % FRAME_RANGES_PLACEHOLDER )
+                    globalScript.append( "    options = c4d.BaseContainer()" )
+                    globalScript.append( "    options.SetInt32( 6, exportFrom )" )
+                    globalScript.append( "    options.SetInt32( 7, exportTo )" )
 
                     assFile = self.ProcessPath( self.Plugin.GetPluginInfoEntryWithDefault( "ExportFile", "" ) )
                     assFile = RepositoryUtils.CheckPathMapping( assFile )
                     assFile = assFile.replace( "\\", "/" ) # Escape the backslashes in the path
                     if assFile != "":
                         self.ValidateFilepath( os.path.dirname( assFile ) )
-                        globalScript.append( "options.SetFilename( 0, '%s' )" % assFile )
+                        outputDirectories.append( os.path.dirname( assFile ) )
+                        globalScript.append( "    options.SetFilename( 0, '%s' )" % assFile )
+                        exportFile = assFile
 
-                    globalScript.append( "scene.GetSettingsInstance( c4d.DOCUMENTSETTINGS_DOCUMENT ).SetContainer( ARNOLD_ASS_EXPORT, options )" )
-                    globalScript.append( "c4d.CallCommand( ARNOLD_ASS_EXPORT )" )
+                    globalScript.append( "    scene.GetSettingsInstance( c4d.DOCUMENTSETTINGS_DOCUMENT ).SetContainer( ARNOLD_ASS_EXPORT, options )" )
+                    globalScript.append( "    c4d.CallCommand( ARNOLD_ASS_EXPORT )" )
 
                 elif renderer == "RedshiftExport":
                     self.Plugin.LogInfo( "Exporting to Redshift" )
@@ -755,8 +1846,6 @@ class Cinema4DController( object ):
                     globalScript.append( "imexporter = op[ \"imexporter\" ]" )
                     globalScript.append( "imexporter[ c4d.REDSHIFT_PROXYEXPORT_AUTOPROXY_CREATE ] = False" )
                     globalScript.append( "imexporter[ c4d.REDSHIFT_PROXYEXPORT_ANIMATION_RANGE ] = c4d.REDSHIFT_PROXYEXPORT_ANIMATION_RANGE_MANUAL" )
-                    globalScript.append( "imexporter[ c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_START ] = %s" % self.Plugin.GetStartFrame() )
-                    globalScript.append( "imexporter[ c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_END ] = %s" % self.Plugin.GetEndFrame() )
                     globalScript.append( "imexporter[ c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_STEP ] = 1" )
 
                     rsFile = self.ProcessPath( self.Plugin.GetPluginInfoEntryWithDefault( "ExportFile", "" ) )
@@ -765,8 +1854,13 @@ class Cinema4DController( object ):
                     rsFile = rsFile.replace("#","") # Redshift automatically adds the frame numbers.
                     if rsFile != "":
                         self.ValidateFilepath( os.path.dirname( rsFile ) )
-                        globalScript.append( "documents.SaveDocument(scene, \"%s\", c4d.SAVEDOCUMENTFLAGS_0, REDSHIFT_EXPORT_PLUGIN_ID)" % rsFile )
+                        outputDirectories.append( os.path.dirname( rsFile ) )
+                        globalScript.append( "for exportFrom, exportTo in %s:" % FRAME_RANGES_PLACEHOLDER )
+                        globalScript.append( "    imexporter[ c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_START ] = exportFrom" )
+                        globalScript.append( "    imexporter[ c4d.REDSHIFT_PROXYEXPORT_ANIMATION_FRAME_END ] = exportTo" )
+                        globalScript.append( "    documents.SaveDocument(scene, \"%s\", c4d.SAVEDOCUMENTFLAGS_0, REDSHIFT_EXPORT_PLUGIN_ID)" % rsFile )
                         globalScript.append( "print ( 'Exported: %s' )" % rsFile )
+                        exportFile = rsFile
                     else:
                         self.Plugin.FailRender( "Failed to export Redshift Scene - No output file name set." )
             
@@ -774,20 +1868,55 @@ class Cinema4DController( object ):
             full_script_contents = '\n'.join(deadlineC4DThreadScript + globalScript).replace( "\r", "" )
             if self.Plugin.GetBooleanConfigEntryWithDefault( "WriteScriptToLog", False ):
                 self.Plugin.LogInfo( "Script contents:" )
-                self.Plugin.LogInfo( full_script_contents )
+                self.Plugin.LogInfo( full_script_contents.replace( FRAME_RANGES_PLACEHOLDER, str( self.FrameRanges ) ) )
 
             self.ScriptFilename = os.path.join( self.renderTempDirectory, "c4d_Batch_Script.py" )
+            self.ScriptTemplate = full_script_contents
+
+            if exportFile:
+                exportCache, exportKeys, exportFrames = CheckExportCache( self.Plugin, self.TaskStats, exportFile, self.Cinema4DFilename, renderer, list( range( self.Plugin.GetStartFrame(), self.Plugin.GetEndFrame() + 1 ) ) )
+                if exportCache:
+                    self.FrameRanges = CompactFrameRanges( exportFrames )
+                exportFrames = [ frame for frameFrom, frameTo in self.FrameRanges for frame in range( frameFrom, frameTo + 1 ) ]
+                self.ExportShards = self.StartExportShards( exportFrames )
             
-            File.WriteAllText( self.ScriptFilename, full_script_contents, Encoding.UTF8 )
+            self.WriteRenderScript()
             self.Plugin.LogInfo( "" )
             if SystemUtils.IsRunningOnMac():
                 os.chmod( self.ScriptFilename, os.stat( Path.GetTempFileName() ).st_mode )
         
-        self.Cinema4DSocket.Send( "RunScript:" + self.ScriptFilename )
-        self.Plugin.LogInfo( self.PollUntilComplete( False ) )
-        self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+        if self.FrameRanges:
+            if self.HangWatchdog:
+                self.HangWatchdog.SetOutputDirectories( outputDirectories )
+                self.HangWatchdog.Restart()
+            try:
+                self.Plugin.LogInfo( self.RunRenderScript( renderOutputs ) )
+            except:
+                self.StopExportShards()
+                if self.GICachePrepass:
+                    shutil.rmtree( self.GICachePrepass[ 0 ], ignore_errors=True )
+                    self.GICachePrepass = None
+                raise
+            self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+            self.TaskStats.EndFrame()
+            if self.DuplicateFramesFile:
+                self.DuplicateFrameOutputs( renderOutputs )
+            if self.GICachePrepass:
+                self.PublishGICache()
+        else:
+            self.Plugin.LogInfo( "All frames of this task already have valid output, skipping the render" )
+
+        if self.ExportShards:
+            self.FinishExportShards( exportFile, exportFrames )
+        if exportCache and exportFrames:
+            StoreExportCache( self.Plugin, exportCache, exportKeys, exportFile, exportFrames, self.TaskStats.StartTime )
 
         if self.LocalRendering:
+            uploadStartTime = time.time()
+            if self.LiveMetrics:
+                self.LiveMetrics.SetPhase( "Upload" )
+                self.LiveMetrics.AddUploadedBytes( sum( GetDirectorySize( localPath ) for localPath, networkPath in (
+                    ( self.LocalFilePath, self.NetworkFilePath ), ( self.LocalMPFilePath, self.NetworkMPFilePath ), ( self.VRay5LocalFilePath, self.VRay5NetworkFilePath ) ) if networkPath != "" ) )
             if self.NetworkFilePath != "":
                 self.Plugin.LogInfo( "Moving main output files and folders from " + self.LocalFilePath + " to " + self.NetworkFilePath )
                 self.Plugin.VerifyAndMoveDirectory( self.LocalFilePath, self.NetworkFilePath, False, -1 )
@@ -797,9 +1926,261 @@ class Cinema4DController( object ):
             if self.VRay5NetworkFilePath != "":
                 self.Plugin.LogInfo( "Moving VRay 5 output files and folders from " + self.VRay5LocalFilePath + " to " + self.VRay5NetworkFilePath )
                 self.Plugin.VerifyAndMoveDirectory( self.VRay5LocalFilePath, self.VRay5NetworkFilePath, False, -1 )
+            self.TaskStats.AddTiming( "upload", time.time() - uploadStartTime )
+
+        if self.Cgroup:
+            LogCgroupUsage( self.Plugin, self.Cgroup, cgroupPressure, cgroupEvents, "session peak" )
+        if self.ResourceSampler:
+            LogResourceSamplerMessages( self.Plugin, self.ResourceSampler )
+            for line in self.ResourceSampler.FormatSummary():
+                self.Plugin.LogInfo( line )
+        if self.StdoutCapture:
+            self.Plugin.LogInfo( self.StdoutCapture.FormatSummary() )
+        if self.RedshiftCache:
+            for line in self.RedshiftCache.EndTask():
+                self.Plugin.LogInfo( line )
+        if self.LiveMetrics:
+            self.LiveMetrics.SetPhase( "Idle" )
+            if self.LiveMetrics.Error:
+                self.Plugin.LogWarning( "Failed to write the live metrics: %s" % self.LiveMetrics.Error )
+                self.LiveMetrics.Error = None
+
+        self.WriteRenderHistory()
 
         self.Plugin.LogInfo( "Finished Cinema 4D Task" )
 
+    def StartExportShards( self, frames ):
+        """
+        Starts export sessions next to Cinema 4D for all but the first slice of the frames to export, if export sharding is
+        enabled. The first slice is left to Cinema 4D. The sessions run in Cinema 4D's cgroup and CPU partition, and only as
+        many are started as memory admission control has room for.
+        :param frames: the frames the task exports
+        :return: the ExportShardProcesses, or None if Cinema 4D exports every frame
+        """
+        shardCount = self.Plugin.GetIntegerConfigEntryWithDefault( "ExportShards", 1 )
+        if shardCount < 2:
+            return None
+        slices = SplitExportFrames( frames, self.ReserveExportShards( shardCount - 1 ) + 1 )
+        # Short tasks are split into fewer slices than were reserved for.
+        self.ReleaseExportShardReservations( len( slices ) - 1 )
+        if len( slices ) < 2:
+            return None
+
+        shards = ExportShardProcesses( self.Plugin.CreateTempDirectory( "exportShards" ) )
+        StartExportShards( self.Plugin, shards, slices[ 1: ], self.Cinema4DRenderExecutable, lambda frameSlice: self.WriteExportShardCommands( shards, frameSlice ),
+            self.Plugin.GetProcessEnvironmentVariable, os.path.dirname( self.Cinema4DRenderExecutable ), self.PlaceExportShard )
+
+        self.FrameRanges = CompactFrameRanges( slices[ 0 ] )
+        self.Plugin.LogInfo( "Exporting frames %s-%s in Cinema 4D and the other %s slice(s) in export shards" % ( slices[ 0 ][ 0 ], slices[ 0 ][ -1 ], len( slices ) - 1 ) )
+        return shards
+
+    def WriteExportShardCommands( self, shards, frameSlice ):
+        """
+        Writes the export script of a slice of frames, and the file of commands that the export shard runs it with.
+        :return: the arguments of the export shard
+        """
+        frameRange = ( frameSlice[ 0 ], frameSlice[ -1 ] )
+        scriptFile = shards.GetFilename( frameRange, ".py" )
+        File.WriteAllText( scriptFile, self.ScriptTemplate.replace( FRAME_RANGES_PLACEHOLDER, str( CompactFrameRanges( frameSlice ) ) ), Encoding.UTF8 )
+        commandFile = shards.GetFilename( frameRange, ".txt" )
+        with io.open( commandFile, mode="w", encoding="utf-8" ) as commandHandle:
+            for command in self.StartupCommands + [ "RunScript:" + scriptFile ]:
+                commandHandle.write( u"%s\n" % command )
+
+        return " ".join( self.SessionParameters + [ '"-DeadlineExportShard \'%s\'"' % commandFile ] )
+
+    def ReserveExportShards( self, shardCount ):
+        """
+        Reserves memory for export shards like WaitForMemoryAdmission does for Cinema 4D, if Cinema 4D was admitted with a
+        reservation. Shards are not waited for: the frames of the shards that do not fit are exported by the other sessions.
+        :param shardCount: the number of export shards wanted
+        :return: the number of export shards that may be started
+        """
+        self.ExportShardReservations = []
+        if not self.MemoryReservation:
+            return shardCount
+
+        with SessionReservations() as reservations:
+            outstanding, sessionCount = reservations.Outstanding()
+            available = ReadMemInfo().get( "MemAvailable", 0 ) - outstanding
+            admitted = min( shardCount, max( int( available // self.ExpectedPeakMemory ), 0 ) )
+            for index in range( admitted ):
+                name = "%s-shard%d" % ( self.MemoryReservation, index )
+                reservations.Reserve( name, self.ExpectedPeakMemory )
+                self.ExportShardReservations.append( name )
+        if admitted < shardCount:
+            self.Plugin.LogInfo( "Starting %s of %s export shard(s): each needs about %s and %s is free after the %s session(s) on this machine" % (
+                admitted, shardCount, FormatMegabytes( self.ExpectedPeakMemory ), FormatMegabytes( max( available, 0 ) ), sessionCount ) )
+        return admitted
+
+    def ReleaseExportShardReservations( self, keep=0 ):
+        """
+        Releases the memory reserved for export shards, except for the first keep shards.
+        """
+        if len( self.ExportShardReservations ) <= keep:
+            return
+        with SessionReservations() as reservations:
+            for name in self.ExportShardReservations[ keep: ]:
+                reservations.Release( name )
+        self.ExportShardReservations = self.ExportShardReservations[ :keep ]
+
+    def PlaceExportShard( self, pid, index ):
+        """
+        Moves an export shard that was just started into Cinema 4D's cgroup and CPU partition, and records its process with
+        its memory reservation, the same way LaunchCinema4D does for Cinema 4D.
+        :param index: the index of the shard's memory reservation
+        """
+        PlaceExportShard( self.Plugin, pid, self.Cgroup, self.CpuPartition )
+        if index < len( self.ExportShardReservations ):
+            with SessionReservations() as reservations:
+                reservations.Reserve( self.ExportShardReservations[ index ], self.ExpectedPeakMemory, pid )
+
+    def StopExportShards( self ):
+        """
+        Kills the export shards that are still running and releases their memory reservations.
+        """
+        if self.ExportShards:
+            self.ExportShards.Stop()
+            self.ExportShards = None
+        self.ReleaseExportShardReservations()
+
+    def FinishExportShards( self, exportFile, frames ):
+        """
+        Waits for the export shards to finish, and fails the task if one of them failed or if an exported frame does not have
+        an export file.
+        :param exportFile: the export file, without the frame numbers that the exporter adds
+        :param frames: the frames the task exported
+        """
+        shards = self.ExportShards
+        waitStartTime = time.time()
+        try:
+            results = shards.Wait( self.Plugin.IsCanceled )
+        finally:
+            self.StopExportShards()
+        self.TaskStats.AddTiming( "exportShardWait", time.time() - waitStartTime )
+        CheckExportShards( self.Plugin, shards, results, lambda frameRange, exitCode: self.GetExportShardError( shards, frameRange, exitCode ) )
+        VerifyExportFiles( self.Plugin, exportFile, frames, self.TaskStats.StartTime )
+
+    def GetExportShardError( self, shards, frameRange, exitCode ):
+        """
+        :return: the error of an export shard that ran to the end, or None if it ran every command
+        """
+        replies = []
+        replyFile = shards.GetFilename( frameRange, ".txt.replies" )
+        if os.path.isfile( replyFile ):
+            with io.open( replyFile, mode="r", encoding="utf-8" ) as replyHandle:
+                replies = [ line.rstrip( "\n" ) for line in replyHandle ]
+
+        # The shard runs the startup commands and then the export script.
+        errors = [ reply for reply in replies if not reply.startswith( "SUCCESS" ) ]
+        if errors:
+            return errors[ 0 ]
+        if len( replies ) < len( self.StartupCommands ) + 1:
+            return "Cinema 4D exited with code %s before the export finished" % exitCode
+        return None
+
+    def WriteRenderHistory( self ):
+        """
+        Appends the timings of this task to the render history, if a render history directory is configured. The Cinema 4D
+        session is shared by every task the Worker renders for the job, so its startup time is only recorded with the first one.
+        :return: None
+        """
+        timings = dict( self.TaskStats.Timings )
+        startup = None
+        if self.SessionTimings:
+            timings.update( self.SessionTimings )
+            startup = sum( self.SessionTimings.values() )
+            self.SessionTimings = {}
+        WriteRenderHistory( self.Plugin, self.MapPath, self.TaskStats, {
+            "plugin": "Cinema4DBatch",
+            "startup": startup,
+            "timings": timings,
+            "peakMemory": ReadProcessTreeMemory( self.Cinema4DPid, "VmHWM" ) if self.Cinema4DPid else None,
+            "pluginFiltering": self.PluginFiltering,
+        } )
+
+    def WriteRenderScript( self ):
+        File.WriteAllText( self.ScriptFilename, self.ScriptTemplate.replace( FRAME_RANGES_PLACEHOLDER, str( self.FrameRanges ) ), Encoding.UTF8 )
+
+    def RunRenderScript( self, renderOutputs ):
+        """
+        Runs the task's script in Cinema 4D. If Cinema 4D crashes while it renders, Cinema 4D is restarted and the render
+        resumes from the first frame without output, up to CrashRestartLimit times per task.
+        :param renderOutputs: the ( directory, prefix, isMultipass ) outputs of the render, or None if the script is not a render
+            and can not be resumed
+        :return: the result of the script
+        """
+        restartLimit = self.Plugin.GetIntegerConfigEntryWithDefault( "CrashRestartLimit", 0 ) if renderOutputs is not None else 0
+        restarts = 0
+        while True:
+            attemptStartTime = time.time()
+            try:
+                self.Cinema4DSocket.Send( "RunScript:" + self.ScriptFilename )
+                return self.PollUntilComplete( False, crashRecovery=restarts < restartLimit )
+            except SOCKET_EXCEPTIONS as e:
+                # Cinema 4D crashed before the script was sent, e.g. after the previous task.
+                if restarts >= restartLimit:
+                    raise
+                crash = e.Message
+            except Cinema4DCrashedError as e:
+                crash = str( e )
+
+            restarts += 1
+            self.SessionCrashes += 1
+            self.Plugin.LogWarning( "Cinema 4D crashed while rendering (%s), restarting it: restart %s of %s for this task, %s crash(es) in this session" % ( crash, restarts, restartLimit, self.SessionCrashes ) )
+            restartStartTime = time.time()
+            self.RestartCinema4D( renderOutputs, attemptStartTime )
+            restartTime = time.time() - restartStartTime
+            self.TaskStats.AddTiming( "crashRestart", restartTime )
+            self.Plugin.LogInfo( "Restarted Cinema 4D in %.1f seconds, %.1f seconds of rendering were lost, resuming with frame(s) %s" % ( restartTime, restartStartTime - attemptStartTime, ", ".join( "%s-%s" % frameRange for frameRange in self.FrameRanges ) ) )
+
+    def RestartCinema4D( self, renderOutputs, attemptStartTime ):
+        """
+        Relaunches Cinema 4D with the arguments it was started with, replays the recorded startup sequence (verbose, scene
+        load, path mapping and asset cache) and rewrites the render script for the frames that still need to be rendered.
+        The frames are checked while Cinema 4D starts.
+        :param renderOutputs: the ( directory, prefix, isMultipass ) outputs of the render
+        :param attemptStartTime: the time the crashed render started, older output is not counted as rendered
+        """
+        if self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ):
+            self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+        self.Plugin.ShutdownMonitoredManagedProcess( self.ProgramName )
+        self.Cinema4DSocket.Disconnect( False )
+        if os.path.isfile( self.CancellationTokenPath ):
+            os.remove( self.CancellationTokenPath )
+
+        outputDirectories = self.HangWatchdog.OutputDirectories if self.HangWatchdog else []
+        self.HangWatchdog = None
+        self.LaunchCinema4D( self.ManagedCinema4DProcessRenderExecutable, self.ManagedCinema4DProcessRenderArgument, self.ManagedCinema4DProcessStartupDirectory )
+        self.ResumeFrameRanges( renderOutputs, attemptStartTime )
+        self.WaitForConnection( "Cinema 4D restart" )
+        for command in self.StartupCommands:
+            self.Cinema4DSocket.Send( command )
+            self.Plugin.LogInfo( self.PollUntilComplete( False ) )
+
+        self.WriteRenderScript()
+        if self.HangWatchdog:
+            self.HangWatchdog.SetOutputDirectories( outputDirectories )
+
+    def ResumeFrameRanges( self, renderOutputs, attemptStartTime ):
+        """
+        Drops the frames that were rendered before Cinema 4D crashed from the frame ranges. Frames are rendered in order, so
+        the render resumes from the first frame without valid output. Every frame is rendered again if the output file names
+        can not be predicted.
+        """
+        if not renderOutputs or any( not prefix or "$" in os.path.join( directory, prefix ) for directory, prefix, _isMultipass in renderOutputs ):
+            self.Plugin.LogWarning( "Rendering every frame of the task again because the output file names can not be predicted" )
+            return
+
+        frames = [ frame for frameFrom, frameTo in self.FrameRanges for frame in range( frameFrom, frameTo + 1 ) ]
+        missingFrames = FindFramesToRender( frames, renderOutputs, attemptStartTime, FRAME_VALIDATION_THREADS )
+        if missingFrames:
+            frames = frames[ frames.index( missingFrames[0] ): ]
+        else:
+            # Every frame was written, the crash happened while Cinema 4D finished the render, so the last frame is rendered again.
+            frames = frames[ -1: ]
+        self.FrameRanges = CompactFrameRanges( frames )
+
     def SplitTokens( self, filePath ):
         if not "$" in filePath:
             return filePath, ""
@@ -838,6 +2219,11 @@ class Cinema4DController( object ):
 
     # This tells Cinema4D to unload the current scene file.
     def EndCinema4DJob( self ):
+        # In abandon mode, Cinema 4D is told to end the job and stopped on a background thread, so the Worker can move on.
+        abandon = self.Plugin.GetConfigEntryWithDefault( "ShutdownMode", "Wait" ) == "Abandon" and self.Cinema4DPid is not None
+        gracePeriod = self.Plugin.GetIntegerConfigEntryWithDefault( "ShutdownGracePeriod", 10000 ) / 1000.0
+        termTimeout = self.Plugin.GetIntegerConfigEntryWithDefault( "ShutdownTermTimeout", 2000 ) / 1000.0
+
         if not self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ):
             self.Plugin.LogWarning( "Cinema 4D.exe was shut down before the proper shut down sequence" )
         else:
@@ -854,11 +2240,14 @@ class Cinema4DController( object ):
             except Exception as e:
                 response = ( "ERROR: Error sending EndJob command: %s" % e.Message )
             
-            countdown = 5000
-            while countdown > 0 and not response:
+            # Wait for the reply, which arrives as soon as Cinema 4D sends it, or for the socket to close.
+            startTime = time.time()
+            while not response and not abandon:
+                remaining = int( ( startTime + 5.0 - time.time() ) * 1000 )
+                if remaining <= 0:
+                    break
                 try:
-                    countdown = countdown - 100
-                    response = self.Cinema4DSocket.Receive( 100 )
+                    response = self.Cinema4DSocket.Receive( remaining )
                     
                     # If this is a STDOUT message, print it out and reset 'response' so that we keep looping
                     match = self.StdoutRegex.Match( response )
@@ -873,43 +2262,113 @@ class Cinema4DController( object ):
                         response = ""
                     
                 except Exception as e:
-                    if not isinstance( e, SimpleSocketTimeoutException ):
+                    if not isinstance( e, SOCKET_TIMEOUT_EXCEPTIONS ):
                         response = ( "ERROR: Error when waiting for renderer to close: %s" % e.Message )
             
-            if not response:
+            if abandon:
+                pass
+            elif not response:
                 self.Plugin.LogWarning( "Timed out waiting for the renderer to close." )
             else:
-                self.Plugin.LogInfo( "The process took " + str( 5000 - countdown ) + "ms to respond." )
+                self.Plugin.LogInfo( "The process took %d ms to respond." % ( ( time.time() - startTime ) * 1000 ) )
                 
             if response.startswith( "ERROR: " ):
                 self.Plugin.LogWarning( response[7:] )
             
-            if not response.startswith( "SUCCESS" ):
+            if not abandon and not response.startswith( "SUCCESS" ):
                 self.Plugin.LogWarning( "Did not receive a success message in response to EndJob: %s" % response )
- 
-        timeout = 10000
-        while self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ) and timeout > 0:
-            # Sleep for 100ms while waiting for the process to end.
-            time.sleep(.1)
-            timeout = timeout - 100
-            
-        # If we waited 10 seconds and the process still hasn't closed then lets forcebly terminate it, this is to prevent Jobs hanging around forever.
-        if self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ):
-            self.Plugin.LogWarning("Timed out waiting for the process to end, forcebly terminating.")
-            self.Plugin.ShutdownMonitoredManagedProcess( self.ProgramName )
+
+        if self.ResourceSampler:
+            self.ResourceSampler.Stop()
+            self.ResourceSampler = None
+        if self.LiveMetrics:
+            self.LiveMetrics.Stop()
+            self.LiveMetrics = None
+        self.HangWatchdog = None
+        self.StopExportShards()
+
+        # Stopping a Unix domain socket removes its socket file.
+        if isinstance( self.Cinema4DSocket, UnixListeningSocket ):
+            self.Cinema4DSocket.Disconnect( True )
+
+        if abandon:
+            self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+            self.CloseStdoutCapture()
+            self.Plugin.LogInfo( "Not waiting for Cinema 4D to exit, it is stopped in the background" )
+            reaper = threading.Thread( target=self.ReapCinema4D, args=( self.Cinema4DPid, self.Cinema4DStartTime, gracePeriod, termTimeout, self.MemoryReservation, self.Cgroup ) )
+            reaper.daemon = True
+            reaper.start()
+            self.MemoryReservation = None
+            self.Cgroup = None
+            return
+
+        if self.Cinema4DPid is not None:
+            # Wait on the process itself, and escalate to SIGTERM and SIGKILL if it does not exit.
+            outcome, seconds = StopProcessTree( self.Cinema4DPid, self.Cinema4DStartTime, gracePeriod, termTimeout )
+            if outcome == "exited":
+                self.Plugin.LogInfo( "The process took %d ms to exit." % ( seconds * 1000 ) )
+            elif outcome == "running":
+                self.Plugin.LogWarning( "Cinema 4D is still running %d ms after SIGKILL, shutting down the managed process." % ( termTimeout * 1000 ) )
+            else:
+                self.Plugin.LogWarning( "Cinema 4D did not exit within %d ms of EndJob, so it was %s after %d ms." % ( gracePeriod * 1000, outcome, seconds * 1000 ) )
         else:
-            self.Plugin.LogInfo( "The process took " + str( 10000 - timeout ) + "ms to exit." )
-            
+            timeout = gracePeriod + termTimeout
+            startTime = time.time()
+            while self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ) and time.time() - startTime < timeout:
+                time.sleep( 0.05 )
+
+            # If the process still hasn't closed then forcibly terminate it below, this is to prevent Jobs hanging around forever.
+            if self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ):
+                self.Plugin.LogWarning( "Timed out waiting for the process to end, forcebly terminating." )
+            else:
+                self.Plugin.LogInfo( "The process took %d ms to exit." % ( ( time.time() - startTime ) * 1000 ) )
+
+        # The Worker drops a managed process, and the output it has not logged yet, once it is shut down, so flush first.
         self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+        if self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ):
+            self.Plugin.ShutdownMonitoredManagedProcess( self.ProgramName )
+        self.CloseStdoutCapture()
+
+        if self.MemoryReservation:
+            with SessionReservations() as reservations:
+                reservations.Release( self.MemoryReservation )
+            self.MemoryReservation = None
+        if self.Cgroup and not self.Cgroup.Remove():
+            self.Plugin.LogWarning( "Failed to remove the cgroup %s, processes that are still running in it keep its limits" % self.Cgroup.Path )
+
+    def CloseStdoutCapture( self ):
+        if self.StdoutCapture:
+            self.StdoutCapture.Close()
+            self.StdoutCapture = None
+
+    def ReapCinema4D( self, pid, startTime, gracePeriod, termTimeout, memoryReservation, cgroup ):
+        """
+        Runs on a background thread in abandon mode: stops Cinema 4D like EndCinema4DJob does, then releases its memory
+        reservation and removes its cgroup. Nothing is logged from this thread.
+        """
+        StopProcessTree( pid, startTime, gracePeriod, termTimeout )
+        if memoryReservation:
+            with SessionReservations() as reservations:
+                reservations.Release( memoryReservation )
+        if cgroup:
+            cgroup.Remove()
         
-    def PollUntilComplete( self, timeoutEnabled, timeoutOverride=-1 ):
+    def PollUntilComplete( self, timeoutEnabled, timeoutOverride=-1, crashRecovery=False ):
+        """
+        Waits for Cinema 4D to complete the last command, logging its messages.
+        :param crashRecovery: raise a Cinema4DCrashedError instead of failing the task if Cinema 4D exits or disconnects
+        """
         progressCountdown = (self.ProgressUpdateTimeout if timeoutOverride < 0 else timeoutOverride) * 1000
         
         while progressCountdown > 0 and self.Cinema4DSocket.IsConnected and not self.Plugin.IsCanceled():
+            self.CheckForHang()
+            if crashRecovery and not self.Plugin.MonitoredManagedProcessIsRunning( self.ProgramName ):
+                raise Cinema4DCrashedError( "the process exited" )
             try:
                 # Verify that Cinema 4D is still running.
                 self.Plugin.VerifyMonitoredManagedProcess( self.ProgramName )
                 self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+                LogResourceSamplerMessages( self.Plugin, self.ResourceSampler )
                 
                 # Check for any popup dialogs.
                 blockingDialogMessage = self.Plugin.CheckForMonitoredManagedProcessPopups( self.ProgramName )
@@ -926,6 +2385,8 @@ class Cinema4DController( object ):
                     
                     # We received a request, so reset the progress update timeout.
                     progressCountdown = (self.ProgressUpdateTimeout if timeoutOverride < 0 else timeoutOverride) * 1000
+                    if self.HangWatchdog:
+                        self.HangWatchdog.NoteActivity( "a message from DeadlineConnect" )
                                         
                     match = self.SuccessMessageRegex.Match( request )
                     if match.Success: # Render finished successfully
@@ -944,13 +2405,15 @@ class Cinema4DController( object ):
                         continue
                     
             except Exception as e:
-                if isinstance( e, SimpleSocketTimeoutException ):
+                if isinstance( e, SOCKET_TIMEOUT_EXCEPTIONS ):
                     if progressCountdown <= 0:
                         if timeoutOverride < 0:
                             self.Plugin.FailRender( "Timed out waiting for the next progress update. The ProgressUpdateTimeout setting can be modified in the Cinema4D Batch plugin configuration." )
                         else:
                             self.Plugin.FailRender( "Timed out waiting for the next progress update." )
-                elif isinstance( e, SimpleSocketException ):
+                elif isinstance( e, SOCKET_EXCEPTIONS ):
+                    if crashRecovery:
+                        raise Cinema4DCrashedError( e.Message )
                     self.Plugin.FailRender( "RenderTask: Cinema4D may have crashed (%s)" % e.Message )
                 else:
                     self.Plugin.FailRender( "RenderTask: Unexpected exception (%s)" % e.Message )
@@ -959,18 +2422,91 @@ class Cinema4DController( object ):
             self.Plugin.FailRender( "Render was canceled" )
         
         if not self.Cinema4DSocket.IsConnected:
+            if crashRecovery:
+                raise Cinema4DCrashedError( "the socket disconnected" )
             self.Plugin.FailRender( "Socket disconnected unexpectedly" )
         
         return "undefined"
         
+    def CheckForHang( self ):
+        """
+        Fails the task once the hang watchdog finds that Cinema 4D stopped making progress. Cinema 4D is stopped first, after
+        its diagnostic snapshot has been logged, since a hung session can not be ended with EndJob.
+        """
+        if not self.HangWatchdog:
+            return
+        hang = self.HangWatchdog.Check()
+        if hang:
+            if self.Plugin.GetBooleanConfigEntryWithDefault( "CollectHangDiagnostics", True ):
+                for line in CollectHangDiagnostics( self.HangWatchdog.RootPid ):
+                    self.Plugin.LogWarning( line )
+            SignalProcessTree( self.HangWatchdog.RootPid, self.HangWatchdog.RootStartTime, signal.SIGKILL )
+            self.HangWatchdog = None
+            self.Plugin.FailRender( "%s Cinema 4D was stopped, the HangTimeout setting can be modified in the Cinema4D Batch plugin configuration." % hang )
+
     def LaunchCinema4D( self, executable, arguments, startupDir ):
         self.ManagedCinema4DProcessRenderExecutable = executable
         self.ManagedCinema4DProcessRenderArgument = arguments
         self.ManagedCinema4DProcessStartupDirectory = startupDir
         
+        if self.Plugin.GetBooleanConfigEntryWithDefault( "EnableLogCapture", False ) and not self.StdoutCapture:
+            # The capture lasts for the whole session, including Cinema 4D restarts after a crash.
+            self.StdoutCapture = CreateStdoutCapture( self.Plugin )
         self.Cinema4DProcess = Cinema4DProcess(self)
-        self.Plugin.StartMonitoredManagedProcess( self.ProgramName, self.Cinema4DProcess )
+        knownChildren = set( GetChildProcessIds( os.getpid() ) ) if SystemUtils.IsRunningOnLinux() else None
+        if self.CpuPartition:
+            # Cinema 4D inherits the affinity of the thread that starts it, and passes it on to any process it starts, so
+            # the thread is only pinned while Cinema 4D is started.
+            os.sched_setaffinity( 0, self.CpuPartition )
+            try:
+                self.Plugin.StartMonitoredManagedProcess( self.ProgramName, self.Cinema4DProcess )
+            finally:
+                os.sched_setaffinity( 0, self.OriginalCpuAffinity )
+        else:
+            self.Plugin.StartMonitoredManagedProcess( self.ProgramName, self.Cinema4DProcess )
+        self.Cinema4DPid = None
+        self.Cinema4DStartTime = None
+        if knownChildren is not None:
+            pid = FindNewChildProcess( knownChildren, self.Cinema4DRenderExecutable, self.SessionMarker )
+            if pid is None:
+                self.Plugin.LogWarning( "Could not find the Cinema 4D process, so it will run without resource limits or sampling" )
+            else:
+                self.Cinema4DPid = pid
+                self.Cinema4DStartTime = GetProcessStartTime( pid )
+                if self.Cgroup:
+                    self.MoveCinema4DToCgroup( pid )
+                if self.ResourceSampler:
+                    # Cinema 4D was restarted after a crash, the task's resource usage is still sampled.
+                    self.ResourceSampler.RootPid = pid
+                else:
+                    self.ResourceSampler = CreateResourceSampler( self.Plugin, lambda: pid, self.Cgroup is not None )
+                    self.ResourceSamplerHasTask = False
+                if self.Plugin.GetBooleanConfigEntryWithDefault( "EnableHangDetection", False ):
+                    self.HangWatchdog = HangWatchdog( self.Plugin.GetIntegerConfigEntryWithDefault( "HangTimeout", 10 ) * 60, self.Plugin.GetIntegerConfigEntryWithDefault( "HangCpuPercent", 150 ) / 100.0 )
+                    self.HangWatchdog.SetProcess( pid )
+                if self.MemoryReservation:
+                    with SessionReservations() as reservations:
+                        reservations.Reserve( self.MemoryReservation, self.ExpectedPeakMemory, pid )
         self.Plugin.VerifyMonitoredManagedProcess( self.ProgramName )
+
+    def SaveCapturedLog( self ):
+        if not self.StdoutCapture:
+            return
+        try:
+            # Capture what Cinema 4D printed before it failed or crashed. This runs while a failure is being raised, so it
+            # must not raise another one.
+            self.Plugin.FlushMonitoredManagedProcessStdout( self.ProgramName )
+        except Exception:
+            pass
+        SaveCapturedLog( self.Plugin, self.StdoutCapture, RepositoryUtils.GetJobAuxiliaryPath( self.Plugin.GetJob() ) )
+
+    def MoveCinema4DToCgroup( self, pid ):
+        try:
+            self.Cgroup.AddProcessTree( pid )
+        except ( IOError, OSError ) as e:
+            self.Plugin.LogWarning( "Failed to move Cinema 4D into the cgroup %s, so it will run without resource limits: %s" % ( self.Cgroup.Path, e ) )
+            return
+        self.Plugin.LogInfo( "Moved Cinema 4D (process %s) into the cgroup %s" % ( pid, self.Cgroup.Path ) )
     
     def WaitForConnection( self, errorMessageOperation ):
         startTime = DateTime.Now
@@ -1001,7 +2537,7 @@ class Cinema4DController( object ):
                             failedImports.append( line.strip() )
                     self.Plugin.FailRender( "Failed to import the following modules: %s\nPlease ensure that your environment is set correctly or that you are allowing Deadline to set the render environment." % ", ".join(failedImports) )
 
-                if not isinstance( e, SimpleSocketTimeoutException ):
+                if not isinstance( e, SOCKET_TIMEOUT_EXCEPTIONS ):
                     self.Plugin.FailRender( "%s: Error getting connection from Cinema4D: %s" % (errorMessageOperation, e.Message) )
             
             if self.Plugin.IsCanceled():
@@ -1051,6 +2587,10 @@ class Cinema4DProcess( ManagedProcess ):
         self.currFrame = None
         self.prevFrame = self.Cinema4DController.Plugin.GetStartFrame()
         
+        # The output is captured before any other handler sees it, so that a line that fails the render is in the saved log.
+        if self.Cinema4DController.StdoutCapture:
+            self.AddStdoutHandlerCallback( ".*" ).HandleCallback += self.HandleCapturedStdout
+
         #self.AddStdoutHandlerCallback("Error:.*").HandleCallback += self.HandleStdoutError
         self.AddStdoutHandlerCallback(".*Document not found.*").HandleCallback += self.HandleStdoutError
         self.AddStdoutHandlerCallback(".*Project not found.*").HandleCallback += self.HandleStdoutError
@@ -1090,6 +2630,10 @@ class Cinema4DProcess( ManagedProcess ):
         self.AddStdoutHandlerCallback( ".*ImportError: No module named site.*" ).HandleCallback += self.HandleNoSite
         self.AddStdoutHandlerCallback( ".*code for hash .* was not found." ).HandleCallback += self.HandleHashNotFound
 
+        # Anything Cinema 4D prints shows the hang watchdog that it is making progress.
+        if self.Cinema4DController.Plugin.GetBooleanConfigEntryWithDefault( "EnableHangDetection", False ):
+            self.AddStdoutHandlerCallback( ".*" ).HandleCallback += self.HandleAnyStdout
+
         # Handle QuickTime popup dialog
         # "QuickTime does not support the current Display Setting.  Please change it and restart this application."
         self.AddPopupHandler( "Unsupported Display", "OK" )
@@ -1106,6 +2650,16 @@ class Cinema4DProcess( ManagedProcess ):
     def StartupDirectory( self ):
         return self.Cinema4DController.ManagedCinema4DProcessStartupDirectory
 
+    def HandleCapturedStdout( self ):
+        # The capture is closed at the end of the job, when Cinema 4D may still print a few lines.
+        capture = self.Cinema4DController.StdoutCapture
+        if capture and not capture.Write( self.GetRegexMatch( 0 ) ):
+            self.SuppressThisLine()
+
+    def HandleAnyStdout( self ):
+        if self.Cinema4DController.HangWatchdog:
+            self.Cinema4DController.HangWatchdog.NoteActivity()
+
     def HandleNoSite( self ):
         self.Cinema4DController.Plugin.FailRender( "Failed to import the following modules: site\nPlease ensure that your environment is set correctly or that you are allowing Deadline to set the render environment.\nPlease go to the C4D FAQ in the Deadline documentation for more information." )
 
@@ -1113,10 +2667,12 @@ class Cinema4DProcess( ManagedProcess ):
         self.Cinema4DController.Plugin.LogInfo( "OpenSSL has not been set up to work properly with C4D Batch, this is a non-blocking issue.\nPlease go to the C4D FAQ in the Deadline documentation for more information." )
 
     def HandleStdoutProgress( self ):
+        self.Cinema4DController.TaskStats.StartFrame()
         startFrame = self.Cinema4DController.Plugin.GetStartFrame()
         endFrame = self.Cinema4DController.Plugin.GetEndFrame()
 
         currFrame = int( self.GetRegexMatch(1) )
+        self.Cinema4DController.SetRenderPhase( "Render", currFrame )
         frameCount = abs( endFrame - startFrame ) + 1
         progress = 100 * ( currFrame - startFrame ) // frameCount
 
@@ -1140,6 +2696,8 @@ class Cinema4DProcess( ManagedProcess ):
         self.Cinema4DController.Plugin.FailRender( self.GetRegexMatch(0) + "\nC4D was unable to locate DeadlineConnect.pyp. This is a known issue in R18 and R19 for Cinema4DBatch, please go to the C4D FAQ in the Deadline documentation for a workaround." )
         
     def HandleSetupProgress( self ):
+        self.Cinema4DController.SetRenderPhase( "Setup" )
+
         #If frame number is given update the Render status with the current frame
         if self.currFrame is not None:
             self.CurrentRenderPhase = "Frame: "+str(self.currFrame)+",  Rendering Phase: Setup"
@@ -1148,6 +2706,7 @@ class Cinema4DProcess( ManagedProcess ):
 
     def HandleProgressCheck( self ):
         self.CheckProgress = True
+        self.Cinema4DController.SetRenderPhase( "Main Render" )
 
         #If frame number is given update the Render status with the current frame
         if self.currFrame != None:
@@ -1180,6 +2739,7 @@ class Cinema4DProcess( ManagedProcess ):
     def HandleFrameProgress( self ):
         self.FinishedFrameCount += 1
         self.CheckProgress = False
+        self.Cinema4DController.SetRenderPhase( "Finalize" )
 
         #If frame number is given update the Render status with the current frame
         if self.currFrame is not None:
@@ -1205,6 +2765,8 @@ class Cinema4DProcess( ManagedProcess ):
         self.Cinema4DController.Plugin.SetProgress( progress )
 
     def HandleRedshiftBlockRendered(self):
+        if self.Cinema4DController.LiveMetrics:
+            self.Cinema4DController.LiveMetrics.AddRedshiftBlock()
         startFrame = self.Cinema4DController.Plugin.GetStartFrame()
         endFrame = self.Cinema4DController.Plugin.GetEndFrame()
         frameCount = abs( endFrame - startFrame ) + 1
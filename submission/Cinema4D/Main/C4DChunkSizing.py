@@ -0,0 +1,106 @@
+from __future__ import absolute_import, division, print_function
+import argparse
+import math
+import os
+import sys
+
+# The render history is read with the helpers the Cinema4D and Cinema4DBatch plugins write it with.
+_commonDir = os.path.join( os.path.dirname( os.path.dirname( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) ) ), "plugins", "Cinema4D" )
+if _commonDir not in sys.path:
+    sys.path.insert( 0, _commonDir )
+
+from Cinema4DCommon import GetRenderHistoryDirectory, LoadRenderHistory
+
+# Fraction of a Worker's time that may be spent outside of rendering frames when no target is given.
+DEFAULT_MAX_OVERHEAD = 0.1
+
+def Median( values ):
+    values = sorted( values )
+    if not values:
+        return None
+    middle = len( values ) // 2
+    if len( values ) % 2:
+        return values[ middle ]
+    return ( values[ middle - 1 ] + values[ middle ] ) / 2.0
+
+def EstimateCosts( records ):
+    """
+    Estimates the per-frame, per-task and per-session costs of rendering from a list of history records.
+    :param records: records returned by LoadRenderHistory
+    :return: a dictionary with the median "frame", "task" and "startup" times in seconds, or None if there are no frame times
+    """
+    frameTimes = []
+    taskOverheads = []
+    startupTimes = []
+    for record in records:
+        frameTimes.extend( record.get( "frames" ) or [] )
+        if record.get( "overhead" ) is not None:
+            taskOverheads.append( record[ "overhead" ] + record.get( "timings", {} ).get( "upload", 0.0 ) )
+        if record.get( "startup" ) is not None:
+            startupTimes.append( record[ "startup" ] )
+
+    if not frameTimes:
+        return None
+
+    return {
+        "frame": Median( frameTimes ),
+        "task": Median( taskOverheads ) or 0.0,
+        "startup": Median( startupTimes ) or 0.0,
+    }
+
+def SuggestChunkSize( frameCount, costs, plugin, workers=1, maxOverhead=DEFAULT_MAX_OVERHEAD ):
+    """
+    Picks the smallest chunk size that keeps the time a Worker spends outside of rendering frames below maxOverhead.
+    The Cinema4D plugin starts Cinema 4D for every task, so its startup is paid per chunk. The Cinema4DBatch plugin keeps
+    Cinema 4D running between tasks, so its startup is paid once per Worker and spread over all of its frames.
+    The chunk size is capped so that the frames are still spread over every Worker.
+    :param frameCount: the number of frames in the job
+    :param costs: the costs returned by EstimateCosts
+    :param plugin: "Cinema4D" or "Cinema4DBatch"
+    :param workers: the number of Workers expected to render the job at the same time
+    :param maxOverhead: the target fraction of time spent outside of rendering frames
+    :return: the suggested chunk size
+    """
+    frameCount = max( frameCount, 1 )
+    workers = max( workers, 1 )
+    frameTime = max( costs[ "frame" ], 1e-3 )
+    perTask = costs[ "task" ]
+    if plugin == "Cinema4DBatch":
+        framesPerWorker = int( math.ceil( frameCount / float( workers ) ) )
+        perTask += costs[ "startup" ] / float( framesPerWorker )
+    else:
+        perTask += costs[ "startup" ]
+
+    # overhead / ( overhead + chunk * frameTime ) <= maxOverhead
+    maxOverhead = min( max( maxOverhead, 0.01 ), 0.99 )
+    chunkSize = int( math.ceil( perTask * ( 1.0 - maxOverhead ) / ( maxOverhead * frameTime ) ) )
+
+    maxChunkSize = int( math.ceil( frameCount / float( workers ) ) )
+    return min( max( chunkSize, 1 ), maxChunkSize )
+
+def main():
+    parser = argparse.ArgumentParser( description="Suggests a chunk size for a Cinema 4D job from the render history recorded by the Cinema4D and Cinema4DBatch plugins." )
+    parser.add_argument( "historyDirectory", help="the Render History Directory from the plugin configuration" )
+    parser.add_argument( "sceneFile", help="the scene file, as it will be submitted" )
+    parser.add_argument( "frameCount", type=int, help="the number of frames in the job" )
+    parser.add_argument( "--renderer", default="", help="the Renderer the job will be submitted with" )
+    parser.add_argument( "--plugin", default="Cinema4D", choices=[ "Cinema4D", "Cinema4DBatch" ] )
+    parser.add_argument( "--workers", type=int, default=1, help="the number of Workers expected to render the job at once" )
+    parser.add_argument( "--max-overhead", type=float, default=DEFAULT_MAX_OVERHEAD, help="the target fraction of time spent outside of rendering frames" )
+    args = parser.parse_args()
+
+    sceneHistoryDir = GetRenderHistoryDirectory( args.historyDirectory, args.sceneFile, args.renderer )
+    costs = EstimateCosts( LoadRenderHistory( sceneHistoryDir, lambda record: record.get( "plugin" ) == args.plugin ) )
+    if costs is None:
+        # Frame times do not depend on the plugin, so fall back to the records of the other plugin.
+        costs = EstimateCosts( LoadRenderHistory( sceneHistoryDir ) )
+    if costs is None:
+        print( "No render history for %s" % args.sceneFile )
+        return 1
+
+    print( "Median frame time: %.1fs, task overhead: %.1fs, startup: %.1fs" % ( costs[ "frame" ], costs[ "task" ], costs[ "startup" ] ) )
+    print( "Suggested chunk size: %d" % SuggestChunkSize( args.frameCount, costs, args.plugin, args.workers, args.max_overhead ) )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit( main() )
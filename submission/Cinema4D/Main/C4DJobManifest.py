@@ -0,0 +1,198 @@
+"""
+Writes the manifest of a Cinema 4D job at submission time: the scene's assets with their sizes and modification times, its
+takes, active renderer, frame range and resolution, and a rough estimate of the memory a render session needs.
+
+The submitter runs this in Cinema 4D with the scene loaded, or it is run on a scene file with c4dpy:
+
+    c4dpy C4DJobManifest.py scene.c4d manifest.json
+
+The manifest is submitted as an auxiliary file of the job with its name in the AssetManifest plugin info entry, which
+AttachToSubmission does, or the --plugin-info option for a job submitted from the command line. The Cinema4D and
+Cinema4DBatch plugins check its assets in the asset pre-flight before Cinema 4D starts, use its renderer
+when the job does not name one, and use its memory estimate for memory admission until the render history has recorded
+the scene's peak memory.
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import io
+import json
+import os
+
+import c4d
+from c4d import documents
+
+# The scene is walked with the functions DeadlineConnect.pyp path maps it with, so that the manifest lists the same files.
+_deadlineConnectFile = os.path.join( os.path.dirname( os.path.dirname( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) ) ), "plugins", "Cinema4DBatch", "DeadlineConnect.pyp" )
+
+def _LoadDeadlineConnect():
+    try:
+        import importlib.util
+        from importlib.machinery import SourceFileLoader
+    except ImportError:
+        # Python 2, in Cinema 4D R20 to R22.
+        import imp
+        return imp.load_source( "DeadlineConnect", _deadlineConnectFile )
+    loader = SourceFileLoader( "DeadlineConnect", _deadlineConnectFile )
+    module = importlib.util.module_from_spec( importlib.util.spec_from_loader( loader.name, loader ) )
+    loader.exec_module( module )
+    return module
+
+DeadlineConnect = _LoadDeadlineConnect()
+
+MANIFEST_VERSION = 1
+
+# The Renderer plugin info values of the render engines, by the id of their video post.
+RENDER_ENGINES = {
+    0: "standard",
+    1023342: "physical",
+    300001061: "ogl_hardware",
+    1036219: "redshift",
+    1029988: "arnold",
+    1029525: "octane",
+    1053272: "vray5",
+    1030480: "corona",
+    1035287: "cycles4d",
+}
+
+# The memory estimate: a session without a scene, the decoded size of each image relative to its file, and the render
+# buffers, a few RGBA float copies of the frame.
+SESSION_BYTES = 1024 * 1024 * 1024
+IMAGE_EXTENSIONS = frozenset( [ ".bmp", ".jpeg", ".jpg", ".png", ".psd", ".tga", ".tif", ".tiff" ] )
+IMAGE_EXPANSION = 4
+FRAME_BUFFER_COPIES = 4
+
+def CollectFileParameters( doc ):
+    """
+    Finds the file paths of the document's objects, tags, materials and their shaders with the walk that DeadlineConnect.pyp
+    path maps the scene with.
+    :return: the list of file paths, in the order they were found
+    """
+    objectsWithPaths = []
+    DeadlineConnect.GrabAllObjectsWithPaths( doc, objectsWithPaths )
+    return [ DeadlineConnect.toStr( obj[ paramid ].strip() ) for obj, paramid in objectsWithPaths ]
+
+def DescribeAssets( doc, paths ):
+    """
+    Resolves relative paths the way Cinema 4D does when rendering, and records the size and modification time of each asset.
+    :return: the list of asset entries, sorted by path
+    """
+    docPath = doc.GetDocumentPath()
+    assets = []
+    for path in sorted( set( paths ) ):
+        if not os.path.isabs( path ):
+            path = c4d.GenerateTexturePath( docPath, path, "" ) or path
+        try:
+            stat = os.stat( path )
+        except OSError:
+            assets.append( { "path": path, "missing": True } )
+            continue
+        assets.append( { "path": path, "size": stat.st_size, "mtime": stat.st_mtime } )
+    return assets
+
+def GetTakes( doc ):
+    """
+    :return: the names of the document's takes and the name of the active take, or ( [], "" ) if it has no take data
+    """
+    takeData = doc.GetTakeData()
+    if takeData is None:
+        return [], ""
+
+    names = []
+
+    def walkTakes( take ):
+        while take:
+            names.append( take.GetName() )
+            walkTakes( take.GetDown() )
+            take = take.GetNext()
+
+    walkTakes( takeData.GetMainTake() )
+    return names, takeData.GetCurrentTake().GetName()
+
+def EstimateMemory( assets, resolution ):
+    """
+    Estimates the peak memory of a render session from the scene's assets and resolution. This is only a starting point
+    until the plugins have recorded the scene's actual peak memory in the render history.
+    :return: the estimate in bytes
+    """
+    total = SESSION_BYTES
+    for asset in assets:
+        size = asset.get( "size", 0 )
+        if os.path.splitext( asset[ "path" ] )[ 1 ].lower() in IMAGE_EXTENSIONS:
+            size *= IMAGE_EXPANSION
+        total += size
+    return total + resolution[ 0 ] * resolution[ 1 ] * 16 * FRAME_BUFFER_COPIES
+
+def BuildJobManifest( doc ):
+    """
+    :param doc: the document to submit
+    :return: the manifest dictionary
+    """
+    renderData = doc.GetActiveRenderData()
+    fps = int( renderData[ c4d.RDATA_FRAMERATE ] or doc.GetFps() )
+    resolution = [ int( renderData[ c4d.RDATA_XRES ] ), int( renderData[ c4d.RDATA_YRES ] ) ]
+    engine = renderData[ c4d.RDATA_RENDERENGINE ] or 0
+    takes, activeTake = GetTakes( doc )
+    assets = DescribeAssets( doc, CollectFileParameters( doc ) )
+
+    return {
+        "version": MANIFEST_VERSION,
+        "scene": os.path.join( doc.GetDocumentPath(), doc.GetDocumentName() ),
+        "renderer": RENDER_ENGINES.get( engine, "" ),
+        "takes": takes,
+        "activeTake": activeTake,
+        "frameRange": [ renderData[ c4d.RDATA_FRAMEFROM ].GetFrame( fps ), renderData[ c4d.RDATA_FRAMETO ].GetFrame( fps ), int( renderData[ c4d.RDATA_FRAMESTEP ] or 1 ) ],
+        "resolution": resolution,
+        "memoryEstimate": EstimateMemory( assets, resolution ),
+        "assets": assets,
+    }
+
+def WriteJobManifest( doc, manifestFile ):
+    """
+    Writes the manifest of the document to manifestFile.
+    :return: the manifest dictionary
+    """
+    manifest = BuildJobManifest( doc )
+    with io.open( manifestFile, mode="w", encoding="utf-8" ) as manifestHandle:
+        manifestHandle.write( u"%s" % json.dumps( manifest, indent=1, sort_keys=True ) )
+    return manifest
+
+def AttachToSubmission( manifestFile, pluginInfoFile, auxiliaryFiles ):
+    """
+    Adds the manifest to a job's submission: its file name is set as the AssetManifest entry of the plugin info file, and
+    the manifest is added to the auxiliary files, which the Worker copies to the job's data folder.
+    :param manifestFile: the manifest written by WriteJobManifest
+    :param pluginInfoFile: the plugin info file the job is submitted with
+    :param auxiliaryFiles: the list of auxiliary files the job is submitted with, which the manifest is appended to
+    :return: None
+    """
+    with io.open( pluginInfoFile, mode="r", encoding="utf-8-sig" ) as pluginInfoHandle:
+        lines = [ line.rstrip( "\r\n" ) for line in pluginInfoHandle ]
+    lines = [ line for line in lines if line.split( "=", 1 )[ 0 ].strip() != "AssetManifest" ]
+    lines.append( u"AssetManifest=%s" % os.path.basename( manifestFile ) )
+    with io.open( pluginInfoFile, mode="w", encoding="utf-8" ) as pluginInfoHandle:
+        pluginInfoHandle.write( u"\n".join( lines ) + u"\n" )
+    if manifestFile not in auxiliaryFiles:
+        auxiliaryFiles.append( manifestFile )
+
+def main():
+    parser = argparse.ArgumentParser( description="Writes the asset and dependency manifest of a Cinema 4D scene for submission with its job." )
+    parser.add_argument( "sceneFile", help="the scene file to analyze" )
+    parser.add_argument( "manifestFile", help="the manifest to write" )
+    parser.add_argument( "--plugin-info", help="the plugin info file of the job, to set its AssetManifest entry in" )
+    args = parser.parse_args()
+
+    if not documents.LoadFile( args.sceneFile ):
+        print( "Failed to load %s" % args.sceneFile )
+        return 1
+    manifest = WriteJobManifest( documents.GetActiveDocument(), args.manifestFile )
+    missing = [ asset[ "path" ] for asset in manifest[ "assets" ] if asset.get( "missing" ) ]
+    print( "Wrote %s: %d asset(s), %d of them missing, renderer '%s', frames %s-%s, estimated memory %.0f MB" % (
+        args.manifestFile, len( manifest[ "assets" ] ), len( missing ), manifest[ "renderer" ], manifest[ "frameRange" ][ 0 ], manifest[ "frameRange" ][ 1 ], manifest[ "memoryEstimate" ] / 1048576.0 ) )
+    if args.plugin_info:
+        auxiliaryFiles = []
+        AttachToSubmission( args.manifestFile, args.plugin_info, auxiliaryFiles )
+        print( "Set AssetManifest in %s, submit the job with %s as an auxiliary file" % ( args.plugin_info, auxiliaryFiles[ 0 ] ) )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit( main() )
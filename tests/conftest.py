@@ -0,0 +1,12 @@
+"""
+Puts the shared plugin helpers, the submission scripts and the benchmark harness, which brings the Deadline and c4d
+stand-ins with it, on the path.
+"""
+import os
+import sys
+
+REPOSITORY_DIR = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+for path in ( os.path.join( REPOSITORY_DIR, "plugins", "Cinema4D" ), os.path.join( REPOSITORY_DIR, "benchmarks" ), os.path.join( REPOSITORY_DIR, "submission", "Cinema4D", "Main" ) ):
+    if path not in sys.path:
+        sys.path.insert( 0, path )
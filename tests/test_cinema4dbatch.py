@@ -0,0 +1,245 @@
+import functools
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import harness
+from Cinema4DCommon import AppendRenderHistory, GetRenderHistoryDirectory
+
+Cinema4DBatch = harness.LoadPluginModule( "Cinema4DBatch" )
+DeadlineConnect = harness.LoadDeadlineConnect()
+
+
+def test_get_frame_filename_keeps_padding():
+    path = os.path.join( "renders", "Beauty0001.exr" )
+    assert Cinema4DBatch.GetFrameFilename( path, 7 ) == os.path.join( "renders", "Beauty0007.exr" )
+    assert Cinema4DBatch.GetFrameFilename( path, 12345 ) == os.path.join( "renders", "Beauty12345.exr" )
+    assert Cinema4DBatch.GetFrameFilename( "Beauty_12", 3 ) == "Beauty_03"
+    assert Cinema4DBatch.GetFrameFilename( "Beauty.exr", 3 ) == "Beauty.exr"
+
+
+def test_mapped_scene_copies_keep_the_scene_name( tmp_path ):
+    sceneFile = str( tmp_path / "shot010.c4d" )
+    with open( sceneFile, "w" ) as sceneHandle:
+        sceneHandle.write( "{}" )
+    cache = Cinema4DBatch.MappedSceneCache( str( tmp_path / "MappedScenes" ), sceneFile )
+    linuxFiles = cache.GetFilenames( [ "X:/tex/a.png" ], lambda path: path.replace( "X:", "/mnt/x" ), [] )
+    windowsFiles = cache.GetFilenames( [ "X:/tex/a.png" ], lambda path: path, [] )
+    assert os.path.basename( linuxFiles[0] ) == "shot010.c4d"
+    assert os.path.dirname( linuxFiles[0] ) == os.path.dirname( linuxFiles[1] )
+    assert os.path.dirname( linuxFiles[0] ) != os.path.dirname( windowsFiles[0] )
+
+
+@pytest.mark.skipif( not sys.platform.startswith( "linux" ), reason="reads the process start time from /proc" )
+def test_stop_process_tree_only_signals_the_process_it_was_given():
+    process = subprocess.Popen( [ sys.executable, "-c", "import time; time.sleep( 60 )" ] )
+    try:
+        startTime = Cinema4DBatch.GetProcessStartTime( process.pid )
+        assert Cinema4DBatch.StopProcessTree( process.pid, startTime + 1, 0.1, 1.0 )[0] == "exited"
+        assert process.poll() is None
+
+        assert Cinema4DBatch.StopProcessTree( process.pid, startTime, 0.1, 5.0 )[0] == "terminated"
+        assert process.wait( 5 ) == -signal.SIGTERM
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_crash_recovery_resumes_the_render_and_times_each_restart_once( tmp_path ):
+    environment = {
+        "FAKE_C4D_BOOT_SECONDS": "0.3",
+        "FAKE_C4D_CRASH_FRAME": "2,4",
+        "FAKE_C4D_CRASH_FILE": str( tmp_path / "crashed.txt" ),
+    }
+    with harness.Worker( "Cinema4DBatch", config={ "CrashRestartLimit": 2 }, environment=environment ) as worker:
+        outputDir = os.path.join( worker.Root, "output" )
+        os.makedirs( outputDir )
+        worker.PluginInfo[ "SceneFile" ] = harness.WriteScene( os.path.join( worker.Root, "scene.c4d" ), objects=10, materials=2 )
+        worker.PluginInfo[ "FilePath" ] = outputDir
+        worker.PluginInfo[ "FilePrefix" ] = "beauty_"
+        worker.StartJob()
+        worker.SetTask( 0, 1, 5 )
+        startTime = time.time()
+        worker.RenderTask()
+        taskTime = time.time() - startTime
+
+        restarts = [ message for _, _, message in worker.Messages if "Restarted Cinema 4D in" in message ]
+        assert len( restarts ) == 2
+        assert sorted( os.listdir( outputDir ) ) == [ "beauty_%04d.png" % frame for frame in range( 1, 6 ) ]
+        crashRestart = worker.Plugin.MyCinema4DController.TaskStats.Timings[ "crashRestart" ]
+        assert 0.6 <= crashRestart <= taskTime
+
+
+@pytest.mark.skipif( not sys.platform.startswith( "linux" ), reason="memory admission control is Linux only" )
+def test_memory_admission_keeps_waiting_after_the_timeout( tmp_path, monkeypatch ):
+    monkeypatch.setattr( Cinema4DBatch, "SessionReservations", functools.partial( Cinema4DBatch.SessionReservations, directory=str( tmp_path / "sessions" ) ) )
+    monkeypatch.setattr( Cinema4DBatch, "MEMORY_ADMISSION_POLL_SECONDS", 0.05 )
+    with Cinema4DBatch.SessionReservations() as reservations:
+        reservations.Reserve( "other-session", 1 << 50 )
+    historyDir = str( tmp_path / "history" )
+    config = { "EnableMemoryAdmission": True, "RenderHistoryDirectory": historyDir, "MemoryAdmissionTimeout": 0 }
+    with harness.Worker( "Cinema4DBatch", config=config ) as worker:
+        scene = harness.WriteScene( os.path.join( worker.Root, "scene.c4d" ), objects=10, materials=2 )
+        worker.PluginInfo[ "SceneFile" ] = scene
+        sceneHistoryDir = GetRenderHistoryDirectory( historyDir, scene, worker.PluginInfo.get( "Renderer", "" ) )
+        AppendRenderHistory( sceneHistoryDir, "other", { "time": time.time(), "take": "", "peakMemory": 1 << 50 } )
+
+        def releaseOtherSession():
+            with Cinema4DBatch.SessionReservations() as reservations:
+                reservations.Release( "other-session" )
+        releaseTimer = threading.Timer( 0.5, releaseOtherSession )
+        releaseTimer.start()
+        startTime = time.time()
+        worker.StartJob()
+
+        assert time.time() - startTime >= 0.5
+        assert worker.Plugin.MyCinema4DController.MemoryReservation
+        assert any( message.startswith( "Still waiting for free memory" ) for _, _, message in worker.Messages )
+        assert worker.Plugin.MyCinema4DController.Cinema4DPid
+
+
+@pytest.mark.skipif( not sys.platform.startswith( "linux" ), reason="memory admission control is Linux only" )
+def test_abandoned_session_releases_only_its_own_reservation( tmp_path, monkeypatch ):
+    reservationDir = str( tmp_path / "sessions" )
+    monkeypatch.setattr( Cinema4DBatch, "SessionReservations", functools.partial( Cinema4DBatch.SessionReservations, directory=reservationDir ) )
+    historyDir = str( tmp_path / "history" )
+    config = { "EnableMemoryAdmission": True, "RenderHistoryDirectory": historyDir, "ShutdownMode": "Abandon" }
+    with harness.Worker( "Cinema4DBatch", config=config ) as worker:
+        scene = harness.WriteScene( os.path.join( worker.Root, "scene.c4d" ), objects=10, materials=2 )
+        worker.PluginInfo[ "SceneFile" ] = scene
+        sceneHistoryDir = GetRenderHistoryDirectory( historyDir, scene, worker.PluginInfo.get( "Renderer", "" ) )
+        AppendRenderHistory( sceneHistoryDir, "other", { "time": time.time(), "take": "", "peakMemory": 1 << 20 } )
+        worker.StartJob()
+        abandonedReservation = worker.Plugin.MyCinema4DController.MemoryReservation
+        worker.EndJob()
+        worker.StartJob()
+        reservation = worker.Plugin.MyCinema4DController.MemoryReservation
+        assert any( "it is stopped in the background" in message for _, _, message in worker.Messages )
+        assert reservation != abandonedReservation
+
+        deadline = time.time() + 10
+        while os.path.exists( os.path.join( reservationDir, "%s.json" % abandonedReservation ) ) and time.time() < deadline:
+            time.sleep( 0.05 )
+        assert sorted( os.listdir( reservationDir ) ) == [ "%s.json" % reservation, "reservations.lock" ]
+
+
+def RenderSkippingDuplicates( tmp_path, frames, **sceneDescription ):
+    with harness.Worker( "Cinema4DBatch", pluginInfo={ "SkipDuplicateFrames": True } ) as worker:
+        outputDir = str( tmp_path / "output" )
+        os.makedirs( outputDir )
+        worker.PluginInfo[ "SceneFile" ] = harness.WriteScene( str( tmp_path / "scene.c4d" ), objects=4, materials=1, cacheEvery=2, **sceneDescription )
+        worker.PluginInfo[ "FilePath" ] = outputDir
+        worker.PluginInfo[ "FilePrefix" ] = "beauty_"
+        worker.StartJob()
+        worker.SetTask( 0, frames[0], frames[-1] )
+        worker.RenderTask()
+        assert sorted( os.listdir( outputDir ) ) == [ "beauty_%04d.png" % frame for frame in frames ]
+        return [ message for _, _, message in worker.Messages ]
+
+
+def test_skip_duplicate_frames_compares_the_evaluated_geometry( tmp_path ):
+    # The objects hold still for the whole task, while the Alembic caches only hold within cacheHolds.
+    messages = RenderSkippingDuplicates( tmp_path, list( range( 1, 9 ) ), holds=[ [ 1, 8 ] ], animatedCaches=True, cacheHolds=[ [ 1, 3 ], [ 5, 6 ] ] )
+    assert "Frame 1 was duplicated as frame(s) 2, 3" in messages
+    assert "Frame 5 was duplicated as frame(s) 6" in messages
+    assert any( message.startswith( "Skipped rendering 3 duplicate frame(s)" ) for message in messages )
+
+
+def test_skip_duplicate_frames_renders_every_frame_of_scenes_with_particles( tmp_path ):
+    messages = RenderSkippingDuplicates( tmp_path, list( range( 1, 5 ) ), holds=[ [ 1, 4 ] ], emitters=1 )
+    assert any( "scene has particle emitters" in message for message in messages )
+    assert not any( "was duplicated as" in message for message in messages )
+
+
+def test_gi_prepass_publishes_the_cache_of_the_whole_job( tmp_path ):
+    giCacheDir = str( tmp_path / "gicache" )
+    pluginInfo = { "Renderer": "physical", "GICacheMode": "Prepass", "GICacheDirectory": giCacheDir }
+    with harness.Worker( "Cinema4DBatch", pluginInfo=pluginInfo ) as worker:
+        worker.PluginInfo[ "SceneFile" ] = harness.WriteScene( str( tmp_path / "scene.c4d" ), objects=4, materials=1, globalIllumination=True )
+        worker.Job.JobFramesList = list( range( 1, 11 ) )
+        worker.StartJob()
+        worker.SetTask( 0, 1, 5 )
+        with pytest.raises( harness.RenderFailedError, match="whole frame range" ):
+            worker.RenderTask()
+        assert not os.path.exists( giCacheDir )
+
+        cacheDir = os.path.join( giCacheDir, worker.Plugin.MyCinema4DController.GICacheKey )
+        os.makedirs( cacheDir )
+        with open( os.path.join( cacheDir, "illum.gi" ), "w" ) as cacheHandle:
+            cacheHandle.write( "[]" )
+        worker.SetTask( 1, 1, 10 )
+        worker.RenderTask()
+        assert os.listdir( giCacheDir ) == [ os.path.basename( cacheDir ) ]
+        with open( os.path.join( cacheDir, "illum.gi" ) ) as cacheHandle:
+            assert cacheHandle.read() == "[1, 2, 3, 4, 5, 6, 7, 8, 9, 10]"
+
+
+def test_skip_duplicate_frames_compares_the_points_of_deformed_geometry( tmp_path ):
+    # The deformation keeps the bounding box of the caches, and only holds still within pointHolds.
+    messages = RenderSkippingDuplicates( tmp_path, list( range( 1, 7 ) ), holds=[ [ 1, 6 ] ], deformedCaches=True, pointHolds=[ [ 2, 4 ] ] )
+    assert "Frame 2 was duplicated as frame(s) 3, 4" in messages
+    assert any( message.startswith( "Skipped rendering 2 duplicate frame(s)" ) for message in messages )
+
+
+@pytest.mark.parametrize( "sceneDescription", [ { "animatedNoise": True }, { "textureExtension": ".mov" } ] )
+def test_skip_duplicate_frames_renders_every_frame_of_scenes_with_time_dependent_shaders( tmp_path, sceneDescription ):
+    messages = RenderSkippingDuplicates( tmp_path, list( range( 1, 5 ) ), holds=[ [ 1, 4 ] ], **sceneDescription )
+    assert any( "scene has movie, image sequence or animated noise shaders" in message for message in messages )
+    assert not any( "was duplicated as" in message for message in messages )
+
+
+@pytest.fixture
+def unixSocket( tmp_path ):
+    listener = Cinema4DBatch.UnixListeningSocket( str( tmp_path / "deadline.sock" ) )
+    listener.StartListening( 1 )
+    client = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    client.connect( listener.Path )
+    listener.WaitForConnection( 1000, False )
+    yield listener, client
+    client.close()
+    listener.Disconnect( True )
+
+
+@pytest.mark.skipif( not hasattr( socket, "AF_UNIX" ), reason="Unix domain sockets are not available" )
+def test_unix_socket_speaks_the_deadline_connect_framing( unixSocket ):
+    listener, client = unixSocket
+    DeadlineConnect.send_msg( client, "TOKEN:abc" )
+    assert listener.Receive( 1000 ) == "TOKEN:abc"
+    listener.Send( u"RenderFrame:12" )
+    assert DeadlineConnect.recv_msg( client ) == "RenderFrame:12"
+
+    # The length prefix and the message arrive in separate reads, and the rest of the message after the timeout.
+    data = struct.pack( ">I", 13 ) + b"SUCCESS: done"
+    def SendSlowly():
+        for chunk in ( data[ :2 ], data[ 2:7 ], data[ 7: ] ):
+            client.sendall( chunk )
+            time.sleep( 0.2 )
+    sender = threading.Thread( target=SendSlowly )
+    sender.start()
+    try:
+        assert listener.Receive( 100 ) == "SUCCESS: done"
+    finally:
+        sender.join()
+
+
+@pytest.mark.skipif( not hasattr( socket, "AF_UNIX" ), reason="Unix domain sockets are not available" )
+def test_unix_socket_times_out_and_detects_the_peer_closing( unixSocket ):
+    listener, client = unixSocket
+    with pytest.raises( Cinema4DBatch.UnixSocketTimeoutException ):
+        listener.Receive( 100 )
+    assert listener.IsConnected
+
+    client.sendall( struct.pack( ">I", 5 ) + b"SUC" )
+    client.close()
+    with pytest.raises( Cinema4DBatch.UnixSocketException ) as excinfo:
+        listener.Receive( 1000 )
+    assert not isinstance( excinfo.value, Cinema4DBatch.UnixSocketTimeoutException )
+    assert not listener.IsConnected
@@ -0,0 +1,310 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from Cinema4DCommon import (
+    AppendRenderHistory, AppendVerifiedPaths, CompactFrameRanges, ExportCache, FindFramesToRender, FindNewChildProcess,
+    FormatCpuList, GetCgroupLimits, GetChildProcessIds, GetRenderHistoryDirectory, IndexFrameFiles, JobManifest,
+    LoadRenderHistory, LoadVerifiedPaths, PREFLIGHT_RETENTION_SECONDS, ParseCpuList, PartitionCpus, RedshiftCache,
+    RemoveVerifiedPaths, SplitExportFrames )
+
+
+@pytest.mark.parametrize( "frames, expected", [
+    ( [], [] ),
+    ( [ 5 ], [ ( 5, 5 ) ] ),
+    ( [ 3, 1, 2, 7 ], [ ( 1, 3 ), ( 7, 7 ) ] ),
+    ( [ 1, 3, 5 ], [ ( 1, 1 ), ( 3, 3 ), ( 5, 5 ) ] ),
+] )
+def test_compact_frame_ranges( frames, expected ):
+    assert CompactFrameRanges( frames ) == expected
+
+
+def test_split_export_frames_balances_slices():
+    slices = SplitExportFrames( list( range( 1, 11 ) ), 3 )
+    assert slices == [ [ 1, 2, 3, 4 ], [ 5, 6, 7 ], [ 8, 9, 10 ] ]
+
+
+def test_split_export_frames_keeps_two_frames_per_slice():
+    assert SplitExportFrames( [ 1, 2, 3, 4, 5 ], 4 ) == [ [ 1, 2, 3 ], [ 4, 5 ] ]
+    assert SplitExportFrames( [ 1 ], 4 ) == [ [ 1 ] ]
+
+
+@pytest.mark.parametrize( "cpuList, cpus", [
+    ( "0-3,8,10-11", [ 0, 1, 2, 3, 8, 10, 11 ] ),
+    ( "5", [ 5 ] ),
+    ( "", [] ),
+] )
+def test_cpu_list_round_trip( cpuList, cpus ):
+    assert ParseCpuList( cpuList ) == cpus
+    assert FormatCpuList( cpus ) == cpuList
+
+
+def test_partition_cpus_does_not_split_nodes():
+    topology = [ ( 0, [ [ 0, 4 ], [ 1, 5 ] ] ), ( 1, [ [ 2, 6 ], [ 3, 7 ] ] ) ]
+    assert PartitionCpus( topology, 2, 0 ) == ( [ 0 ], [ 0, 1, 4, 5 ] )
+    assert PartitionCpus( topology, 2, 1 ) == ( [ 1 ], [ 2, 3, 6, 7 ] )
+    assert PartitionCpus( topology, 1, 0 ) == ( [ 0, 1 ], list( range( 8 ) ) )
+
+
+def test_partition_cpus_shares_nodes_without_splitting_cores():
+    topology = [ ( 0, [ [ 0, 4 ], [ 1, 5 ] ] ) ]
+    nodes, first = PartitionCpus( topology, 2, 0 )
+    _, second = PartitionCpus( topology, 2, 1 )
+    assert nodes == [ 0 ]
+    assert sorted( first + second ) == [ 0, 1, 4, 5 ]
+    assert not set( first ) & set( second )
+
+
+def test_render_history_directory_is_shared_across_path_separators( tmp_path ):
+    historyDir = str( tmp_path )
+    windowsDir = GetRenderHistoryDirectory( historyDir, "\\\\server\\jobs\\shot.c4d", "redshift" )
+    assert windowsDir == GetRenderHistoryDirectory( historyDir, "//server/jobs/shot.c4d", "redshift" )
+    assert windowsDir != GetRenderHistoryDirectory( historyDir, "//server/jobs/shot.c4d", "physical" )
+    assert windowsDir != GetRenderHistoryDirectory( historyDir, "//server/jobs/other.c4d", "redshift" )
+
+
+def test_render_history_directory_keeps_case( tmp_path ):
+    historyDir = str( tmp_path )
+    assert GetRenderHistoryDirectory( historyDir, "/jobs/Shot.c4d", "" ) != GetRenderHistoryDirectory( historyDir, "/jobs/shot.c4d", "" )
+
+
+def test_render_history_merges_every_writer( tmp_path ):
+    sceneHistoryDir = GetRenderHistoryDirectory( str( tmp_path ), "/jobs/shot.c4d", "redshift" )
+    AppendRenderHistory( sceneHistoryDir, "worker-a_0", { "job": "1", "time": 3.0 } )
+    AppendRenderHistory( sceneHistoryDir, "worker/b_1", { "job": "1", "time": 1.0 } )
+    AppendRenderHistory( sceneHistoryDir, "worker-a_0", { "job": "2", "time": 2.0 } )
+    with open( os.path.join( sceneHistoryDir, "worker-a_0.jsonl" ), "a" ) as historyHandle:
+        historyHandle.write( '{"job": "1", "ti' )
+
+    assert sorted( os.listdir( sceneHistoryDir ) ) == [ "worker-a_0.jsonl", "worker_b_1.jsonl" ]
+    assert [ record[ "time" ] for record in LoadRenderHistory( sceneHistoryDir ) ] == [ 1.0, 2.0, 3.0 ]
+    assert [ record[ "time" ] for record in LoadRenderHistory( sceneHistoryDir, lambda record: record[ "job" ] == "1" ) ] == [ 1.0, 3.0 ]
+    assert LoadRenderHistory( os.path.join( str( tmp_path ), "missing" ) ) == []
+
+
+def test_index_frame_files( tmp_path ):
+    for name in ( "Beauty0001.exr", "Beauty.0002.exr", "Beauty_0003.exr", "Beauty_diffuse0001.exr", "Other0001.exr" ):
+        tmp_path.joinpath( name ).write_bytes( b"" )
+
+    frames = IndexFrameFiles( str( tmp_path ), "Beauty", False )
+    assert sorted( frames ) == [ 1, 2, 3 ]
+    assert frames[ 1 ] == [ os.path.join( str( tmp_path ), "Beauty0001.exr" ) ]
+
+    assert len( IndexFrameFiles( str( tmp_path ), "Beauty", True )[ 1 ] ) == 2
+
+
+def test_find_frames_to_render_skips_valid_frames( tmp_path ):
+    # A PNG header is enough for the frame to count as valid; the empty file for frame 2 is not.
+    tmp_path.joinpath( "Beauty0001.png" ).write_bytes( b"\x89PNG\r\n\x1a\n" + b"\0" * 64 )
+    tmp_path.joinpath( "Beauty0002.png" ).write_bytes( b"" )
+
+    outputs = [ ( str( tmp_path ), "Beauty", False ) ]
+    assert FindFramesToRender( [ 1, 2, 3 ], outputs, 0, 2 ) == [ 2, 3 ]
+
+
+@pytest.mark.skipif( not sys.platform.startswith( "linux" ), reason="reads the child processes from /proc" )
+def test_find_new_child_process_tells_sessions_apart():
+    knownChildren = set( GetChildProcessIds( os.getpid() ) )
+    processes = []
+    try:
+        for token in ( "first", "second" ):
+            environment = dict( os.environ, DEADLINE_C4D_SESSION=token )
+            processes.append( subprocess.Popen( [ sys.executable, "-c", "import time; time.sleep( 60 )", "-DeadlineConnect %s" % token ], env=environment ) )
+
+        # The plugins poll until the renderer is found, since a child that has not run its executable yet still has the
+        # command line and environment of this process.
+        deadline = time.time() + 10
+        while FindNewChildProcess( knownChildren, sys.executable, "-DeadlineConnect second" ) is None and time.time() < deadline:
+            time.sleep( 0.05 )
+        while FindNewChildProcess( knownChildren, sys.executable, "-DeadlineConnect first" ) is None and time.time() < deadline:
+            time.sleep( 0.05 )
+
+        assert FindNewChildProcess( knownChildren, sys.executable, "DEADLINE_C4D_SESSION=second" ) == processes[ 1 ].pid
+        assert FindNewChildProcess( knownChildren, sys.executable, "-DeadlineConnect first" ) == processes[ 0 ].pid
+        assert FindNewChildProcess( knownChildren, sys.executable, "DEADLINE_C4D_SESSION=third" ) is None
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+
+
+def test_verified_paths_are_appended_and_removed_with_the_job( tmp_path ):
+    preflightDir = str( tmp_path / "preflight" )
+    verifiedFile = os.path.join( preflightDir, "job1.txt" )
+    assert LoadVerifiedPaths( verifiedFile ) == set()
+    AppendVerifiedPaths( verifiedFile, [ u"/a/b.png", u"/c/d.exr" ] )
+    AppendVerifiedPaths( verifiedFile, [ u"/e/f.abc" ] )
+    with open( verifiedFile, "a" ) as verifiedHandle:
+        verifiedHandle.write( "/torn" )
+    assert LoadVerifiedPaths( verifiedFile ) == { u"/a/b.png", u"/c/d.exr", u"/e/f.abc" }
+
+    AppendVerifiedPaths( os.path.join( preflightDir, "job2.txt" ), [ u"/g.png" ] )
+    AppendVerifiedPaths( os.path.join( preflightDir, "job3.txt" ), [ u"/h.png" ] )
+    staleTime = time.time() - PREFLIGHT_RETENTION_SECONDS - 60
+    os.utime( os.path.join( preflightDir, "job3.txt" ), ( staleTime, staleTime ) )
+    RemoveVerifiedPaths( preflightDir, "job1" )
+    assert os.listdir( preflightDir ) == [ "job2.txt" ]
+
+
+def test_redshift_cache_counts_the_files_added_during_the_task_with_one_scan( tmp_path, monkeypatch ):
+    cacheDir = tmp_path / "redshift"
+    ( cacheDir / "tex" ).mkdir( parents=True )
+    oldTime = time.time() - 3600
+    for name in ( "a.rstexbin", "b.rstexbin" ):
+        ( cacheDir / "tex" / name ).write_bytes( b"x" * 100 )
+        os.utime( str( cacheDir / "tex" / name ), ( oldTime, oldTime ) )
+    cache = RedshiftCache( str( cacheDir ), 0 )
+    scans = []
+    scan = cache.scan
+    monkeypatch.setattr( cache, "scan", lambda: scans.append( 1 ) or scan() )
+
+    cache.StartTask()
+    ( cacheDir / "tex" / "c.rstexbin" ).write_bytes( b"x" * 50 )
+    lines = cache.EndTask()
+    assert lines[0].startswith( "The Redshift cache was cold for this task: 1 file(s)" )
+    assert "in addition to the 2 file(s)" in lines[0]
+    assert len( scans ) == 1
+
+    os.utime( str( cacheDir / "tex" / "c.rstexbin" ), ( oldTime, oldTime ) )
+    cache.StartTask()
+    assert cache.EndTask()[0].startswith( "The Redshift cache was warm for this task: nothing was added to the 3 file(s)" )
+
+
+def test_redshift_cache_evicts_one_session_at_a_time( tmp_path ):
+    cacheDir = tmp_path / "redshift"
+    cacheDir.mkdir()
+    for index in range( 4 ):
+        path = cacheDir / ( "%d.rstexbin" % index )
+        path.write_bytes( b"x" * 100 )
+        os.utime( str( path ), ( 1000 + index, 1000 + index ) )
+    cache = RedshiftCache( str( cacheDir ), 250 )
+
+    # Another session holds the lock, so nothing is evicted until it is released.
+    lockHandle = RedshiftCache( str( cacheDir ), 250 ).acquireLock()
+    assert lockHandle is not None
+    assert cache.acquireLock() is None
+    assert cache.evict( cache.scan() ) == ( 0, 0 )
+    cache.releaseLock( lockHandle )
+
+    assert cache.evict( cache.scan() ) == ( 2, 200 )
+    assert sorted( os.listdir( str( cacheDir ) ) ) == [ ".deadline_evict.lock", "2.rstexbin", "3.rstexbin" ]
+
+
+class PluginInfo( object ):
+    """
+    The plugin info and logging of a DeadlinePlugin, which the setup helpers read the job's settings from.
+    """
+    def __init__( self, jobsDataDir, **entries ):
+        self.jobsDataDir = jobsDataDir
+        self.entries = entries
+        self.warnings = []
+
+    def GetPluginInfoEntryWithDefault( self, key, default ):
+        return str( self.entries.get( key, default ) )
+
+    def GetIntegerPluginInfoEntryWithDefault( self, key, default ):
+        return int( self.entries.get( key, default ) )
+
+    def GetJobsDataDirectory( self ):
+        return self.jobsDataDir
+
+    def LogWarning( self, message ):
+        self.warnings.append( message )
+
+
+def test_job_manifest_falls_back_to_the_recorded_renderer( tmp_path ):
+    ( tmp_path / "manifest.json" ).write_text( u'{"renderer": "Redshift", "memoryEstimate": 4096, "assets": []}' )
+    manifest = JobManifest( PluginInfo( str( tmp_path ), AssetManifest="manifest.json" ), lambda path: path )
+    assert manifest.GetFile() == str( tmp_path / "manifest.json" )
+    assert manifest.GetRenderer() == "Redshift"
+    assert manifest.GetEntry( "memoryEstimate" ) == 4096
+
+    manifest.Plugin.entries[ "Renderer" ] = "Standard"
+    assert manifest.GetRenderer() == "Standard"
+
+
+def test_job_manifest_without_a_readable_file_uses_the_defaults( tmp_path ):
+    manifest = JobManifest( PluginInfo( str( tmp_path ) ), lambda path: path )
+    assert manifest.GetFile() is None
+    assert manifest.GetAssetPaths() is None
+
+    manifest.Plugin.entries[ "AssetManifest" ] = "missing.json"
+    assert manifest.GetEntry( "renderer", "" ) == ""
+    assert manifest.Plugin.warnings
+
+
+def test_cgroup_limits_reset_every_interface_file():
+    assert GetCgroupLimits( PluginInfo( "" ) ) == {
+        "memory.high": "max", "memory.max": "max", "cpu.weight": 100, "io.weight": "default 100" }
+    limits = GetCgroupLimits( PluginInfo( "", MemoryHighMB=1024, CpuWeight=0, IoWeight=50000 ) )
+    assert limits[ "memory.high" ] == 1024 * 1024 * 1024
+    assert limits[ "cpu.weight" ] == 1
+    assert limits[ "io.weight" ] == "default 10000"
+
+
+def ExportFrames( cache, sceneFile, frames ):
+    """
+    Writes the export files of frames and returns the keys they were exported with.
+    """
+    keys = cache.GetKeys( { "scene": cache.GetSceneDigest( sceneFile ) }, frames )
+    files = {}
+    for frame in frames:
+        files[ frame ] = "cache%04d.abc" % frame
+        with open( os.path.join( cache.Directory, files[ frame ] ), "wb" ) as exportHandle:
+            exportHandle.write( b"frame %d" % frame )
+    cache.Store( keys, files )
+    return keys
+
+
+def test_export_cache_hits_until_the_scene_changes( tmp_path ):
+    sceneFile = str( tmp_path / "scene.c4d" )
+    with open( sceneFile, "wb" ) as sceneHandle:
+        sceneHandle.write( b"scene" )
+    exportFile = str( tmp_path / "cache####.abc" )
+    keys = ExportFrames( ExportCache( exportFile ), sceneFile, [ 1, 2, 3 ] )
+
+    cache = ExportCache( exportFile )
+    assert cache.GetKeys( { "scene": cache.GetSceneDigest( sceneFile ) }, [ 1, 2, 3 ] ) == keys
+    assert cache.FindValidItems( keys ) == [ 1, 2, 3 ]
+
+    with open( sceneFile, "wb" ) as sceneHandle:
+        sceneHandle.write( b"changed scene" )
+    cache = ExportCache( exportFile )
+    assert cache.FindValidItems( cache.GetKeys( { "scene": cache.GetSceneDigest( sceneFile ) }, [ 1, 2, 3 ] ) ) == []
+
+
+def test_export_cache_misses_files_changed_since_the_export( tmp_path ):
+    sceneFile = str( tmp_path / "scene.c4d" )
+    with open( sceneFile, "wb" ) as sceneHandle:
+        sceneHandle.write( b"scene" )
+    exportFile = str( tmp_path / "cache####.abc" )
+    keys = ExportFrames( ExportCache( exportFile ), sceneFile, [ 1, 2, 3 ] )
+
+    # Frame 1 is rewritten with a different size, frame 2 keeps its size but is touched, and frame 3 is deleted.
+    with open( str( tmp_path / "cache0001.abc" ), "ab" ) as exportHandle:
+        exportHandle.write( b" and more" )
+    modifiedTime = os.path.getmtime( str( tmp_path / "cache0002.abc" ) ) + 10
+    os.utime( str( tmp_path / "cache0002.abc" ), ( modifiedTime, modifiedTime ) )
+    os.remove( str( tmp_path / "cache0003.abc" ) )
+    assert ExportCache( exportFile ).FindValidItems( keys ) == []
+
+
+def test_export_cache_store_merges_with_the_manifest_of_other_tasks( tmp_path ):
+    sceneFile = str( tmp_path / "scene.c4d" )
+    with open( sceneFile, "wb" ) as sceneHandle:
+        sceneHandle.write( b"scene" )
+    exportFile = str( tmp_path / "cache####.abc" )
+    # Both tasks read the manifest before either of them stored its frames.
+    firstTask = ExportCache( exportFile )
+    secondTask = ExportCache( exportFile )
+    firstKeys = ExportFrames( firstTask, sceneFile, [ 1, 2 ] )
+    secondKeys = ExportFrames( secondTask, sceneFile, [ 3, 4 ] )
+
+    cache = ExportCache( exportFile )
+    assert sorted( cache.manifest[ "exports" ] ) == [ "1", "2", "3", "4" ]
+    assert cache.FindValidItems( firstKeys ) == [ 1, 2 ]
+    assert cache.FindValidItems( secondKeys ) == [ 3, 4 ]
+    assert [ name for name in os.listdir( str( tmp_path ) ) if name.startswith( ".exportcache" ) ] == []
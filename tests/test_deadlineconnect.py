@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import harness
+from c4d import documents
+
+DeadlineConnect = harness.LoadDeadlineConnect()
+
+
+def WriteLease( cache, pid, paths ):
+    with open( os.path.join( cache.leasesDir, "%d.json" % pid ), "w" ) as leaseHandle:
+        json.dump( { "pid": pid, "paths": paths }, leaseHandle )
+
+
+@pytest.mark.skipif( os.name == "nt", reason="checks the lease owners with os.kill" )
+def test_evict_keeps_the_objects_that_running_sessions_leased( tmp_path ):
+    cache = DeadlineConnect.AssetCache( str( tmp_path / "cache" ) )
+    objectPaths = []
+    for index in range( 4 ):
+        source = tmp_path / ( "texture%d.png" % index )
+        source.write_bytes( b"%d" % index * 1000 )
+        objectPaths.append( cache.fetch( str( source ) )[0] )
+    oldTime = time.time() - DeadlineConnect.leaseGraceSeconds - 60
+    for objectPath in objectPaths[ :3 ]:
+        os.utime( objectPath, ( oldTime, oldTime ) )
+
+    otherSession = subprocess.Popen( [ sys.executable, "-c", "import time; time.sleep( 60 )" ] )
+    exitedSession = subprocess.Popen( [ sys.executable, "-c", "pass" ] )
+    exitedSession.wait()
+    try:
+        WriteLease( cache, otherSession.pid, [ objectPaths[0] ] )
+        WriteLease( cache, exitedSession.pid, [ objectPaths[1] ] )
+        assert cache.evict( 0, set() ) == ( 2, 2000 )
+    finally:
+        otherSession.kill()
+        otherSession.wait()
+
+    # The object leased by the running session and the one used within the grace period are kept.
+    assert [ os.path.isfile( objectPath ) for objectPath in objectPaths ] == [ True, False, False, True ]
+    assert os.listdir( cache.leasesDir ) == [ "%d.json" % otherSession.pid ]
+
+
+def test_lease_replaces_the_previous_lease_and_is_released( tmp_path ):
+    cache = DeadlineConnect.AssetCache( str( tmp_path / "cache" ) )
+    cache.lease( [ "a" ] )
+    DeadlineConnect.assetCacheLease = cache.lease( [ "b", "c" ] )
+    assert cache.getLeasedPaths() == { "b", "c" }
+    DeadlineConnect.releaseAssetCacheLease()
+    assert os.listdir( cache.leasesDir ) == []
+
+
+def test_save_mapped_scene_leaves_the_active_document_as_loaded( tmp_path ):
+    textureDir = tmp_path / "tex"
+    textureDir.mkdir()
+    for index in range( 4 ):
+        ( textureDir / ( "texture_%04d.png" % index ) ).write_bytes( b"png" )
+    scene = harness.WriteScene( str( tmp_path / "scene.c4d" ), objects=5, materials=2, shadersPerMaterial=2, textureDirectory="tex", cacheEvery=0 )
+    assert documents.LoadFile( scene )
+    doc = documents.GetActiveDocument()
+    loadedPaths = [ node[ paramId ] for node, paramId in doc.filenameParams ]
+
+    savedScene = str( tmp_path / "mapped.c4d" )
+    DeadlineConnect.saveMappedScene( savedScene, str( tmp_path / "paths.json" ), str( tmp_path / "assets.json" ) )
+
+    assert documents.GetActiveDocument() is doc
+    assert [ node[ paramId ] for node, paramId in doc.filenameParams ] == loadedPaths
+    with open( savedScene ) as sceneHandle:
+        savedPaths = json.load( sceneHandle )[ "filenames" ]
+    assert savedPaths == [ os.path.join( str( tmp_path ), path ) for path in loadedPaths ]
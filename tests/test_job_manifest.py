@@ -0,0 +1,80 @@
+import os
+
+import harness  # noqa: F401, puts the c4d stand-in on the path
+import c4d
+from c4d import documents
+
+import C4DJobManifest
+
+
+def LoadScene( path, **description ):
+    assert documents.LoadFile( harness.WriteScene( path, **description ) )
+    return documents.GetActiveDocument()
+
+
+def test_collect_file_parameters_finds_every_file_parameter( tmp_path ):
+    # Every third shader of a material is nested in a layer shader, and every fifth object is an Alembic generator.
+    doc = LoadScene( str( tmp_path / "scene.c4d" ), objects=20, materials=6, shadersPerMaterial=3, cacheEvery=5 )
+    expected = sorted( node[ paramId ] for node, paramId in doc.filenameParams )
+    assert sorted( C4DJobManifest.CollectFileParameters( doc ) ) == expected
+    assert any( path.endswith( ".abc" ) for path in expected )
+
+
+class Wrapper( object ):
+    """
+    A node handed out by a new Python object every time it is reached, the way c4d wraps its nodes. The wrappers are
+    freed as soon as the walk moves on, so their ids are reused.
+    """
+    def __init__( self, node ):
+        self.node = node
+
+    def __getattr__( self, name ):
+        attribute = getattr( self.node, name )
+        if not callable( attribute ):
+            return attribute
+        return lambda *args: Wrap( attribute( *args ) )
+
+    def __getitem__( self, paramId ):
+        return Wrap( self.node[ paramId ] )
+
+    def __setitem__( self, paramId, value ):
+        self.node[ paramId ] = value
+
+
+def Wrap( value ):
+    return Wrapper( value ) if isinstance( value, c4d.BaseList2D ) else value
+
+
+def test_collect_file_parameters_walks_short_lived_wrappers( tmp_path ):
+    doc = LoadScene( str( tmp_path / "scene.c4d" ), objects=20, materials=6, shadersPerMaterial=3, cacheEvery=5 )
+    expected = sorted( node[ paramId ] for node, paramId in doc.filenameParams )
+    assert sorted( C4DJobManifest.CollectFileParameters( Wrapper( doc ) ) ) == expected
+
+
+def test_collect_file_parameters_keeps_every_use_of_a_shared_texture( tmp_path ):
+    doc = LoadScene( str( tmp_path / "scene.c4d" ), objects=4, materials=4, shadersPerMaterial=2, textures=1, cacheEvery=0 )
+    paths = C4DJobManifest.CollectFileParameters( doc )
+    assert len( paths ) == 8
+    assert len( set( paths ) ) == 1
+
+
+def test_job_manifest_describes_found_and_missing_assets( tmp_path ):
+    textureDir = tmp_path / "tex"
+    textureDir.mkdir()
+    ( textureDir / "texture_0000.png" ).write_bytes( b"x" * 100 )
+    doc = LoadScene( str( tmp_path / "scene.c4d" ), objects=2, materials=1, shadersPerMaterial=2, textureDirectory=str( textureDir ), cacheEvery=0 )
+    assets = C4DJobManifest.BuildJobManifest( doc )[ "assets" ]
+    assert [ ( os.path.basename( asset[ "path" ] ), asset.get( "size" ), asset.get( "missing", False ) ) for asset in assets ] == [
+        ( "texture_0000.png", 100, False ), ( "texture_0001.png", None, True ) ]
+
+
+def test_attach_to_submission_sets_the_asset_manifest( tmp_path ):
+    pluginInfoFile = str( tmp_path / "plugin_info.job" )
+    with open( pluginInfoFile, "w" ) as pluginInfoHandle:
+        pluginInfoHandle.write( "SceneFile=/mnt/scene.c4d\nAssetManifest=old.json\nVersion=26\n" )
+    manifestFile = str( tmp_path / "scene_manifest.json" )
+    auxiliaryFiles = [ "/mnt/scene.c4d" ]
+    C4DJobManifest.AttachToSubmission( manifestFile, pluginInfoFile, auxiliaryFiles )
+    with open( pluginInfoFile ) as pluginInfoHandle:
+        assert pluginInfoHandle.read() == "SceneFile=/mnt/scene.c4d\nVersion=26\nAssetManifest=scene_manifest.json\n"
+    assert auxiliaryFiles == [ "/mnt/scene.c4d", manifestFile ]
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+
+import pytest
+
+import harness
+
+Cinema4DRenderStats = harness.LoadEventModule( "Cinema4DRenderStats" )
+
+
+class Job( object ):
+    def __init__( self, jobId ):
+        self.JobId = jobId
+        self.JobName = "shot010"
+        self.JobUserName = "artist"
+        self.JobPlugin = "Cinema4DBatch"
+        self.JobFramesPerTask = 2
+        self.PluginInfo = { "SceneFile": "/mnt/projects/shot010.c4d", "Renderer": "Redshift" }
+
+    def GetJobPluginInfoKeyValue( self, key ):
+        return self.PluginInfo.get( key, "" )
+
+
+def Records():
+    """
+    The history of a job of two tasks. Task 1 was requeued and rendered again on another Worker, and the first render of
+    it did not record its peak memory.
+    """
+    return [
+        { "job": "job1", "task": 0, "worker": "render01", "time": 100.0, "frames": [ 10.0, 12.0 ], "startup": 30.0,
+          "overhead": 1.0, "timings": { "boot": 20.0, "load": 8.0, "upload": 2.0 }, "peakMemory": 4096 * 1048576 },
+        { "job": "job1", "task": 1, "worker": "render02", "time": 110.0, "frames": [ 40.0 ], "startup": 25.0,
+          "overhead": 3.0, "timings": { "boot": 18.0, "load": 7.0 } },
+        { "job": "job1", "task": 1, "worker": "render01", "time": 200.0, "frames": [ 14.0, 16.0 ], "startup": 0.0,
+          "overhead": 2.0, "timings": { "upload": 4.0 }, "peakMemory": 6144 * 1048576 },
+    ]
+
+
+@pytest.mark.parametrize( "percent, expected", [ ( 0, 1 ), ( 50, 5 ), ( 90, 9 ), ( 99, 10 ), ( 100, 10 ) ] )
+def test_percentile_is_the_nearest_rank( percent, expected ):
+    assert Cinema4DRenderStats.Percentile( [ 10, 3, 1, 7, 2, 9, 4, 8, 6, 5 ], percent ) == expected
+
+
+def test_percentile_of_a_single_value():
+    assert Cinema4DRenderStats.Percentile( [ 42.0 ], 99 ) == 42.0
+
+
+def test_aggregate_records_counts_every_render_of_a_requeued_task():
+    statistics = Cinema4DRenderStats.AggregateRecords( Records() )
+
+    frame = statistics[ "Frame" ]
+    assert frame[ "count" ] == 5
+    assert frame[ "mean" ] == pytest.approx( 18.4 )
+    assert ( frame[ "p50" ], frame[ "p90" ], frame[ "max" ] ) == ( 14.0, 40.0, 40.0 )
+    assert statistics[ "Startup" ][ "count" ] == 3
+    assert statistics[ "Upload" ][ "count" ] == 2
+    assert statistics[ "Boot" ][ "p50" ] == 18.0
+
+    # The record without a peak memory is left out rather than counted as zero.
+    peakMemory = statistics[ "PeakMemory" ]
+    assert ( peakMemory[ "unit" ], peakMemory[ "count" ], peakMemory[ "p50" ], peakMemory[ "max" ] ) == ( "MB", 2, 4096.0, 6144.0 )
+    # Figures that no task recorded are not reported at all.
+    assert "PathMapping" not in statistics
+
+
+def test_store_job_statistics_replaces_the_rows_of_an_earlier_aggregation( tmp_path ):
+    databaseFile = str( tmp_path / "stats.sqlite" )
+    job = Job( "job1" )
+    records = Records()[ :2 ]
+    Cinema4DRenderStats.StoreJobStatistics( databaseFile, job, "Failed", records, Cinema4DRenderStats.AggregateRecords( records ) )
+
+    # The job is resumed: the failed task is requeued and rendered again, and the job's history is aggregated once more.
+    records = Records()
+    records[ 0 ][ "overhead" ] = 1.5
+    statistics = Cinema4DRenderStats.AggregateRecords( records )
+    Cinema4DRenderStats.StoreJobStatistics( databaseFile, job, "Completed", records, statistics )
+
+    connection = sqlite3.connect( databaseFile )
+    try:
+        tasks = connection.execute( "SELECT task, worker, overhead, upload, peakMemory, frameCount, frameSeconds FROM tasks ORDER BY time" ).fetchall()
+        assert tasks == [
+            ( 0, "render01", 1.5, 2.0, 4096 * 1048576, 2, 22.0 ),
+            ( 1, "render02", 3.0, None, None, 1, 40.0 ),
+            ( 1, "render01", 2.0, 4.0, 6144 * 1048576, 2, 30.0 ),
+        ]
+        assert connection.execute( "SELECT COUNT(*) FROM frames" ).fetchone()[ 0 ] == 5
+        jobs = connection.execute( "SELECT job, plugin, scene, renderer, status, statistics FROM jobs" ).fetchall()
+        assert [ row[ :5 ] for row in jobs ] == [ ( "job1", "Cinema4DBatch", "/mnt/projects/shot010.c4d", "Redshift", "Completed" ) ]
+        assert json.loads( jobs[ 0 ][ 5 ] ) == json.loads( json.dumps( statistics ) )
+    finally:
+        connection.close()